@@ -8,6 +8,7 @@ from .valuation_agent import ValuationAgent
 from .news_agent import NewsAgent
 from .summarizer_agent import SummarizerAgent
 from .company_qa_agent import CompanyQAAgent
+from .comparison_agent import ComparisonAgent
 
 __all__ = [
     'PlannerAgent',
@@ -17,4 +18,5 @@ __all__ = [
     'NewsAgent',
     'SummarizerAgent',
     'CompanyQAAgent',
+    'ComparisonAgent',
 ]
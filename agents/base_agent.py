@@ -3,48 +3,160 @@ Agent基类
 提供ReAct Agent的基础实现
 """
 from abc import ABC, abstractmethod
-from typing import List, Any, Optional
+from typing import List, Any, Dict, Optional
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks import BaseCallbackHandler
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage
 from langgraph.prebuilt import create_react_agent
 import sys
 import time
 sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
 from config import config
+from monitoring.metrics import registry, current_run_id, CallTimer
+from llm.factory import get_chat_model, estimate_cost
+from tools.async_utils import asyncify_tools, run_blocking
+from tools.capabilities import unavailable_tools
+from .context_compactor import ContextCompactor, CompactionStats
 
 
 class LLMProgressCallback(BaseCallbackHandler):
-    """LLM和工具调用进度回调，显示执行过程的提示"""
+    """
+    LLM和工具调用进度回调 + 指标收集
+
+    除了打印执行进度，还会为每次LLM/工具调用记录:
+    所属Agent、图节点、耗时、首token时间、prompt/completion token用量，
+    写入全局指标注册表 (monitoring.registry)
+    """
     
-    def __init__(self, agent_name: str = "Agent"):
+    def __init__(self, agent_name: str = "Agent", verbose: bool = True):
         self.agent_name = agent_name
+        self.verbose = verbose
         self.llm_call_count = 0
         self.tool_call_count = 0
+        # LangChain run_id -> (计时器, 调用上下文)
+        self._pending: Dict[Any, tuple] = {}
+    
+    def _log(self, icon: str, message: str):
+        if self.verbose:
+            current_time = time.strftime("%H:%M:%S")
+            print(f"    {icon} [{current_time}] [{self.agent_name}] {message}", flush=True)
+    
+    @staticmethod
+    def _resolve_node(metadata: Optional[dict]) -> str:
+        """从回调元数据中解析外层图节点名 (如 fundamental)"""
+        metadata = metadata or {}
+        checkpoint_ns = metadata.get('langgraph_checkpoint_ns') or metadata.get('checkpoint_ns') or ''
+        if checkpoint_ns:
+            return checkpoint_ns.split('|')[0].split(':')[0]
+        return metadata.get('langgraph_node', '')
+    
+    def _start(self, run_id, kind: str, name: str, metadata: Optional[dict]):
+        metadata = metadata or {}
+        context = {
+            'kind': kind,
+            'name': name,
+            'agent': self.agent_name,
+            'node': self._resolve_node(metadata),
+            'run_id': metadata.get('analysis_run_id') or current_run_id(),
+        }
+        if kind == 'llm':
+            context['call_site'] = metadata.get('call_site', '')
+            context['model_tier'] = metadata.get('model_tier', '')
+        self._pending[run_id] = (CallTimer(), context)
+    
+    def _finish(self, run_id, error: Optional[BaseException] = None, **extra) -> Optional[dict]:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return None
+        timer, context = pending
+        now = time.perf_counter()
+        record = {
+            **context,
+            'start': timer.wall_start,
+            'end': timer.wall_start + (now - timer.start),
+            'wall_time': now - timer.start,
+            'ttft': (timer.first_token - timer.start) if timer.first_token else None,
+            'error': f"{type(error).__name__}: {error}" if error else None,
+            **extra,
+        }
+        registry.record_call(record)
+        return record
+    
+    @staticmethod
+    def _model_name(kwargs: dict) -> str:
+        metadata = kwargs.get('metadata') or {}
+        params = kwargs.get('invocation_params') or {}
+        return metadata.get('ls_model_name') or params.get('model') or params.get('model_name') or ''
+    
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        """Chat模型开始调用时触发"""
+        self.on_llm_start(serialized, [], **kwargs)
     
     def on_llm_start(self, serialized, prompts, **kwargs):
         """LLM开始调用时触发"""
         self.llm_call_count += 1
-        current_time = time.strftime("%H:%M:%S")
-        print(f"    💭 [{current_time}] [{self.agent_name}] 正在调用LLM分析 (第{self.llm_call_count}次)...", flush=True)
+        self._start(kwargs.get('run_id'), 'llm', self._model_name(kwargs), kwargs.get('metadata'))
+        self._log("💭", f"正在调用LLM分析 (第{self.llm_call_count}次)...")
+    
+    def on_llm_new_token(self, token, **kwargs):
+        """流式输出时记录首token时间"""
+        pending = self._pending.get(kwargs.get('run_id'))
+        if pending is not None and pending[0].first_token is None:
+            pending[0].first_token = time.perf_counter()
     
     def on_llm_end(self, response, **kwargs):
         """LLM调用结束时触发"""
-        current_time = time.strftime("%H:%M:%S")
-        print(f"    ✓  [{current_time}] [{self.agent_name}] LLM响应完成", flush=True)
+        prompt_tokens, completion_tokens = self._token_usage(response)
+        pending = self._pending.get(kwargs.get('run_id'))
+        model = pending[1]['name'] if pending else ''
+        record = self._finish(
+            kwargs.get('run_id'),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens),
+        )
+        elapsed = f" ({record['wall_time']:.1f}s, {prompt_tokens}+{completion_tokens} tokens)" if record else ""
+        self._log("✓ ", f"LLM响应完成{elapsed}")
+    
+    def on_llm_error(self, error, **kwargs):
+        """LLM调用失败时触发"""
+        self._finish(kwargs.get('run_id'), error=error)
+        self._log("✗ ", f"LLM调用失败: {error}")
+    
+    @staticmethod
+    def _token_usage(response) -> tuple:
+        """从LLMResult中提取token用量，兼容流式 (usage_metadata) 和非流式 (llm_output)"""
+        prompt_tokens = completion_tokens = 0
+        for generations in getattr(response, 'generations', None) or []:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if usage:
+                    prompt_tokens += usage.get('input_tokens', 0)
+                    completion_tokens += usage.get('output_tokens', 0)
+        if not (prompt_tokens or completion_tokens):
+            usage = (getattr(response, 'llm_output', None) or {}).get('token_usage') or {}
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+        return prompt_tokens, completion_tokens
     
     def on_tool_start(self, serialized, input_str, **kwargs):
         """工具开始调用时触发"""
         self.tool_call_count += 1
-        tool_name = serialized.get("name", "未知工具")
-        current_time = time.strftime("%H:%M:%S")
-        print(f"    🔧 [{current_time}] [{self.agent_name}] 正在调用工具: {tool_name}...", flush=True)
+        tool_name = (serialized or {}).get("name") or kwargs.get('name') or "未知工具"
+        self._start(kwargs.get('run_id'), 'tool', tool_name, kwargs.get('metadata'))
+        self._log("🔧", f"正在调用工具: {tool_name}...")
     
     def on_tool_end(self, output, **kwargs):
         """工具调用结束时触发"""
-        current_time = time.strftime("%H:%M:%S")
         output_len = len(str(output)) if output else 0
-        print(f"    ✓  [{current_time}] [{self.agent_name}] 工具返回: {output_len} 字符", flush=True)
+        record = self._finish(kwargs.get('run_id'), output_chars=output_len)
+        elapsed = f" ({record['wall_time']:.1f}s)" if record else ""
+        self._log("✓ ", f"工具返回: {output_len} 字符{elapsed}")
+    
+    def on_tool_error(self, error, **kwargs):
+        """工具调用失败时触发"""
+        self._finish(kwargs.get('run_id'), error=error)
+        self._log("✗ ", f"工具调用失败: {error}")
 
 
 class BaseAgent(ABC):
@@ -55,7 +167,8 @@ class BaseAgent(ABC):
         name: str,
         tools: List[BaseTool],
         system_prompt: str,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        call_site: str = "analysis"
     ):
         """
         初始化Agent
@@ -64,34 +177,44 @@ class BaseAgent(ABC):
             name: Agent名称
             tools: 可用工具列表
             system_prompt: 系统提示词
-            model: 使用的模型名称
+            model: 使用的模型名称 (为空时按调用点路由)
+            call_site: 调用点名称，决定模型档位 (见 llm/factory.py)
         """
         self.name = name
-        self.tools = tools
+        # 为同步工具补充线程池卸载的异步实现，供 ainvoke 使用
+        self.tools = asyncify_tools(tools)
         self.system_prompt = system_prompt
-        self.model = model or config.OPENAI_MODEL
+        self.call_site = call_site
         
         # 创建进度回调
         self.progress_callback = LLMProgressCallback(agent_name=name)
         
-        # 创建LLM (添加超时配置和进度回调)
-        self.llm = ChatOpenAI(
-            api_key=config.OPENAI_API_KEY,
-            base_url=config.OPENAI_BASE_URL,
-            model=self.model,
-            temperature=0,
-            request_timeout=60,  # 60秒超时
+        # 创建LLM (按调用点路由模型，流式输出用于统计首token时间)
+        self.llm = get_chat_model(
+            call_site,
             callbacks=[self.progress_callback],  # 添加LLM调用进度回调
+            streaming=True,
+            model=model,
+        )
+        self.model = self.llm.model_name
+        
+        # 上下文压缩器: 已读工具结果转摘要 + token预算
+        self.compactor = ContextCompactor(
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            digest_chars=config.TOOL_DIGEST_CHARS,
         )
         
         # 创建ReAct Agent (如果有工具)
         if tools:
             self.agent = create_react_agent(
                 model=self.llm,
-                tools=tools,
+                tools=self.tools,
                 # 兼容性修复：移除modifier参数，改用SystemMessage
                 # state_modifier=system_prompt  <- 旧版本
                 # messages_modifier=system_prompt <- 新版本
+                pre_model_hook=self.compactor.as_pre_model_hook(config.DEADLINE_WRAP_UP_SECONDS),
+                # 检查点粒度为图节点，不保存ReAct内部的每一步 (见 graph/checkpoint.py)
+                checkpointer=False,
             )
             # 设置递归限制 (防止无限循环)
             self.recursion_limit = 25  # 最多25次工具调用
@@ -99,6 +222,63 @@ class BaseAgent(ABC):
             self.agent = None
             self.recursion_limit = 10
     
+    def _prepare_agent_input(self, input_data: dict) -> tuple:
+        """
+        准备ReAct Agent的输入消息和运行配置
+        
+        Args:
+            input_data: 输入数据 (会被原地补充SystemMessage)
+        
+        Returns:
+            (运行配置, 压缩统计) 元组
+        """
+        # 手动添加SystemMessage以兼容不同版本
+        messages = input_data.get("messages", [])
+        # 确保system_prompt作为第一条消息
+        if self.system_prompt:
+            system_msg = SystemMessage(content=self.system_prompt)
+            # 检查是否已有SystemMessage
+            if not messages or not isinstance(messages[0], SystemMessage):
+                messages = [system_msg] + messages
+        
+        # 使用ReAct Agent (带递归限制)，传递 callbacks 以显示工具调用进度
+        input_data["messages"] = messages
+        compaction_stats = CompactionStats()
+        config_dict = {
+            "recursion_limit": self.recursion_limit,
+            "configurable": {"compaction_stats": compaction_stats},
+            "callbacks": [self.progress_callback],
+        }
+        return config_dict, compaction_stats
+    
+    def _market_note(self, stock_code: str) -> str:
+        """
+        股票所属市场不支持部分工具时附加到Prompt的说明 (这些工具被调用时也会立即拒绝)
+        
+        Args:
+            stock_code: 股票代码
+        
+        Returns:
+            说明文本，工具都支持时为空字符串
+        """
+        names = unavailable_tools([tool.name for tool in self.tools], stock_code)
+        if not names:
+            return ""
+        return f"\n\n注意: 当前数据源不支持该股票所属市场的以下工具，请不要调用: {'、'.join(names)}"
+    
+    @staticmethod
+    def _final_content(result: dict) -> str:
+        """提取Agent执行结果中最后一条消息的文本"""
+        ai_message = result['messages'][-1]
+        return ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
+    
+    def _report_compaction(self, compaction_stats: CompactionStats):
+        """记录并打印上下文压缩节省情况"""
+        if compaction_stats.saved_tokens > 0:
+            registry.inc('stock_agent_context_tokens_saved_total', {'agent': self.name},
+                         compaction_stats.saved_tokens, help_text='上下文压缩节省的token估算值')
+            print(f"    [{self.name}] 上下文压缩: {compaction_stats.summary()}", flush=True)
+    
     def invoke(self, input_data: dict, debug: bool = False) -> dict:
         """
         执行Agent
@@ -111,21 +291,8 @@ class BaseAgent(ABC):
             执行结果
         """
         if self.agent:
-            # 手动添加SystemMessage以兼容不同版本
-            from langchain_core.messages import SystemMessage
-            import time
-            
-            messages = input_data.get("messages", [])
-            # 确保system_prompt作为第一条消息
-            if self.system_prompt:
-                system_msg = SystemMessage(content=self.system_prompt)
-                # 检查是否已有SystemMessage
-                if not messages or not isinstance(messages[0], SystemMessage):
-                    messages = [system_msg] + messages
-                
-            # 使用ReAct Agent (带递归限制)
-            input_data["messages"] = messages
-            config_dict = {"recursion_limit": self.recursion_limit}
+            config_dict, compaction_stats = self._prepare_agent_input(input_data)
+            messages = input_data["messages"]
             
             if debug:
                 # 调试模式：使用 stream 显示每一步
@@ -139,6 +306,9 @@ class BaseAgent(ABC):
                     current_time = time.strftime("%H:%M:%S")
                     
                     for key, value in event.items():
+                        if key == "pre_model_hook":
+                            # 上下文压缩步骤，不计入结果
+                            continue
                         print(f"    [{current_time}] Step {step_count}: {key}")
                         
                         if key == "agent":
@@ -164,11 +334,12 @@ class BaseAgent(ABC):
                         result = value
                 
                 print(f"    [DEBUG] 执行完成，共 {step_count} 步")
+                print(f"    [DEBUG] 上下文压缩: {compaction_stats.summary()}")
                 return result if result else {"messages": messages}
             else:
                 # 正常模式 - 传递 callbacks 以显示工具调用进度
-                config_dict["callbacks"] = [self.progress_callback]
                 result = self.agent.invoke(input_data, config=config_dict)
+                self._report_compaction(compaction_stats)
                 return result
         else:
             # 直接使用LLM
@@ -176,6 +347,30 @@ class BaseAgent(ABC):
             response = self.llm.invoke(messages)
             return {'messages': messages + [response]}
     
+    async def ainvoke(self, input_data: dict) -> dict:
+        """
+        异步执行Agent
+        
+        LLM调用使用异步客户端，阻塞的数据工具在线程池中执行，
+        多个分析可以共享同一个事件循环而无需为每个节点占用线程
+        
+        Args:
+            input_data: 输入数据
+        
+        Returns:
+            执行结果
+        """
+        if self.agent:
+            config_dict, compaction_stats = self._prepare_agent_input(input_data)
+            result = await self.agent.ainvoke(input_data, config=config_dict)
+            self._report_compaction(compaction_stats)
+            return result
+        else:
+            # 直接使用LLM
+            messages = input_data.get('messages', [])
+            response = await self.llm.ainvoke(messages)
+            return {'messages': messages + [response]}
+    
     @abstractmethod
     def run(self, state: dict) -> dict:
         """
@@ -188,3 +383,17 @@ class BaseAgent(ABC):
             更新后的状态
         """
         pass
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行Agent的主逻辑
+        
+        默认在数据线程池中执行同步的 run，子类应覆盖为原生异步实现
+        
+        Args:
+            state: 当前状态
+        
+        Returns:
+            更新后的状态
+        """
+        return await run_blocking(self.run, state)
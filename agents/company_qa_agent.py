@@ -11,6 +11,7 @@ from .base_agent import BaseAgent
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from rag.retriever.company_retriever import CompanyRetriever
+from tools.async_utils import run_blocking
 
 
 class CompanyQAAgent(BaseAgent):
@@ -30,23 +31,13 @@ class CompanyQAAgent(BaseAgent):
         super().__init__(
             name="公司知识Agent",
             tools=[],  # 不需要工具
-            system_prompt=self.SYSTEM_PROMPT
+            system_prompt=self.SYSTEM_PROMPT,
+            call_site="company_qa"
         )
         self.retriever = CompanyRetriever()
     
-    def run(self, state: dict) -> dict:
-        """
-        运行公司知识问答
-        
-        Args:
-            state: 包含user_query的状态
-        
-        Returns:
-            更新后的状态，包含final_report
-        """
-        user_query = state.get('user_query', '')
-        
-        # 检索相关知识
+    def _retrieve(self, user_query: str) -> str:
+        """检索相关知识 (知识库为空时自动索引)"""
         print(f"    [CompanyQA] 检索公司知识库...")
         
         # 自动索引：如果知识库为空，尝试索引目录
@@ -55,11 +46,11 @@ class CompanyQAAgent(BaseAgent):
             count = self.retriever.index_knowledge_dir()
             print(f"    [CompanyQA] 已建立索引，共 {count} 个文档块")
             
-        knowledge = self.retriever.search(user_query, k=3)
-        
-        if not knowledge:
-            # 知识库为空
-            answer = f"""## 公司知识查询
+        return self.retriever.search(user_query, k=3)
+    
+    def _empty_answer(self, user_query: str) -> dict:
+        """知识库无匹配内容时的回答"""
+        answer = f"""## 公司知识查询
             
 抱歉，公司知识库中暂无相关信息。
 
@@ -69,12 +60,13 @@ class CompanyQAAgent(BaseAgent):
 
 请将相关文档（PDF格式）放入 `data/company_knowledge/` 目录，下次查询时会自动加载。
 """
-            return {
-                **state,
-                'final_report': answer
-            }
-        
-        # 构建提示
+        return {
+            'final_report': answer
+        }
+    
+    @staticmethod
+    def _build_messages(knowledge: str, user_query: str) -> list:
+        """构建提示"""
         prompt = f"""请根据以下知识库内容回答用户问题。
 
 ## 知识库内容
@@ -84,15 +76,13 @@ class CompanyQAAgent(BaseAgent):
 {user_query}
 
 请给出准确、有帮助的回答："""
-        
-        messages = [HumanMessage(content=prompt)]
-        
-        try:
-            response = self.llm.invoke(messages)
-            answer = response.content if hasattr(response, 'content') else str(response)
-            
-            # 格式化输出
-            final_report = f"""## 公司知识查询
+        return [HumanMessage(content=prompt)]
+    
+    @staticmethod
+    def _format_answer(user_query: str, response) -> dict:
+        """格式化输出"""
+        answer = response.content if hasattr(response, 'content') else str(response)
+        final_report = f"""## 公司知识查询
 
 **问题**: {user_query}
 
@@ -100,13 +90,58 @@ class CompanyQAAgent(BaseAgent):
 
 {answer}
 """
+        return {
+            'final_report': final_report
+        }
+    
+    def run(self, state: dict) -> dict:
+        """
+        运行公司知识问答
+        
+        Args:
+            state: 包含user_query的状态
+        
+        Returns:
+            更新后的状态，包含final_report
+        """
+        user_query = state.get('user_query', '')
+        
+        # 检索相关知识
+        knowledge = self._retrieve(user_query)
+        if not knowledge:
+            # 知识库为空
+            return self._empty_answer(user_query)
+        
+        try:
+            response = self.llm.invoke(self._build_messages(knowledge, user_query))
+            return self._format_answer(user_query, response)
+        except Exception as e:
             return {
-                **state,
-                'final_report': final_report
+                'final_report': f'公司知识查询失败: {str(e)}',
+                'error': str(e)
             }
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行公司知识问答 (向量检索在线程池中执行)
+        
+        Args:
+            state: 包含user_query的状态
+        
+        Returns:
+            更新后的状态，包含final_report
+        """
+        user_query = state.get('user_query', '')
+        
+        knowledge = await run_blocking(self._retrieve, user_query)
+        if not knowledge:
+            return self._empty_answer(user_query)
+        
+        try:
+            response = await self.llm.ainvoke(self._build_messages(knowledge, user_query))
+            return self._format_answer(user_query, response)
         except Exception as e:
             return {
-                **state,
                 'final_report': f'公司知识查询失败: {str(e)}',
                 'error': str(e)
             }
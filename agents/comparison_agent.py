@@ -0,0 +1,140 @@
+"""
+对比分析Agent
+汇总多只股票各自的分析结果，结合本地计算的指标对比表生成对比报告
+"""
+import asyncio
+import contextvars
+from datetime import datetime
+from typing import Any, Dict, List
+from langchain_core.messages import HumanMessage
+from .base_agent import BaseAgent
+from .summarizer_agent import ANALYSIS_SECTIONS, MISSING_SECTION, UNSUPPORTED_SECTION
+from prompts.comparison import COMPARISON_PROMPT
+from tools.async_utils import DATA_EXECUTOR, run_blocking
+from tools.capabilities import dimension_supported
+from tools.comparison import fetch_stock_metrics, format_comparison_table
+
+
+class ComparisonAgent(BaseAgent):
+    """对比分析Agent"""
+
+    def __init__(self):
+        super().__init__(
+            name="对比分析Agent",
+            tools=[],  # 指标在本地计算，纯LLM生成
+            system_prompt=COMPARISON_PROMPT,
+            call_site="comparison"
+        )
+
+    @staticmethod
+    def _ordered_results(state: dict) -> List[Dict[str, Any]]:
+        """按规划顺序排列的各股票分析结果 (缺少结果的股票保留空记录)"""
+        results = {r['stock_code']: r for r in state.get('stock_results') or []}
+        return [
+            {**stock, **results.get(stock['stock_code'], {})}
+            for stock in state.get('stocks') or []
+        ]
+
+    def _metrics(self, stocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在数据线程池中并行计算各股票的对比指标"""
+        futures = [
+            DATA_EXECUTOR.submit(contextvars.copy_context().run, fetch_stock_metrics, s['stock_code'])
+            for s in stocks
+        ]
+        return [future.result() for future in futures]
+
+    async def _ametrics(self, stocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """异步版本的指标计算"""
+        return list(await asyncio.gather(*(run_blocking(fetch_stock_metrics, s['stock_code']) for s in stocks)))
+
+    def run(self, state: dict) -> dict:
+        """
+        运行对比分析
+
+        Args:
+            state: 包含 stocks 和 stock_results 的状态
+
+        Returns:
+            状态更新，包含final_report
+        """
+        stocks = self._ordered_results(state)
+        table = format_comparison_table(stocks, self._metrics(stocks))
+        try:
+            response = self.llm.invoke(self._build_messages(state, stocks, table))
+            return self._format_report(stocks, table, response)
+        except Exception as e:
+            return {
+                'final_report': f'对比报告生成失败: {str(e)}',
+                'error': str(e)
+            }
+
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行对比分析 (指标计算在线程池中并行执行)
+
+        Args:
+            state: 包含 stocks 和 stock_results 的状态
+
+        Returns:
+            状态更新，包含final_report
+        """
+        stocks = self._ordered_results(state)
+        table = format_comparison_table(stocks, await self._ametrics(stocks))
+        try:
+            response = await self.llm.ainvoke(self._build_messages(state, stocks, table))
+            return self._format_report(stocks, table, response)
+        except Exception as e:
+            return {
+                'final_report': f'对比报告生成失败: {str(e)}',
+                'error': str(e)
+            }
+
+    @staticmethod
+    def _build_messages(state: dict, stocks: List[Dict[str, Any]], table: str) -> list:
+        """构建对比报告的输入消息 (未执行的维度不列出，市场不支持和超时的维度以占位说明代替)"""
+        sections = []
+        for stock in stocks:
+            timed_out = set(stock.get('timed_out_nodes') or [])
+            parts = [f"### {stock.get('company_name') or stock['stock_code']} ({stock['stock_code']})"]
+            for node, (field, title) in ANALYSIS_SECTIONS.items():
+                if field not in stock:
+                    continue
+                if not dimension_supported(node, stock['stock_code']):
+                    value = UNSUPPORTED_SECTION
+                else:
+                    value = MISSING_SECTION if node in timed_out or not stock[field] else stock[field]
+                parts.append(f"#### {title}\n{value}")
+            sections.append("\n\n".join(parts))
+        prompt = COMPARISON_PROMPT.format(
+            user_query=state.get('user_query', ''),
+            stock_list="\n".join(f"- {s.get('company_name', '')} ({s['stock_code']}, {s.get('market', '')})"
+                                 for s in stocks),
+            metrics_table=table,
+            stock_sections="\n\n".join(sections),
+        )
+        return [HumanMessage(content=prompt)]
+
+    @staticmethod
+    def _format_report(stocks: List[Dict[str, Any]], table: str, response) -> dict:
+        """添加报告头、指标对比表和时间戳"""
+        names = " vs ".join(s.get('company_name') or s['stock_code'] for s in stocks)
+        report = response.content if hasattr(response, 'content') else str(response)
+        missing = [
+            f"{s.get('company_name') or s['stock_code']}: {'、'.join(ANALYSIS_SECTIONS[n][1] for n in s['timed_out_nodes'] if n in ANALYSIS_SECTIONS)}"
+            for s in stocks if s.get('timed_out_nodes')
+        ]
+        missing_note = f"\n> **未完成的分析**: {'; '.join(missing)}" if missing else ""
+        final_report = f"""# {names} 对比分析报告
+
+> **生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+> **对比标的**: {len(stocks)} 只{missing_note}
+
+---
+
+## 关键指标对比
+
+{table}
+
+{report}
+"""
+        return {'final_report': final_report}
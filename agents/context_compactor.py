@@ -0,0 +1,274 @@
+"""
+ReAct上下文压缩模块
+在每次调用LLM前压缩消息历史，避免工具返回结果在每一轮被完整重发
+
+策略:
+1. 已被LLM看过的工具结果替换为简短摘要 (保留标题、表头和首尾数据行)
+2. 超出token预算时，从最早的工具调用轮次开始整轮丢弃
+3. 统计压缩前后的token数量，用于观察节省效果
+4. 运行截止时间临近时追加收尾指令，要求LLM停止调用工具、直接给出结论
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from llm.gateway import remaining_time
+
+
+# 截止时间临近时追加的收尾指令 (只发送给LLM，不写入消息历史)
+WRAP_UP_PROMPT = (
+    "分析时间即将用完。请不要再调用任何工具，立即基于已经获取的数据给出分析结论；"
+    "未能获取的数据请明确注明“数据缺失”，不要编造。"
+)
+
+# 中日韩字符 (粗略按1字符=1token估算)
+_CJK_PATTERN = re.compile(r'[　-〿一-鿿＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数量
+
+    中文字符按1个token计算，其余字符按4个字符1个token计算
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的token数量
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def _message_text(message: BaseMessage) -> str:
+    """提取消息的文本内容"""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    # 多模态内容: 只统计文本部分
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get('type') == 'text':
+            parts.append(part.get('text', ''))
+    return ''.join(parts)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """估算单条消息的token数量 (包含工具调用参数)"""
+    tokens = estimate_tokens(_message_text(message)) + 4
+    if isinstance(message, AIMessage) and message.tool_calls:
+        for tool_call in message.tool_calls:
+            tokens += estimate_tokens(f"{tool_call.get('name', '')}{tool_call.get('args', {})}")
+    return tokens
+
+
+def digest_tool_output(text: str, max_chars: int = 600, max_rows: int = 4) -> str:
+    """
+    从工具返回结果中提取简短摘要
+
+    工具大多返回 format_to_markdown 生成的 "### 标题 + Markdown表格"，
+    摘要保留标题、表头以及首尾若干数据行，其余行以省略说明代替。
+
+    Args:
+        text: 工具原始返回文本
+        max_chars: 摘要最大字符数
+        max_rows: 表格最多保留的数据行数
+
+    Returns:
+        摘要文本
+    """
+    if len(text) <= max_chars:
+        return text
+
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    headings = [line for line in lines if line.startswith('#')]
+    table_rows = [line for line in lines if line.lstrip().startswith('|')]
+    other_lines = [line for line in lines if line not in headings and line not in table_rows]
+
+    kept: List[str] = list(headings)
+    if table_rows:
+        # 表头 + 分隔行
+        header, data_rows = table_rows[:2], table_rows[2:]
+        kept.extend(header)
+        if len(data_rows) <= max_rows:
+            kept.extend(data_rows)
+        else:
+            head_count = max_rows // 2
+            tail_count = max_rows - head_count
+            kept.extend(data_rows[:head_count])
+            kept.append(f"| ...(省略 {len(data_rows) - max_rows} 行) |")
+            kept.extend(data_rows[-tail_count:])
+    # 非表格文本: 优先保留包含数字的结论性语句
+    kept.extend(line for line in other_lines if re.search(r'\d', line))
+
+    # 单行过长时截断 (宽表)
+    kept = [line if len(line) <= 300 else line[:300] + '…' for line in kept]
+    digest = '\n'.join(kept)
+    if len(digest) > max_chars:
+        digest = digest[:max_chars] + '…'
+    return f"[已压缩摘要，原文 {len(text)} 字符]\n{digest}"
+
+
+@dataclass
+class CompactionStats:
+    """单次Agent执行的压缩统计"""
+    llm_calls: int = 0
+    original_tokens: int = 0
+    compacted_tokens: int = 0
+    digested_messages: int = 0
+    dropped_turns: int = 0
+    # 因截止时间临近而要求收尾的次数
+    wrap_ups: int = 0
+    # 每次LLM调用实际发送的token数，用于观察prompt是否保持平稳
+    prompt_tokens_per_call: List[int] = field(default_factory=list)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+    def summary(self) -> str:
+        """生成统计摘要文本"""
+        if not self.llm_calls:
+            return "未触发压缩"
+        ratio = self.saved_tokens / self.original_tokens * 100 if self.original_tokens else 0
+        return (
+            f"LLM调用 {self.llm_calls} 次, 估算发送 {self.compacted_tokens} tokens "
+            f"(原始 {self.original_tokens}, 节省 {self.saved_tokens} / {ratio:.0f}%), "
+            f"摘要 {self.digested_messages} 条, 丢弃 {self.dropped_turns} 轮"
+            + (f", 收尾 {self.wrap_ups} 次" if self.wrap_ups else "")
+        )
+
+
+class ContextCompactor:
+    """ReAct消息历史压缩器"""
+
+    def __init__(self, token_budget: int = 6000, digest_chars: int = 600):
+        """
+        初始化压缩器
+
+        Args:
+            token_budget: 每次LLM调用的消息token预算
+            digest_chars: 工具结果摘要的最大字符数
+        """
+        self.token_budget = token_budget
+        self.digest_chars = digest_chars
+        # 摘要缓存 (消息ID -> 摘要)，同一条工具结果只提取一次
+        self._digest_cache: Dict[str, str] = {}
+
+    def _digest(self, message: ToolMessage) -> ToolMessage:
+        text = _message_text(message)
+        cache_key = message.id or f"{message.tool_call_id}:{hash(text)}"
+        digest = self._digest_cache.get(cache_key)
+        if digest is None:
+            digest = digest_tool_output(text, self.digest_chars)
+            if len(self._digest_cache) >= 2000:
+                # Agent实例跨多次运行复用，防止缓存无限增长
+                self._digest_cache.clear()
+            self._digest_cache[cache_key] = digest
+        if digest == text:
+            return message
+        return message.model_copy(update={'content': digest})
+
+    @staticmethod
+    def _split_turns(messages: List[BaseMessage]) -> tuple:
+        """
+        将消息切分为: 前缀 (系统提示+首条用户消息) 和 轮次列表
+
+        每一轮以AIMessage开头，包含其后紧跟的ToolMessage，
+        丢弃时整轮移除，保证tool_call与ToolMessage始终成对出现。
+        """
+        prefix: List[BaseMessage] = []
+        index = 0
+        while index < len(messages) and isinstance(messages[index], SystemMessage):
+            prefix.append(messages[index])
+            index += 1
+        if index < len(messages) and isinstance(messages[index], HumanMessage):
+            prefix.append(messages[index])
+            index += 1
+
+        turns: List[List[BaseMessage]] = []
+        for message in messages[index:]:
+            if isinstance(message, ToolMessage) and turns:
+                turns[-1].append(message)
+            else:
+                turns.append([message])
+        return prefix, turns
+
+    def compact(self, messages: List[BaseMessage], stats: Optional[CompactionStats] = None) -> List[BaseMessage]:
+        """
+        压缩消息历史
+
+        Args:
+            messages: 完整消息历史
+            stats: 压缩统计 (可选)
+
+        Returns:
+            发送给LLM的压缩后消息列表
+        """
+        original_tokens = sum(message_tokens(m) for m in messages)
+
+        # 1. 已被LLM看过的工具结果 -> 摘要
+        #    最后一条AIMessage之后的ToolMessage尚未被看过，保持原文
+        last_ai_index = max(
+            (i for i, m in enumerate(messages) if isinstance(m, AIMessage)),
+            default=-1
+        )
+        compacted: List[BaseMessage] = []
+        digested = 0
+        for i, message in enumerate(messages):
+            if isinstance(message, ToolMessage) and i < last_ai_index:
+                new_message = self._digest(message)
+                if new_message is not message:
+                    digested += 1
+                compacted.append(new_message)
+            else:
+                compacted.append(message)
+
+        # 2. 超出预算时丢弃最早的轮次 (始终保留前缀和最近一轮)
+        prefix, turns = self._split_turns(compacted)
+        turn_tokens = [sum(message_tokens(m) for m in turn) for turn in turns]
+        total = sum(message_tokens(m) for m in prefix) + sum(turn_tokens)
+        dropped = 0
+        while total > self.token_budget and len(turns) - dropped > 1:
+            total -= turn_tokens[dropped]
+            dropped += 1
+        result = prefix + [m for turn in turns[dropped:] for m in turn]
+
+        if stats is not None:
+            stats.llm_calls += 1
+            stats.original_tokens += original_tokens
+            stats.compacted_tokens += total
+            stats.digested_messages += digested
+            stats.dropped_turns += dropped
+            stats.prompt_tokens_per_call.append(total)
+        return result
+
+    def as_pre_model_hook(self, wrap_up_seconds: float = 0):
+        """
+        生成 create_react_agent 的 pre_model_hook
+
+        只改写发送给LLM的消息 (llm_input_messages)，不修改图状态中的完整历史。
+        统计对象通过 config["configurable"]["compaction_stats"] 传入。
+
+        Args:
+            wrap_up_seconds: 距截止时间 (llm.gateway.run_deadline) 少于该秒数时追加收尾指令，0表示不追加
+        """
+        def pre_model_hook(state: dict, config: RunnableConfig) -> dict:
+            stats = (config or {}).get('configurable', {}).get('compaction_stats')
+            messages = self.compact(state['messages'], stats)
+            remaining = remaining_time()
+            if wrap_up_seconds and remaining is not None and remaining < wrap_up_seconds:
+                messages = messages + [HumanMessage(content=WRAP_UP_PROMPT)]
+                if stats is not None:
+                    stats.wrap_ups += 1
+            return {'llm_input_messages': messages}
+
+        return pre_model_hook
@@ -0,0 +1,102 @@
+"""
+分析维度定义
+规划Agent识别用户关心的维度，工作流只扇出到这些分析节点，总结Agent按维度数选择报告形式
+
+- 单一维度 (如 "茅台最近K线怎么样"): 只运行一个分析节点，总结走轻量路径直接回答问题
+- 多个维度: 运行对应节点，报告只包含这些章节
+- full 或未明确: 运行全部四个分析节点，生成完整报告
+- 股票所属市场没有数据源支持的维度 (如港股的基本面) 不运行，报告中注明不支持 (见 tools/capabilities.py)
+"""
+from typing import Iterable, List, Optional
+from tools.capabilities import split_dimensions
+
+# 分析维度 (与分析节点同名，顺序即报告章节顺序)
+ANALYSIS_DIMENSIONS = ('fundamental', 'technical', 'valuation', 'news')
+FULL_DIMENSION = 'full'
+
+# 维度关键词 (规划Agent未给出有效维度时的回退；英文关键词不区分大小写)
+DIMENSION_KEYWORDS = {
+    'fundamental': [
+        "基本面", "财报", "年报", "季报", "营收", "收入", "净利润", "利润", "毛利率", "ROE",
+        "盈利", "负债", "现金流", "业绩", "成长性",
+    ],
+    'technical': [
+        "K线", "走势", "技术面", "均线", "MACD", "RSI", "KDJ", "支撑", "阻力", "压力位",
+        "成交量", "量价", "股价", "行情",
+    ],
+    'valuation': [
+        "估值", "市盈率", "PE", "市净率", "PB", "分红", "股息", "贵不贵", "便宜", "高估", "低估",
+    ],
+    'news': [
+        "新闻", "消息", "舆情", "公告", "利好", "利空", "情绪", "传闻",
+    ],
+}
+
+# 出现这些词时视为要求完整分析
+FULL_KEYWORDS = ["投资价值", "全面", "综合", "完整", "报告", "值得投资", "值得买", "能买吗", "买入", "卖出", "持有"]
+
+
+def normalize_dimensions(values: Optional[Iterable[str]]) -> List[str]:
+    """
+    规范化维度列表
+
+    Args:
+        values: 维度名称 (可包含 full 或无效值)
+
+    Returns:
+        按报告章节顺序排列的有效维度；包含 full 或没有有效维度时返回空列表 (表示完整分析)
+    """
+    names = {str(value).strip().lower() for value in values or []}
+    if FULL_DIMENSION in names:
+        return []
+    return [dimension for dimension in ANALYSIS_DIMENSIONS if dimension in names]
+
+
+def match_dimensions(query: str) -> List[str]:
+    """
+    关键词匹配查询涉及的维度
+
+    Args:
+        query: 用户查询
+
+    Returns:
+        匹配到的维度；要求完整分析或未匹配时返回空列表
+    """
+    query_upper = query.upper()
+    if any(keyword in query_upper for keyword in FULL_KEYWORDS):
+        return []
+    return [
+        dimension for dimension in ANALYSIS_DIMENSIONS
+        if any(keyword.upper() in query_upper for keyword in DIMENSION_KEYWORDS[dimension])
+    ]
+
+
+def requested_dimensions(state: dict) -> List[str]:
+    """
+    本次运行需要执行的分析维度
+
+    Args:
+        state: 工作流状态 (dimensions 为空或缺失表示完整分析)
+
+    Returns:
+        维度列表 (至少一个)
+    """
+    return normalize_dimensions(state.get('dimensions')) or list(ANALYSIS_DIMENSIONS)
+
+
+def runnable_dimensions(state: dict) -> List[str]:
+    """
+    需要执行且股票所属市场支持的分析维度
+
+    Args:
+        state: 工作流状态
+
+    Returns:
+        维度列表 (可能为空，如只问了港股的估值)
+    """
+    return split_dimensions(state.get('stock_code', ''), requested_dimensions(state))[0]
+
+
+def unsupported_dimensions(state: dict) -> List[str]:
+    """已请求但股票所属市场不支持的分析维度"""
+    return split_dimensions(state.get('stock_code', ''), requested_dimensions(state))[1]
@@ -29,9 +29,24 @@ class FundamentalAgent(BaseAgent):
                 get_cash_flow_data,
                 get_dupont_data,
             ],
-            system_prompt=FUNDAMENTAL_PROMPT
+            system_prompt=FUNDAMENTAL_PROMPT,
+            call_site="fundamental"
         )
     
+    def _build_messages(self, state: dict):
+        """构建输入消息，缺少必要信息时返回None"""
+        company_name = state.get('company_name', '')
+        stock_code = state.get('stock_code', '')
+        
+        if not stock_code:
+            return None
+        
+        prompt = FUNDAMENTAL_PROMPT.format(
+            company_name=company_name,
+            stock_code=stock_code
+        )
+        return [HumanMessage(content=prompt + self._market_note(stock_code))]
+    
     def run(self, state: dict) -> dict:
         """
         运行基本面分析
@@ -42,27 +57,36 @@ class FundamentalAgent(BaseAgent):
         Returns:
             更新后的状态，包含fundamental_analysis
         """
-        company_name = state.get('company_name', '')
-        stock_code = state.get('stock_code', '')
-        
-        if not stock_code:
-            return {'fundamental_analysis': '无法进行基本面分析：缺少股票代码'}
-        
         # 构建输入消息
-        prompt = FUNDAMENTAL_PROMPT.format(
-            company_name=company_name,
-            stock_code=stock_code
-        )
-        messages = [HumanMessage(content=prompt)]
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'fundamental_analysis': '无法进行基本面分析：缺少股票代码'}
         
         # 调用ReAct Agent
         try:
             result = self.invoke({'messages': messages})
             
             # 提取分析结果
-            ai_message = result['messages'][-1]
-            analysis = ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
-            
-            return {'fundamental_analysis': analysis}
+            return {'fundamental_analysis': self._final_content(result)}
+        except Exception as e:
+            return {'fundamental_analysis': f'基本面分析失败: {str(e)}'}
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行基本面分析 (异步LLM客户端 + 线程池数据工具)
+        
+        Args:
+            state: 当前状态
+        
+        Returns:
+            更新后的状态，包含fundamental_analysis
+        """
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'fundamental_analysis': '无法进行基本面分析：缺少股票代码'}
+        
+        try:
+            result = await self.ainvoke({'messages': messages})
+            return {'fundamental_analysis': self._final_content(result)}
         except Exception as e:
             return {'fundamental_analysis': f'基本面分析失败: {str(e)}'}
@@ -0,0 +1,209 @@
+"""
+本地意图分类器
+
+规划Agent的意图识别依次经过:
+1. 关键词自动机: Aho-Corasick 一次扫描匹配全部意图关键词 (股票关键词优先)
+2. 最近质心分类: 查询向量与各意图标注样例的质心做余弦相似度，softmax 置信度达到阈值时采用
+3. 以上都无法确定时才调用LLM
+
+Embedding 复用RAG的共享模型 (get_shared_embedding)；模型不可用时跳过第2步。
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from tools.aho_corasick import AhoCorasick
+
+INTENTS = ('stock', 'company', 'general')
+
+# 意图关键词 (同时命中时按此顺序优先)
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "stock": [
+        "分析", "股票", "投资", "估值", "行情", "K线", "基本面", "技术面",
+        "市盈率", "PE", "PB", "ROE", "财报", "年报", "研报", "股价",
+        "买入", "卖出", "持有", "涨", "跌", "茅台", "五粮液"
+    ],
+    "company": [
+        "例会", "手册", "规章", "请假", "公司介绍", "流程", "制度",
+        "员工", "部门", "考勤", "报销", "审批", "OA", "内部"
+    ],
+}
+
+# 各意图的标注样例 (计算质心用，均不含关键词，覆盖关键词漏掉的说法)
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "stock": [
+        "宁德时代这家公司值得长期拿着吗",
+        "比亚迪最近的走势如何",
+        "帮我看看招商银行的分红情况",
+        "白酒板块现在能上车吗",
+        "这只票的业绩预告怎么样",
+        "半导体龙头的盈利能力如何",
+        "中芯国际的毛利率是多少",
+        "现在是抄底光伏的好时机吗",
+        "沪深300成分股里哪些银行股息高",
+        "美的集团的现金流健康吗",
+        "医药股最近为什么一直下行",
+        "隆基绿能的负债率高不高",
+    ],
+    "company": [
+        "年假可以分几次休",
+        "新人入职需要准备哪些材料",
+        "加班餐补怎么申请",
+        "出差住宿标准是多少",
+        "公司的周会几点开始",
+        "怎么申请调岗",
+        "试用期多久转正",
+        "办公用品找谁领",
+        "团建费用怎么报",
+        "产假有多少天",
+        "工资条在哪里查看",
+        "会议室怎么预定",
+    ],
+    "general": [
+        "今天天气怎么样",
+        "如何学习Python编程",
+        "什么是机器学习",
+        "帮我写一首关于春天的诗",
+        "地球到月球有多远",
+        "推荐几本好看的小说",
+        "红烧肉怎么做",
+        "解释一下量子计算",
+        "英语单词怎么背得快",
+        "你好，你是谁",
+        "明天周几",
+        "怎么缓解颈椎疼痛",
+    ],
+}
+
+Embed = Callable[[List[str]], List[List[float]]]
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _default_embed(texts: List[str]) -> List[List[float]]:
+    from rag.embedding.qwen_embedding import get_shared_embedding
+    return get_shared_embedding().embed_documents(texts)
+
+
+class IntentClassifier:
+    """
+    关键词自动机 + 最近质心的本地意图分类器
+
+    Attributes:
+        threshold: 质心分类的最低置信度，低于阈值时返回None (交给LLM)
+        temperature: 相似度 softmax 的温度
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Embed] = None,
+        examples: Optional[Dict[str, List[str]]] = None,
+        threshold: Optional[float] = None,
+        temperature: float = 0.05,
+    ):
+        """
+        Args:
+            embed: 批量向量化函数，默认使用共享的 Qwen Embedding 模型
+            examples: 各意图的标注样例，默认为 INTENT_EXAMPLES
+            threshold: 置信度阈值，默认为配置 INTENT_CONFIDENCE_THRESHOLD
+            temperature: softmax 温度
+        """
+        self._embed = embed or _default_embed
+        self.examples = examples or INTENT_EXAMPLES
+        self.threshold = config.INTENT_CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.temperature = temperature
+        self.automaton = AhoCorasick(
+            (keyword, intent) for intent, keywords in INTENT_KEYWORDS.items() for keyword in keywords
+        )
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def match_keywords(self, query: str) -> Optional[Tuple[str, str]]:
+        """
+        关键词匹配
+
+        Returns:
+            (意图, 命中的关键词)，股票关键词优先；未命中返回None
+        """
+        hits: Dict[str, str] = {}
+        for start, end, intent in self.automaton.iter(query):
+            hits.setdefault(intent, query[start:end])
+        for intent in INTENT_KEYWORDS:
+            if intent in hits:
+                return intent, hits[intent]
+        return None
+
+    def _load_centroids(self) -> Optional[Dict[str, List[float]]]:
+        """首次使用时向量化标注样例并计算质心 (模型不可用时只尝试一次)"""
+        if self._centroids is None and not self._unavailable:
+            with self._lock:
+                if self._centroids is None and not self._unavailable:
+                    try:
+                        centroids = {}
+                        for intent, texts in self.examples.items():
+                            vectors = self._embed(texts)
+                            centroids[intent] = _normalize([sum(column) / len(vectors) for column in zip(*vectors)])
+                        self._centroids = centroids
+                    except Exception as e:
+                        self._unavailable = True
+                        print(f"    [Intent] Embedding 模型不可用，跳过本地分类: {e}")
+        return self._centroids
+
+    def scores(self, query: str) -> Optional[Dict[str, float]]:
+        """
+        各意图的置信度 (与质心余弦相似度的 softmax)
+
+        Returns:
+            {意图: 置信度}，Embedding 模型不可用时返回None
+        """
+        centroids = self._load_centroids()
+        if not centroids:
+            return None
+        vector = _normalize(self._embed([query])[0])
+        similarities = {intent: sum(a * b for a, b in zip(vector, centroid))
+                        for intent, centroid in centroids.items()}
+        top = max(similarities.values())
+        weights = {intent: math.exp((s - top) / self.temperature) for intent, s in similarities.items()}
+        total = sum(weights.values())
+        return {intent: weight / total for intent, weight in weights.items()}
+
+    def classify(self, query: str) -> Optional[str]:
+        """
+        质心分类 (不含关键词匹配)
+
+        Returns:
+            置信度达到阈值的意图，否则返回None
+        """
+        try:
+            scores = self.scores(query)
+        except Exception as e:
+            print(f"    [Intent] 本地分类失败: {e}")
+            return None
+        if not scores:
+            return None
+        intent, confidence = max(scores.items(), key=lambda item: item[1])
+        if confidence < self.threshold:
+            print(f"    [Intent] 本地分类置信度不足: {intent} ({confidence:.2f})")
+            return None
+        print(f"    [Intent] 本地分类: {intent} ({confidence:.2f})")
+        return intent
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """获取进程内共享的意图分类器"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
@@ -1,10 +1,13 @@
 """
 新闻分析Agent
-使用ReAct模式爬取新闻并进行情感/风险分析
+使用ReAct模式爬取新闻并进行情感/风险分析；
+快速模式 (NEWS_SENTIMENT_MODE=fast) 下直接调用新闻工具，使用本地评分，不调用LLM
 """
 from langchain_core.messages import HumanMessage
 from .base_agent import BaseAgent
+from config import config
 from prompts.news import NEWS_PROMPT
+from tools.async_utils import run_blocking
 from tools.news_crawler import crawl_news
 
 
@@ -15,9 +18,33 @@ class NewsAgent(BaseAgent):
         super().__init__(
             name="新闻分析Agent",
             tools=[crawl_news],
-            system_prompt=NEWS_PROMPT
+            system_prompt=NEWS_PROMPT,
+            call_site="news"
         )
     
+    def _build_messages(self, state: dict):
+        """构建输入消息，缺少必要信息时返回None"""
+        company_name = state.get('company_name', '')
+        stock_code = state.get('stock_code', '')
+        
+        if not company_name:
+            return None
+        
+        prompt = NEWS_PROMPT.format(
+            company_name=company_name,
+            stock_code=stock_code
+        )
+        return [HumanMessage(content=prompt)]
+    
+    @staticmethod
+    def _fast_mode() -> bool:
+        return config.NEWS_SENTIMENT_MODE == 'fast'
+    
+    def _crawl_directly(self, company_name: str) -> dict:
+        """快速模式: 不经过ReAct，直接返回新闻工具的本地评分结果"""
+        print("    [News] 快速模式: 本地评分，跳过LLM")
+        return {'news_analysis': crawl_news.invoke({'query': company_name, 'num_results': config.NEWS_COUNT})}
+    
     def run(self, state: dict) -> dict:
         """
         运行新闻分析
@@ -28,27 +55,40 @@ class NewsAgent(BaseAgent):
         Returns:
             更新后的状态，包含news_analysis
         """
-        company_name = state.get('company_name', '')
-        stock_code = state.get('stock_code', '')
-        
-        if not company_name:
-            return {'news_analysis': '无法进行新闻分析：缺少公司名称'}
-        
         # 构建输入消息
-        prompt = NEWS_PROMPT.format(
-            company_name=company_name,
-            stock_code=stock_code
-        )
-        messages = [HumanMessage(content=prompt)]
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'news_analysis': '无法进行新闻分析：缺少公司名称'}
         
-        # 调用ReAct Agent
         try:
+            if self._fast_mode():
+                return self._crawl_directly(state['company_name'])
+            # 调用ReAct Agent
             result = self.invoke({'messages': messages})
             
             # 提取分析结果
-            ai_message = result['messages'][-1]
-            analysis = ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
-            
-            return {'news_analysis': analysis}
+            return {'news_analysis': self._final_content(result)}
+        except Exception as e:
+            return {'news_analysis': f'新闻分析失败: {str(e)}'}
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行新闻分析 (异步LLM客户端 + 线程池数据工具)
+        
+        Args:
+            state: 当前状态
+        
+        Returns:
+            更新后的状态，包含news_analysis
+        """
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'news_analysis': '无法进行新闻分析：缺少公司名称'}
+        
+        try:
+            if self._fast_mode():
+                return await run_blocking(self._crawl_directly, state['company_name'])
+            result = await self.ainvoke({'messages': messages})
+            return {'news_analysis': self._final_content(result)}
         except Exception as e:
             return {'news_analysis': f'新闻分析失败: {str(e)}'}
@@ -1,51 +1,49 @@
 """
 任务规划Agent
 负责解析用户查询，识别意图，提取公司名称，查询股票代码
+查询中的股票优先用词典抽取 (不调用LLM)，抽取不到或有歧义时才由ReAct Agent查询
 支持三分支路由：股票分析 / 公司内部知识 / 通用问答
+股票分析同时识别需要的分析维度，以及对比查询中的多只股票
+交互会话中的追问对照上一轮的上下文解析，并复用同一股票已有的分析结果
 """
 import json
 import re
 from typing import Optional
 from langchain_core.messages import HumanMessage, AIMessage
 from .base_agent import BaseAgent
+from .dimensions import match_dimensions, normalize_dimensions, requested_dimensions
+from .intent_classifier import INTENT_KEYWORDS, get_intent_classifier
+from llm.factory import get_chat_model
 from prompts.planner import PLANNER_PROMPT
-from tools.stock_search import query_stock_info
+from tools.async_utils import run_blocking
+from tools.prefetch import start_prefetch
+from tools.stock_search import query_stock_info, extract_stocks, match_stocks_in_query, get_market
+from config import config
 
 
 class PlannerAgent(BaseAgent):
     """任务规划Agent - 支持意图路由"""
     
-    # 意图关键词
-    INTENT_KEYWORDS = {
-        "stock": [
-            "分析", "股票", "投资", "估值", "行情", "K线", "基本面", "技术面",
-            "市盈率", "PE", "PB", "ROE", "财报", "年报", "研报", "股价",
-            "买入", "卖出", "持有", "涨", "跌", "茅台", "五粮液"
-        ],
-        "company": [
-            "例会", "手册", "规章", "请假", "公司介绍", "流程", "制度",
-            "员工", "部门", "考勤", "报销", "审批", "OA", "内部"
-        ],
-    }
+    # 意图关键词 (见 agents/intent_classifier.py)
+    INTENT_KEYWORDS = INTENT_KEYWORDS
+    
+    # 指代上一轮公司的词 (追问时不再调用LLM规划)
+    FOLLOWUP_PRONOUNS = ["它", "该公司", "这家", "这只", "该股", "这个公司", "这个股票"]
     
     def __init__(self):
         super().__init__(
             name="任务规划Agent",
             tools=[query_stock_info],
-            system_prompt=PLANNER_PROMPT
+            system_prompt=PLANNER_PROMPT,
+            call_site="planner"
         )
+        # 意图分类是简单分类任务，单独路由到快速模型
+        self.intent_llm = get_chat_model("intent", callbacks=[self.progress_callback])
     
-    def _classify_intent_with_llm(self, query: str) -> str:
-        """
-        使用 LLM 进行意图分类（语义理解）
-        
-        Args:
-            query: 用户查询
-        
-        Returns:
-            意图: "stock" | "company" | "general"
-        """
-        prompt = f"""请判断以下用户查询的意图类型，只返回一个单词。
+    @staticmethod
+    def _intent_prompt(query: str) -> str:
+        """构建意图分类Prompt"""
+        return f"""请判断以下用户查询的意图类型，只返回一个单词。
 
 **意图类型定义**：
 - stock: 股票投资分析相关（如：分析某公司、查看股价、了解财报等）
@@ -55,26 +53,73 @@ class PlannerAgent(BaseAgent):
 **用户查询**：{query}
 
 **意图类型**："""
+    
+    @staticmethod
+    def _validate_intent(content: str) -> str:
+        """校验LLM返回的意图"""
+        intent = content.strip().lower()
+        if intent in ['stock', 'company', 'general']:
+            print(f"    [Planner] LLM分类结果: {intent}")
+            return intent
+        print(f"    [Planner] LLM返回无效值: {intent}, 默认为general")
+        return 'general'
+    
+    def _classify_intent_with_llm(self, query: str) -> str:
+        """
+        使用 LLM 进行意图分类（语义理解）
         
+        Args:
+            query: 用户查询
+        
+        Returns:
+            意图: "stock" | "company" | "general"
+        """
         try:
             print(f"    [Planner] 关键词未匹配，调用LLM进行语义理解...")
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            intent = response.content.strip().lower()
-            
-            # 验证返回值
-            if intent in ['stock', 'company', 'general']:
-                print(f"    [Planner] LLM分类结果: {intent}")
-                return intent
-            else:
-                print(f"    [Planner] LLM返回无效值: {intent}, 默认为general")
-                return 'general'
+            response = self.intent_llm.invoke([HumanMessage(content=self._intent_prompt(query))])
+            return self._validate_intent(response.content)
         except Exception as e:
             print(f"    [Planner] LLM分类失败: {e}, 默认为general")
             return 'general'
     
+    async def _aclassify_intent_with_llm(self, query: str) -> str:
+        """异步版本的 LLM 意图分类"""
+        try:
+            print(f"    [Planner] 关键词未匹配，调用LLM进行语义理解...")
+            response = await self.intent_llm.ainvoke([HumanMessage(content=self._intent_prompt(query))])
+            return self._validate_intent(response.content)
+        except Exception as e:
+            print(f"    [Planner] LLM分类失败: {e}, 默认为general")
+            return 'general'
+    
+    def _match_intent_keywords(self, query: str) -> Optional[str]:
+        """
+        关键词快速匹配意图
+        
+        Args:
+            query: 用户查询
+        
+        Returns:
+            匹配到的意图，未匹配返回None
+        """
+        # 关键词自动机一次扫描，股票关键词优先
+        matched = get_intent_classifier().match_keywords(query)
+        if matched:
+            intent, keyword = matched
+            print(f"    [Planner] 关键词匹配 '{keyword}' -> {intent}")
+            return intent
+        return None
+    
+    @staticmethod
+    def _classify_intent_locally(query: str) -> Optional[str]:
+        """本地最近质心分类 (置信度不足或未启用时返回None)"""
+        if not config.INTENT_CLASSIFIER_ENABLED:
+            return None
+        return get_intent_classifier().classify(query)
+    
     def _classify_intent(self, query: str) -> str:
         """
-        混合意图识别：优先关键词，回退 LLM
+        混合意图识别：优先关键词，其次本地分类器，置信度不足时回退 LLM
         
         Args:
             query: 用户查询
@@ -82,23 +127,30 @@ class PlannerAgent(BaseAgent):
         Returns:
             意图: "stock" | "company" | "general"
         """
-        query_lower = query.lower()
+        intent = self._match_intent_keywords(query)
+        if intent:
+            return intent
         
-        # 第1步：快速关键词匹配 - stock
-        for keyword in self.INTENT_KEYWORDS["stock"]:
-            if keyword.lower() in query_lower:
-                print(f"    [Planner] 关键词匹配 '{keyword}' -> stock")
-                return "stock"
+        # 第2步：关键词未匹配，本地 Embedding 质心分类
+        print(f"    [Planner] 关键词匹配失败")
+        intent = self._classify_intent_locally(query)
+        if intent:
+            return intent
         
-        # 第2步：快速关键词匹配 - company
-        for keyword in self.INTENT_KEYWORDS["company"]:
-            if keyword.lower() in query_lower:
-                print(f"    [Planner] 关键词匹配 '{keyword}' -> company")
-                return "company"
+        # 第3步：本地分类置信度不足，调用 LLM 进行语义理解
+        return self._classify_intent_with_llm(query)
+    
+    async def _aclassify_intent(self, query: str) -> str:
+        """异步版本的混合意图识别 (向量化在线程池中执行)"""
+        intent = self._match_intent_keywords(query)
+        if intent:
+            return intent
         
-        # 第3步：关键词未匹配，调用 LLM 进行语义理解
         print(f"    [Planner] 关键词匹配失败")
-        return self._classify_intent_with_llm(query)
+        intent = await run_blocking(self._classify_intent_locally, query)
+        if intent:
+            return intent
+        return await self._aclassify_intent_with_llm(query)
     
     def run(self, state: dict) -> dict:
         """
@@ -108,32 +160,183 @@ class PlannerAgent(BaseAgent):
             state: 包含user_query的状态
         
         Returns:
-            更新后的状态，包含intent, company_name, stock_code, market
+            状态更新，包含intent, company_name, stock_code, market
         """
         user_query = state.get('user_query', '')
+        context = state.get('session_context')
         
-        # 1. 意图识别
-        intent = self._classify_intent(user_query)
-        print(f"    [Planner] 意图识别: {intent}")
-        
-        # 2. 非股票分析直接返回
-        if intent != "stock":
-            return {
-                **state,
-                'intent': intent,
-                'company_name': '',
-                'stock_code': '',
-                'market': '',
-                'messages': []
-            }
+        # 追问上一轮的公司：直接使用会话上下文
+        followup = self._resolve_followup(user_query, context)
+        if followup:
+            return followup
+        
+        # 查询中能直接确定股票时，规划期间在后台预取数据 (未确认的预取在退出时取消)
+        with start_prefetch(user_query) as prefetch:
+            # 0. 词典抽取股票 (常见情况下不调用LLM)
+            plan = self._extract_plan(user_query)
+            if plan:
+                prefetch.settle(plan['stock_code'])
+                return {**plan, **self._reuse_analyses(plan, context)}
+            
+            # 1. 意图识别
+            intent = self._classify_intent(user_query)
+            print(f"    [Planner] 意图识别: {intent}")
+            
+            # 2. 非股票分析直接返回
+            if intent != "stock":
+                return self._without_stock(intent)
+            
+            # 3. 股票分析：提取公司和代码
+            prompt = PLANNER_PROMPT.format(user_query=self._with_context(user_query, context))
+            result = self.invoke({'messages': [HumanMessage(content=prompt)]})
+            plan = self._parse_plan(intent, result, user_query)
+            prefetch.settle(plan['stock_code'])
+            return {**plan, **self._reuse_analyses(plan, context)}
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行任务规划
+        
+        Args:
+            state: 包含user_query的状态
+        
+        Returns:
+            状态更新，包含intent, company_name, stock_code, market
+        """
+        user_query = state.get('user_query', '')
+        context = state.get('session_context')
+        
+        followup = self._resolve_followup(user_query, context)
+        if followup:
+            return followup
+        
+        with start_prefetch(user_query) as prefetch:
+            plan = self._extract_plan(user_query)
+            if plan:
+                prefetch.settle(plan['stock_code'])
+                return {**plan, **self._reuse_analyses(plan, context)}
+            
+            intent = await self._aclassify_intent(user_query)
+            print(f"    [Planner] 意图识别: {intent}")
+            
+            if intent != "stock":
+                return self._without_stock(intent)
+            
+            prompt = PLANNER_PROMPT.format(user_query=self._with_context(user_query, context))
+            result = await self.ainvoke({'messages': [HumanMessage(content=prompt)]})
+            plan = self._parse_plan(intent, result, user_query)
+            prefetch.settle(plan['stock_code'])
+            return {**plan, **self._reuse_analyses(plan, context)}
+    
+    def _extract_plan(self, user_query: str) -> Optional[dict]:
+        """
+        用词典抽取的股票直接生成规划 (不调用LLM)
+        
+        Args:
+            user_query: 用户查询
+        
+        Returns:
+            规划结果；没有抽取到股票、某个词对应多只股票或为公司知识问题时返回None，交给LLM规划
+        """
+        stocks, ambiguous = extract_stocks(user_query)
+        if ambiguous or not stocks:
+            return None
+        if self._match_intent_keywords(user_query) == 'company':
+            return None
+        first = stocks[0]
+        print(f"    [Planner] 词典抽取: {', '.join(s['name'] or s['code'] for s in stocks)}，跳过LLM规划")
+        return {
+            'intent': 'stock',
+            'company_name': first['name'],
+            'stock_code': first['code'],
+            'market': get_market(first['code']),
+            'dimensions': self._plan_dimensions(None, user_query),
+            'stocks': self._plan_stocks(None, user_query),
+        }
+    
+    def _resolve_followup(self, user_query: str, context: Optional[dict]) -> Optional[dict]:
+        """
+        解析指代上一轮公司的追问 (如 "那它的估值呢")
         
-        # 3. 股票分析：提取公司和代码
-        prompt = PLANNER_PROMPT.format(user_query=user_query)
-        messages = [HumanMessage(content=prompt)]
+        查询中没有提到新的股票、不是公司知识问题，且包含指代词时，直接沿用上一轮的公司；
+        其他情况交给LLM规划 (Prompt中附带上一轮的公司)。
         
-        # 调用Agent
-        result = self.invoke({'messages': messages})
+        Args:
+            user_query: 用户查询
+            context: 会话上下文 (见 graph/session.py)
+        
+        Returns:
+            规划结果 (含复用的分析结果)，不是追问时返回None
+        """
+        if not context or not context.get('stock_code'):
+            return None
+        if not any(word in user_query for word in self.FOLLOWUP_PRONOUNS):
+            return None
+        if match_stocks_in_query(user_query) or self._match_intent_keywords(user_query) == 'company':
+            return None
+        
+        plan = {
+            'intent': 'stock',
+            'company_name': context.get('company_name', ''),
+            'stock_code': context['stock_code'],
+            'market': context.get('market', ''),
+            'dimensions': self._plan_dimensions(None, user_query),
+            'stocks': [],
+        }
+        print(f"    [Planner] 追问上一轮的 {plan['company_name'] or plan['stock_code']}，跳过LLM规划")
+        return {**plan, **self._reuse_analyses(plan, context)}
+    
+    @staticmethod
+    def _with_context(user_query: str, context: Optional[dict]) -> str:
+        """有会话上下文时，在查询后附上一轮讨论的公司，供LLM解析省略了公司的追问"""
+        if not context or not context.get('stock_code'):
+            return user_query
+        return (f"{user_query}\n(上一轮对话讨论的是 {context.get('company_name', '')} ({context['stock_code']})，"
+                f"如果本次查询没有指明公司，指的就是它)")
+    
+    @staticmethod
+    def _reuse_analyses(plan: dict, context: Optional[dict]) -> dict:
+        """
+        复用会话中同一股票已有的分析结果 (写入状态后，路由只执行缺少的分析节点)
+        
+        Returns:
+            {分析字段: 已有结果}，不是同一股票或为对比查询时返回空字典
+        """
+        if not context or plan.get('stocks') or plan.get('stock_code') != context.get('stock_code'):
+            return {}
+        analyses = context.get('analyses') or {}
+        reused = {
+            f"{node}_analysis": analyses[node]
+            for node in requested_dimensions(plan) if analyses.get(node)
+        }
+        if reused:
+            print(f"    [Planner] 复用上一轮的分析: {', '.join(field.replace('_analysis', '') for field in reused)}")
+        return reused
+    
+    @staticmethod
+    def _without_stock(intent: str) -> dict:
+        """非股票分析意图的状态更新"""
+        return {
+            'intent': intent,
+            'company_name': '',
+            'stock_code': '',
+            'market': '',
+            'dimensions': [],
+            'stocks': [],
+        }
+    
+    def _parse_plan(self, intent: str, result: dict, user_query: str = '') -> dict:
+        """
+        从ReAct Agent的输出中解析公司名称、股票代码、市场和分析维度
         
+        Args:
+            intent: 意图
+            result: Agent执行结果
+            user_query: 用户查询 (LLM未给出有效维度时按关键词匹配)
+        
+        Returns:
+            状态更新 (ReAct中间消息不写入图状态)
+        """
         # 解析结果
         ai_message = result['messages'][-1]
         response_text = ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
@@ -142,6 +345,8 @@ class PlannerAgent(BaseAgent):
         company_name = ""
         stock_code = ""
         market = ""
+        dimensions = None
+        stocks = None
         
         # 调试: 打印原始响应
         print(f"    [DEBUG] Planner原始响应: {response_text[:500]}...")
@@ -156,15 +361,18 @@ class PlannerAgent(BaseAgent):
                 company_name = data.get('company_name', '')
                 stock_code = data.get('stock_code', '')
                 market = data.get('market', '')
+                dimensions = data.get('dimensions')
+                stocks = data.get('stocks')
             else:
-                # 方法2: 尝试匹配裸 JSON 对象 (允许嵌套)
-                json_match = re.search(r'\{[^{}]*"company_name"\s*:\s*"[^"]*"[^{}]*\}', response_text, re.DOTALL)
-                if json_match:
-                    print(f"    [DEBUG] 从文本提取JSON: {json_match.group()[:200]}...")
-                    data = json.loads(json_match.group())
+                # 方法2: 从第一个 "{" 起解析裸 JSON 对象 (允许嵌套，如 stocks 列表)
+                data = self._bare_json(response_text)
+                if data is not None:
+                    print(f"    [DEBUG] 从文本提取JSON: {json.dumps(data, ensure_ascii=False)[:200]}...")
                     company_name = data.get('company_name', '')
                     stock_code = data.get('stock_code', '')
                     market = data.get('market', '')
+                    dimensions = data.get('dimensions')
+                    stocks = data.get('stocks')
         except json.JSONDecodeError as e:
             print(f"    [DEBUG] JSON解析失败: {e}")
         
@@ -176,26 +384,102 @@ class PlannerAgent(BaseAgent):
                 stock_code = code_match.group(1).lower()
                 print(f"    [DEBUG] 从文本提取股票代码: {stock_code}")
         
+        # 对比查询：多只股票 (第一只同时作为单股字段，兼容单股流程)
+        stocks = self._plan_stocks(stocks, user_query)
+        if stocks and not stock_code:
+            company_name, stock_code, market = (stocks[0][k] for k in ('company_name', 'stock_code', 'market'))
+        
         print(f"    [DEBUG] 解析结果: company={company_name}, code={stock_code}, market={market}")
         
         # 特殊处理：如果意图是 stock 但没找到股票代码
         # 这通常意味着是通用问题（如"分析过哪些行业"）或历史查询
         if intent == "stock" and not stock_code:
             print(f"    [Planner] ⚠️  未识别到股票代码，降级为通用问答(general)")
-            return {
-                **state,
-                'intent': 'general',  # 修改意图
-                'company_name': '',
-                'stock_code': '',
-                'market': '',
-                'messages': []
-            }
+            return self._without_stock('general')  # 修改意图
         
         return {
-            **state,
             'intent': intent,
             'company_name': company_name,
             'stock_code': stock_code,
             'market': market,
-            'messages': result['messages']
+            'dimensions': self._plan_dimensions(dimensions, user_query),
+            'stocks': stocks,
         }
+    
+    @staticmethod
+    def _bare_json(text: str):
+        """
+        解析文本中的裸 JSON 对象 (从第一个 "{" 起，解析失败时尝试下一个 "{")
+        
+        Args:
+            text: LLM回复
+        
+        Returns:
+            含 company_name 或 stocks 的对象，没有时返回None
+        """
+        decoder = json.JSONDecoder()
+        start = text.find('{')
+        while start != -1:
+            try:
+                data, _ = decoder.raw_decode(text, start)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) and ('company_name' in data or 'stocks' in data):
+                return data
+            start = text.find('{', start + 1)
+        return None
+    
+    @staticmethod
+    def _plan_stocks(stocks, user_query: str) -> list:
+        """
+        确定对比查询的股票列表
+        
+        优先使用LLM给出的 stocks 字段；不足两只时用查询中明确提到的股票代码/简称补充判断。
+        
+        Args:
+            stocks: LLM输出的 stocks 字段
+            user_query: 用户查询
+        
+        Returns:
+            [{company_name, stock_code, market}]，不是对比查询时返回空列表
+        """
+        resolved = {}
+        for item in stocks if isinstance(stocks, list) else []:
+            if isinstance(item, dict) and item.get('stock_code'):
+                code = str(item['stock_code']).strip().lower()
+                resolved.setdefault(code, {
+                    'company_name': item.get('company_name') or '',
+                    'stock_code': code,
+                    'market': item.get('market') or get_market(code),
+                })
+        if len(resolved) < 2:
+            resolved = {
+                code: {'company_name': name, 'stock_code': code, 'market': get_market(code)}
+                for code, name in match_stocks_in_query(user_query)
+            }
+        if len(resolved) < 2:
+            return []
+        result = list(resolved.values())[:config.COMPARE_MAX_STOCKS]
+        print(f"    [Planner] 对比查询: {', '.join(s['company_name'] or s['stock_code'] for s in result)}")
+        return result
+    
+    @staticmethod
+    def _plan_dimensions(dimensions, user_query: str) -> list:
+        """
+        确定需要的分析维度
+        
+        LLM给出具体维度时直接使用；给出 full、缺失或无效时按关键词匹配 (未匹配即完整分析)，
+        避免LLM照抄输出模板中的 full 使窄问题也生成完整报告。
+        
+        Args:
+            dimensions: LLM输出的 dimensions 字段
+            user_query: 用户查询
+        
+        Returns:
+            维度列表，空列表表示完整分析
+        """
+        result = normalize_dimensions(dimensions) if isinstance(dimensions, list) else []
+        if not result:
+            result = match_dimensions(user_query)
+        print(f"    [Planner] 分析维度: {', '.join(result) if result else 'full'}")
+        return result
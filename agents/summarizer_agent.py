@@ -2,18 +2,43 @@
 总结Agent
 汇总所有分析结果，生成完整的投资分析报告
 支持 RAG 增强：从年报/研报知识库检索相关内容
+只请求单一维度时走轻量路径：快速模型直接回答问题，不做行业提取和知识库检索
+股票所属市场不支持的维度在报告中注明；请求的维度都不支持时直接返回说明，不调用LLM
 """
 import sys
 import os
 from datetime import datetime
 from langchain_core.messages import HumanMessage
 from .base_agent import BaseAgent
-from prompts.summarizer import SUMMARIZER_PROMPT
+from .dimensions import requested_dimensions, runnable_dimensions, unsupported_dimensions
+from prompts.summarizer import SUMMARIZER_PROMPT, BRIEF_SUMMARIZER_PROMPT
 
 # 添加项目根目录
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from rag.retriever.stock_retriever import StockRetriever
+from tools.async_utils import run_blocking
+from tools.capabilities import split_dimensions
+from llm.factory import get_chat_model
+from llm.gateway import remaining_time
+from config import config
+
+# 分析节点 -> (状态字段, 章节名称)
+ANALYSIS_SECTIONS = {
+    'fundamental': ('fundamental_analysis', '基本面分析'),
+    'technical': ('technical_analysis', '技术分析'),
+    'valuation': ('valuation_analysis', '估值分析'),
+    'news': ('news_analysis', '新闻分析'),
+}
+
+# 未在时限内完成的分析在Prompt中的占位说明
+MISSING_SECTION = "【数据缺失】该部分分析未在时限内完成。请在报告对应章节注明“数据缺失”，不要编造结论。"
+
+# 股票所属市场没有数据源支持的分析维度在Prompt中的占位说明
+UNSUPPORTED_SECTION = "【市场不支持】当前数据源不支持该市场的这类数据，报告中对应章节注明“该市场暂不支持”，不要编造结论。"
+
+# 用户未要求的分析维度在Prompt中的占位说明
+NOT_REQUESTED_SECTION = "【未请求】用户未要求该维度的分析，报告中省略对应章节及相关评分，不要推测。"
 
 
 class SummarizerAgent(BaseAgent):
@@ -23,8 +48,13 @@ class SummarizerAgent(BaseAgent):
         super().__init__(
             name="总结Agent",
             tools=[],  # 不需要工具，纯LLM生成
-            system_prompt=SUMMARIZER_PROMPT
+            system_prompt=SUMMARIZER_PROMPT,
+            call_site="summarizer"
         )
+        # 行业提取是简单抽取任务，单独路由到快速模型
+        self.extraction_llm = get_chat_model("industry_extraction", callbacks=[self.progress_callback])
+        # 单一维度的简短回答，路由到快速模型
+        self.brief_llm = get_chat_model("brief_summary", callbacks=[self.progress_callback])
         # 初始化 RAG 检索器
         self._retriever = None
     
@@ -48,23 +78,42 @@ class SummarizerAgent(BaseAgent):
         if not text or text == '暂无数据':
             return ""
         
-        prompt = f"""从以下分析文本中提取公司所属行业，只返回行业名称（如：白酒、新能源、医药、银行、房地产）。
+        try:
+            response = self.extraction_llm.invoke([HumanMessage(content=self._industry_prompt(text))])
+            return self._clean_industry(response.content)
+        except Exception as e:
+            print(f"    [Summarizer] 行业提取失败: {e}")
+            return ""
+    
+    async def _aextract_industry_from_text(self, text: str) -> str:
+        """异步版本的行业提取"""
+        if not text or text == '暂无数据':
+            return ""
+        
+        try:
+            response = await self.extraction_llm.ainvoke([HumanMessage(content=self._industry_prompt(text))])
+            return self._clean_industry(response.content)
+        except Exception as e:
+            print(f"    [Summarizer] 行业提取失败: {e}")
+            return ""
+    
+    @staticmethod
+    def _industry_prompt(text: str) -> str:
+        """构建行业提取Prompt"""
+        return f"""从以下分析文本中提取公司所属行业，只返回行业名称（如：白酒、新能源、医药、银行、房地产）。
 如果无法确定行业，返回空字符串。
 
 分析文本：
 {text[:800]}
 
 行业名称："""
-        
-        try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            industry = response.content.strip()[:20]  # 限制长度
-            # 清理可能的多余内容
-            industry = industry.split('\n')[0].strip()
-            return industry
-        except Exception as e:
-            print(f"    [Summarizer] 行业提取失败: {e}")
-            return ""
+    
+    @staticmethod
+    def _clean_industry(content: str) -> str:
+        """清理LLM返回的行业名称"""
+        industry = content.strip()[:20]  # 限制长度
+        # 清理可能的多余内容
+        return industry.split('\n')[0].strip()
     
     def _extract_company_and_industry(self, state: dict) -> tuple:
         """
@@ -91,6 +140,61 @@ class SummarizerAgent(BaseAgent):
         print(f"    [Summarizer] 提取结果 - 公司: {company_name}, 行业: {industry or '未知'}")
         return company_name, industry
     
+    async def _aextract_company_and_industry(self, state: dict) -> tuple:
+        """异步版本的公司名称和行业提取"""
+        company_name = state.get('company_name', '')
+        industry = await self._aextract_industry_from_text(state.get('fundamental_analysis', ''))
+        if not industry:
+            industry = await self._aextract_industry_from_text(state.get('valuation_analysis', ''))
+        
+        print(f"    [Summarizer] 提取结果 - 公司: {company_name}, 行业: {industry or '未知'}")
+        return company_name, industry
+    
+    @staticmethod
+    def _missing_sections(state: dict) -> list:
+        """已请求但超时或没有结果的分析章节名称 (不含市场不支持的维度)"""
+        timed_out = set(state.get('timed_out_nodes') or [])
+        runnable = runnable_dimensions(state)
+        return [
+            title for node, (field, title) in ANALYSIS_SECTIONS.items()
+            if node in runnable and (node in timed_out or not state.get(field))
+        ]
+    
+    @staticmethod
+    def _unsupported_report(state: dict) -> dict:
+        """请求的维度在该市场都不支持时的说明 (不调用LLM)"""
+        titles = '、'.join(ANALYSIS_SECTIONS[node][1] for node in unsupported_dimensions(state))
+        supported = split_dimensions(state.get('stock_code', ''), ANALYSIS_SECTIONS)[0]
+        alternatives = '、'.join(ANALYSIS_SECTIONS[node][1] for node in supported) or '其他问题'
+        market = state.get('market') or '该市场'
+        print(f"    [Summarizer] {market}不支持 {titles}，直接返回说明")
+        return {
+            'final_report': f"""# {state.get('company_name', '未知公司')} ({state.get('stock_code', '未知代码')}) 分析
+
+> **生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+> **市场**: {market}
+
+---
+
+当前数据源不支持{market}的{titles}数据，无法完成该分析。可以改问该股票的{alternatives}，或选择A股标的。
+"""
+        }
+    
+    @staticmethod
+    def _brief_dimension(state: dict):
+        """只请求了单一维度时返回该维度，否则返回None"""
+        requested = requested_dimensions(state)
+        return requested[0] if len(requested) == 1 else None
+    
+    @staticmethod
+    def _short_on_time() -> bool:
+        """运行剩余时间不足总结预留时，跳过行业提取和知识库检索，直接生成报告"""
+        remaining = remaining_time()
+        if remaining is not None and remaining < config.DEADLINE_SUMMARY_RESERVE:
+            print(f"    [Summarizer] 剩余时间 {remaining:.0f}s，跳过知识库检索")
+            return True
+        return False
+    
     def _get_knowledge_context(self, company_name: str, industry: str = "") -> str:
         """
         从知识库检索相关内容
@@ -132,59 +236,140 @@ class SummarizerAgent(BaseAgent):
         Returns:
             更新后的状态，包含final_report
         """
-        company_name = state.get('company_name', '未知公司')
-        stock_code = state.get('stock_code', '未知代码')
-        market = state.get('market', '未知市场')
+        if not runnable_dimensions(state):
+            return self._unsupported_report(state)
         
-        fundamental_analysis = state.get('fundamental_analysis', '暂无数据')
-        technical_analysis = state.get('technical_analysis', '暂无数据')
-        valuation_analysis = state.get('valuation_analysis', '暂无数据')
-        news_analysis = state.get('news_analysis', '暂无数据')
+        dimension = self._brief_dimension(state)
+        if dimension:
+            try:
+                response = self.brief_llm.invoke(self._build_brief_messages(state, dimension))
+                return self._format_report(state, response, "", ANALYSIS_SECTIONS[dimension][1])
+            except Exception as e:
+                return {
+                    'final_report': f'回答生成失败: {str(e)}',
+                    'error': str(e)
+                }
         
-        # RAG 增强：智能提取公司和行业，精准检索
-        extracted_company, industry = self._extract_company_and_industry(state)
-        knowledge_context = self._get_knowledge_context(
-            extracted_company or company_name, 
-            industry
-        )
+        # RAG 增强：智能提取公司和行业，精准检索 (时间不足时跳过)
+        knowledge_context = ""
+        if not self._short_on_time():
+            extracted_company, industry = self._extract_company_and_industry(state)
+            knowledge_context = self._get_knowledge_context(
+                extracted_company or state.get('company_name', '未知公司'),
+                industry
+            )
         
-        # 构建输入消息
+        # 调用LLM生成报告
+        try:
+            response = self.llm.invoke(self._build_messages(state, knowledge_context))
+            return self._format_report(state, response, knowledge_context)
+        except Exception as e:
+            return {
+                'final_report': f'报告生成失败: {str(e)}',
+                'error': str(e)
+            }
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行总结生成 (RAG检索在线程池中执行)
+        
+        Args:
+            state: 包含所有分析结果的状态
+        
+        Returns:
+            更新后的状态，包含final_report
+        """
+        if not runnable_dimensions(state):
+            return self._unsupported_report(state)
+        
+        dimension = self._brief_dimension(state)
+        if dimension:
+            try:
+                response = await self.brief_llm.ainvoke(self._build_brief_messages(state, dimension))
+                return self._format_report(state, response, "", ANALYSIS_SECTIONS[dimension][1])
+            except Exception as e:
+                return {
+                    'final_report': f'回答生成失败: {str(e)}',
+                    'error': str(e)
+                }
+        
+        knowledge_context = ""
+        if not self._short_on_time():
+            extracted_company, industry = await self._aextract_company_and_industry(state)
+            knowledge_context = await run_blocking(
+                self._get_knowledge_context,
+                extracted_company or state.get('company_name', '未知公司'),
+                industry
+            )
+        
+        try:
+            response = await self.llm.ainvoke(self._build_messages(state, knowledge_context))
+            return self._format_report(state, response, knowledge_context)
+        except Exception as e:
+            return {
+                'final_report': f'报告生成失败: {str(e)}',
+                'error': str(e)
+            }
+    
+    def _build_messages(self, state: dict, knowledge_context: str) -> list:
+        """构建报告生成的输入消息 (未请求、市场不支持和缺失的分析以占位说明代替)"""
+        timed_out = set(state.get('timed_out_nodes') or [])
+        requested = requested_dimensions(state)
+        unsupported = unsupported_dimensions(state)
+        sections = {
+            field: NOT_REQUESTED_SECTION if node not in requested
+            else UNSUPPORTED_SECTION if node in unsupported
+            else MISSING_SECTION if node in timed_out or not state.get(field) else state[field]
+            for node, (field, _) in ANALYSIS_SECTIONS.items()
+        }
         prompt = SUMMARIZER_PROMPT.format(
-            company_name=company_name,
-            stock_code=stock_code,
-            market=market,
-            fundamental_analysis=fundamental_analysis,
-            technical_analysis=technical_analysis,
-            valuation_analysis=valuation_analysis,
-            news_analysis=news_analysis,
-            knowledge_context=knowledge_context if knowledge_context else "无相关知识库内容"
+            company_name=state.get('company_name', '未知公司'),
+            stock_code=state.get('stock_code', '未知代码'),
+            market=state.get('market', '未知市场'),
+            knowledge_context=knowledge_context if knowledge_context else "无相关知识库内容",
+            **sections
         )
-        messages = [HumanMessage(content=prompt)]
+        return [HumanMessage(content=prompt)]
+    
+    @staticmethod
+    def _build_brief_messages(state: dict, dimension: str) -> list:
+        """构建单一维度简短回答的输入消息"""
+        field, title = ANALYSIS_SECTIONS[dimension]
+        timed_out = set(state.get('timed_out_nodes') or [])
+        analysis = MISSING_SECTION if dimension in timed_out or not state.get(field) else state[field]
+        prompt = BRIEF_SUMMARIZER_PROMPT.format(
+            section_title=title,
+            company_name=state.get('company_name', '未知公司'),
+            stock_code=state.get('stock_code', '未知代码'),
+            market=state.get('market', '未知市场'),
+            user_query=state.get('user_query', ''),
+            analysis=analysis,
+        )
+        return [HumanMessage(content=prompt)]
+    
+    @staticmethod
+    def _format_report(state: dict, response, knowledge_context: str, title: str = "投资分析报告") -> dict:
+        """添加报告头和时间戳"""
+        company_name = state.get('company_name', '未知公司')
+        stock_code = state.get('stock_code', '未知代码')
+        market = state.get('market', '未知市场')
+        report = response.content if hasattr(response, 'content') else str(response)
         
-        # 调用LLM生成报告
-        try:
-            response = self.llm.invoke(messages)
-            report = response.content if hasattr(response, 'content') else str(response)
-            
-            # 添加报告头和时间戳
-            rag_note = "\n> **知识库**: 已参考年报/研报内容" if knowledge_context else ""
-            final_report = f"""# {company_name} ({stock_code}) 投资分析报告
+        rag_note = "\n> **知识库**: 已参考年报/研报内容" if knowledge_context else ""
+        missing = SummarizerAgent._missing_sections(state)
+        missing_note = f"\n> **未完成的分析**: {'、'.join(missing)} (未在时限内完成，相关结论仅供参考)" if missing else ""
+        unsupported = [ANALYSIS_SECTIONS[node][1] for node in unsupported_dimensions(state)]
+        unsupported_note = f"\n> **不支持的分析**: {'、'.join(unsupported)} (当前数据源不支持该市场)" if unsupported else ""
+        final_report = f"""# {company_name} ({stock_code}) {title}
 
 > **生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-> **市场**: {market}{rag_note}
+> **市场**: {market}{rag_note}{missing_note}{unsupported_note}
 
 ---
 
 {report}
 """
-            
-            return {
-                **state,
-                'final_report': final_report
-            }
-        except Exception as e:
-            return {
-                **state,
-                'final_report': f'报告生成失败: {str(e)}',
-                'error': str(e)
-            }
+        
+        return {
+            'final_report': final_report
+        }
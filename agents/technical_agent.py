@@ -23,9 +23,24 @@ class TechnicalAgent(BaseAgent):
                 get_stock_basic_info,
                 get_adjust_factor_data,
             ],
-            system_prompt=TECHNICAL_PROMPT
+            system_prompt=TECHNICAL_PROMPT,
+            call_site="technical"
         )
     
+    def _build_messages(self, state: dict):
+        """构建输入消息，缺少必要信息时返回None"""
+        company_name = state.get('company_name', '')
+        stock_code = state.get('stock_code', '')
+        
+        if not stock_code:
+            return None
+        
+        prompt = TECHNICAL_PROMPT.format(
+            company_name=company_name,
+            stock_code=stock_code
+        )
+        return [HumanMessage(content=prompt + self._market_note(stock_code))]
+    
     def run(self, state: dict) -> dict:
         """
         运行技术分析
@@ -36,27 +51,36 @@ class TechnicalAgent(BaseAgent):
         Returns:
             更新后的状态，包含technical_analysis
         """
-        company_name = state.get('company_name', '')
-        stock_code = state.get('stock_code', '')
-        
-        if not stock_code:
-            return {'technical_analysis': '无法进行技术分析：缺少股票代码'}
-        
         # 构建输入消息
-        prompt = TECHNICAL_PROMPT.format(
-            company_name=company_name,
-            stock_code=stock_code
-        )
-        messages = [HumanMessage(content=prompt)]
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'technical_analysis': '无法进行技术分析：缺少股票代码'}
         
         # 调用ReAct Agent
         try:
             result = self.invoke({'messages': messages})
             
             # 提取分析结果
-            ai_message = result['messages'][-1]
-            analysis = ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
-            
-            return {'technical_analysis': analysis}
+            return {'technical_analysis': self._final_content(result)}
+        except Exception as e:
+            return {'technical_analysis': f'技术分析失败: {str(e)}'}
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行技术分析 (异步LLM客户端 + 线程池数据工具)
+        
+        Args:
+            state: 当前状态
+        
+        Returns:
+            更新后的状态，包含technical_analysis
+        """
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'technical_analysis': '无法进行技术分析：缺少股票代码'}
+        
+        try:
+            result = await self.ainvoke({'messages': messages})
+            return {'technical_analysis': self._final_content(result)}
         except Exception as e:
             return {'technical_analysis': f'技术分析失败: {str(e)}'}
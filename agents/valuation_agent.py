@@ -23,9 +23,24 @@ class ValuationAgent(BaseAgent):
                 get_hs300_stocks,
                 get_profit_data,
             ],
-            system_prompt=VALUATION_PROMPT
+            system_prompt=VALUATION_PROMPT,
+            call_site="valuation"
         )
     
+    def _build_messages(self, state: dict):
+        """构建输入消息，缺少必要信息时返回None"""
+        company_name = state.get('company_name', '')
+        stock_code = state.get('stock_code', '')
+        
+        if not stock_code:
+            return None
+        
+        prompt = VALUATION_PROMPT.format(
+            company_name=company_name,
+            stock_code=stock_code
+        )
+        return [HumanMessage(content=prompt + self._market_note(stock_code))]
+    
     def run(self, state: dict) -> dict:
         """
         运行估值分析
@@ -36,27 +51,36 @@ class ValuationAgent(BaseAgent):
         Returns:
             更新后的状态，包含valuation_analysis
         """
-        company_name = state.get('company_name', '')
-        stock_code = state.get('stock_code', '')
-        
-        if not stock_code:
-            return {'valuation_analysis': '无法进行估值分析：缺少股票代码'}
-        
         # 构建输入消息
-        prompt = VALUATION_PROMPT.format(
-            company_name=company_name,
-            stock_code=stock_code
-        )
-        messages = [HumanMessage(content=prompt)]
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'valuation_analysis': '无法进行估值分析：缺少股票代码'}
         
         # 调用ReAct Agent
         try:
             result = self.invoke({'messages': messages})
             
             # 提取分析结果
-            ai_message = result['messages'][-1]
-            analysis = ai_message.content if hasattr(ai_message, 'content') else str(ai_message)
-            
-            return {'valuation_analysis': analysis}
+            return {'valuation_analysis': self._final_content(result)}
+        except Exception as e:
+            return {'valuation_analysis': f'估值分析失败: {str(e)}'}
+    
+    async def arun(self, state: dict) -> dict:
+        """
+        异步运行估值分析 (异步LLM客户端 + 线程池数据工具)
+        
+        Args:
+            state: 当前状态
+        
+        Returns:
+            更新后的状态，包含valuation_analysis
+        """
+        messages = self._build_messages(state)
+        if messages is None:
+            return {'valuation_analysis': '无法进行估值分析：缺少股票代码'}
+        
+        try:
+            result = await self.ainvoke({'messages': messages})
+            return {'valuation_analysis': self._final_content(result)}
         except Exception as e:
             return {'valuation_analysis': f'估值分析失败: {str(e)}'}
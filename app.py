@@ -7,8 +7,15 @@ import asyncio
 import textwrap
 import json
 from datetime import datetime
-from graph.workflow import create_multi_branch_graph
+from graph.workflow import ANALYSIS_NODES
+from agents.dimensions import requested_dimensions, runnable_dimensions, unsupported_dimensions
+from graph.registry import get_graph, warm_up
+from graph.checkpoint import run_config
+from graph.session import AnalysisSession
+from graph.coalesce import coalescer, run_key
 from config import config
+from monitoring import registry, new_run_id, run_scope, start_metrics_server
+from llm import PRIORITY_INTERACTIVE, llm_priority, run_deadline
 
 # 设置页面配置
 st.set_page_config(
@@ -235,13 +242,17 @@ st.markdown("""
 NODE_METADATA = {
     'planner': {'start': 0, 'end': 10, 'label': '🎯 意图识别', 'desc': '分析用户查询意图...'},
     
-    # 股票分支
-    'fundamental': {'start': 10, 'end': 30, 'label': '💰 基本面分析', 'desc': '分析财报与运营数据...'},
-    'technical': {'start': 30, 'end': 50, 'label': '📉 技术面分析', 'desc': '计算技术指标与趋势...'},
-    'valuation': {'start': 50, 'end': 70, 'label': '💹 估值分析', 'desc': '进行相对与绝对估值...'},
-    'news': {'start': 70, 'end': 90, 'label': '📰 新闻分析', 'desc': '抓取并分析市场舆情...'},
+    # 股票分支 (四个分析节点并行执行，进度按完成比例计算)
+    'fundamental': {'start': 10, 'end': 90, 'label': '💰 基本面分析', 'desc': '分析财报与运营数据...'},
+    'technical': {'start': 10, 'end': 90, 'label': '📉 技术面分析', 'desc': '计算技术指标与趋势...'},
+    'valuation': {'start': 10, 'end': 90, 'label': '💹 估值分析', 'desc': '进行相对与绝对估值...'},
+    'news': {'start': 10, 'end': 90, 'label': '📰 新闻分析', 'desc': '抓取并分析市场舆情...'},
     'summarizer': {'start': 90, 'end': 100, 'label': '📝 生成报告', 'desc': 'RAG 检索与报告生成...'},
     
+    # 对比查询 (每只股票一个分析子图并行执行)
+    'stock_analysis': {'start': 10, 'end': 90, 'label': '📊 多股分析', 'desc': '并行分析各只股票...'},
+    'comparison': {'start': 90, 'end': 100, 'label': '⚖️ 对比报告', 'desc': '计算对比指标并生成报告...'},
+    
     # 公司知识分支
     'company_qa': {'start': 50, 'end': 90, 'label': '🏢 知识检索', 'desc': '查询公司内部知识库...'},
     
@@ -249,16 +260,38 @@ NODE_METADATA = {
     'general_qa': {'start': 50, 'end': 90, 'label': '🤖 智能问答', 'desc': '思考并生成回答...'},
 }
 
-async def run_analysis_async(query, status_container, progress_bar, log_container):
-    """异步运行分析工作流"""
+# 并行分析节点及其共享的进度区间
+PARALLEL_NODES = tuple(ANALYSIS_NODES)
+PARALLEL_PROGRESS = (10, 90)
+
+
+def event_node(event: dict) -> str:
+    """从事件元数据中解析所属的图节点 (嵌套的ReAct Agent事件也能归属到外层节点)"""
+    metadata = event.get("metadata") or {}
+    checkpoint_ns = metadata.get("langgraph_checkpoint_ns") or ""
+    if checkpoint_ns:
+        return checkpoint_ns.split("|")[0].split(":")[0]
+    return metadata.get("langgraph_node", "")
+
+
+@st.cache_resource(show_spinner="正在初始化分析引擎...")
+def load_graph():
+    """进程级缓存的工作流图和Agent (同一进程内的后续请求不再重复构建)"""
+    warm_up()
+    return get_graph()
+
+
+async def run_analysis_async(query, session, status_container, progress_bar, log_container):
+    """异步运行分析工作流 (session 提供上一轮的上下文，追问时复用)"""
     try:
-        # 使用三分支工作流
-        graph = create_multi_branch_graph()
+        run_id = new_run_id()
+        graph_config = run_config(run_id)  # 运行ID同时作为检查点 thread_id
         
-        initial_state = {
-            'user_query': query,
-            'messages': []
-        }
+        # 使用三分支工作流 (进程级缓存，首次请求的构建耗时计入本次运行的setup时间)
+        with run_scope(run_id):
+            graph = load_graph()
+        
+        initial_state = session.build_input(query)
         
         # 日志数据存储
         logs_data = []
@@ -267,6 +300,8 @@ async def run_analysis_async(query, status_container, progress_bar, log_containe
         current_node = None
         current_progress = 0
         detected_intent = None
+        finished_parallel = set()
+        parallel_total = len(PARALLEL_NODES)  # 规划只要求部分维度时按实际执行的节点数计算进度
         
         def render_logs():
             """渲染日志HTML"""
@@ -306,68 +341,96 @@ async def run_analysis_async(query, status_container, progress_bar, log_containe
             logs_data.append({'node': node, 'status': status, 'html': log_html})
             render_logs()
 
-        # 订阅事件流
-        async for event in graph.astream_events(initial_state, version="v1"):
-            kind = event["event"]
-            name = event["name"]
-            data = event["data"]
+        # 订阅事件流 (其他会话正在进行相同的分析时附加到该运行，接收同一事件流)
+        # 交互式请求优先排队；可选的单次运行LLM截止时间
+        key = run_key(initial_state, {'deadline': config.LLM_RUN_DEADLINE})
+        with run_scope(run_id), llm_priority(PRIORITY_INTERACTIVE), run_deadline(config.LLM_RUN_DEADLINE):
+            async for event in coalescer.astream_events(graph, initial_state, graph_config, key, version="v1"):
+                kind = event["event"]
+                name = event["name"]
+                data = event["data"]
             
-            # 1. 节点开始
-            if kind == "on_chain_start" and name in NODE_METADATA:
-                current_node = name
-                node_info = NODE_METADATA[name]
+                # 1. 节点开始
+                if kind == "on_chain_start" and name in NODE_METADATA:
+                    current_node = name
+                    node_info = NODE_METADATA[name]
                 
-                # 智能跳转进度：如果刚识别完意图，根据 intent 跳转
-                if name == 'planner':
-                    current_progress = 5
-                else:
-                    current_progress = node_info['start']
+                    # 智能跳转进度：如果刚识别完意图，根据 intent 跳转
+                    # 并行分析节点同时开始，进度只增不减
+                    if name == 'planner':
+                        current_progress = 5
+                    else:
+                        current_progress = max(current_progress, node_info['start'])
                 
-                progress_bar.progress(current_progress)
+                    progress_bar.progress(current_progress)
                 
-                # 更新状态卡片
-                status_container.markdown(textwrap.dedent(f"""
-                <div class="status-text">
-                    <span class="status-icon">🚀</span>
-                    <div>
-                        <strong>{node_info['label']}</strong><br>
-                        <span style="font-size: 13px; color: #86868b;">{node_info['desc']}</span>
+                    # 更新状态卡片
+                    status_container.markdown(textwrap.dedent(f"""
+                    <div class="status-text">
+                        <span class="status-icon">🚀</span>
+                        <div>
+                            <strong>{node_info['label']}</strong><br>
+                            <span style="font-size: 13px; color: #86868b;">{node_info['desc']}</span>
+                        </div>
                     </div>
-                </div>
-                """), unsafe_allow_html=True)
+                    """), unsafe_allow_html=True)
                 
-                update_log(name, "开始执行工作...", "running")
+                    update_log(name, "开始执行工作...", "running")
             
-            # 2. 节点结束
-            elif kind == "on_chain_end":
-                if name in NODE_METADATA:
-                    node_info = NODE_METADATA[name]
-                    current_progress = node_info['end']
-                    progress_bar.progress(current_progress)
-                    update_log(name, "执行完成", "done")
+                # 2. 节点结束
+                elif kind == "on_chain_end":
+                    if name in NODE_METADATA:
+                        node_info = NODE_METADATA[name]
+                        if name in PARALLEL_NODES:
+                            # 并行分析节点按完成比例推进进度
+                            finished_parallel.add(name)
+                            start, end = PARALLEL_PROGRESS
+                            current_progress = max(
+                                current_progress,
+                                start + (end - start) * len(finished_parallel) // parallel_total
+                            )
+                        else:
+                            current_progress = max(current_progress, node_info['end'])
+                        progress_bar.progress(current_progress)
+                        update_log(name, "执行完成", "done")
                 
-                # 捕获状态输出
-                if "output" in data and isinstance(data["output"], dict):
-                    output = data["output"]
-                    final_state.update(output)
+                    # 捕获状态输出
+                    if "output" in data and isinstance(data["output"], dict):
+                        output = data["output"]
+                        final_state.update(output)
                     
-                    # 捕获意图识别结果
-                    if name == "planner" and "intent" in output:
-                        detected_intent = output["intent"]
-                        intent_label = {
-                            "stock": "📈 股票分析",
-                            "company": "🏢 公司知识查询",
-                            "general": "🤖 通用问答"
-                        }.get(detected_intent, detected_intent)
+                        # 捕获意图识别结果
+                        if name == "planner" and "intent" in output:
+                            detected_intent = output["intent"]
+                            intent_label = {
+                                "stock": "📈 股票分析",
+                                "company": "🏢 公司知识查询",
+                                "general": "🤖 通用问答"
+                            }.get(detected_intent, detected_intent)
                         
-                        update_log("system", f"意图识别为: {intent_label}", "info")
-
-            # 3. 工具调用
-            elif kind == "on_tool_start":
-                update_log(current_node or "system", f"调用工具: {name}", "running")
+                            update_log("system", f"意图识别为: {intent_label}", "info")
+                            if detected_intent == "stock" and output.get("stock_code"):
+                                # 会话中已有的分析结果直接复用，不再执行
+                                dimensions = [d for d in runnable_dimensions(output) if not output.get(f"{d}_analysis")]
+                                reused = [d for d in requested_dimensions(output) if output.get(f"{d}_analysis")]
+                                unsupported = unsupported_dimensions(output)
+                                parallel_total = max(len(dimensions), 1)
+                                if unsupported:
+                                    labels = '、'.join(NODE_METADATA[d]['label'] for d in unsupported)
+                                    update_log("system", f"{output.get('market') or '该市场'}不支持: {labels}，已跳过", "info")
+                                if reused:
+                                    labels = '、'.join(NODE_METADATA[d]['label'] for d in reused)
+                                    update_log("system", f"复用上一轮的分析: {labels}", "info")
+                                if len(dimensions) < len(PARALLEL_NODES):
+                                    labels = '、'.join(NODE_METADATA[d]['label'] for d in dimensions) or "无"
+                                    update_log("system", f"只执行: {labels}", "info")
+
+                # 3. 工具调用 (并行执行时按事件元数据归属到所在节点)
+                elif kind == "on_tool_start":
+                    update_log(event_node(event) or current_node or "system", f"调用工具: {name}", "running")
                 
-            elif kind == "on_tool_end":
-                update_log(current_node or "system", f"工具返回结果", "done")
+                elif kind == "on_tool_end":
+                    update_log(event_node(event) or current_node or "system", f"工具返回结果", "done")
 
         # 完成
         progress_bar.progress(100)
@@ -380,6 +443,9 @@ async def run_analysis_async(query, status_container, progress_bar, log_containe
         
         # 补充结果状态
         final_state['detected_intent'] = detected_intent
+        final_state['run_id'] = run_id
+        final_state['run_metrics'] = registry.run_summary(run_id)['totals']
+        registry.export_run_json(run_id, config.METRICS_DIR)
         return final_state
         
     except Exception as e:
@@ -394,10 +460,18 @@ def main():
     st.markdown('<div class="apple-title">📈 Agentic Stock Advisor</div>', unsafe_allow_html=True)
     st.markdown('<div class="apple-subtitle">智能多意图股票助手 • 股票分析 | 公司知识 | 通用问答</div>', unsafe_allow_html=True)
 
+    # 长期运行进程: 按配置启动 Prometheus 指标服务 (重复调用只启动一次)
+    start_metrics_server(config.METRICS_PORT)
+    
     # 状态检查
     if not config.OPENAI_API_KEY:
         st.warning("⚠️ 未检测到 OPENAI_API_KEY，请检查 .env 配置")
     
+    # 会话上下文 (每个浏览器会话一份，追问复用上一轮的公司和分析结果)
+    if 'analysis_session' not in st.session_state:
+        st.session_state['analysis_session'] = AnalysisSession()
+    session = st.session_state['analysis_session']
+    
     # 输入区
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
     
@@ -415,6 +489,16 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    context = session.active_context()
+    if context:
+        col_ctx, col_reset = st.columns([5, 1])
+        with col_ctx:
+            st.caption(f"当前话题: {context['company_name'] or context['stock_code']} ({context['stock_code']})，可直接追问，如 \"那它的估值呢\"")
+        with col_reset:
+            if st.button("🆕 新话题", use_container_width=True):
+                session.reset()
+                st.rerun()
+    
     # 处逻辑
     if submit_btn and query:
         st.markdown('<div class="apple-divider"></div>', unsafe_allow_html=True)
@@ -435,9 +519,10 @@ def main():
                 log_container.markdown('<div class="tool-log">等待任务启动...</div>', unsafe_allow_html=True)
 
         # 运行异步分析
-        result = asyncio.run(run_analysis_async(query, status_container, progress_bar, log_container))
+        result = asyncio.run(run_analysis_async(query, session, status_container, progress_bar, log_container))
         
         if result:
+            session.update(result)
             st.markdown('<div class="apple-divider"></div>', unsafe_allow_html=True)
             
             # 结果展示区
@@ -464,6 +549,13 @@ def main():
                 st.markdown(f"<div class='report-title'>{header_title}</div>", unsafe_allow_html=True)
                 if intent == 'stock':
                     st.caption(f"代码: {result.get('stock_code', '--')} | 市场: {result.get('market', '--')}")
+                metrics = result.get('run_metrics') or {}
+                if metrics.get('llm_calls'):
+                    st.caption(
+                        f"运行 {result.get('run_id')} | LLM {metrics['llm_calls']} 次 / {metrics['llm_time']:.1f}s | "
+                        f"tokens {metrics['prompt_tokens']}+{metrics['completion_tokens']} | "
+                        f"初始化 {metrics.get('setup_time', 0.0):.2f}s"
+                    )
             
             st.markdown("<br>", unsafe_allow_html=True)
             
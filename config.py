@@ -16,6 +16,23 @@ class Config:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai-proxy.org/v1")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # 模型分档: 分类/提取类调用使用快速模型，为空时回退到 OPENAI_MODEL
+    OPENAI_FAST_MODEL: str = os.getenv("OPENAI_FAST_MODEL", "")
+    # 按调用点覆盖路由，如 "intent=fast,summarizer=gpt-4o" (见 llm/factory.py)
+    MODEL_ROUTES: str = os.getenv("MODEL_ROUTES", "")
+    
+    # LLM网关配置 (自适应并发 + 限流重试，见 llm/gateway.py)
+    LLM_GATEWAY_ENABLED: bool = os.getenv("LLM_GATEWAY_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_INITIAL_CONCURRENCY: int = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))  # 初始并发上限
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # 并发上限的上界
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))  # 429/超时/过载的最大重试次数
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # 退避基准 (秒)
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))  # 退避上限 (秒)
+    LLM_RUN_DEADLINE: float = float(os.getenv("LLM_RUN_DEADLINE", "0"))  # 单次分析的LLM截止时间 (秒)，0表示不限制
+    # 设置截止时间时的节点预算 (见 graph/deadline.py)
+    DEADLINE_SUMMARY_RESERVE: float = float(os.getenv("DEADLINE_SUMMARY_RESERVE", "30"))  # 为总结节点预留的时间 (秒)
+    DEADLINE_WRAP_UP_SECONDS: float = float(os.getenv("DEADLINE_WRAP_UP_SECONDS", "15"))  # 剩余时间低于该值时要求Agent停止调用工具
+    DEADLINE_NODE_POOL_SIZE: int = int(os.getenv("DEADLINE_NODE_POOL_SIZE", "16"))  # 设置截止时间时同步执行分析节点的线程池大小
     
     # 项目路径
     PROJECT_ROOT: Path = Path(__file__).parent
@@ -31,6 +48,67 @@ class Config:
     EMBEDDING_MODEL_DIR: Path = RAG_DIR / "models"  # 本地模型存放目录
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-0.6B")
     
+    # 数据源缓存 (进程内，批量分析时多个运行共享，见 tools/data_cache.py)
+    DATA_CACHE_TTL: float = float(os.getenv("DATA_CACHE_TTL", "1800"))  # 有效期 (秒)，0表示关闭
+    NEWS_CACHE_TTL: float = float(os.getenv("NEWS_CACHE_TTL", "600"))  # 新闻搜索结果有效期 (秒)
+    NEWS_SOURCE_TIMEOUT: float = float(os.getenv("NEWS_SOURCE_TIMEOUT", "5"))  # 各新闻源并发搜索的截止时间 (秒)
+    NEWS_DEDUP_SIMILARITY: float = float(os.getenv("NEWS_DEDUP_SIMILARITY", "0.4"))  # 判定为同一事件转载的最低相似度
+    # 新闻情感/风险评分方式 (见 tools/news_sentiment.py): llm=LLM评分并撰写分析；
+    # hybrid=本地词典+Embedding评分，LLM只撰写分析；fast=只用本地评分，新闻节点不调用LLM
+    NEWS_SENTIMENT_MODE: str = os.getenv("NEWS_SENTIMENT_MODE", "hybrid").lower()
+    # 新闻增量存储 (见 tools/news_store.py)：按公司保存已抓取的文章和评分，只处理新增文章
+    NEWS_STORE_ENABLED: bool = os.getenv("NEWS_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+    NEWS_STORE_PATH: Path = Path(os.getenv("NEWS_STORE_PATH", str(OUTPUT_DIR / "news_store.sqlite")))
+    NEWS_SYNC_INTERVAL: float = float(os.getenv("NEWS_SYNC_INTERVAL", "600"))  # 距上次同步不足该时间 (秒) 时不再搜索
+    NEWS_WINDOW_DAYS: float = float(os.getenv("NEWS_WINDOW_DAYS", "7"))  # 新闻分析汇总的时间窗口 (天)
+    # 新闻正文抓取 (见 tools/article_fetcher.py)
+    ARTICLE_FETCH_TOP_N: int = int(os.getenv("ARTICLE_FETCH_TOP_N", "5"))  # 抓取正文的事件数，0表示只用摘要
+    ARTICLE_FETCH_DEADLINE: float = float(os.getenv("ARTICLE_FETCH_DEADLINE", "6"))  # 正文抓取的总截止时间 (秒)
+    ARTICLE_FETCH_CONCURRENCY: int = int(os.getenv("ARTICLE_FETCH_CONCURRENCY", "8"))  # 同时进行的正文请求数
+    ARTICLE_HOST_CONCURRENCY: int = int(os.getenv("ARTICLE_HOST_CONCURRENCY", "2"))  # 同一站点同时进行的请求数
+    ARTICLE_HOST_INTERVAL: float = float(os.getenv("ARTICLE_HOST_INTERVAL", "0.2"))  # 同一站点相邻请求的最小间隔 (秒)
+    ARTICLE_CACHE_TTL: float = float(os.getenv("ARTICLE_CACHE_TTL", "86400"))  # 正文缓存有效期 (秒)
+    ARTICLE_MAX_CHARS: int = int(os.getenv("ARTICLE_MAX_CHARS", "3000"))  # 保留的正文最大长度
+    # 共享HTTP层 (见 tools/http_client.py)：新闻搜索和 AKShare 请求的长连接池及磁盘响应缓存 (各接口有效期见 CACHE_RULES)
+    HTTP_CACHE_ENABLED: bool = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    HTTP_CACHE_PATH: Path = Path(os.getenv("HTTP_CACHE_PATH", str(OUTPUT_DIR / "http_cache.sqlite")))
+    HTTP_CACHE_MAX_MB: float = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))  # 缓存正文总大小上限 (MB)，超过时淘汰最早过期的条目
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "10"))  # 每个主机保持的长连接数
+    HTTP_POOL_HOSTS: int = int(os.getenv("HTTP_POOL_HOSTS", "20"))  # 保留连接池的主机数
+    # 规划阶段预取: 查询中能直接确定股票时，在LLM规划的同时预取数据写入缓存 (见 tools/prefetch.py)
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    # 批量分析配置
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "3"))  # 同时进行的分析数
+    
+    # 本地意图分类 (见 agents/intent_classifier.py)：关键词未命中时先用Embedding质心分类，置信度不足才调用LLM
+    INTENT_CLASSIFIER_ENABLED: bool = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() in ("1", "true", "yes")
+    INTENT_CONFIDENCE_THRESHOLD: float = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+    
+    # 对比查询 (如 "比较茅台和五粮液") 最多同时分析的股票数
+    COMPARE_MAX_STOCKS: int = int(os.getenv("COMPARE_MAX_STOCKS", "5"))
+    
+    # 会话上下文有效期 (秒)：交互模式/Web界面中追问复用上一轮分析结果的时限 (见 graph/session.py)
+    SESSION_CONTEXT_TTL: float = float(os.getenv("SESSION_CONTEXT_TTL", "1800"))
+    
+    # 同一进程内同时发起的相同分析 (同一股票、维度、日期和选项) 合并为一次运行 (见 graph/coalesce.py)
+    COALESCE_RUNS: bool = os.getenv("COALESCE_RUNS", "true").lower() in ("1", "true", "yes")
+    
+    # 异步执行配置
+    DATA_THREAD_POOL_SIZE: int = int(os.getenv("DATA_THREAD_POOL_SIZE", "8"))  # 阻塞数据调用的线程池大小
+    
+    # 检查点配置 (中断/失败的分析可按运行ID恢复，见 graph/checkpoint.py)
+    CHECKPOINT_ENABLED: bool = os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+    CHECKPOINT_DB: Path = Path(os.getenv("CHECKPOINT_DB", str(OUTPUT_DIR / "checkpoints.sqlite")))
+    
+    # 股票名称索引 (见 tools/stock_index.py)：全部A股名称的本地索引文件及刷新周期 (秒)
+    STOCK_INDEX_PATH: Path = Path(os.getenv("STOCK_INDEX_PATH", str(OUTPUT_DIR / "stock_index.json")))
+    STOCK_INDEX_TTL: float = float(os.getenv("STOCK_INDEX_TTL", "86400"))
+    
+    # 指标配置
+    METRICS_DIR: Path = OUTPUT_DIR / "metrics"  # 单次运行指标JSON输出目录
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))  # Prometheus指标端口，0表示不启动
+    
     # 日志级别
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
@@ -38,6 +116,10 @@ class Config:
     DEFAULT_K_LINE_YEARS: int = 3  # 默认获取3年K线数据
     NEWS_COUNT: int = 10  # 默认获取10条新闻
     
+    # ReAct上下文压缩配置
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))  # 每次LLM调用的消息token预算
+    TOOL_DIGEST_CHARS: int = int(os.getenv("TOOL_DIGEST_CHARS", "600"))  # 已读工具结果的摘要长度
+    
     @classmethod
     def validate(cls) -> bool:
         """验证必要配置"""
@@ -3,5 +3,6 @@ Graph模块初始化
 """
 from .state import StockAnalysisState
 from .workflow import create_stock_analysis_graph
+from .registry import get_graph, get_agent, warm_up
 
-__all__ = ['StockAnalysisState', 'create_stock_analysis_graph']
+__all__ = ['StockAnalysisState', 'create_stock_analysis_graph', 'get_graph', 'get_agent', 'warm_up']
@@ -0,0 +1,252 @@
+"""
+批量分析 (自选股 / 查询文件 / 指数成分股)
+
+- 多只股票在同一个事件循环中并发分析，并发数由信号量限制，LLM调用以批量优先级排队
+- 所有运行共享进程内的编译图、Agent、数据缓存 (tools/data_cache.py) 和LLM缓存
+- 每完成一项立即写入报告和 summary.jsonl；批次清单保存在 manifest.json
+- 中断后用同一批次ID恢复: 已完成的项跳过，未完成的项从各自的检查点继续 (见 graph/checkpoint.py)
+
+批次目录: OUTPUT_DIR/batch/<batch_id>/
+"""
+import asyncio
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from llm.gateway import PRIORITY_BATCH, llm_priority, run_deadline
+from monitoring.metrics import new_run_id, run_scope
+from tools.stock_search import normalize_code
+from .checkpoint import resume_point, run_config
+from .coalesce import coalescer, run_key
+
+# 视为已完成的状态 (恢复时跳过): 成功生成报告，或规划阶段未识别到股票 (重试也不会成功)
+DONE_STATUSES = {'ok', 'no_report'}
+
+SUPPORTED_INDEXES = ('hs300', 'sz50', 'zz500')
+
+
+def _item(key: str, query: str, name: str = '') -> Dict[str, str]:
+    return {'key': key, 'query': query, 'name': name}
+
+
+def _code_item(code: str, name: str = '') -> Dict[str, str]:
+    label = f"{name}({code})" if name else code
+    return _item(code, f"分析{label}的投资价值", name)
+
+
+def load_items(
+    codes: Optional[List[str]] = None,
+    file: Optional[Path] = None,
+    index: Optional[str] = None,
+    limit: int = 0,
+) -> List[Dict[str, str]]:
+    """
+    汇总批量分析项 (按输入顺序去重)
+
+    Args:
+        codes: 股票代码列表
+        file: 查询文件，每行一个查询或股票代码 (空行和 # 开头的行忽略)
+        index: 指数名称 (hs300/sz50/zz500)，通过 Baostock 获取成分股
+        limit: 最多返回的项数，0表示不限制
+
+    Returns:
+        [{'key', 'query', 'name'}]
+
+    Raises:
+        ValueError: 指数名称不支持或代码格式错误
+    """
+    items: List[Dict[str, str]] = []
+    for text in codes or []:
+        code = normalize_code(text)
+        if code is None:
+            raise ValueError(f"无法识别的股票代码: {text}")
+        items.append(_code_item(code))
+
+    if file:
+        for line in Path(file).read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            code = normalize_code(line)
+            items.append(_code_item(code) if code else _item(line, line))
+
+    if index:
+        index = index.lower()
+        if index not in SUPPORTED_INDEXES:
+            raise ValueError(f"不支持的指数: {index} (可选: {', '.join(SUPPORTED_INDEXES)})")
+        from tools.baostock_utils import fetch_index_constituent_data
+        df = fetch_index_constituent_data(index)
+        for _, row in df.iterrows():
+            items.append(_code_item(row['code'], row.get('code_name', '')))
+
+    unique: Dict[str, Dict[str, str]] = {}
+    for item in items:
+        unique.setdefault(item['key'], item)
+    items = list(unique.values())
+    return items[:limit] if limit > 0 else items
+
+
+class BatchRun:
+    """
+    一个批次的清单、结果记录和报告目录
+
+    Attributes:
+        batch_id: 批次ID
+        items: 分析项列表
+        directory: 批次目录
+    """
+
+    def __init__(self, batch_id: str, items: List[Dict[str, str]], directory: Path):
+        self.batch_id = batch_id
+        self.items = items
+        self.directory = directory
+
+    @property
+    def summary_path(self) -> Path:
+        return self.directory / "summary.jsonl"
+
+    @classmethod
+    def create(cls, items: List[Dict[str, str]], root: Optional[Path] = None) -> 'BatchRun':
+        """创建新批次并写入清单"""
+        batch_id = f"batch_{new_run_id()}"
+        directory = Path(root or config.OUTPUT_DIR / "batch") / batch_id
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "manifest.json").write_text(json.dumps({
+            'batch_id': batch_id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'items': items,
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+        return cls(batch_id, items, directory)
+
+    @classmethod
+    def load(cls, batch_id: str, root: Optional[Path] = None) -> 'BatchRun':
+        """
+        加载已有批次 (用于恢复)
+
+        Raises:
+            FileNotFoundError: 批次不存在
+        """
+        directory = Path(root or config.OUTPUT_DIR / "batch") / batch_id
+        manifest = json.loads((directory / "manifest.json").read_text(encoding='utf-8'))
+        return cls(batch_id, manifest['items'], directory)
+
+    def run_id(self, position: int) -> str:
+        """分析项对应的运行ID (固定，恢复时据此找到检查点)"""
+        return f"{self.batch_id}_{position:04d}"
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """已记录的结果 (同一项多次记录时取最后一次)"""
+        results: Dict[str, Dict[str, Any]] = {}
+        if self.summary_path.exists():
+            for line in self.summary_path.read_text(encoding='utf-8').splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    results[entry['key']] = entry
+        return results
+
+    def pending(self) -> List[int]:
+        """尚未完成的分析项序号"""
+        done = {key for key, entry in self.results().items() if entry['status'] in DONE_STATUSES}
+        return [i for i, item in enumerate(self.items) if item['key'] not in done]
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """追加一条结果 (每项完成后立即写入，中断不丢失)"""
+        with self.summary_path.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def save_report(self, position: int, result: Dict[str, Any]) -> Path:
+        """保存单项报告"""
+        item = self.items[position]
+        label = result.get('stock_code') or item['key']
+        name = result.get('company_name') or item.get('name') or ''
+        safe = re.sub(r'[\\/:*?"<>|\s]+', '_', f"{label}_{name}".strip('_'))
+        path = self.directory / f"{position:04d}_{safe}.md"
+        path.write_text(result['final_report'], encoding='utf-8')
+        return path
+
+
+async def _run_item(graph, batch: BatchRun, position: int, deadline: float) -> Dict[str, Any]:
+    """分析单项 (有检查点时从检查点继续)，返回结果记录"""
+    item = batch.items[position]
+    run_id = batch.run_id(position)
+    graph_input: Optional[Dict[str, Any]] = {'user_query': item['query'], 'messages': []}
+    graph_config = run_config(run_id, batch_id=batch.batch_id)
+    point = resume_point(graph, run_id) if graph.checkpointer else None
+
+    start = time.perf_counter()
+    entry: Dict[str, Any] = {'key': item['key'], 'query': item['query'], 'run_id': run_id}
+    try:
+        with run_scope(run_id), llm_priority(PRIORITY_BATCH), run_deadline(deadline):
+            if point == (None, []):
+                # 上次已分析完成，但在写入结果前中断
+                result = graph.get_state(graph_config).values
+            else:
+                if point is not None:
+                    graph_input, graph_config = None, point[0]
+                # 从检查点恢复的运行不合并；新运行与其他会话/批次项中相同的分析共享一次运行
+                key = run_key(graph_input, {'deadline': deadline}) if graph_input else None
+                result = await coalescer.ainvoke(graph, graph_input, graph_config, key)
+    except Exception as e:
+        entry.update(status='failed', error=f"{type(e).__name__}: {e}")
+    else:
+        if result.get('final_report') and not result.get('error'):
+            entry.update(status='ok', report=str(batch.save_report(position, result)),
+                         stock_code=result.get('stock_code', ''),
+                         company_name=result.get('company_name', ''),
+                         timed_out_nodes=result.get('timed_out_nodes') or [])
+        elif result.get('error'):
+            entry.update(status='failed', error=result['error'])
+        else:
+            entry.update(status='no_report', error='未识别到股票或未生成报告')
+    entry['elapsed'] = round(time.perf_counter() - start, 2)
+    entry['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    return entry
+
+
+async def run_batch(
+    graph,
+    batch: BatchRun,
+    concurrency: int = 3,
+    deadline: float = 0,
+    on_result: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    并发执行批次中未完成的分析项
+
+    Args:
+        graph: 编译后的工作流图 (进程级共享)
+        batch: 批次
+        concurrency: 同时进行的分析数
+        deadline: 单项分析时限 (秒)，0表示不限制
+        on_result: 每项完成时的回调 (结果记录, 已完成数, 总数)
+
+    Returns:
+        统计信息 {'total', 'ok', 'failed', 'no_report', 'skipped', 'elapsed', 'reports_per_minute'}
+    """
+    positions = batch.pending()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats: Dict[str, Any] = {'total': len(batch.items), 'skipped': len(batch.items) - len(positions),
+                             'ok': 0, 'failed': 0, 'no_report': 0}
+    done = 0
+    start = time.perf_counter()
+
+    async def worker(position: int):
+        nonlocal done
+        async with semaphore:
+            entry = await _run_item(graph, batch, position, deadline)
+        batch.record(entry)
+        stats[entry['status']] += 1
+        done += 1
+        if on_result:
+            on_result(entry, done, len(positions))
+
+    await asyncio.gather(*(worker(position) for position in positions))
+    elapsed = time.perf_counter() - start
+    stats['elapsed'] = elapsed
+    stats['reports_per_minute'] = stats['ok'] / (elapsed / 60) if elapsed > 0 else 0.0
+    return stats
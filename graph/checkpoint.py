@@ -0,0 +1,157 @@
+"""
+分析运行检查点 (本地SQLite)
+
+每个超步结束时保存图状态，并行分支中已完成节点的输出也会单独写入，
+因此中断 (Ctrl-C) 或某个节点失败后，可以用同一个运行ID恢复，只重新执行未完成的节点。
+
+- 运行ID即 LangGraph 的 thread_id (见 run_config)
+- 状态用 msgpack 编码，较大的记录再经 zlib 压缩 (CompactSerializer)
+- 同步 SqliteSaver 的异步接口由线程卸载实现，Streamlit 的 astream_events 也可使用
+"""
+import asyncio
+import sqlite3
+import threading
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+
+# 超过该长度的记录才压缩 (小记录压缩收益低于开销)
+COMPRESS_MIN_BYTES = 512
+_ZLIB_SUFFIX = '+zlib'
+
+
+class CompactSerializer:
+    """
+    紧凑的检查点序列化器
+
+    在 JsonPlusSerializer (msgpack) 的基础上对较大的记录做 zlib 压缩，
+    类型标记追加 '+zlib' 后缀，读取时按后缀解压，未压缩的旧记录照常读取。
+    """
+
+    def __init__(self, min_bytes: int = COMPRESS_MIN_BYTES, level: int = 6):
+        self.inner = JsonPlusSerializer()
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return type_ + _ZLIB_SUFFIX, compressed
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(_ZLIB_SUFFIX):
+            type_, payload = type_[:-len(_ZLIB_SUFFIX)], zlib.decompress(payload)
+        return self.inner.loads_typed((type_, payload))
+
+
+class LocalCheckpointer(SqliteSaver):
+    """
+    本地SQLite检查点存储
+
+    SqliteSaver 本身只支持同步调用 (内部有锁，可跨线程共享连接)，
+    这里把异步接口转到线程中执行，使同一个编译后的图可同时用于 invoke 和 astream_events。
+    """
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_checkpointer: Optional[LocalCheckpointer] = None
+_lock = threading.Lock()
+
+
+def get_checkpointer() -> LocalCheckpointer:
+    """
+    获取进程内共享的检查点存储 (首次调用时创建数据库)
+
+    Returns:
+        检查点存储实例
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock:
+            if _checkpointer is None:
+                config.CHECKPOINT_DB.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(config.CHECKPOINT_DB), check_same_thread=False)
+                _checkpointer = LocalCheckpointer(conn, serde=CompactSerializer())
+    return _checkpointer
+
+
+def run_config(run_id: str, **metadata: Any) -> Dict[str, Any]:
+    """
+    构造带检查点线程ID的运行配置
+
+    Args:
+        run_id: 运行ID (同时作为检查点 thread_id)
+        **metadata: 附加的运行元数据
+
+    Returns:
+        传给 invoke/astream_events 的 config
+    """
+    return {
+        "configurable": {"thread_id": run_id},
+        "metadata": {"analysis_run_id": run_id, **metadata},
+    }
+
+
+def resume_point(graph, run_id: str) -> Optional[Tuple[Optional[Dict[str, Any]], List[str]]]:
+    """
+    确定恢复运行的位置和需要重新执行的节点
+
+    - 中断或节点抛出异常的运行: 从最新检查点继续，同一步中已完成的并行节点不再执行
+    - 已结束但最终节点报错 (如总结失败) 的运行: 从该节点执行前的检查点分叉，只重新执行该节点
+
+    Args:
+        graph: 带检查点的编译后图
+        run_id: 运行ID
+
+    Returns:
+        (传给 invoke(None, config) 的运行配置, 将执行的节点)；
+        运行已成功完成时配置为None；没有该运行的检查点时返回None
+    """
+    latest = run_config(run_id)
+    snapshot = graph.get_state(latest)
+    if not snapshot.values and not snapshot.next:
+        return None
+    if snapshot.next:
+        return latest, list(snapshot.next)
+    if not snapshot.values.get('error'):
+        return None, []
+    for state in graph.get_state_history(latest):
+        if state.next:
+            return {**state.config, "metadata": latest["metadata"]}, list(state.next)
+    return None, []
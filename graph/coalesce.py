@@ -0,0 +1,292 @@
+"""
+图级请求合并 (single-flight)
+
+多个会话 (Streamlit用户、批量任务) 同时分析同一只股票时，只运行一次工作流:
+- 合并键为 (意图, 股票代码, 分析维度, 分析日期, 运行选项)，在运行前由查询本地解析，不调用LLM；
+  单一维度的问题走轻量总结、回答针对问题本身，合并键还包含规范化的查询
+- 第一个请求作为 leader 运行工作流；相同键的后续请求作为 follower 附加到进行中的运行，
+  回放 leader 已产生的事件并接收后续事件，最终得到同一份结果
+- leader 被取消 (如用户关闭页面) 时，follower 重新发起运行，不受影响；leader 运行出错时 follower 得到同样的错误
+- 无法在本地唯一确定股票、对比查询、依赖会话上下文复用结果的追问，不参与合并
+
+合并在进程内生效 (Streamlit 的多个会话共享同一进程)。
+"""
+import asyncio
+import re
+import threading
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, get_type_hints
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from agents.dimensions import match_dimensions
+from agents.intent_classifier import get_intent_classifier
+from monitoring.metrics import registry
+from tools.stock_search import match_stocks_in_query
+from .state import StockAnalysisState
+
+# leader 以这些异常结束时视为放弃运行，follower 重新发起
+_ABANDONED = (asyncio.CancelledError, KeyboardInterrupt, GeneratorExit)
+
+# 状态字段的合并函数 (由事件流中各节点的更新还原最终状态)
+_REDUCERS = {
+    name: hint.__metadata__[0]
+    for name, hint in get_type_hints(StockAnalysisState, include_extras=True).items()
+    if hasattr(hint, '__metadata__')
+}
+
+
+def _apply_update(values: Dict[str, Any], update: Any) -> None:
+    """按状态字段的合并函数应用一次节点更新"""
+    if not isinstance(update, dict):
+        return
+    for name, value in update.items():
+        reducer = _REDUCERS.get(name)
+        values[name] = reducer(values[name], value) if reducer and name in values else value
+
+
+def run_key(state: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> Optional[Tuple]:
+    """
+    计算运行的合并键
+
+    Args:
+        state: 图输入 (含 user_query，可选 session_context)
+        options: 影响结果的运行选项 (如时限)
+
+    Returns:
+        (意图, 股票代码, 分析维度, 分析日期, 运行选项[, 规范化查询])，不参与合并时返回None
+    """
+    if not config.COALESCE_RUNS or not state:
+        return None
+    query = state.get('user_query', '')
+    matches = match_stocks_in_query(query)
+    if len(matches) != 1:
+        return None
+    # 与规划Agent的关键词意图匹配一致: 股票关键词优先，公司知识问题不合并
+    matched = get_intent_classifier().match_keywords(query)
+    if matched and matched[0] == 'company':
+        return None
+    code = matches[0][0]
+    context = state.get('session_context') or {}
+    if context.get('stock_code') == code:
+        # 会复用本会话已有的分析结果，与其他会话的运行不等价
+        return None
+    dimensions = tuple(match_dimensions(query))
+    key = (
+        'stock',
+        code,
+        dimensions,
+        datetime.now().strftime('%Y-%m-%d'),
+        tuple(sorted((options or {}).items())),
+    )
+    if len(dimensions) == 1:
+        # 单一维度走轻量总结，回答针对问题本身 (如 "支撑位在哪" 与 "K线怎么样")，问题不同时不能共享结果
+        key += (_normalize_query(query),)
+    return key
+
+
+def _normalize_query(query: str) -> str:
+    """规范化查询 (忽略大小写、空白和标点)，用于单一维度问题的合并键"""
+    return re.sub(r'[\s\W_]+', '', query).casefold()
+
+
+class _Flight:
+    """一次进行中的运行: 事件缓冲 + 最终结果 (跨线程、跨事件循环共享)"""
+
+    def __init__(self, key: Tuple):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def _wake(self) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # follower 的事件循环已关闭
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self.events.append(event)
+        self._wake()
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.abandoned = isinstance(error, _ABANDONED)
+            self.finished.set()
+        self._wake()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """回放已产生的事件并等待后续事件，直到运行结束"""
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            wake = asyncio.Event()
+            with self._lock:
+                pending = self.events[index:]
+                finished = self.finished.is_set()
+                if not pending and not finished:
+                    self._waiters.append((loop, wake))
+            index += len(pending)
+            for event in pending:
+                yield event
+            if pending:
+                continue
+            if finished:
+                return
+            await wake.wait()
+
+    async def wait(self) -> None:
+        """异步等待运行结束"""
+        async for _ in self.follow():
+            pass
+
+
+def _final_event(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """leader 未产生事件流 (invoke/ainvoke) 时，为事件流 follower 补发的根节点结束事件"""
+    return {'event': 'on_chain_end', 'name': 'LangGraph', 'run_id': '', 'tags': [], 'metadata': {},
+            'data': {'output': result}}
+
+
+class RunCoalescer:
+    """进程级的运行合并器"""
+
+    def __init__(self):
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Tuple) -> Tuple[_Flight, bool]:
+        """附加到进行中的运行，没有时创建 (返回 运行, 是否为leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.finished.is_set():
+                registry.inc('stock_agent_coalesced_runs_total', {'intent': key[0]},
+                             help_text='合并到进行中运行的重复请求数')
+                print(f"    [Coalesce] {key[1]} 已有相同的分析在进行，合并到进行中的运行")
+                return flight, False
+            flight = self._flights[key] = _Flight(key)
+            return flight, True
+
+    def _leave(self, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    @staticmethod
+    def _outcome(flight: _Flight) -> Dict[str, Any]:
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def invoke(self, graph, state: Dict[str, Any], config: Dict[str, Any], key: Optional[Tuple]) -> Dict[str, Any]:
+        """
+        同步运行工作流 (相同键的并发请求共享一次运行)
+
+        Args:
+            graph: 编译后的工作流图
+            state: 图输入
+            config: 运行配置
+            key: 合并键 (run_key)，None表示不合并
+
+        Returns:
+            最终状态
+        """
+        if key is None:
+            return graph.invoke(state, config=config)
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            flight.finished.wait()
+            if not flight.abandoned:
+                return self._outcome(flight)
+        try:
+            result = graph.invoke(state, config=config)
+        except BaseException as e:
+            flight.finish(error=e)
+            raise
+        else:
+            flight.finish(result=result)
+            return result
+        finally:
+            self._leave(flight)
+
+    async def ainvoke(self, graph, state: Dict[str, Any], config: Dict[str, Any],
+                      key: Optional[Tuple]) -> Dict[str, Any]:
+        """异步版本的 invoke"""
+        if key is None:
+            return await graph.ainvoke(state, config=config)
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            await flight.wait()
+            if not flight.abandoned:
+                return self._outcome(flight)
+        try:
+            result = await graph.ainvoke(state, config=config)
+        except BaseException as e:
+            flight.finish(error=e)
+            raise
+        else:
+            flight.finish(result=result)
+            return result
+        finally:
+            self._leave(flight)
+
+    async def astream_events(self, graph, state: Dict[str, Any], config: Dict[str, Any],
+                             key: Optional[Tuple], **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        运行工作流并产生事件流 (参数同 graph.astream_events)
+
+        follower 先回放 leader 已产生的事件，再接收后续事件；leader 以 invoke/ainvoke 运行时，
+        follower 在运行结束后收到一个包含最终状态的根节点结束事件。
+        """
+        if key is None:
+            async for event in graph.astream_events(state, config=config, **kwargs):
+                yield event
+            return
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            async for event in flight.follow():
+                yield event
+            if flight.abandoned:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            if not flight.events:
+                yield _final_event(flight.result)
+            return
+
+        root_id, result = None, {}
+        _apply_update(result, state)
+        try:
+            async for event in graph.astream_events(state, config=config, **kwargs):
+                # 第一个事件为根节点开始事件；根节点的流式输出为各节点的状态更新，依次合并得到最终状态
+                root_id = root_id or event.get('run_id')
+                if event['event'] == 'on_chain_stream' and event.get('run_id') == root_id:
+                    for update in (event['data'].get('chunk') or {}).values():
+                        _apply_update(result, update)
+                flight.publish(event)
+                yield event
+        except BaseException as e:
+            flight.finish(error=e)
+            raise
+        else:
+            flight.finish(result=result)
+        finally:
+            self._leave(flight)
+
+
+coalescer = RunCoalescer()
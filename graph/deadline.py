@@ -0,0 +1,138 @@
+"""
+分析节点时间预算 (运行级SLA)
+
+运行设置了截止时间 (run_deadline / main.py --deadline) 时:
+- 四个并行分析节点共享同一预算: 运行剩余时间扣除为总结预留的时间
+- 预算内的LLM调用受节点截止时间约束；剩余时间不足 DEADLINE_WRAP_UP_SECONDS 时，
+  ReAct Agent 被要求停止调用工具、基于已有数据直接给出结论 (见 ContextCompactor)
+- 超过预算的节点被取消 (异步) 或放弃等待 (同步，被放弃的节点在结束前仍占用线程池中的线程)，记入 timed_out_nodes，
+  总结节点用已完成的分析生成报告并标注缺失的部分
+
+未设置截止时间时节点照常执行，没有额外开销。
+"""
+import asyncio
+import contextvars
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Awaitable, Callable, Dict, Optional
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from llm.gateway import remaining_time, run_deadline
+from monitoring.metrics import registry
+
+# 同步执行时承载分析节点的线程池 (大小见 DEADLINE_NODE_POOL_SIZE)。
+# 超时后只是放弃等待，节点仍在线程中运行到结束 (线程无法取消)，期间一直占用线程；
+# 批量任务中多个节点同时超时时，后续运行的节点可能排队，需按并发运行数 x 4 个分析节点设置线程数
+_NODE_EXECUTOR = ThreadPoolExecutor(max_workers=config.DEADLINE_NODE_POOL_SIZE, thread_name_prefix='node-budget')
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(h|m|s)?', re.IGNORECASE)
+_UNIT_SECONDS = {'h': 3600, 'm': 60, 's': 1}
+
+
+def parse_duration(text: Optional[str]) -> float:
+    """
+    解析时长字符串
+
+    Args:
+        text: 如 "90s"、"2m"、"1m30s"、"90" (纯数字按秒计)
+
+    Returns:
+        秒数，空字符串返回0 (不限制)
+
+    Raises:
+        ValueError: 格式无法识别
+    """
+    text = (text or '').strip()
+    if not text:
+        return 0.0
+    matches = list(_DURATION_PATTERN.finditer(text))
+    if not matches or ''.join(m.group(0) for m in matches).replace(' ', '') != text.replace(' ', ''):
+        raise ValueError(f"无法识别的时长: {text} (示例: 90s, 2m, 1m30s)")
+    return sum(float(m.group(1)) * _UNIT_SECONDS[(m.group(2) or 's').lower()] for m in matches)
+
+
+def analysis_budget() -> Optional[float]:
+    """
+    计算分析节点的时间预算
+
+    Returns:
+        预算秒数 (运行剩余时间扣除总结预留，预留最多占剩余时间的30%)，未设置截止时间时返回None
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return None
+    reserve = min(config.DEADLINE_SUMMARY_RESERVE, remaining * 0.3)
+    return max(remaining - reserve, 0.0)
+
+
+def _timed_out(node: str, field: str, budget: float) -> Dict[str, Any]:
+    """超过预算的节点返回空结果并登记，由总结节点标注缺失"""
+    print(f"    [Deadline] {node} 超过时间预算 ({budget:.0f}s)，报告中标注为缺失")
+    registry.inc('stock_agent_node_timeouts_total', {'node': node},
+                 help_text='超过时间预算的分析节点数')
+    return {field: None, 'timed_out_nodes': [node]}
+
+
+def run_with_budget(node: str, field: str, func: Callable[[dict], dict], state: dict) -> Dict[str, Any]:
+    """
+    在时间预算内同步执行分析节点
+
+    节点在独立线程中执行 (保留上下文变量)；超过预算后不再等待，
+    该线程中后续的LLM调用会因节点截止时间立即失败。
+
+    Args:
+        node: 节点名
+        field: 节点负责的状态字段
+        func: 节点函数 (如 agent.run)
+        state: 当前状态
+
+    Returns:
+        节点的状态更新
+    """
+    budget = analysis_budget()
+    if budget is None:
+        return func(state)
+    if budget <= 0:
+        return _timed_out(node, field, budget)
+    with run_deadline(budget) as deadline:
+        context = contextvars.copy_context()
+        future = _NODE_EXECUTOR.submit(context.run, func, state)
+        try:
+            result = future.result(timeout=budget)
+        except FutureTimeout:
+            return _timed_out(node, field, budget)
+    if deadline is not None and time.monotonic() >= deadline:
+        # 截止时间后才返回的结果只可能是失败信息
+        return _timed_out(node, field, budget)
+    return result
+
+
+async def arun_with_budget(node: str, field: str, afunc: Callable[[dict], Awaitable[dict]],
+                           state: dict) -> Dict[str, Any]:
+    """
+    在时间预算内异步执行分析节点，超过预算时取消
+
+    Args:
+        node: 节点名
+        field: 节点负责的状态字段
+        afunc: 异步节点函数 (如 agent.arun)
+        state: 当前状态
+
+    Returns:
+        节点的状态更新
+    """
+    budget = analysis_budget()
+    if budget is None:
+        return await afunc(state)
+    if budget <= 0:
+        return _timed_out(node, field, budget)
+    with run_deadline(budget) as deadline:
+        try:
+            result = await asyncio.wait_for(afunc(state), timeout=budget)
+        except asyncio.TimeoutError:
+            return _timed_out(node, field, budget)
+    if deadline is not None and time.monotonic() >= deadline:
+        return _timed_out(node, field, budget)
+    return result
@@ -0,0 +1,147 @@
+"""
+进程级图与Agent注册表
+
+编译后的工作流图和各Agent (连同LLM客户端、向量检索器、Embedding模型) 每个进程只构建一次，
+后续请求直接复用；构建耗时按运行记录到指标注册表 (kind=setup)。
+
+- CLI: main.py 直接调用 get_graph()
+- Streamlit: app.py 通过 st.cache_resource 包装 warm_up() + get_graph()，脚本重跑时也不会重建
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Type, TypeVar
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry, current_run_id
+
+T = TypeVar('T')
+
+_agents: Dict[type, Any] = {}
+_graph = None
+# 可重入锁: 构建图时会在锁内再次获取Agent
+_lock = threading.RLock()
+
+
+@contextmanager
+def timed_setup(component: str):
+    """
+    记录一次构建耗时 (计入当前运行的setup时间)
+
+    Args:
+        component: 构建的组件名，如 graph、FundamentalAgent
+    """
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.record_call({
+            'kind': 'setup',
+            'name': component,
+            'run_id': current_run_id(),
+            'agent': '',
+            'node': '',
+            'start': wall_start,
+            'end': wall_start + elapsed,
+            'wall_time': elapsed,
+        })
+
+
+def get_agent(agent_cls: Type[T]) -> T:
+    """
+    获取进程内共享的Agent实例 (首次调用时构建)
+
+    Args:
+        agent_cls: Agent类
+
+    Returns:
+        Agent实例
+    """
+    agent = _agents.get(agent_cls)
+    if agent is None:
+        with _lock:
+            agent = _agents.get(agent_cls)
+            if agent is None:
+                with timed_setup(agent_cls.__name__):
+                    agent = _agents[agent_cls] = agent_cls()
+    return agent
+
+
+def get_graph():
+    """
+    获取进程内共享的已编译工作流图 (三分支RAG版本)
+    
+    启用检查点 (CHECKPOINT_ENABLED) 时图带有本地SQLite检查点，调用时需用 run_config(run_id) 指定运行ID
+
+    Returns:
+        编译后的 LangGraph 图
+    """
+    global _graph
+    if _graph is None:
+        with _lock:
+            if _graph is None:
+                from .workflow import create_multi_branch_graph
+                with timed_setup('graph'):
+                    checkpointer = None
+                    if config.CHECKPOINT_ENABLED:
+                        from .checkpoint import get_checkpointer
+                        checkpointer = get_checkpointer()
+                    _graph = create_multi_branch_graph(checkpointer=checkpointer)
+    return _graph
+
+
+def warm_up(load_embedding: bool = False) -> Dict[str, float]:
+    """
+    预先构建图和所有Agent，使第一次请求也不承担构建开销
+
+    Args:
+        load_embedding: 是否同时加载Embedding模型 (较慢，适合长期运行的服务)
+
+    Returns:
+        各组件构建耗时 {组件名: 秒}
+    """
+    from agents import (
+        PlannerAgent, FundamentalAgent, TechnicalAgent, ValuationAgent, NewsAgent, SummarizerAgent,
+    )
+    from agents.company_qa_agent import CompanyQAAgent
+
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    get_graph()
+    timings['graph'] = time.perf_counter() - start
+    for agent_cls in (PlannerAgent, FundamentalAgent, TechnicalAgent, ValuationAgent,
+                      NewsAgent, SummarizerAgent, CompanyQAAgent):
+        start = time.perf_counter()
+        get_agent(agent_cls)
+        timings[agent_cls.__name__] = time.perf_counter() - start
+    if load_embedding:
+        from rag.embedding.qwen_embedding import get_shared_embedding
+        start = time.perf_counter()
+        with timed_setup('embedding'):
+            get_shared_embedding().model
+        timings['embedding'] = time.perf_counter() - start
+        if config.INTENT_CLASSIFIER_ENABLED:
+            # 本地意图分类的样例质心 (复用已加载的模型)
+            from agents.intent_classifier import get_intent_classifier
+            start = time.perf_counter()
+            with timed_setup('intent_centroids'):
+                get_intent_classifier().scores("预热")
+            timings['intent_centroids'] = time.perf_counter() - start
+    print(f"    [Registry] 预热完成: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return timings
+
+
+def reset() -> None:
+    """清空注册表 (配置变更或测试时使用)"""
+    global _graph
+    with _lock:
+        _agents.clear()
+        _graph = None
+
+
+def cached_agent(agent_cls: type) -> Optional[Any]:
+    """返回已构建的Agent实例，未构建时返回None"""
+    return _agents.get(agent_cls)
@@ -0,0 +1,116 @@
+"""
+会话上下文 (交互模式 / Web界面的追问)
+
+同一会话中上一轮的公司、代码和各维度分析结果作为 session_context 传入下一轮:
+- 追问 (如 "那它的估值呢") 由规划Agent对照上下文解析，不再调用LLM规划
+- 同一股票已有的分析结果直接复用，只执行缺少的分析节点；
+  全部已有时直接进入总结 (单一维度走轻量路径，几秒内返回)
+- 上下文超过 SESSION_CONTEXT_TTL 后失效 (行情和新闻需要刷新)；各维度的分析结果按各自的分析时间过期，
+  持续追问不会让早先的分析一直被复用
+"""
+import time
+from typing import Any, Dict, Optional
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from agents.dimensions import ANALYSIS_DIMENSIONS
+
+# Agent失败时返回的说明文字不作为可复用的分析结果
+_FAILURE_PREFIXES = ('无法进行',)
+_FAILURE_MARKER = '失败:'
+
+
+def _usable(text: Optional[str]) -> bool:
+    """分析结果是否可在后续追问中复用"""
+    if not text:
+        return False
+    return not text.startswith(_FAILURE_PREFIXES) and _FAILURE_MARKER not in text[:20]
+
+
+class AnalysisSession:
+    """
+    一个交互会话的上下文
+
+    Attributes:
+        context: 上一轮的股票和分析结果 {'company_name', 'stock_code', 'market', 'analyses'}，无上下文时为None
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = config.SESSION_CONTEXT_TTL if ttl is None else ttl
+        self.context: Optional[Dict[str, Any]] = None
+        self._updated_at = 0.0
+        self._analyzed_at: Dict[str, float] = {}   # 维度 -> 分析结果的生成时间
+
+    def active_context(self) -> Optional[Dict[str, Any]]:
+        """未过期的上下文 (只保留未过期的分析结果)"""
+        now = time.monotonic()
+        if not self.context or now - self._updated_at > self.ttl:
+            return None
+        analyses = {node: text for node, text in self.context['analyses'].items()
+                    if now - self._analyzed_at.get(node, 0.0) <= self.ttl}
+        return {**self.context, 'analyses': analyses}
+
+    def build_input(self, query: str) -> Dict[str, Any]:
+        """
+        构建本轮分析的初始状态
+
+        Args:
+            query: 用户查询
+
+        Returns:
+            图输入，包含 session_context
+        """
+        return {
+            'user_query': query,
+            'company_name': '',
+            'stock_code': '',
+            'market': '',
+            'fundamental_analysis': None,
+            'technical_analysis': None,
+            'valuation_analysis': None,
+            'news_analysis': None,
+            'final_report': None,
+            'error': None,
+            'session_context': self.active_context(),
+            'messages': [],
+        }
+
+    def update(self, result: Dict[str, Any]) -> None:
+        """
+        用本轮结果更新上下文
+
+        只有单只股票的分析会更新上下文；同一股票的分析结果合并，换股票时替换。
+        公司知识/通用问答和多股票对比不改变上下文。
+
+        Args:
+            result: 本轮的最终状态
+        """
+        code = result.get('stock_code')
+        if result.get('intent') != 'stock' or not code or len(result.get('stocks') or []) >= 2:
+            return
+        timed_out = set(result.get('timed_out_nodes') or [])
+        analyses = {
+            node: result[f"{node}_analysis"] for node in ANALYSIS_DIMENSIONS
+            if node not in timed_out and _usable(result.get(f"{node}_analysis"))
+        }
+        now = time.monotonic()
+        previous = self.active_context()
+        reused = previous['analyses'] if previous and previous['stock_code'] == code else {}
+        # 本轮复用的分析 (规划时从上下文填入，内容未变) 保留原来的生成时间，不因追问而延长有效期
+        self._analyzed_at = {
+            **{node: self._analyzed_at[node] for node in reused},
+            **{node: now for node, text in analyses.items() if reused.get(node) != text},
+        }
+        analyses = {**reused, **analyses}
+        self.context = {
+            'company_name': result.get('company_name', ''),
+            'stock_code': code,
+            'market': result.get('market', ''),
+            'analyses': analyses,
+        }
+        self._updated_at = now
+
+    def reset(self) -> None:
+        """开始新话题"""
+        self.context = None
+        self._analyzed_at = {}
@@ -1,35 +1,84 @@
 """
 LangGraph状态定义
+
+四个分析节点并行执行 (扇出-扇入)，节点只返回自己负责的字段，
+每个字段都声明了合并函数 (reducer)，同一步中多个节点写入同一字段时也能安全合并。
 """
 from typing import TypedDict, List, Optional, Annotated
 from langgraph.graph.message import add_messages
 
 
+def keep_latest(left, right):
+    """保留最新的非空值 (None 表示节点未更新该字段)"""
+    return left if right is None else right
+
+
+def merge_errors(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """合并多个节点的错误信息"""
+    if not left:
+        return right
+    if not right or right in left.split('; '):
+        return left
+    return f"{left}; {right}"
+
+
+def merge_stock_results(left: Optional[List[dict]], right: Optional[List[dict]]) -> List[dict]:
+    """按股票代码合并对比查询中各股票的分析结果 (同一股票保留最新结果)"""
+    merged = {item['stock_code']: item for item in left or []}
+    for item in right or []:
+        merged[item['stock_code']] = item
+    return list(merged.values())
+
+
+def merge_unique(left: Optional[List[str]], right: Optional[List[str]]) -> List[str]:
+    """合并列表并去重 (保持顺序)"""
+    merged = list(left or [])
+    for item in right or []:
+        if item not in merged:
+            merged.append(item)
+    return merged
+
+
 class StockAnalysisState(TypedDict):
     """股票分析状态定义"""
-    
+
     # 用户输入
-    user_query: str
-    
+    user_query: Annotated[str, keep_latest]
+
     # 意图识别结果
-    intent: str  # "stock" | "company" | "general"
-    
+    intent: Annotated[str, keep_latest]  # "stock" | "company" | "general"
+
     # 任务规划结果
-    company_name: str
-    stock_code: str
-    market: str  # A股-上海/A股-深圳/港股/美股
+    company_name: Annotated[str, keep_latest]
+    stock_code: Annotated[str, keep_latest]
+    market: Annotated[str, keep_latest]  # A股-上海/A股-深圳/港股/美股
+    dimensions: Annotated[List[str], keep_latest]  # 需要的分析维度，空列表表示完整分析 (见 agents/dimensions.py)
     
-    # 各Agent分析结果
-    fundamental_analysis: Optional[str]
-    technical_analysis: Optional[str]
-    valuation_analysis: Optional[str]
-    news_analysis: Optional[str]
+    # 对比查询: 多只股票 [{company_name, stock_code, market}] (少于两只时为空，按单只股票分析)
+    stocks: Annotated[List[dict], keep_latest]
+    # 对比查询中各股票子图的分析结果 (并行写入，按股票代码合并)
+    stock_results: Annotated[List[dict], merge_stock_results]
     
-    # 最终报告
-    final_report: Optional[str]
+    # 会话上下文: 上一轮的股票和可复用的分析结果 (追问时使用，见 graph/session.py)
+    session_context: Annotated[Optional[dict], keep_latest]
+
+    # 各Agent分析结果 (并行写入，各节点只写自己的字段)
+    fundamental_analysis: Annotated[Optional[str], keep_latest]
+    technical_analysis: Annotated[Optional[str], keep_latest]
+    valuation_analysis: Annotated[Optional[str], keep_latest]
+    news_analysis: Annotated[Optional[str], keep_latest]
+
+    # 已完成的节点 (用于进度展示)
+    completed_nodes: Annotated[List[str], merge_unique]
     
+    # 超过时间预算的分析节点 (总结时标注为缺失，见 graph/deadline.py)
+    timed_out_nodes: Annotated[List[str], merge_unique]
+
+    # 最终报告
+    final_report: Annotated[Optional[str], keep_latest]
+
     # 错误信息
-    error: Optional[str]
-    
+    error: Annotated[Optional[str], merge_errors]
+
     # 消息历史 (用于ReAct Agent)
     messages: Annotated[List, add_messages]
@@ -2,8 +2,10 @@
 LangGraph工作流定义
 实现三分支架构：股票分析 / 公司知识 / 通用问答
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END, START
+from langgraph.types import Send
 from .state import StockAnalysisState
 from agents import (
     PlannerAgent,
@@ -12,135 +14,192 @@ from agents import (
     ValuationAgent,
     NewsAgent,
     SummarizerAgent,
+    ComparisonAgent,
 )
 from agents.company_qa_agent import CompanyQAAgent
+from agents.dimensions import ANALYSIS_DIMENSIONS, requested_dimensions, runnable_dimensions, unsupported_dimensions
+from .registry import get_agent
+from .deadline import run_with_budget, arun_with_budget
 
 
-def create_planner_node():
-    """创建任务规划节点"""
-    _agent = None
+def _create_agent_node(agent_cls, node_name: str, budget_field: Optional[str] = None) -> RunnableLambda:
+    """
+    创建Agent节点 (同时支持同步和异步执行)
     
-    def planner_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = PlannerAgent()
-        return _agent.run(state)
+    同步执行 (invoke/stream) 调用 agent.run，
+    异步执行 (ainvoke/astream_events) 调用 agent.arun，LLM与工具均不阻塞事件循环。
+    Agent只返回自己负责的字段 (状态更新)，由状态的reducer合并。
+    
+    Args:
+        agent_cls: Agent类
+        node_name: 节点名称
+        budget_field: 分析节点负责的字段；指定时节点受运行截止时间的预算约束 (见 graph/deadline.py)
+    
+    Returns:
+        节点Runnable
+    """
+    def _get_agent():
+        # 进程级共享实例，首次执行时构建 (见 graph/registry.py)
+        return get_agent(agent_cls)
+    
+    def node(state: StockAnalysisState) -> Dict[str, Any]:
+        if budget_field:
+            update = run_with_budget(node_name, budget_field, _get_agent().run, state)
+        else:
+            update = _get_agent().run(state)
+        return {**update, 'completed_nodes': [node_name]}
+    
+    async def anode(state: StockAnalysisState) -> Dict[str, Any]:
+        if budget_field:
+            update = await arun_with_budget(node_name, budget_field, _get_agent().arun, state)
+        else:
+            update = await _get_agent().arun(state)
+        return {**update, 'completed_nodes': [node_name]}
     
-    return planner_node
+    return RunnableLambda(node, afunc=anode, name=f"{node_name}_node")
+
+
+def create_planner_node():
+    """创建任务规划节点"""
+    return _create_agent_node(PlannerAgent, "planner")
 
 
 def create_fundamental_node():
     """创建基本面分析节点"""
-    _agent = None
-    
-    def fundamental_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = FundamentalAgent()
-        return _agent.run(state)
-    
-    return fundamental_node
+    return _create_agent_node(FundamentalAgent, "fundamental", budget_field="fundamental_analysis")
 
 
 def create_technical_node():
     """创建技术分析节点"""
-    _agent = None
-    
-    def technical_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = TechnicalAgent()
-        return _agent.run(state)
-    
-    return technical_node
+    return _create_agent_node(TechnicalAgent, "technical", budget_field="technical_analysis")
 
 
 def create_valuation_node():
     """创建估值分析节点"""
-    _agent = None
-    
-    def valuation_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = ValuationAgent()
-        return _agent.run(state)
-    
-    return valuation_node
+    return _create_agent_node(ValuationAgent, "valuation", budget_field="valuation_analysis")
 
 
 def create_news_node():
     """创建新闻分析节点"""
-    _agent = None
-    
-    def news_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = NewsAgent()
-        return _agent.run(state)
-    
-    return news_node
+    return _create_agent_node(NewsAgent, "news", budget_field="news_analysis")
 
 
 def create_summarizer_node():
     """创建总结节点"""
-    _agent = None
+    return _create_agent_node(SummarizerAgent, "summarizer")
+
+
+def create_comparison_node():
+    """创建对比分析节点"""
+    return _create_agent_node(ComparisonAgent, "comparison")
+
+
+def create_stock_subgraph():
+    """
+    创建单只股票的分析子图 (对比查询中每只股票执行一份)
+    
+    与主图使用相同的分析节点和进程级共享Agent，按 dimensions 扇出到需要的节点。
+    检查点粒度为主图中的 stock_analysis 任务 (子图本身不保存检查点)。
+    """
+    workflow = StateGraph(StockAnalysisState)
+    workflow.add_node("fundamental", create_fundamental_node())
+    workflow.add_node("technical", create_technical_node())
+    workflow.add_node("valuation", create_valuation_node())
+    workflow.add_node("news", create_news_node())
+    # 市场不支持的维度不执行 (都不支持时直接结束，报告中注明)
+    workflow.add_conditional_edges(START, lambda state: runnable_dimensions(state) or END, ANALYSIS_NODES + [END])
+    for node in ANALYSIS_NODES:
+        workflow.add_edge(node, END)
+    return workflow.compile(checkpointer=False)
+
+
+def create_stock_analysis_node(subgraph) -> RunnableLambda:
+    """
+    创建对比查询的单股分析节点 (由 Send 为每只股票各启动一次，同一步内并发执行)
     
-    def summarizer_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = SummarizerAgent()
-        return _agent.run(state)
+    Args:
+        subgraph: create_stock_subgraph() 编译的子图
     
-    return summarizer_node
+    Returns:
+        节点Runnable，输出写入 stock_results (按股票代码合并)
+    """
+    def _input(task: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'user_query': task.get('user_query', ''),
+            'company_name': task.get('company_name', ''),
+            'stock_code': task['stock_code'],
+            'market': task.get('market', ''),
+            'dimensions': task.get('dimensions') or [],
+            'messages': [],
+        }
+    
+    def _update(task: Dict[str, Any], output: Dict[str, Any]) -> Dict[str, Any]:
+        code = task['stock_code']
+        timed_out = output.get('timed_out_nodes') or []
+        result = {
+            'company_name': task.get('company_name', ''),
+            'stock_code': code,
+            'market': task.get('market', ''),
+            'timed_out_nodes': timed_out,
+        }
+        for node in requested_dimensions(task):
+            field = f"{node}_analysis"
+            result[field] = output.get(field)
+        return {
+            'stock_results': [result],
+            'timed_out_nodes': [f"{code}:{node}" for node in timed_out],
+            'completed_nodes': ['stock_analysis'],
+        }
+    
+    def node(task: Dict[str, Any], config) -> Dict[str, Any]:
+        print(f"    [Compare] 分析 {task.get('company_name') or task['stock_code']} ({task['stock_code']})")
+        return _update(task, subgraph.invoke(_input(task), config=config))
+    
+    async def anode(task: Dict[str, Any], config) -> Dict[str, Any]:
+        print(f"    [Compare] 分析 {task.get('company_name') or task['stock_code']} ({task['stock_code']})")
+        return _update(task, await subgraph.ainvoke(_input(task), config=config))
+    
+    return RunnableLambda(node, afunc=anode, name="stock_analysis_node")
 
 
 def create_company_qa_node():
     """创建公司知识问答节点"""
-    _agent = None
-    
-    def company_qa_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _agent
-        if _agent is None:
-            _agent = CompanyQAAgent()
-        return _agent.run(state)
-    
-    return company_qa_node
+    return _create_agent_node(CompanyQAAgent, "company_qa")
 
 
 def create_general_qa_node():
     """创建通用问答节点"""
-    from langchain_openai import ChatOpenAI
     from langchain_core.messages import HumanMessage
     import sys
     import os
     sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-    from config import config
+    from llm.factory import get_chat_model
+    
+    def _get_llm():
+        return get_chat_model("general_qa")
     
-    _llm = None
+    def _format_answer(query: str, response) -> Dict[str, Any]:
+        answer = response.content if hasattr(response, 'content') else str(response)
+        return {
+            'final_report': f"## 问答\n\n**问题**: {query}\n\n**回答**: {answer}",
+            'completed_nodes': ['general_qa'],
+        }
     
     def general_qa_node(state: StockAnalysisState) -> Dict[str, Any]:
-        nonlocal _llm
-        if _llm is None:
-            _llm = ChatOpenAI(
-                api_key=config.OPENAI_API_KEY,
-                base_url=config.OPENAI_BASE_URL,
-                model=config.OPENAI_MODEL,
-                temperature=0
-            )
-        
         query = state.get('user_query', '')
         print(f"    [GeneralQA] 直接 LLM 回答: {query}")
         
-        messages = [HumanMessage(content=query)]
-        response = _llm.invoke(messages)
-        answer = response.content if hasattr(response, 'content') else str(response)
+        response = _get_llm().invoke([HumanMessage(content=query)])
+        return _format_answer(query, response)
+    
+    async def ageneral_qa_node(state: StockAnalysisState) -> Dict[str, Any]:
+        query = state.get('user_query', '')
+        print(f"    [GeneralQA] 直接 LLM 回答: {query}")
         
-        return {
-            **state,
-            'final_report': f"## 问答\n\n**问题**: {query}\n\n**回答**: {answer}"
-        }
+        response = await _get_llm().ainvoke([HumanMessage(content=query)])
+        return _format_answer(query, response)
     
-    return general_qa_node
+    return RunnableLambda(general_qa_node, afunc=ageneral_qa_node, name="general_qa_node")
 
 
 def route_by_intent(state: StockAnalysisState) -> str:
@@ -157,6 +216,50 @@ def route_by_intent(state: StockAnalysisState) -> str:
     return intent
 
 
+# 股票分析分支中并行执行的分析节点
+ANALYSIS_NODES = list(ANALYSIS_DIMENSIONS)
+
+
+def route_after_planner(state: StockAnalysisState) -> Union[str, List[str]]:
+    """
+    规划后的三分支路由
+    
+    Returns:
+        股票分析返回规划的分析维度中尚无结果、且股票所属市场支持的节点 (并行扇出，未指定维度时为全部节点)，
+        追问所需的分析都已复用或都不被支持时直接进入总结；
+        对比查询为每只股票发送一个 stock_analysis 任务 (并行)；
+        其他意图返回对应的单个节点
+    """
+    intent = state.get('intent', 'stock')
+    
+    if intent == 'company':
+        return 'company_qa'
+    elif intent == 'general':
+        return 'general_qa'
+    # 股票分析：检查是否有股票代码
+    stocks = state.get('stocks') or []
+    if len(stocks) >= 2:
+        print(f"    [Router] 对比分析: {len(stocks)} 只股票并行")
+        task = {
+            'user_query': state.get('user_query', ''),
+            'dimensions': state.get('dimensions') or [],
+        }
+        return [Send('stock_analysis', {**task, **stock}) for stock in stocks]
+    if state.get('stock_code'):
+        unsupported = unsupported_dimensions(state)
+        if unsupported:
+            print(f"    [Router] {state.get('market') or state['stock_code']} 不支持: {', '.join(unsupported)}，跳过")
+        # 追问时复用的分析结果已由规划节点写入状态，只执行缺少的节点
+        nodes = [node for node in runnable_dimensions(state) if not state.get(f"{node}_analysis")]
+        if not nodes:
+            print(f"    [Router] {'没有可执行的分析' if unsupported else '复用会话中的分析结果'}，直接总结")
+            return 'summarizer'
+        if len(nodes) < len(ANALYSIS_NODES):
+            print(f"    [Router] 只执行: {', '.join(nodes)}")
+        return nodes
+    return END
+
+
 def should_continue_stock(state: StockAnalysisState) -> str:
     """判断股票分析是否继续"""
     if state.get('stock_code'):
@@ -246,18 +349,27 @@ def create_stock_analysis_graph_v2():
     return workflow.compile()
 
 
-def create_multi_branch_graph():
+def create_multi_branch_graph(checkpointer=None):
     """
     创建三分支工作流图 (RAG版本)
     
     架构：
     planner（意图识别）
-        ├── stock: [fundamental, technical, valuation, news] -> summarizer
+        ├── stock: [fundamental | technical | valuation | news] 中规划的维度并行 -> summarizer
+        ├── stock (对比): 每只股票一个 stock_analysis 子图并行 -> comparison
         ├── company: company_qa
         └── general: general_qa
-    """
-    from langgraph.constants import Send
     
+    四个分析节点在同一步中并发执行 (扇出)，全部完成后进入 summarizer (扇入)，
+    单份报告的耗时约为 max(各分析) 而不是 sum(各分析)。
+    规划只要求部分维度时 (如只问K线) 只扇出到对应节点，单一维度由总结节点的轻量路径直接回答。
+    对比查询 (如 "比较茅台和五粮液") 的各股票子图在同一步中并发执行，共享Agent和数据缓存，
+    总耗时接近单只股票的分析耗时。
+    
+    Args:
+        checkpointer: 检查点存储 (可选)，传入后每次运行需指定 thread_id，
+            中断或失败的运行可从最近的检查点恢复 (见 graph/checkpoint.py)
+    """
     workflow = StateGraph(StockAnalysisState)
     
     # 添加所有节点
@@ -269,44 +381,28 @@ def create_multi_branch_graph():
     workflow.add_node("summarizer", create_summarizer_node())
     workflow.add_node("company_qa", create_company_qa_node())
     workflow.add_node("general_qa", create_general_qa_node())
+    workflow.add_node("stock_analysis", create_stock_analysis_node(create_stock_subgraph()))
+    workflow.add_node("comparison", create_comparison_node())
     
     workflow.set_entry_point("planner")
     
-    # 三分支路由
-    def route_after_planner(state: StockAnalysisState):
-        intent = state.get('intent', 'stock')
-        
-        if intent == 'company':
-            return 'company'
-        elif intent == 'general':
-            return 'general'
-        else:
-            # 股票分析：检查是否有股票代码
-            if state.get('stock_code'):
-                return 'stock'
-            else:
-                return 'end'
-    
     workflow.add_conditional_edges(
         "planner",
         route_after_planner,
-        {
-            "stock": "fundamental",
-            "company": "company_qa",
-            "general": "general_qa",
-            "end": END
-        }
+        ANALYSIS_NODES + ["stock_analysis", "summarizer", "company_qa", "general_qa", END]
     )
     
-    # 股票分析流程
-    workflow.add_edge("fundamental", "technical")
-    workflow.add_edge("technical", "valuation")
-    workflow.add_edge("valuation", "news")
-    workflow.add_edge("news", "summarizer")
+    # 对比查询：各股票子图扇入到对比节点
+    workflow.add_edge("stock_analysis", "comparison")
+    workflow.add_edge("comparison", END)
+    
+    # 股票分析流程：各分析节点扇入到总结节点
+    for node in ANALYSIS_NODES:
+        workflow.add_edge(node, "summarizer")
     workflow.add_edge("summarizer", END)
     
     # 公司知识和通用问答直接结束
     workflow.add_edge("company_qa", END)
     workflow.add_edge("general_qa", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
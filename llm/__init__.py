@@ -0,0 +1,37 @@
+"""
+LLM模块
+按调用点路由模型档位 (fast/main)，所有调用经共享网关限流与重试
+"""
+from .factory import (
+    CALL_SITE_TIERS,
+    MODEL_PRICING,
+    resolve_model,
+    estimate_cost,
+    get_chat_model,
+    enable_llm_cache,
+)
+from .gateway import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    PRIORITY_BATCH,
+    LLMDeadlineExceeded,
+    llm_priority,
+    run_deadline,
+    get_gateway,
+)
+
+__all__ = [
+    "CALL_SITE_TIERS",
+    "MODEL_PRICING",
+    "resolve_model",
+    "estimate_cost",
+    "get_chat_model",
+    "enable_llm_cache",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_NORMAL",
+    "PRIORITY_BATCH",
+    "LLMDeadlineExceeded",
+    "llm_priority",
+    "run_deadline",
+    "get_gateway",
+]
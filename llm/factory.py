@@ -0,0 +1,236 @@
+"""
+LLM模型工厂
+按调用点 (call site) 选择模型档位:
+- fast: 意图分类、行业/公司名提取、新闻情感评分等简单任务，使用小而快的模型
+- main: 基本面/技术面/估值分析、综合报告、问答，使用主模型
+
+路由规则 (优先级从高到低):
+1. 环境变量 MODEL_ROUTES 中的调用点覆盖，如 "intent=fast,summarizer=gpt-4o"
+   (值为 fast/main 表示档位，其他值视为具体模型名)
+2. CALL_SITE_TIERS 中的默认档位
+3. 未登记的调用点使用 main
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+from .gateway import GatedChatOpenAI
+
+
+# 调用点默认档位
+CALL_SITE_TIERS: Dict[str, str] = {
+    # 分类与提取
+    'intent': 'fast',               # 规划Agent: 意图分类
+    'planner': 'fast',              # 规划Agent: 股票代码解析与执行计划
+    'industry_extraction': 'fast',  # 总结Agent: 从报告中提取行业
+    'company_extraction': 'fast',   # 股票搜索: 从查询中提取公司名
+    'news_sentiment': 'fast',       # 新闻: 情感/风险评分
+    'brief_summary': 'fast',        # 总结Agent: 单一维度问题的简短回答
+    # 分析与总结
+    'fundamental': 'main',
+    'technical': 'main',
+    'valuation': 'main',
+    'news': 'main',
+    'summarizer': 'main',
+    'comparison': 'main',
+    'company_qa': 'main',
+    'general_qa': 'main',
+}
+
+# 模型价格 (美元 / 百万token): (输入, 输出)，用于估算单次运行成本
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4.1': (2.0, 8.0),
+    'gpt-4.1-mini': (0.4, 1.6),
+    'gpt-4.1-nano': (0.1, 0.4),
+    'gpt-4': (30.0, 60.0),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+
+
+def _parse_routes(spec: str) -> Dict[str, str]:
+    """解析 "site=value,site=value" 格式的路由覆盖"""
+    routes = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        site, value = item.split('=', 1)
+        if site.strip() and value.strip():
+            routes[site.strip()] = value.strip()
+    return routes
+
+
+def resolve_model(call_site: str) -> Tuple[str, str]:
+    """
+    解析调用点使用的模型
+
+    Args:
+        call_site: 调用点名称，如 intent、summarizer
+
+    Returns:
+        (档位, 模型名) 元组；档位为 fast/main，直接指定模型名时为 custom
+    """
+    route = _parse_routes(config.MODEL_ROUTES).get(call_site) or CALL_SITE_TIERS.get(call_site, 'main')
+    if route == 'fast':
+        return 'fast', config.OPENAI_FAST_MODEL or config.OPENAI_MODEL
+    if route == 'main':
+        return 'main', config.OPENAI_MODEL
+    return 'custom', route
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """
+    按价格表估算调用成本
+
+    Args:
+        model: 模型名 (支持带日期后缀，如 gpt-4o-mini-2024-07-18)
+        prompt_tokens: 输入token数
+        completion_tokens: 输出token数
+
+    Returns:
+        成本 (美元)，价格表中没有该模型时返回None
+    """
+    # 优先匹配最长的前缀，避免 gpt-4o-mini 被 gpt-4o 命中
+    for name in sorted(MODEL_PRICING, key=len, reverse=True):
+        if model == name or model.startswith(name + '-'):
+            input_price, output_price = MODEL_PRICING[name]
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return None
+
+
+class ModelRouteCallback(BaseCallbackHandler):
+    """记录每次LLM调用实际选择的路由 (调用点/档位/模型)"""
+
+    def __init__(self, call_site: str, tier: str, model: str):
+        self.labels = {'call_site': call_site, 'tier': tier, 'model': model}
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        registry.inc('stock_agent_model_route_total', self.labels, help_text='按调用点统计的模型路由次数')
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        registry.inc('stock_agent_model_route_total', self.labels, help_text='按调用点统计的模型路由次数')
+
+
+_shared_models: Dict[Tuple[str, str, bool, str, bool], ChatOpenAI] = {}
+_shared_lock = threading.Lock()
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    按事件循环隔离连接池的异步传输层
+
+    httpx 的连接绑定在创建它的事件循环上。Streamlit 每次分析都会 asyncio.run 一个新循环，
+    共享的模型实例若复用旧循环的连接会报 "Event loop is closed"，因此每个循环使用独立连接池。
+    """
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport()
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport().aclose()
+
+
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_http_client() -> httpx.AsyncClient:
+    """所有模型共享的异步HTTP客户端 (连接池按事件循环隔离)"""
+    global _async_http_client
+    with _shared_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(transport=_LoopLocalTransport(), timeout=None)
+        return _async_http_client
+
+
+def get_chat_model(
+    call_site: str,
+    callbacks: Optional[List[BaseCallbackHandler]] = None,
+    streaming: bool = False,
+    model: Optional[str] = None,
+    **kwargs: Any,
+) -> ChatOpenAI:
+    """
+    获取调用点对应的Chat模型
+
+    不带回调和额外参数时返回进程内共享实例 (复用HTTP连接池)；
+    否则每次创建新实例。启用 LLM_GATEWAY_ENABLED 时返回经共享网关调度的模型。
+
+    Args:
+        call_site: 调用点名称
+        callbacks: 额外回调 (如Agent进度回调)
+        streaming: 是否流式输出 (用于统计首token时间)
+        model: 显式指定模型名，优先于路由配置
+        **kwargs: 传给 ChatOpenAI 的其他参数
+
+    Returns:
+        ChatOpenAI 实例，metadata 中带有 call_site 和 model_tier
+    """
+    tier, model_name = ('custom', model) if model else resolve_model(call_site)
+    shared_key = (call_site, model_name, streaming, config.OPENAI_BASE_URL, config.LLM_GATEWAY_ENABLED)
+    if callbacks is None and not kwargs:
+        with _shared_lock:
+            shared = _shared_models.get(shared_key)
+            if shared is not None:
+                return shared
+
+    params = {
+        'api_key': config.OPENAI_API_KEY,
+        'base_url': config.OPENAI_BASE_URL,
+        'model': model_name,
+        'temperature': 0,
+        'request_timeout': 60,
+        'http_async_client': _get_async_http_client(),
+    }
+    if streaming:
+        params.update(streaming=True, stream_usage=True)
+    if config.LLM_GATEWAY_ENABLED:
+        # 重试由网关统一负责 (遵守 Retry-After 并联动并发上限)，底层客户端不再重试
+        params['max_retries'] = 0
+    params.update(kwargs)
+    model_cls = GatedChatOpenAI if config.LLM_GATEWAY_ENABLED else ChatOpenAI
+    llm = model_cls(
+        **params,
+        callbacks=[ModelRouteCallback(call_site, tier, model_name)] + list(callbacks or []),
+        metadata={'call_site': call_site, 'model_tier': tier},
+    )
+
+    if callbacks is None and not kwargs:
+        with _shared_lock:
+            _shared_models[shared_key] = llm
+    return llm
+
+
+def enable_llm_cache(maxsize: int = 2000) -> None:
+    """
+    开启进程内LLM结果缓存 (temperature=0，相同模型和消息直接返回缓存结果)
+
+    批量分析时多个运行共享，例如相同新闻的情感评分、相同指数/宏观数据的解读
+
+    Args:
+        maxsize: 最多缓存的结果数
+    """
+    from langchain_core.caches import InMemoryCache
+    from langchain_core.globals import get_llm_cache, set_llm_cache
+    if get_llm_cache() is None:
+        set_llm_cache(InMemoryCache(maxsize=maxsize))
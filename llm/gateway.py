@@ -0,0 +1,553 @@
+"""
+LLM调用网关
+所有Agent/辅助调用共享同一个网关，统一处理供应商限流:
+
+- AIMD自适应并发: 成功时并发上限缓慢增加 (+1/上限)，遇到429/超时/过载时减半
+  (同一拥塞窗口内只减一次)，使吞吐稳定在供应商的实际容量附近
+- Retry-After: 429响应带 Retry-After 时，整个网关暂停放行到指定时间，避免重试风暴
+- 抖动退避重试: 无 Retry-After 时使用 full jitter 指数退避
+- 运行截止时间: 通过 run_deadline() 设置，排队、退避和单次请求超时都不会超过截止时间
+- 优先级排队: 通过 llm_priority() 设置，并发已满时优先放行数值小的请求
+
+同步调用 (线程) 和异步调用 (任意事件循环) 共享同一个并发上限和等待队列。
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+import openai
+from langchain_openai import ChatOpenAI
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+
+
+# 优先级 (数值越小越优先)
+PRIORITY_INTERACTIVE = 0   # 界面/交互式请求
+PRIORITY_NORMAL = 5        # CLI单次分析
+PRIORITY_BATCH = 10        # 批量分析
+
+_priority: ContextVar[int] = ContextVar('llm_priority', default=PRIORITY_NORMAL)
+_deadline: ContextVar[Optional[float]] = ContextVar('llm_deadline', default=None)
+# 当前调用已持有网关名额 (避免 _generate 内部再调用 _stream 时重复申请)
+_slot_held: ContextVar[bool] = ContextVar('llm_slot_held', default=False)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """运行截止时间前无法完成LLM调用"""
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """
+    设置作用域内LLM调用的排队优先级
+
+    Args:
+        priority: 优先级，数值越小越优先 (见 PRIORITY_*)
+    """
+    token = _priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def run_deadline(seconds: Optional[float]):
+    """
+    设置作用域内LLM调用的截止时间，嵌套时取更早的截止时间
+
+    Args:
+        seconds: 距现在的秒数，None 或 <=0 表示不限制
+    """
+    if not seconds or seconds <= 0:
+        yield None
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(deadline, outer) if outer is not None else deadline)
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """当前运行距截止时间的剩余秒数，未设置截止时间时返回None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """从错误响应头中解析 Retry-After (支持 retry-after-ms、秒数和HTTP日期)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify_error(error: BaseException) -> Tuple[Optional[str], Optional[float]]:
+    """
+    判断错误是否可重试
+
+    Returns:
+        (原因, Retry-After秒数)；原因为 rate_limited/timeout/overloaded/connection，
+        不可重试时为None
+    """
+    if isinstance(error, openai.RateLimitError):
+        return 'rate_limited', _retry_after_seconds(error)
+    if isinstance(error, openai.APITimeoutError):
+        return 'timeout', None
+    if isinstance(error, openai.APIConnectionError):
+        return 'connection', None
+    if isinstance(error, openai.APIStatusError) and error.status_code in (500, 502, 503, 504, 529):
+        return 'overloaded', _retry_after_seconds(error)
+    return None, None
+
+
+# 这些原因说明供应商已过载，需要降低并发
+CONGESTION_REASONS = ('rate_limited', 'timeout', 'overloaded')
+
+
+class _Waiter:
+    """等待并发名额的请求 (线程用Event，协程用所属事件循环的Future)"""
+
+    __slots__ = ('event', 'loop', 'future', 'granted', 'cancelled')
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self) -> None:
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve_future, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class AdaptiveLimiter:
+    """AIMD自适应并发限制器 (线程安全，支持跨事件循环)"""
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, name: str = "default"):
+        """
+        初始化限制器
+
+        Args:
+            initial: 初始并发上限
+            min_limit: 并发上限下界
+            max_limit: 并发上限上界
+            decrease_factor: 拥塞时的乘性减小系数
+            name: 名称 (指标标签)
+        """
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.name = name
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._resume_at = 0.0
+        self._last_decrease = 0.0
+        self._latency_ewma = 1.0
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._heap if not waiter.cancelled)
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def _grant_locked(self) -> List[_Waiter]:
+        """在锁内按优先级放行等待者，返回需要唤醒的等待者"""
+        now = time.monotonic()
+        if now < self._resume_at:
+            # Retry-After 暂停期内不放行，到期后由定时器重新调度
+            if self._timer is None:
+                self._timer = threading.Timer(self._resume_at - now, self._on_resume)
+                self._timer.daemon = True
+                self._timer.start()
+            return []
+        woken = []
+        while self._heap and self.in_flight < self._capacity():
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+            woken.append(waiter)
+        return woken
+
+    def _on_resume(self) -> None:
+        with self._lock:
+            self._timer = None
+            woken = self._grant_locked()
+        for waiter in woken:
+            waiter.wake()
+
+    def _enqueue(self, waiter: _Waiter, priority: int) -> bool:
+        """申请名额，立即获得时返回True，否则加入等待队列"""
+        with self._lock:
+            if not self._heap and self.in_flight < self._capacity() and time.monotonic() >= self._resume_at:
+                self.in_flight += 1
+                return True
+            heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+            woken = self._grant_locked()
+        for other in woken:
+            other.wake()
+        return False
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """放弃等待 (超时/取消)；若名额已分配则归还"""
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                return
+        self.release(None)
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> None:
+        """
+        同步申请一个并发名额
+
+        Args:
+            priority: 优先级
+            timeout: 最长等待秒数，None表示一直等待
+
+        Raises:
+            LLMDeadlineExceeded: 等待超时
+        """
+        waiter = _Waiter()
+        if self._enqueue(waiter, priority):
+            return
+        if not waiter.event.wait(timeout):
+            self._abandon(waiter)
+            raise LLMDeadlineExceeded("等待LLM并发名额超时")
+
+    async def aacquire(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> None:
+        """异步申请一个并发名额 (参数同 acquire)"""
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._enqueue(waiter, priority):
+            return
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise LLMDeadlineExceeded("等待LLM并发名额超时") from None
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def release(self, outcome: Optional[str], latency: Optional[float] = None,
+                retry_after: Optional[float] = None) -> None:
+        """
+        归还名额并根据结果调整并发上限
+
+        Args:
+            outcome: ok 表示成功 (加性增加)；CONGESTION_REASONS 中的原因触发乘性减小；
+                     其他值或None只归还名额
+            latency: 成功调用的耗时，用于估算拥塞窗口
+            retry_after: 供应商要求的等待秒数
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if outcome == 'ok':
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                if latency is not None:
+                    self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+            elif outcome in CONGESTION_REASONS:
+                # 同一拥塞窗口 (约一次调用耗时) 内的多个失败只减一次
+                if now - self._last_decrease >= max(0.5, self._latency_ewma):
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                if retry_after:
+                    self._resume_at = max(self._resume_at, now + retry_after)
+            woken = self._grant_locked()
+            limit, in_flight = self.limit, self.in_flight
+        for waiter in woken:
+            waiter.wake()
+        registry.set_gauge('stock_agent_llm_concurrency_limit', limit, {'gateway': self.name},
+                           help_text='LLM网关当前自适应并发上限')
+        registry.set_gauge('stock_agent_llm_in_flight', in_flight, {'gateway': self.name},
+                           help_text='LLM网关当前在途请求数')
+
+
+class RetryPolicy:
+    """抖动指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次失败后的等待时间
+
+        有 Retry-After 时网关已整体暂停到指定时间，这里只加一个小抖动错开重试；
+        否则使用 full jitter: uniform(0, min(max_delay, base_delay * 2^attempt))
+        """
+        if retry_after:
+            return random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class LLMGateway:
+    """LLM调用网关: 并发控制 + 重试 + 截止时间"""
+
+    def __init__(self, limiter: AdaptiveLimiter, policy: RetryPolicy):
+        self.limiter = limiter
+        self.policy = policy
+
+    @staticmethod
+    def _wait_budget() -> Optional[float]:
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise LLMDeadlineExceeded("已超过运行截止时间")
+        return remaining
+
+    def _record_wait(self, started: float) -> None:
+        registry.observe('stock_agent_llm_queue_wait_seconds', time.monotonic() - started,
+                         {'gateway': self.limiter.name}, help_text='LLM请求在网关排队的时间')
+
+    def _backoff(self, error: BaseException, reason: Optional[str], retry_after: Optional[float],
+                 attempt: int) -> float:
+        """判断是否继续重试，返回退避时间；不可重试时重新抛出原错误"""
+        if reason is None or attempt + 1 >= self.policy.max_attempts:
+            raise error
+        delay = self.policy.delay(attempt, retry_after)
+        remaining = remaining_time()
+        if remaining is not None and delay + (retry_after or 0) >= remaining:
+            raise LLMDeadlineExceeded(f"重试将超过运行截止时间 ({reason})") from error
+        registry.inc('stock_agent_llm_retries_total', {'gateway': self.limiter.name, 'reason': reason},
+                     help_text='LLM网关重试次数')
+        print(f"    [LLMGateway] {reason}，{delay + (retry_after or 0):.1f}s 后重试 "
+              f"(第{attempt + 1}次, 并发上限 {self.limiter.limit:.1f})", flush=True)
+        return delay
+
+    def call(self, func: Callable[[Optional[float]], Any]) -> Any:
+        """
+        同步执行一次LLM调用 (带排队和重试)
+
+        Args:
+            func: 实际调用，参数为本次请求的超时秒数 (受截止时间约束，None表示不限)
+
+        Returns:
+            func 的返回值
+        """
+        priority = _priority.get()
+        for attempt in itertools.count():
+            started = time.monotonic()
+            self.limiter.acquire(priority, self._wait_budget())
+            self._record_wait(started)
+            started = time.monotonic()
+            try:
+                result = func(self._wait_budget())
+            except Exception as error:
+                reason, retry_after = classify_error(error)
+                self.limiter.release(reason, retry_after=retry_after)
+                time.sleep(self._backoff(error, reason, retry_after, attempt))
+                continue
+            self.limiter.release('ok', time.monotonic() - started)
+            return result
+
+    async def acall(self, func: Callable[[Optional[float]], Any]) -> Any:
+        """异步版本的 call，func 返回可等待对象"""
+        priority = _priority.get()
+        for attempt in itertools.count():
+            started = time.monotonic()
+            await self.limiter.aacquire(priority, self._wait_budget())
+            self._record_wait(started)
+            started = time.monotonic()
+            try:
+                result = await func(self._wait_budget())
+            except asyncio.CancelledError:
+                self.limiter.release(None)
+                raise
+            except Exception as error:
+                reason, retry_after = classify_error(error)
+                self.limiter.release(reason, retry_after=retry_after)
+                await asyncio.sleep(self._backoff(error, reason, retry_after, attempt))
+                continue
+            self.limiter.release('ok', time.monotonic() - started)
+            return result
+
+    def stream(self, factory: Callable[[Optional[float]], Iterator[Any]]) -> Iterator[Any]:
+        """
+        同步流式调用: 名额持有到流结束；只在收到第一个分片前失败时重试
+        """
+        priority = _priority.get()
+        for attempt in itertools.count():
+            started = time.monotonic()
+            self.limiter.acquire(priority, self._wait_budget())
+            self._record_wait(started)
+            started = time.monotonic()
+            outcome, retry_after, emitted = None, None, False
+            try:
+                for chunk in factory(self._wait_budget()):
+                    emitted = True
+                    yield chunk
+                outcome = 'ok'
+            except Exception as error:
+                reason, retry_after = classify_error(error)
+                outcome = reason
+                if emitted:
+                    raise
+                delay = self._backoff(error, reason, retry_after, attempt)
+            finally:
+                self.limiter.release(outcome, time.monotonic() - started, retry_after)
+            if outcome == 'ok':
+                return
+            time.sleep(delay)
+
+    async def astream(self, factory: Callable[[Optional[float]], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """异步版本的 stream"""
+        priority = _priority.get()
+        for attempt in itertools.count():
+            started = time.monotonic()
+            await self.limiter.aacquire(priority, self._wait_budget())
+            self._record_wait(started)
+            started = time.monotonic()
+            outcome, retry_after, emitted = None, None, False
+            try:
+                async for chunk in factory(self._wait_budget()):
+                    emitted = True
+                    yield chunk
+                outcome = 'ok'
+            except Exception as error:
+                reason, retry_after = classify_error(error)
+                outcome = reason
+                if emitted:
+                    raise
+                delay = self._backoff(error, reason, retry_after, attempt)
+            finally:
+                self.limiter.release(outcome, time.monotonic() - started, retry_after)
+            if outcome == 'ok':
+                return
+            await asyncio.sleep(delay)
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(base_url: Optional[str] = None) -> LLMGateway:
+    """
+    获取供应商 (按 base_url 区分) 的共享网关
+
+    Args:
+        base_url: API地址，默认为 config.OPENAI_BASE_URL
+
+    Returns:
+        LLMGateway 实例
+    """
+    base_url = base_url or config.OPENAI_BASE_URL
+    with _gateways_lock:
+        gateway = _gateways.get(base_url)
+        if gateway is None:
+            limiter = AdaptiveLimiter(
+                initial=config.LLM_INITIAL_CONCURRENCY,
+                min_limit=1,
+                max_limit=config.LLM_MAX_CONCURRENCY,
+                name=base_url,
+            )
+            policy = RetryPolicy(
+                max_attempts=config.LLM_MAX_RETRIES + 1,
+                base_delay=config.LLM_RETRY_BASE_DELAY,
+                max_delay=config.LLM_RETRY_MAX_DELAY,
+            )
+            gateway = _gateways[base_url] = LLMGateway(limiter, policy)
+        return gateway
+
+
+class GatedChatOpenAI(ChatOpenAI):
+    """经过共享网关调度的 ChatOpenAI (底层客户端不再自行重试)"""
+
+    @property
+    def gateway(self) -> LLMGateway:
+        return get_gateway(self.openai_api_base)
+
+    def _request_kwargs(self, kwargs: dict, timeout: Optional[float]) -> dict:
+        """按剩余时间收紧单次请求超时"""
+        if timeout is None:
+            return kwargs
+        request_timeout = self.request_timeout if isinstance(self.request_timeout, (int, float)) else None
+        return {**kwargs, 'timeout': min(timeout, request_timeout) if request_timeout else timeout}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _slot_held.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        def attempt(timeout):
+            token = _slot_held.set(True)
+            try:
+                return super(GatedChatOpenAI, self)._generate(
+                    messages, stop=stop, run_manager=run_manager, **self._request_kwargs(kwargs, timeout))
+            finally:
+                _slot_held.reset(token)
+
+        return self.gateway.call(attempt)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _slot_held.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        async def attempt(timeout):
+            token = _slot_held.set(True)
+            try:
+                return await super(GatedChatOpenAI, self)._agenerate(
+                    messages, stop=stop, run_manager=run_manager, **self._request_kwargs(kwargs, timeout))
+            finally:
+                _slot_held.reset(token)
+
+        return await self.gateway.acall(attempt)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()
+        if _slot_held.get():
+            yield from parent._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        yield from self.gateway.stream(lambda timeout: parent._stream(
+            messages, stop=stop, run_manager=run_manager, **self._request_kwargs(kwargs, timeout)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()
+        if _slot_held.get():
+            async for chunk in parent._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        async for chunk in self.gateway.astream(lambda timeout: parent._astream(
+                messages, stop=stop, run_manager=run_manager, **self._request_kwargs(kwargs, timeout))):
+            yield chunk
@@ -3,13 +3,14 @@
 """
 import sys
 import os
+import asyncio
 from pathlib import Path
 from datetime import datetime
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from typing import Optional
+from typing import List, Optional
 import typer
 from rich.console import Console
 from rich.panel import Panel
@@ -17,7 +18,16 @@ from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.markdown import Markdown
 
 from config import config
-from graph.workflow import create_multi_branch_graph
+from graph.registry import get_graph
+from graph.checkpoint import run_config, resume_point
+from graph.deadline import parse_duration
+from graph.batch import BatchRun, load_items, run_batch
+from graph.session import AnalysisSession
+from tools.data_cache import data_cache
+from tools.http_client import get_response_cache
+from tools.news_store import get_news_store
+from monitoring import registry, new_run_id, run_scope
+from llm import run_deadline, enable_llm_cache
 
 # 创建CLI应用
 app = typer.Typer(
@@ -47,6 +57,11 @@ def main(ctx: typer.Context):
         console.print("  python main.py analyze \"五粮液怎么样\" -o report.md -v\n")
         console.print("  [green]# 交互模式[/green]")
         console.print("  python main.py interactive\n")
+        console.print("  [green]# 批量分析 (自选股 / 查询文件 / 指数成分股)[/green]")
+        console.print("  python main.py batch sh.600519 sz.000858")
+        console.print("  python main.py batch --index sz50 --limit 10\n")
+        console.print("  [green]# 恢复中断或失败的分析[/green]")
+        console.print("  python main.py resume <run_id>\n")
         console.print("  [green]# 查看帮助[/green]")
         console.print("  python main.py --help")
         console.print("  python main.py analyze --help\n")
@@ -78,10 +93,58 @@ def save_report(report: str, company_name: str, stock_code: str) -> Path:
     return filepath
 
 
+def export_run_metrics(run_id: str) -> Optional[Path]:
+    """
+    导出单次运行的指标JSON并打印耗时/token摘要
+    
+    Args:
+        run_id: 运行ID
+    
+    Returns:
+        指标文件路径，没有调用记录时返回None
+    """
+    summary = registry.run_summary(run_id)
+    if not summary['calls']:
+        return None
+    totals = summary['totals']
+    console.print(
+        f"[dim]运行 {run_id}: LLM {totals['llm_calls']} 次 / {totals['llm_time']:.1f}s, "
+        f"工具 {totals['tool_calls']} 次 / {totals['tool_time']:.1f}s, "
+        f"tokens {totals['prompt_tokens']}+{totals['completion_tokens']}[/dim]"
+    )
+    return registry.export_run_json(run_id, config.METRICS_DIR)
+
+
+def parse_deadline(text: Optional[str]) -> float:
+    """
+    解析 --deadline 选项，未指定时使用配置 LLM_RUN_DEADLINE
+    
+    Args:
+        text: 时长字符串，如 90s、2m
+    
+    Returns:
+        时限秒数，0表示不限制
+    """
+    if text is None:
+        return config.LLM_RUN_DEADLINE
+    try:
+        return parse_duration(text)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+
+
+def print_resume_hint(run_id: str):
+    """提示可恢复的运行 (未启用检查点时不提示)"""
+    if config.CHECKPOINT_ENABLED:
+        console.print(f"[yellow]可执行 python main.py resume {run_id} 从中断处继续[/yellow]")
+
+
 @app.command()
 def analyze(
     query: str = typer.Argument(..., help="分析查询，如：'分析贵州茅台的投资价值'"),
     output: Optional[str] = typer.Option(None, "-o", "--output", help="指定输出文件路径"),
+    deadline: Optional[str] = typer.Option(None, "--deadline", help="单次分析时限，如 90s、2m (超时的分析在报告中标注为缺失)"),
     verbose: bool = typer.Option(False, "-v", "--verbose", help="显示详细输出")
 ):
     """
@@ -90,6 +153,7 @@ def analyze(
     示例:
         python main.py analyze "分析贵州茅台的投资价值"
         python main.py analyze "五粮液怎么样" -o report.md
+        python main.py analyze "分析贵州茅台" --deadline 90s
     """
     console.print(Panel.fit(
         "[bold blue]多Agent股票顾问系统[/bold blue]\n"
@@ -105,10 +169,11 @@ def analyze(
         console.print("[yellow]请复制 .env.example 为 .env 并配置 OPENAI_API_KEY[/yellow]")
         raise typer.Exit(1)
     
+    deadline_seconds = parse_deadline(deadline)
     console.print(f"\n[cyan]分析查询:[/cyan] {query}\n")
     
-    # 创建工作流
-    graph = create_multi_branch_graph()
+    # 获取工作流 (进程级共享，交互模式下只构建一次)
+    graph = get_graph()
     
     # 初始状态
     initial_state = {
@@ -125,6 +190,32 @@ def analyze(
         'messages': []
     }
     
+    run_id = new_run_id()
+    run_and_report(graph, initial_state, run_id, run_config(run_id), output, verbose,
+                   deadline=deadline_seconds)
+
+
+def run_and_report(
+    graph,
+    graph_input: Optional[dict],
+    run_id: str,
+    graph_config: dict,
+    output: Optional[str] = None,
+    verbose: bool = False,
+    deadline: float = 0
+):
+    """
+    执行工作流并保存/展示报告 (analyze 和 resume 共用)
+    
+    Args:
+        graph: 编译后的工作流图
+        graph_input: 初始状态，恢复运行时为None
+        run_id: 运行ID
+        graph_config: 运行配置 (含检查点 thread_id)
+        output: 指定输出文件路径
+        verbose: 是否显示详细输出
+        deadline: 运行时限 (秒)，0表示不限制
+    """
     # 执行工作流
     with Progress(
         SpinnerColumn(),
@@ -135,21 +226,28 @@ def analyze(
         
         try:
             # 执行图
-            result = graph.invoke(initial_state)
+            with run_scope(run_id), run_deadline(deadline):
+                result = graph.invoke(graph_input, config=graph_config)
             
             progress.update(task, description="[green]分析完成!")
             
-        except Exception as e:
-            progress.update(task, description=f"[red]分析失败: {e}")
+        except (Exception, KeyboardInterrupt) as e:
+            progress.update(task, description=f"[red]分析失败: {str(e) or '已中断'}")
             if verbose:
                 console.print_exception()
+            print_resume_hint(run_id)
             raise typer.Exit(1)
     
+    metrics_path = export_run_metrics(run_id)
+    if metrics_path and verbose:
+        console.print(f"[dim]指标已保存至: {metrics_path}[/dim]")
+    
     # 处理结果
     if result.get('error'):
         console.print(f"\n[red]错误: {result['error']}[/red]")
+        print_resume_hint(run_id)
         raise typer.Exit(1)
-    
+
     if not result.get('final_report'):
         console.print("\n[yellow]警告: 未能生成完整报告[/yellow]")
         if result.get('stock_code'):
@@ -187,13 +285,15 @@ def analyze(
 
 
 @app.command()
-def interactive():
+def interactive(
+    deadline: Optional[str] = typer.Option(None, "--deadline", help="每次分析的时限，如 90s、2m")
+):
     """
-    进入交互模式，可以连续分析多只股票
+    进入交互模式，可以连续分析多只股票，并对上一只股票追问 (如 "那它的估值呢")
     """
     console.print(Panel.fit(
         "[bold blue]多Agent股票顾问系统 - 交互模式[/bold blue]\n"
-        "[dim]输入 'quit' 或 'exit' 退出[/dim]",
+        "[dim]可直接追问上一只股票；输入 'new' 开始新话题，'quit' 或 'exit' 退出[/dim]",
         border_style="blue"
     ))
     
@@ -204,8 +304,12 @@ def interactive():
         console.print(f"[red]配置错误: {e}[/red]")
         raise typer.Exit(1)
     
-    # 创建工作流
-    graph = create_multi_branch_graph()
+    deadline_seconds = parse_deadline(deadline)
+    
+    # 获取工作流 (进程级共享，交互模式下只构建一次)
+    graph = get_graph()
+    # 会话上下文: 追问复用上一轮的公司和分析结果
+    session = AnalysisSession()
     
     while True:
         try:
@@ -215,27 +319,30 @@ def interactive():
                 console.print("[yellow]再见![/yellow]")
                 break
             
+            if query.strip().lower() == 'new':
+                session.reset()
+                console.print("[yellow]已开始新话题[/yellow]")
+                continue
+            
             if not query.strip():
                 continue
             
             # 执行分析
             console.print("\n[dim]正在分析...[/dim]")
             
-            initial_state = {
-                'user_query': query,
-                'company_name': '',
-                'stock_code': '',
-                'market': '',
-                'fundamental_analysis': None,
-                'technical_analysis': None,
-                'valuation_analysis': None,
-                'news_analysis': None,
-                'final_report': None,
-                'error': None,
-                'messages': []
-            }
+            initial_state = session.build_input(query)
             
-            result = graph.invoke(initial_state)
+            run_id = new_run_id()
+            try:
+                with run_scope(run_id), run_deadline(deadline_seconds):
+                    result = graph.invoke(initial_state, config=run_config(run_id))
+            except KeyboardInterrupt:
+                # 分析中途中断只取消本次分析，已完成的节点保存在检查点中
+                console.print("\n[yellow]本次分析已中断[/yellow]")
+                print_resume_hint(run_id)
+                continue
+            export_run_metrics(run_id)
+            session.update(result)
             
             if result.get('final_report'):
                 # 保存并显示
@@ -250,6 +357,7 @@ def interactive():
                 console.print(Markdown(result['final_report'][:500] + "...\n\n*[报告已截断，完整内容请查看文件]*"))
             else:
                 console.print("[red]分析失败[/red]")
+                print_resume_hint(run_id)
                 
         except KeyboardInterrupt:
             console.print("\n[yellow]已中断[/yellow]")
@@ -258,6 +366,137 @@ def interactive():
             console.print(f"[red]错误: {e}[/red]")
 
 
+@app.command()
+def resume(
+    run_id: str = typer.Argument(..., help="要恢复的运行ID (分析中断或失败时会提示)"),
+    output: Optional[str] = typer.Option(None, "-o", "--output", help="指定输出文件路径"),
+    deadline: Optional[str] = typer.Option(None, "--deadline", help="单次分析时限，如 90s、2m (超时的分析在报告中标注为缺失)"),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="显示详细输出")
+):
+    """
+    恢复中断或失败的分析，只重新执行未完成的节点
+    
+    示例:
+        python main.py resume 20260119_161344_a1b2c3
+    """
+    if not config.CHECKPOINT_ENABLED:
+        console.print("[red]未启用检查点 (CHECKPOINT_ENABLED=false)，无法恢复运行[/red]")
+        raise typer.Exit(1)
+    
+    try:
+        config.validate()
+    except ValueError as e:
+        console.print(f"[red]配置错误: {e}[/red]")
+        raise typer.Exit(1)
+    
+    deadline_seconds = parse_deadline(deadline)
+    graph = get_graph()
+    point = resume_point(graph, run_id)
+    if point is None:
+        console.print(f"[red]未找到运行 {run_id} 的检查点[/red]")
+        raise typer.Exit(1)
+    
+    graph_config, nodes = point
+    if graph_config is None:
+        console.print(f"[green]运行 {run_id} 已完成，无需恢复[/green]")
+        return
+    
+    console.print(f"\n[cyan]恢复运行:[/cyan] {run_id}，重新执行: {', '.join(nodes)}\n")
+    run_and_report(graph, None, run_id, graph_config, output, verbose,
+                   deadline=deadline_seconds)
+
+
+@app.command()
+def batch(
+    codes: Optional[List[str]] = typer.Argument(None, help="股票代码列表，如 sh.600519 000858"),
+    file: Optional[Path] = typer.Option(None, "-f", "--file", help="查询文件，每行一个查询或股票代码"),
+    index: Optional[str] = typer.Option(None, "--index", help="分析指数成分股: hs300 / sz50 / zz500"),
+    limit: int = typer.Option(0, "--limit", help="最多分析的数量，0表示不限制"),
+    concurrency: int = typer.Option(config.BATCH_CONCURRENCY, "-c", "--concurrency", help="同时进行的分析数"),
+    deadline: Optional[str] = typer.Option(None, "--deadline", help="单项分析时限，如 90s、2m"),
+    resume_batch: Optional[str] = typer.Option(None, "--resume", help="继续未完成的批次 (批次ID)"),
+    llm_cache: bool = typer.Option(True, "--llm-cache/--no-llm-cache", help="批次内共享LLM结果缓存")
+):
+    """
+    批量分析自选股、查询文件或指数成分股，中断后可恢复
+    
+    示例:
+        python main.py batch sh.600519 sz.000858 -c 2
+        python main.py batch --index sz50 --limit 10 --deadline 2m
+        python main.py batch -f watchlist.txt
+        python main.py batch --resume batch_20260119_161344_a1b2c3
+    """
+    try:
+        config.validate()
+    except ValueError as e:
+        console.print(f"[red]配置错误: {e}[/red]")
+        raise typer.Exit(1)
+    deadline_seconds = parse_deadline(deadline)
+    
+    try:
+        if resume_batch:
+            batch_run = BatchRun.load(resume_batch)
+        else:
+            items = load_items(codes, file, index, limit)
+            batch_run = BatchRun.create(items) if items else None
+    except FileNotFoundError as e:
+        console.print(f"[red]未找到批次或文件: {e.filename}[/red]")
+        raise typer.Exit(1)
+    except (ValueError, RuntimeError) as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    if batch_run is None:
+        console.print("[yellow]请指定股票代码、--file 或 --index[/yellow]")
+        raise typer.Exit(1)
+    
+    pending = batch_run.pending()
+    console.print(Panel.fit(
+        f"[bold blue]批量分析[/bold blue] {batch_run.batch_id}\n"
+        f"[dim]共 {len(batch_run.items)} 项，待分析 {len(pending)} 项，并发 {concurrency}[/dim]",
+        border_style="blue"
+    ))
+    if not pending:
+        console.print("[green]该批次已全部完成[/green]")
+        return
+    
+    if llm_cache:
+        enable_llm_cache()
+    graph = get_graph()
+    
+    def on_result(entry: dict, done: int, total: int):
+        style = {'ok': 'green', 'no_report': 'yellow'}.get(entry['status'], 'red')
+        detail = entry.get('report') or entry.get('error', '')
+        console.print(f"[{style}]({done}/{total}) {entry['key']} {entry['status']} "
+                      f"{entry['elapsed']:.1f}s[/{style}] [dim]{detail}[/dim]")
+    
+    try:
+        stats = asyncio.run(run_batch(graph, batch_run, concurrency, deadline_seconds, on_result))
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]批次已中断，已完成的结果保存在 {batch_run.summary_path}[/yellow]")
+        console.print(f"[yellow]可执行 python main.py batch --resume {batch_run.batch_id} 继续[/yellow]")
+        raise typer.Exit(1)
+    
+    cache = data_cache.stats()
+    http_cache = get_response_cache().stats()
+    news_store = get_news_store().stats()
+    console.print(Panel(
+        f"成功 {stats['ok']} / 失败 {stats['failed']} / 无报告 {stats['no_report']} "
+        f"(此前已完成 {stats['skipped']})\n"
+        f"耗时 {stats['elapsed']:.1f}s，吞吐 [bold]{stats['reports_per_minute']:.2f}[/bold] 份报告/分钟\n"
+        f"数据缓存命中率 {cache['hit_rate']:.0%} ({cache['hits']}/{cache['hits'] + cache['misses']})\n"
+        f"HTTP缓存命中率 {http_cache['hit_rate']:.0%} ({http_cache['hits']}/{http_cache['hits'] + http_cache['misses']})，"
+        f"节省下载 {http_cache['bytes_saved'] / 1024:.0f} KB\n"
+        f"新闻库: 新增 {news_store['new_articles']} 篇 / 已存在 {news_store['seen_articles']} 篇，"
+        f"评分 {news_store['scored']} 个事件，复用分析 {news_store['analyses_reused']} 次，"
+        f"跳过搜索 {news_store['skipped_syncs']} 次\n"
+        f"结果汇总: {batch_run.summary_path}",
+        title="批量分析完成",
+        border_style="green" if not stats['failed'] else "yellow"
+    ))
+    if stats['failed']:
+        console.print(f"[yellow]可执行 python main.py batch --resume {batch_run.batch_id} 重试失败项[/yellow]")
+
+
 @app.command()
 def version():
     """显示版本信息"""
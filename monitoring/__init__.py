@@ -0,0 +1,21 @@
+"""
+监控模块
+提供LLM/工具调用的耗时与token指标收集
+"""
+from .metrics import (
+    MetricsRegistry,
+    registry,
+    new_run_id,
+    current_run_id,
+    run_scope,
+    start_metrics_server,
+)
+
+__all__ = [
+    "MetricsRegistry",
+    "registry",
+    "new_run_id",
+    "current_run_id",
+    "run_scope",
+    "start_metrics_server",
+]
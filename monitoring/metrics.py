@@ -0,0 +1,331 @@
+"""
+运行指标注册表
+记录每次LLM/工具调用的耗时、首token时间和token用量
+
+- 内存注册表: 计数器 + 仪表盘 + 直方图 (线程安全)
+- 按运行ID导出JSON (单次报告的耗时/成本明细)
+- Prometheus文本格式导出 (长期运行的进程，如Streamlit)
+"""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 默认直方图分桶 (秒)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# token数量分桶
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# 当前分析运行ID (在线程/协程间自动传递)
+_current_run_id: ContextVar[Optional[str]] = ContextVar('current_run_id', default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def new_run_id() -> str:
+    """生成分析运行ID，如 20260119_161344_a1b2c3"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def current_run_id() -> Optional[str]:
+    """获取当前上下文的运行ID"""
+    return _current_run_id.get()
+
+
+@contextmanager
+def run_scope(run_id: str):
+    """
+    运行ID作用域，作用域内的LLM/工具调用都归属于该运行
+
+    Args:
+        run_id: 运行ID
+    """
+    token = _current_run_id.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run_id.reset(token)
+
+
+class Histogram:
+    """Prometheus风格的累积直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按分桶估算分位数 (取满足分位的桶上界)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """内存指标注册表"""
+
+    def __init__(self, max_runs: int = 200):
+        """
+        初始化注册表
+
+        Args:
+            max_runs: 保留调用明细的最大运行数量 (超出后丢弃最早的运行)
+        """
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._runs: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._max_runs = max_runs
+
+    @staticmethod
+    def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0,
+            help_text: str = "") -> None:
+        """计数器累加"""
+        with self._lock:
+            self._meta.setdefault(name, ('counter', help_text))
+            key = (name, self._label_key(labels))
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+                  help_text: str = "") -> None:
+        """设置仪表盘当前值"""
+        with self._lock:
+            self._meta.setdefault(name, ('gauge', help_text))
+            self._gauges[(name, self._label_key(labels))] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+                buckets: Tuple[float, ...] = LATENCY_BUCKETS, help_text: str = "") -> None:
+        """直方图记录一个观测值"""
+        with self._lock:
+            self._meta.setdefault(name, ('histogram', help_text))
+            key = (name, self._label_key(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record_call(self, record: Dict[str, Any]) -> None:
+        """
+        记录一次LLM或工具调用
+
+        Args:
+            record: 调用记录，包含 kind(llm/tool/setup), run_id, agent, node, name,
+                    wall_time, ttft, prompt_tokens, completion_tokens, cost_usd, error
+        """
+        kind = record.get('kind', 'llm')
+        labels = {'agent': record.get('agent', ''), 'node': record.get('node', '')}
+
+        if kind == 'llm':
+            model_labels = {**labels, 'model': record.get('name', '')}
+            self.observe('stock_agent_llm_latency_seconds', record['wall_time'], model_labels,
+                         help_text='LLM调用耗时')
+            if record.get('ttft') is not None:
+                self.observe('stock_agent_llm_ttft_seconds', record['ttft'], model_labels,
+                             help_text='LLM首token时间')
+            for token_kind in ('prompt', 'completion'):
+                tokens = record.get(f'{token_kind}_tokens')
+                if tokens:
+                    self.inc('stock_agent_llm_tokens_total', {**model_labels, 'type': token_kind}, tokens,
+                             help_text='LLM token用量')
+            if record.get('prompt_tokens'):
+                self.observe('stock_agent_llm_prompt_tokens', record['prompt_tokens'], model_labels,
+                             buckets=TOKEN_BUCKETS, help_text='单次LLM调用的prompt token数')
+            self.inc('stock_agent_llm_calls_total', {**model_labels, 'status': 'error' if record.get('error') else 'ok'},
+                     help_text='LLM调用次数')
+        elif kind == 'setup':
+            self.observe('stock_agent_setup_seconds', record['wall_time'], {'component': record.get('name', '')},
+                         help_text='图/Agent/模型构建耗时')
+        else:
+            tool_labels = {**labels, 'tool': record.get('name', '')}
+            self.observe('stock_agent_tool_latency_seconds', record['wall_time'], tool_labels,
+                         help_text='工具调用耗时')
+            self.inc('stock_agent_tool_calls_total', {**tool_labels, 'status': 'error' if record.get('error') else 'ok'},
+                     help_text='工具调用次数')
+
+        run_id = record.get('run_id')
+        if run_id:
+            with self._lock:
+                calls = self._runs.get(run_id)
+                if calls is None:
+                    calls = self._runs[run_id] = []
+                    while len(self._runs) > self._max_runs:
+                        self._runs.popitem(last=False)
+                calls.append(record)
+
+    def run_calls(self, run_id: str) -> List[Dict[str, Any]]:
+        """获取某次运行的调用明细"""
+        with self._lock:
+            return list(self._runs.get(run_id, []))
+
+    def run_summary(self, run_id: str) -> Dict[str, Any]:
+        """
+        汇总某次运行的指标 (按节点统计耗时和token)
+
+        Args:
+            run_id: 运行ID
+
+        Returns:
+            汇总字典，包含 totals、by_node 和 calls 明细
+        """
+        calls = self.run_calls(run_id)
+        by_node: Dict[str, Dict[str, Any]] = {}
+        totals = {'llm_calls': 0, 'tool_calls': 0, 'setup_calls': 0, 'llm_time': 0.0, 'tool_time': 0.0,
+                  'setup_time': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0}
+        for call in calls:
+            node = by_node.setdefault(call.get('node') or ('setup' if call.get('kind') == 'setup' else 'unknown'), {
+                'llm_calls': 0, 'tool_calls': 0, 'setup_calls': 0, 'llm_time': 0.0, 'tool_time': 0.0,
+                'setup_time': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0,
+            })
+            kind = call.get('kind', 'llm')
+            for bucket in (node, totals):
+                bucket[f'{kind}_calls'] += 1
+                bucket[f'{kind}_time'] += call.get('wall_time', 0.0)
+                bucket['prompt_tokens'] += call.get('prompt_tokens') or 0
+                bucket['completion_tokens'] += call.get('completion_tokens') or 0
+                bucket['cost_usd'] += call.get('cost_usd') or 0.0
+        if calls:
+            totals['wall_time'] = max(c['end'] for c in calls) - min(c['start'] for c in calls)
+        return {'run_id': run_id, 'totals': totals, 'by_node': by_node, 'calls': calls}
+
+    def export_run_json(self, run_id: str, output_dir: Path) -> Path:
+        """
+        将某次运行的指标导出为JSON文件
+
+        Args:
+            run_id: 运行ID
+            output_dir: 输出目录
+
+        Returns:
+            JSON文件路径
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        filepath = output_dir / f"metrics_{run_id}.json"
+        filepath.write_text(
+            json.dumps(self.run_summary(run_id), ensure_ascii=False, indent=2, default=str),
+            encoding='utf-8'
+        )
+        return filepath
+
+    def to_prometheus(self) -> str:
+        """导出Prometheus文本格式"""
+        def fmt_labels(label_key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = list(label_key) + list(extra)
+            if not pairs:
+                return ''
+            escaped = [f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs]
+            return '{' + ','.join(escaped) + '}'
+
+        lines: List[str] = []
+        with self._lock:
+            for name, (metric_type, help_text) in sorted(self._meta.items()):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type in ('counter', 'gauge'):
+                    values = self._counters if metric_type == 'counter' else self._gauges
+                    for (metric, label_key), value in sorted(values.items()):
+                        if metric == name:
+                            lines.append(f"{name}{fmt_labels(label_key)} {value:g}")
+                else:
+                    for (metric, label_key), histogram in sorted(self._histograms.items(), key=lambda x: x[0]):
+                        if metric != name:
+                            continue
+                        for bound, cumulative in zip(histogram.buckets, histogram.counts):
+                            lines.append(f"{name}_bucket{fmt_labels(label_key, (('le', f'{bound:g}'),))} {cumulative}")
+                        lines.append(f"{name}_bucket{fmt_labels(label_key, (('le', '+Inf'),))} {histogram.count}")
+                        lines.append(f"{name}_sum{fmt_labels(label_key)} {histogram.sum:.6f}")
+                        lines.append(f"{name}_count{fmt_labels(label_key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """清空所有指标"""
+        with self._lock:
+            self._meta.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._runs.clear()
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    启动Prometheus指标HTTP服务 (GET /metrics)，重复调用只启动一次
+
+    Args:
+        port: 监听端口，<=0 时不启动
+        host: 监听地址
+
+    Returns:
+        HTTP服务实例，未启动时返回None
+    """
+    global _server
+    if port <= 0:
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不输出访问日志
+
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-server').start()
+        print(f"    [Metrics] Prometheus指标服务已启动: http://{host}:{port}/metrics")
+        return _server
+
+
+class CallTimer:
+    """单次调用计时辅助 (记录开始时间和首token时间)"""
+
+    __slots__ = ('start', 'first_token', 'wall_start')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.first_token: Optional[float] = None
@@ -28,6 +28,8 @@ PLANNER_PROMPT = """你是一个专业的股票分析任务规划师。你的职
     "company_name": "公司名称",
     "stock_code": "股票代码 (如 sh.600519)",
     "market": "市场 (如 A股-上海)",
+    "dimensions": ["full"],
+    "stocks": [],
     "analysis_tasks": [
         "基本面分析: 分析盈利能力、成长能力、运营效率和偿债能力",
         "技术分析: 分析K线走势、价格趋势和成交量",
@@ -37,6 +39,20 @@ PLANNER_PROMPT = """你是一个专业的股票分析任务规划师。你的职
 }}
 ```
 
+## 分析维度 (dimensions)
+根据用户问题判断需要哪些维度，只列出用户关心的维度：
+- fundamental: 财务、盈利、成长、业绩等
+- technical: K线、走势、均线、成交量等
+- valuation: 估值、市盈率、市净率、分红等
+- news: 新闻、公告、舆情等
+- full: 要求完整分析、投资价值判断或无法确定时使用
+示例: "茅台最近K线怎么样" -> ["technical"]；"五粮液的市盈率" -> ["valuation"]；"分析贵州茅台" -> ["full"]
+
+## 多只股票对比 (stocks)
+用户要求比较多家公司时 (如 "比较茅台和五粮液")，对每家公司分别调用一次 query_stock_info，
+并在 stocks 中按提及顺序列出全部股票，每项包含 company_name、stock_code、market；
+company_name/stock_code/market 填写第一家公司。只涉及一家公司时 stocks 为空列表。
+
 ## 注意事项
 - 如果无法识别公司名称，请向用户确认
 - 如果股票代码查询失败，请说明原因
@@ -1,4 +1,4 @@
 """Embedding 模块"""
-from .qwen_embedding import QwenEmbedding
+from .qwen_embedding import QwenEmbedding, get_shared_embedding
 
-__all__ = ["QwenEmbedding"]
+__all__ = ["QwenEmbedding", "get_shared_embedding"]
@@ -9,7 +9,8 @@ Qwen Embedding 模型封装
 """
 import os
 import sys
-from typing import List
+import threading
+from typing import List, Optional
 
 # 添加项目根目录
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -95,3 +96,24 @@ class QwenEmbedding:
         """
         embedding = self.model.encode(text, normalize_embeddings=True)
         return embedding.tolist()
+
+
+_shared_embedding: Optional[QwenEmbedding] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedding() -> QwenEmbedding:
+    """
+    获取进程内共享的 Embedding 模型
+
+    股票/公司检索器使用同一个模型，避免重复加载 (约1GB显存/内存)
+
+    Returns:
+        QwenEmbedding 实例
+    """
+    global _shared_embedding
+    if _shared_embedding is None:
+        with _shared_lock:
+            if _shared_embedding is None:
+                _shared_embedding = QwenEmbedding()
+    return _shared_embedding
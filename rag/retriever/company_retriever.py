@@ -10,7 +10,7 @@ from typing import List
 # 添加项目根目录
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from rag.embedding.qwen_embedding import QwenEmbedding
+from rag.embedding.qwen_embedding import get_shared_embedding
 from rag.vectorstore.chroma_store import ChromaVectorStore
 from rag.document_loader.pdf_loader import PDFLoader
 from config import config
@@ -21,7 +21,7 @@ class CompanyRetriever:
     
     def __init__(self):
         """初始化检索器"""
-        self.embedding = QwenEmbedding()
+        self.embedding = get_shared_embedding()  # 与其他检索器共享模型
         
         # 知识库目录
         self.knowledge_dir = config.COMPANY_KNOWLEDGE_DIR
@@ -0,0 +1,142 @@
+"""
+意图分类离线基准
+在标注查询集上比较各阶段的准确率、覆盖率和耗时 (不调用LLM):
+
+- keyword: 只用关键词自动机，未命中的查询计为交给LLM
+- keyword+centroid: 关键词未命中时用 Embedding 最近质心分类，置信度不足的查询计为交给LLM
+
+用法:
+    python tests/bench_intent.py
+    python tests/bench_intent.py --threshold 0.5
+    python tests/bench_intent.py --hash-embedding   # 无 Embedding 模型时用字符哈希向量冒烟测试
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from agents.intent_classifier import IntentClassifier
+
+# 标注查询集 (与 INTENT_EXAMPLES 不重复)
+LABELLED_QUERIES = [
+    # stock
+    ("分析一下贵州茅台的投资价值", "stock"),
+    ("五粮液市盈率高吗", "stock"),
+    ("招商银行K线形态怎么样", "stock"),
+    ("宁德时代明年能涨吗", "stock"),
+    ("帮我看看比亚迪的财报", "stock"),
+    ("中国平安适合长期持有吗", "stock"),
+    ("北方华创这家公司怎么样", "stock"),
+    ("现在入手恒瑞医药合适吗", "stock"),
+    ("迈瑞医疗的护城河在哪里", "stock"),
+    ("新能源车赛道还有机会吗", "stock"),
+    ("工商银行每年分红多少", "stock"),
+    ("海天味业的营收增速放缓了吗", "stock"),
+    ("券商板块最近资金流入多吗", "stock"),
+    ("格力电器和美的集团哪个更好", "stock"),
+    ("药明康德被美国制裁影响大吗", "stock"),
+    # company
+    ("请假流程是什么", "company"),
+    ("报销需要哪些单据", "company"),
+    ("员工手册在哪里下载", "company"),
+    ("每周例会几点开", "company"),
+    ("婚假能休几天", "company"),
+    ("病假工资怎么算", "company"),
+    ("年终奖什么时候发", "company"),
+    ("电脑坏了找谁修", "company"),
+    ("怎么开在职证明", "company"),
+    ("公积金缴纳比例是多少", "company"),
+    ("离职需要提前多久说", "company"),
+    ("打卡忘记了怎么补", "company"),
+    # general
+    ("什么是人工智能", "general"),
+    ("北京今天下雨吗", "general"),
+    ("怎么煮鸡蛋不裂", "general"),
+    ("给我讲个笑话", "general"),
+    ("太阳系有几颗行星", "general"),
+    ("Python的列表和元组有什么区别", "general"),
+    ("翻译一下hello world", "general"),
+    ("跑步对膝盖有害吗", "general"),
+    ("世界上最高的山是哪座", "general"),
+    ("周末去哪里玩比较好", "general"),
+    ("怎么提高睡眠质量", "general"),
+    ("光速是多少", "general"),
+]
+
+
+def hash_embed(texts):
+    """字符哈希词袋向量 (冒烟测试用)"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 256
+        for char in text:
+            vector[zlib.crc32(char.encode()) % 256] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(classifier: IntentClassifier, use_centroid: bool) -> dict:
+    """对标注集分类，返回 准确率 (已决定的查询)、覆盖率 (未交给LLM的比例)、耗时"""
+    decided = correct = 0
+    latencies = []
+    errors = []
+    for query, label in LABELLED_QUERIES:
+        start = time.perf_counter()
+        matched = classifier.match_keywords(query)
+        intent = matched[0] if matched else (classifier.classify(query) if use_centroid else None)
+        latencies.append(time.perf_counter() - start)
+        if intent is None:
+            continue
+        decided += 1
+        if intent == label:
+            correct += 1
+        else:
+            errors.append((query, label, intent))
+    return {
+        'accuracy': correct / decided if decided else 0.0,
+        'coverage': decided / len(LABELLED_QUERIES),
+        'end_to_end': correct / len(LABELLED_QUERIES),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': _percentile(latencies, 0.95) * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图分类离线基准")
+    parser.add_argument('--threshold', type=float, default=None, help="质心分类置信度阈值 (默认取配置)")
+    parser.add_argument('--hash-embedding', action='store_true', help="使用字符哈希向量代替 Embedding 模型")
+    args = parser.parse_args()
+
+    classifier = IntentClassifier(embed=hash_embed if args.hash_embedding else None, threshold=args.threshold)
+    print("=" * 72)
+    print(f"意图分类离线基准: {len(LABELLED_QUERIES)} 条标注查询, 置信度阈值 {classifier.threshold}")
+    print("=" * 72)
+
+    # 预热: 向量化标注样例 / 加载模型不计入单条查询耗时
+    start = time.perf_counter()
+    centroid_ready = classifier.scores("预热") is not None
+    print(f"质心准备耗时: {time.perf_counter() - start:.2f}s" if centroid_ready else "Embedding 模型不可用，只评测关键词")
+
+    stages = [('keyword', False)] + ([('keyword+centroid', True)] if centroid_ready else [])
+    print(f"\n{'阶段':<18}{'准确率':>8}{'覆盖率':>8}{'端到端':>8}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for name, use_centroid in stages:
+        result = run(classifier, use_centroid)
+        print(f"{name:<18}{result['accuracy']:>9.1%}{result['coverage']:>9.1%}{result['end_to_end']:>9.1%}"
+              f"{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}")
+        for query, label, intent in result['errors']:
+            print(f"    ✗ {query}  (标注 {label}, 预测 {intent})")
+    print("\n覆盖率以外的查询交给LLM分类 (约 0.5-2s/次)")
+
+
+if __name__ == "__main__":
+    main()
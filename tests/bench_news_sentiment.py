@@ -0,0 +1,155 @@
+"""
+新闻情感/风险评分离线基准
+在标注新闻标题集上比较本地评分与LLM评分的一致性和耗时:
+
+- 参考评分默认为内置标注 (按新闻Agent提示词的1-5评分标准)；--llm 时改为实时调用LLM逐条评分
+  (与 NEWS_SENTIMENT_MODE=llm 相同的提示词)，同时统计LLM耗时
+- 一致性: 完全一致率、相差不超过1分的比例、方向一致率 (正面/中性/负面，风险按高/低)、平均绝对误差
+- 耗时: 本地评分一次批量处理全部标题，报告总耗时和每条耗时
+
+用法:
+    python tests/bench_news_sentiment.py
+    python tests/bench_news_sentiment.py --llm              # 与实时LLM评分比较 (需要API)
+    python tests/bench_news_sentiment.py --hash-embedding   # 无 Embedding 模型时用字符哈希向量冒烟测试
+    python tests/bench_news_sentiment.py --lexicon-only     # 只用词典
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from tests.bench_intent import hash_embed
+from tools.news_sentiment import NewsSentimentScorer
+
+# (标题, 情感评分, 风险评分)，与 SENTIMENT_EXAMPLES / RISK_EXAMPLES 不重复
+LABELLED_HEADLINES = [
+    ("贵州茅台前三季度归母净利润同比增长15%，符合市场预期", 4, 2),
+    ("宁德时代与海外车企签订长期供货协议，订单金额超百亿", 5, 2),
+    ("比亚迪月销量再创新高，海外市场持续放量", 5, 2),
+    ("招商银行拟每10股派发现金红利19.72元", 4, 1),
+    ("恒瑞医药创新药获批上市，填补国内空白", 5, 2),
+    ("隆基绿能宣布回购股份用于员工持股计划", 4, 2),
+    ("券商研报维持五粮液买入评级，目标价上调至200元", 4, 2),
+    ("海天味业召开2024年第一次临时股东大会", 3, 2),
+    ("中国平安发布关于独立董事辞职的公告", 3, 3),
+    ("美的集团将于下周举办投资者开放日活动", 3, 2),
+    ("格力电器完成董事会换届选举", 3, 2),
+    ("工商银行发布关于可转债转股结果的公告", 3, 2),
+    ("北方华创参加半导体行业展会", 3, 2),
+    ("片仔癀上半年营收增速放缓，毛利率小幅下降", 2, 3),
+    ("某光伏龙头预计全年亏损，行业产能过剩持续承压", 1, 4),
+    ("某药企核心产品纳入集采，价格降幅超过70%", 2, 4),
+    ("大股东拟减持不超过2%股份，公司股价大跌", 2, 3),
+    ("某地产公司美元债违约，多家子公司股权被冻结", 1, 5),
+    ("某上市公司因涉嫌信息披露违规被证监会立案调查", 1, 5),
+    ("某公司年报被出具无法表示意见，股票将被实施退市风险警示", 1, 5),
+    ("某芯片企业被列入实体清单，海外业务面临不确定性", 1, 4),
+    ("某乳企产品检出问题，宣布召回相关批次", 2, 4),
+    ("公司澄清: 网传财务造假消息不实，经营一切正常", 3, 3),
+    ("公司收到交易所问询函，要求说明大额预付款用途", 2, 4),
+    ("三季度业绩不及预期，机构下调盈利预测", 2, 3),
+    ("公司计提商誉减值准备，净利润同比下滑40%", 2, 4),
+    ("白酒板块午后集体走强，龙头个股涨停", 4, 2),
+    ("北向资金连续五日净流出消费板块", 2, 3),
+    ("公司中标国家电网特高压项目", 4, 2),
+    ("公司控股股东质押比例超过80%，存在平仓风险", 2, 5),
+]
+
+
+def _direction(score: float, neutral_low: float = 2.5, neutral_high: float = 3.5) -> int:
+    """评分方向: 1 正面/高, 0 中性, -1 负面/低"""
+    return 1 if score > neutral_high else -1 if score < neutral_low else 0
+
+
+def compare(local, reference):
+    """比较本地评分 (浮点，四舍五入为整数) 与参考评分 (整数)"""
+    rounded = [max(1, min(5, int(v + 0.5))) for v in local]
+    pairs = list(zip(rounded, reference))
+    return {
+        'exact': sum(a == b for a, b in pairs) / len(pairs),
+        'within_1': sum(abs(a - b) <= 1 for a, b in pairs) / len(pairs),
+        'direction': sum(_direction(a) == _direction(b) for a, b in zip(local, reference)) / len(pairs),
+        'mae': statistics.mean(abs(a - b) for a, b in zip(local, reference)),
+    }
+
+
+def llm_reference(headlines):
+    """逐条调用LLM评分 (与 NEWS_SENTIMENT_MODE=llm 相同的提示词)，返回 (情感, 风险, 每条耗时)"""
+    from tools.news_crawler import _llm_sentiment_risk
+    sentiments, risks, latencies = [], [], []
+    for title in headlines:
+        start = time.perf_counter()
+        result = _llm_sentiment_risk([{'title': title, 'content': '', 'source': ''}], '该公司')
+        latencies.append(time.perf_counter() - start)
+        sentiments.append(result['sentiment_score'])
+        risks.append(result['risk_score'])
+    return sentiments, risks, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新闻情感/风险评分离线基准")
+    parser.add_argument('--llm', action='store_true', help="与实时LLM评分比较 (默认使用内置标注)")
+    parser.add_argument('--hash-embedding', action='store_true', help="使用字符哈希向量代替 Embedding 模型")
+    parser.add_argument('--lexicon-only', action='store_true', help="只使用词典评分")
+    args = parser.parse_args()
+
+    if args.lexicon_only:
+        def no_embed(texts):
+            raise RuntimeError("--lexicon-only")
+        embed = no_embed
+    else:
+        embed = hash_embed if args.hash_embedding else None
+    scorer = NewsSentimentScorer(embed=embed)
+    headlines = [title for title, _, _ in LABELLED_HEADLINES]
+    articles = [{'title': title, 'content': ''} for title in headlines]
+
+    print("=" * 72)
+    print(f"新闻评分离线基准: {len(headlines)} 条标注标题")
+    print("=" * 72)
+
+    # 预热: 加载模型、向量化标注样例不计入评分耗时
+    start = time.perf_counter()
+    scorer.score_articles(articles[:1])
+    print(f"模型/质心准备耗时: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    scores = scorer.score_articles(articles)
+    local_seconds = time.perf_counter() - start
+    print(f"本地评分方式: {scores[0]['method']}，批量耗时 {local_seconds * 1000:.1f}ms "
+          f"({local_seconds * 1000 / len(articles):.2f}ms/条)")
+
+    if args.llm:
+        ref_sentiment, ref_risk, latencies = llm_reference(headlines)
+        print(f"LLM评分耗时: 共 {sum(latencies):.1f}s，p50 {statistics.median(latencies) * 1000:.0f}ms/条")
+        reference_name = "LLM"
+    else:
+        ref_sentiment = [s for _, s, _ in LABELLED_HEADLINES]
+        ref_risk = [r for _, _, r in LABELLED_HEADLINES]
+        reference_name = "标注"
+
+    print(f"\n与{reference_name}评分比较")
+    print(f"{'指标':<8}{'完全一致':>10}{'相差≤1':>10}{'方向一致':>10}{'MAE':>8}")
+    for name, local, reference in [
+        ('情感', [s['sentiment'] for s in scores], ref_sentiment),
+        ('风险', [s['risk'] for s in scores], ref_risk),
+    ]:
+        result = compare(local, reference)
+        print(f"{name:<8}{result['exact']:>11.1%}{result['within_1']:>11.1%}{result['direction']:>11.1%}"
+              f"{result['mae']:>8.2f}")
+
+    print("\n差异最大的标题:")
+    gaps = sorted(
+        zip(headlines, scores, ref_sentiment, ref_risk),
+        key=lambda item: abs(item[1]['sentiment'] - item[2]) + abs(item[1]['risk'] - item[3]),
+        reverse=True,
+    )
+    for title, score, sentiment, risk in gaps[:5]:
+        print(f"    {title}\n      本地 情感{score['sentiment']:.1f}/风险{score['risk']:.1f}  "
+              f"{reference_name} 情感{sentiment}/风险{risk}  关键词: {'、'.join(score['keywords']) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -218,7 +218,7 @@ try:
     }
     
     print_info(f"输入查询: {initial_state['user_query']}")
-    print_info("工作流节点顺序: planner → fundamental → technical → valuation → news → summarizer")
+    print_info("工作流节点顺序: planner → [fundamental | technical | valuation | news] 并行 → summarizer")
     print_info("提示: 按 Ctrl+C 可跳过此测试")
     print_info("注意: fundamental 节点可能需要1-2分钟（涉及多次LLM调用和数据获取）\n")
     
@@ -0,0 +1,194 @@
+"""
+工作流测试共用的假Agent
+
+用假Agent替换 graph.workflow 中的真实Agent后构建生产工作流 (create_multi_branch_graph)，
+各测试只需提供自己特有的部分:
+
+- calls: 记录执行的节点 (规划 'planner'、分析节点名或 (节点, 股票代码)、总结 'summarizer')
+- latency: 分析节点的模拟耗时 (秒)，可按节点给出 {节点: 耗时}
+- hook(node, state): 节点返回前调用，可抛出异常模拟失败，返回字典时替代节点结果
+- in_flight: 记录同时执行的分析节点数 (InFlight)，用于验证并发而不依赖耗时
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+from langchain_core.messages import AIMessage
+import graph.workflow as workflow
+from agents.summarizer_agent import SummarizerAgent
+from graph.checkpoint import CompactSerializer, LocalCheckpointer
+
+PLAN = {'intent': 'stock', 'company_name': '贵州茅台', 'stock_code': 'sh.600519', 'market': 'A股-上海'}
+
+# 工作流中的分析Agent类名 -> 节点名
+ANALYST_AGENTS = {
+    'FundamentalAgent': 'fundamental',
+    'TechnicalAgent': 'technical',
+    'ValuationAgent': 'valuation',
+    'NewsAgent': 'news',
+}
+
+Hook = Callable[[str, dict], Optional[dict]]
+
+
+class InFlight:
+    """同时执行数计数器 (线程安全，with 块内计为执行中)，peak 为最大同时执行数"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+def fake_planner(plan: Union[dict, Callable[[dict], dict]] = PLAN, calls: Optional[list] = None):
+    """返回固定规划 (或按状态生成规划) 的假规划Agent"""
+    class FakePlanner:
+        def run(self, state):
+            if calls is not None:
+                calls.append('planner')
+            return dict(plan(state) if callable(plan) else plan)
+
+        async def arun(self, state):
+            return self.run(state)
+
+    return FakePlanner
+
+
+def fake_analyst(node: str, calls: Optional[list] = None, latency: float = 0.0, hook: Optional[Hook] = None,
+                 with_code: bool = False, in_flight: Optional[InFlight] = None):
+    """
+    假分析Agent，返回 {node}_analysis = "{node} of {股票代码}"
+
+    Args:
+        node: 节点名
+        calls: 调用记录
+        latency: 模拟耗时 (秒)
+        hook: 返回前调用 (可抛出异常)
+        with_code: 调用记录为 (节点, 股票代码)
+        in_flight: 同时执行数计数器
+    """
+    in_flight = in_flight or InFlight()
+
+    def record(state):
+        if calls is not None:
+            calls.append((node, state['stock_code']) if with_code else node)
+
+    def finish(state):
+        result = hook(node, state) if hook else None
+        return result if result is not None else {f"{node}_analysis": f"{node} of {state['stock_code']}"}
+
+    class FakeAnalyst:
+        def run(self, state):
+            record(state)
+            with in_flight:
+                time.sleep(latency)
+            return finish(state)
+
+        async def arun(self, state):
+            record(state)
+            with in_flight:
+                await asyncio.sleep(latency)
+            return finish(state)
+
+    return FakeAnalyst
+
+
+def fake_summarizer(calls: Optional[list] = None, latency: float = 0.0, hook: Optional[Hook] = None):
+    """假总结Agent: 报告由各分析结果拼接 (缺失的分析写为 "缺失")"""
+    def summarize(state):
+        if calls is not None:
+            calls.append('summarizer')
+        result = hook('summarizer', state) if hook else None
+        if result is not None:
+            return result
+        sections = [state.get(f"{name}_analysis") for name in workflow.ANALYSIS_NODES]
+        return {'final_report': "\n".join(s or '缺失' for s in sections)}
+
+    class FakeSummarizer:
+        def run(self, state):
+            time.sleep(latency)
+            return summarize(state)
+
+        async def arun(self, state):
+            await asyncio.sleep(latency)
+            return summarize(state)
+
+    return FakeSummarizer
+
+
+class FakeLLM:
+    """原样返回最后一条消息的假模型，调用时记录名称"""
+
+    def __init__(self, name: str, calls: Optional[list] = None):
+        self.name = name
+        self.calls = calls
+
+    def invoke(self, messages):
+        if self.calls is not None:
+            self.calls.append(self.name)
+        return AIMessage(content=messages[-1].content)
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def llm_summarizer(calls: Optional[list] = None, summary: str = 'summary', brief: str = 'brief_summary'):
+    """真实总结Agent的路径选择和Prompt构建，LLM替换为记录调用的假模型 (跳过行业提取和知识库检索)"""
+    class FakeSummarizer:
+        def run(self, state):
+            agent = SummarizerAgent.__new__(SummarizerAgent)
+            agent.llm, agent.brief_llm = FakeLLM(summary, calls), FakeLLM(brief, calls)
+            agent._short_on_time = lambda: True
+            return agent.run(state)
+
+    return FakeSummarizer
+
+
+def sqlite_checkpointer(db_path) -> LocalCheckpointer:
+    """本地SQLite检查点 (紧凑序列化)"""
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    return LocalCheckpointer(conn, serde=CompactSerializer())
+
+
+def build_graph(planner: Any = None, summarizer: Any = None, calls: Optional[list] = None,
+                latency: Union[float, Dict[str, float]] = 0.0, hook: Optional[Hook] = None,
+                with_code: bool = False, checkpointer: Any = None, in_flight: Optional[InFlight] = None,
+                **agents: Any):
+    """
+    用假Agent构建生产工作流
+
+    Args:
+        planner: 规划Agent类，默认为 fake_planner()
+        summarizer: 总结Agent类，默认为 fake_summarizer(calls)
+        calls / latency / hook / with_code / in_flight: 传给各假分析Agent (见 fake_analyst)
+        checkpointer: 检查点
+        **agents: 替换的其他Agent (如 ComparisonAgent)，也可覆盖某个分析Agent
+
+    Returns:
+        编译后的工作流
+    """
+    fakes = {'PlannerAgent': planner or fake_planner(), 'SummarizerAgent': summarizer or fake_summarizer(calls)}
+    for name, node in ANALYST_AGENTS.items():
+        node_latency = latency.get(node, 0.0) if isinstance(latency, dict) else latency
+        fakes[name] = fake_analyst(node, calls, node_latency, hook, with_code, in_flight)
+    fakes.update(agents)
+    originals = {name: getattr(workflow, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(workflow, name, fake)
+    try:
+        return workflow.create_multi_branch_graph(checkpointer=checkpointer)
+    finally:
+        for name, original in originals.items():
+            setattr(workflow, name, original)
@@ -0,0 +1,191 @@
+"""
+本地 OpenAI 兼容桩服务 (用于离线基准测试)
+
+模拟 /v1/chat/completions:
+- 可配置响应延迟 (模拟首token时间)
+- 支持流式 (SSE) 与非流式响应，返回 token 用量
+- 请求携带 tools 且最后一条消息不是工具结果时，返回一次工具调用；否则返回文本回答
+
+用法:
+    server = StubLLMServer(latency=0.3).start()
+    config.OPENAI_BASE_URL = server.base_url
+    ...
+    server.stop()
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Union
+
+
+class _BacklogHTTPServer(ThreadingHTTPServer):
+    """增大监听积压队列 (默认只有5，高并发基准时会人为排队)"""
+    request_queue_size = 128
+
+
+class StubLLMServer:
+    """本地 OpenAI 兼容桩服务"""
+
+    def __init__(self, latency: Union[float, Dict[str, float]] = 0.3, answer: str = "分析完成",
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        初始化桩服务
+
+        Args:
+            latency: 响应延迟 (秒)，可按模型名配置 {"model": 秒, "default": 秒}
+            answer: 文本回答内容
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+        """
+        self.latency = latency
+        self.answer = answer
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _BacklogHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def latency_for(self, model: str) -> float:
+        if isinstance(self.latency, dict):
+            return self.latency.get(model, self.latency.get('default', 0.3))
+        return self.latency
+
+    def build_message(self, body: dict) -> dict:
+        """根据请求决定返回工具调用还是文本回答"""
+        messages = body.get('messages') or []
+        tools = body.get('tools') or []
+        if tools and messages and messages[-1].get('role') != 'tool':
+            function = tools[0]['function']
+            properties = (function.get('parameters') or {}).get('properties') or {}
+            args = {
+                name: 1 if schema.get('type') == 'integer' else "sh.600519"
+                for name, schema in properties.items()
+            }
+            return {
+                'role': 'assistant',
+                'content': None,
+                'tool_calls': [{
+                    'id': f"call_{uuid.uuid4().hex[:8]}",
+                    'type': 'function',
+                    'function': {'name': function['name'], 'arguments': json.dumps(args)},
+                }],
+            }
+        return {'role': 'assistant', 'content': self.answer}
+
+    @staticmethod
+    def usage_for(body: dict, message: dict) -> dict:
+        prompt_chars = sum(len(str(m.get('content') or '')) for m in body.get('messages') or [])
+        prompt_tokens = max(1, prompt_chars // 2)
+        completion_tokens = max(1, len(message.get('content') or '') or 10)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    rejection = server.admit(body)
+                    if rejection is not None:
+                        status, payload, headers = rejection
+                        self._send_json(status, payload, headers)
+                        return
+                    time.sleep(server.latency_for(body.get('model', '')))
+                    message = server.build_message(body)
+                    usage = server.usage_for(body, message)
+                    if body.get('stream'):
+                        self._stream(body, message, usage)
+                    else:
+                        self._send_json(200, {
+                            'id': f"chatcmpl-{uuid.uuid4().hex[:8]}",
+                            'object': 'chat.completion',
+                            'created': int(time.time()),
+                            'model': body.get('model', ''),
+                            'choices': [{'index': 0, 'message': message, 'finish_reason':
+                                         'tool_calls' if message.get('tool_calls') else 'stop'}],
+                            'usage': usage,
+                        })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _stream(self, body: dict, message: dict, usage: dict):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
+
+                def emit(choices, extra=None):
+                    payload = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                               'model': body.get('model', ''), 'choices': choices, **(extra or {})}
+                    self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                if message.get('tool_calls'):
+                    tool_calls = [{**call, 'index': i} for i, call in enumerate(message['tool_calls'])]
+                    emit([{'index': 0, 'delta': {'role': 'assistant', 'tool_calls': tool_calls}, 'finish_reason': None}])
+                    emit([{'index': 0, 'delta': {}, 'finish_reason': 'tool_calls'}])
+                else:
+                    emit([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+                    for char in message['content']:
+                        emit([{'index': 0, 'delta': {'content': char}, 'finish_reason': None}])
+                    emit([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+                if (body.get('stream_options') or {}).get('include_usage'):
+                    emit([], {'usage': usage})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+    def admit(self, body: dict):
+        """
+        请求准入检查，返回None表示放行，否则返回 (状态码, 响应体, 响应头)
+
+        默认全部放行，子类可覆盖以模拟限流
+        """
+        return None
@@ -0,0 +1,155 @@
+"""
+新闻正文抓取测试
+
+用 httpx.MockTransport 模拟新闻站点 (不访问网络)，验证:
+1. 正文提取: 优先已知正文容器并去掉脚本/导航；无已知容器时取段落最多的节点；按 <meta charset> 解码
+2. 不同站点的文章并发抓取；同一站点的并发数和请求间隔受限
+3. 超过总截止时间的文章被放弃 (不等待其响应，退回使用摘要)，运行截止时间会缩短抓取预算
+4. 正文按URL缓存，重复抓取不再请求站点
+"""
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+import tools.http_client as http_client
+import tools.news_crawler as news_crawler
+from config import config
+from llm.gateway import run_deadline
+from tools.article_fetcher import afetch_articles, extract_main_text
+from tools.http_client import ResponseCache
+
+PARAGRAPH = "贵州茅台公告称，自11月1日起上调53度飞天茅台出厂价，平均上调幅度约20%，此次提价有助于增厚公司业绩。"
+
+SINA_ARTICLE = f"""<html><head><script>var ad = "广告脚本";</script></head><body>
+<nav>首页 财经 股票</nav>
+<div id="artibody"><p>{PARAGRAPH}</p><script>track()</script><p>分析人士认为，<b>提价</b>幅度符合预期。</p></div>
+<footer>版权所有</footer></body></html>"""
+
+GENERIC_ARTICLE = f"""<html><body><div class="sidebar"><p>热门</p><p>推荐</p></div>
+<div class="main"><p>{PARAGRAPH}</p><p>{PARAGRAPH}</p></div></body></html>"""
+
+in_flight = {}
+max_in_flight = {}
+peak_total = [0]   # 所有站点同时进行的最大请求数
+starts = []
+completed = []     # 已返回响应的主机
+
+
+def _handler(delays):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        starts.append((host, time.monotonic()))
+        in_flight[host] = in_flight.get(host, 0) + 1
+        max_in_flight[host] = max(max_in_flight.get(host, 0), in_flight[host])
+        peak_total[0] = max(peak_total[0], sum(in_flight.values()))
+        try:
+            await asyncio.sleep(delays.get(host, 0.3))
+        finally:
+            in_flight[host] -= 1
+        completed.append(host)
+        return httpx.Response(200, content=SINA_ARTICLE.encode('utf-8'))
+
+    return handler
+
+
+def _fetch(urls, delays, budget=5.0):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_handler(delays))) as client:
+            return await afetch_articles(client, urls, budget)
+
+    in_flight.clear(), max_in_flight.clear(), starts.clear(), completed.clear()
+    peak_total[0] = 0
+    return asyncio.run(run())
+
+
+def _with_cache(tmp_path, func):
+    original = http_client._cache
+    http_client._cache = ResponseCache(tmp_path / "http_cache.sqlite")
+    try:
+        return func()
+    finally:
+        http_client._cache.close()
+        http_client._cache = original
+
+
+def test_extract_main_text():
+    text = extract_main_text(SINA_ARTICLE.encode('utf-8'))
+    assert text.split('\n') == [PARAGRAPH, "分析人士认为，提价幅度符合预期。"]
+    assert extract_main_text(GENERIC_ARTICLE.encode('utf-8')) == f"{PARAGRAPH}\n{PARAGRAPH}"
+    gbk = f'<html><head><meta charset="gbk"></head><body><div class="article"><p>{PARAGRAPH}</p></div></body></html>'
+    assert extract_main_text(gbk.encode('gbk')) == PARAGRAPH
+    assert extract_main_text("<html><body><p>登录</p></body></html>".encode("utf-8")) == ''
+    assert len(extract_main_text(GENERIC_ARTICLE.encode('utf-8'), max_chars=60)) == 60
+
+
+def test_concurrent_polite_fetch(tmp_path):
+    def run():
+        original = config.ARTICLE_HOST_INTERVAL
+        config.ARTICLE_HOST_INTERVAL = 0.05
+        try:
+            urls = [f"https://{host}/a/{i}" for host in ('a.com', 'b.com', 'c.com') for i in range(2)]
+            bodies = _fetch(urls + urls[:1], {})
+            print(f"\n6篇正文 (3个站点): 同时进行的最大请求数 {peak_total[0]}")
+            assert set(bodies) == set(urls) and len(starts) == 6
+            assert peak_total[0] > 2   # 多个站点的请求同时进行
+
+            # 同一站点最多2个并发请求，请求间隔不少于0.05s
+            same_host = [f"https://a.com/b/{i}" for i in range(4)]
+            _fetch(same_host, {})
+            assert max_in_flight == {'a.com': 2}
+            times = sorted(t for _, t in starts)
+            assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+        finally:
+            config.ARTICLE_HOST_INTERVAL = original
+
+    _with_cache(tmp_path, run)
+
+
+def test_deadline_and_cache(tmp_path):
+    def run():
+        bodies = _fetch(["https://slow.com/1", "https://fast.com/1"], {'slow.com': 5, 'fast.com': 0.05}, budget=0.4)
+        assert list(bodies) == ["https://fast.com/1"] and completed == ['fast.com']   # 不等待慢站点的响应
+
+        # 已缓存的正文不再请求站点
+        bodies = _fetch(["https://fast.com/1"], {})
+        assert bodies == {"https://fast.com/1": extract_main_text(SINA_ARTICLE.encode('utf-8'))}
+        assert starts == []
+
+    _with_cache(tmp_path, run)
+
+
+def test_attach_bodies_within_node_budget(tmp_path):
+    def run():
+        events = [{'title': '茅台提价', 'content': '摘要', 'url': 'https://finance.sina.com.cn/a/1.html'},
+                  {'title': '茅台三季报', 'content': '摘要', 'url': 'https://slow.com/2'}]
+        original = news_crawler._client
+        news_crawler._client = httpx.AsyncClient(transport=httpx.MockTransport(_handler({'slow.com': 5})))
+        completed.clear()
+        try:
+            # 运行只剩 收尾时间+0.5s: 抓取预算约0.5s，慢站点的文章在其响应之前被放弃
+            with run_deadline(config.DEADLINE_WRAP_UP_SECONDS + 0.5):
+                assert news_crawler.attach_article_bodies(events) == 1
+            assert completed == ['finance.sina.com.cn']
+            with run_deadline(config.DEADLINE_WRAP_UP_SECONDS - 1):
+                assert news_crawler.attach_article_bodies([{'url': 'https://a.com/1'}]) == 0
+        finally:
+            news_crawler._client = original
+        assert events[0]['body'].startswith(PARAGRAPH) and 'body' not in events[1]
+
+    _with_cache(tmp_path, run)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_extract_main_text()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_concurrent_polite_fetch(Path(tmp) / "a")
+        test_deadline_and_cache(Path(tmp) / "b")
+        test_attach_bodies_within_node_budget(Path(tmp) / "c")
+    print("✅ 新闻正文抓取测试通过")
@@ -0,0 +1,138 @@
+"""
+异步执行路径并发基准测试
+
+对比两种方式同时运行 N 个 ReAct 分析 (LLM -> 阻塞数据工具 -> LLM):
+1. 同步: 每个分析占用一个线程 (线程池大小有限，模拟"每个节点一个线程")
+2. 异步: 所有分析共享一个事件循环，阻塞工具卸载到数据线程池
+
+LLM 使用本地桩服务 (tests/stub_llm_server.py)，无需网络和 API Key
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+from config import config
+from tests.stub_llm_server import StubLLMServer
+
+ANALYSES = 16          # 并发分析数量
+SYNC_THREADS = 4       # 同步方式的线程数
+LLM_LATENCY = 0.3      # 桩服务LLM延迟 (秒)
+DATA_LATENCY = 0.2     # 模拟数据接口延迟 (秒)
+
+
+class _InFlight:
+    """记录数据接口的同时调用数"""
+    lock = threading.Lock()
+    current = 0
+    peak = 0
+
+    @classmethod
+    def reset(cls):
+        cls.current = cls.peak = 0
+
+
+@tool
+def fetch_quote(code: str) -> str:
+    """获取股票行情 (模拟阻塞的数据接口)"""
+    with _InFlight.lock:
+        _InFlight.current += 1
+        _InFlight.peak = max(_InFlight.peak, _InFlight.current)
+    try:
+        time.sleep(DATA_LATENCY)
+    finally:
+        with _InFlight.lock:
+            _InFlight.current -= 1
+    return f"### {code} 行情\n\n| close |\n|--|\n| 1500.0 |"
+
+
+def _build_agent():
+    from agents.base_agent import BaseAgent
+
+    class BenchAgent(BaseAgent):
+        def run(self, state: dict) -> dict:
+            return self.invoke({'messages': [HumanMessage(content="分析 sh.600519")]})
+
+        async def arun(self, state: dict) -> dict:
+            return await self.ainvoke({'messages': [HumanMessage(content="分析 sh.600519")]})
+
+    agent = BenchAgent(name="基准Agent", tools=[fetch_quote], system_prompt="你是一个股票分析师。")
+    agent.progress_callback.verbose = False
+    return agent
+
+
+def run_benchmark(analyses: int = ANALYSES) -> dict:
+    """运行同步/异步对比，返回耗时、线程数和各方式下LLM/数据接口的最大并发数"""
+    server = StubLLMServer(latency=LLM_LATENCY).start()
+    original = (config.OPENAI_BASE_URL, config.OPENAI_API_KEY)
+    config.OPENAI_BASE_URL, config.OPENAI_API_KEY = server.base_url, "stub-key"
+    try:
+        agent = _build_agent()
+
+        # 预热 (建立连接、初始化客户端)
+        agent.run({})
+        asyncio.run(agent.arun({}))
+
+        server.max_in_flight = 0
+        _InFlight.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=SYNC_THREADS) as pool:
+            sync_results = list(pool.map(lambda _: agent.run({}), range(analyses)))
+        sync_time = time.perf_counter() - start
+        sync_peaks = (server.max_in_flight, _InFlight.peak)
+
+        async def run_all():
+            threads_before = threading.active_count()
+            tasks = [agent.arun({}) for _ in range(analyses)]
+            results = await asyncio.gather(*tasks)
+            return results, threading.active_count() - threads_before
+
+        server.max_in_flight = 0
+        _InFlight.reset()
+        start = time.perf_counter()
+        async_results, extra_threads = asyncio.run(run_all())
+        async_time = time.perf_counter() - start
+        async_peaks = (server.max_in_flight, _InFlight.peak)
+    finally:
+        config.OPENAI_BASE_URL, config.OPENAI_API_KEY = original
+        server.stop()
+
+    assert all(r['messages'][-1].content == server.answer for r in sync_results + async_results)
+    return {
+        'analyses': analyses,
+        'sync_time': sync_time,
+        'async_time': async_time,
+        'speedup': sync_time / async_time,
+        'async_extra_threads': extra_threads,
+        'sync_llm_in_flight': sync_peaks[0],
+        'sync_tool_in_flight': sync_peaks[1],
+        'async_llm_in_flight': async_peaks[0],
+        'async_tool_in_flight': async_peaks[1],
+    }
+
+
+def test_async_path_beats_thread_per_node():
+    """异步路径的并发度不受线程数限制: LLM请求和数据接口调用同时进行的数量超过同步方式的线程数"""
+    result = run_benchmark()
+    print(f"\n同步 ({SYNC_THREADS} 线程): {result['sync_time']:.2f}s, LLM最大并发 {result['sync_llm_in_flight']}; "
+          f"异步 (单事件循环): {result['async_time']:.2f}s, LLM最大并发 {result['async_llm_in_flight']}, "
+          f"数据接口最大并发 {result['async_tool_in_flight']}")
+    assert result['sync_llm_in_flight'] <= SYNC_THREADS and result['sync_tool_in_flight'] <= SYNC_THREADS
+    assert result['async_llm_in_flight'] > SYNC_THREADS
+    assert result['async_tool_in_flight'] > SYNC_THREADS
+
+
+if __name__ == "__main__":
+    result = run_benchmark()
+    print("=" * 60)
+    print("异步执行并发基准")
+    print("=" * 60)
+    for key, value in result.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,119 @@
+"""
+批量分析测试
+
+用假Agent构建带检查点的生产工作流，验证:
+1. 有限并发下批量分析的吞吐 (并发3时约为串行的3倍)
+2. 每项完成即写入报告和 summary.jsonl；失败项在恢复时从检查点继续，已完成项跳过
+3. 数据缓存: 并发相同请求只访问一次数据源，结果以副本返回
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pandas as pd
+from graph.batch import BatchRun, load_items, normalize_code, run_batch
+from tests.fake_graph import build_graph, fake_planner, fake_summarizer, sqlite_checkpointer
+from tools.data_cache import cached_data
+
+LATENCY = 0.2      # 每个分析节点的模拟耗时 (秒)
+ITEMS = 6
+calls = []         # (节点, 股票代码)
+failures = set()   # 下一次分析时失败的股票代码 (新闻节点抛出异常)
+
+
+def _plan(state):
+    code = re.search(r'(s[hz]\.\d{6})', state['user_query']).group(1)
+    return {'intent': 'stock', 'company_name': f"公司{code[-3:]}", 'stock_code': code, 'market': 'A股'}
+
+
+def _fail_news(node: str, state: dict):
+    if node == 'news' and state['stock_code'] in failures:
+        failures.discard(state['stock_code'])
+        raise RuntimeError("新闻源超时")
+
+
+def _build_graph(db_path):
+    return build_graph(planner=fake_planner(_plan), summarizer=fake_summarizer(latency=LATENCY), calls=calls,
+                       latency=LATENCY, hook=_fail_news, with_code=True, checkpointer=sqlite_checkpointer(db_path))
+
+
+def _codes(n: int):
+    return [f"sh.600{i:03d}" for i in range(n)]
+
+
+def test_batch_concurrency_and_resume(tmp_path):
+    """并发执行、逐项记录，恢复时只重跑失败项中未完成的节点"""
+    graph = _build_graph(tmp_path / "checkpoints.sqlite")
+    items = load_items(codes=_codes(ITEMS))
+    calls.clear()
+    failures.add('sh.600002')
+
+    serial = BatchRun.create(items[:2], root=tmp_path / "serial")
+    serial_stats = asyncio.run(run_batch(graph, serial, concurrency=1))
+    batch = BatchRun.create(items, root=tmp_path / "batch")
+    stats = asyncio.run(run_batch(graph, batch, concurrency=3))
+    serial_rate = serial_stats['ok'] / (serial_stats['elapsed'] / 60)
+    print(f"\n串行: {serial_rate:.0f} 份/分钟, 并发3: {stats['reports_per_minute']:.0f} 份/分钟 "
+          f"({stats['ok']} 成功, {stats['failed']} 失败, {stats['elapsed']:.2f}s)")
+    assert stats['ok'] == ITEMS - 1 and stats['failed'] == 1
+    assert stats['reports_per_minute'] > serial_rate * 2
+
+    lines = [json.loads(line) for line in batch.summary_path.read_text(encoding='utf-8').splitlines()]
+    assert len(lines) == ITEMS
+    assert all(os.path.exists(entry['report']) for entry in lines if entry['status'] == 'ok')
+
+    # 恢复: 只有失败项待处理，且其余三个分析节点不再执行
+    resumed = BatchRun.load(batch.batch_id, root=tmp_path / "batch")
+    assert resumed.pending() == [2]
+    calls.clear()
+    stats = asyncio.run(run_batch(graph, resumed, concurrency=3))
+    assert (stats['ok'], stats['failed'], stats['skipped']) == (1, 0, ITEMS - 1)
+    assert calls == [('news', 'sh.600002')]
+    assert resumed.pending() == []
+
+
+def test_normalize_code():
+    assert normalize_code("600519") == "sh.600519"
+    assert normalize_code("SZ000858") == "sz.000858"
+    assert normalize_code("sh.600519") == "sh.600519"
+    assert normalize_code("贵州茅台") is None
+
+
+def test_data_cache_single_flight():
+    """并发相同请求只访问一次数据源；DataFrame结果以副本返回"""
+    fetches = []
+
+    @cached_data(namespace='test_k_data', ttl=60)
+    def fetch(code):
+        fetches.append(code)
+        time.sleep(0.2)
+        return pd.DataFrame({'close': [1.0, 2.0]})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch('sh.600519'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fetches == ['sh.600519']
+    results[0].loc[0, 'close'] = 99.0
+    assert fetch('sh.600519').loc[0, 'close'] == 1.0
+    fetch('sz.000858')
+    assert fetches == ['sh.600519', 'sz.000858']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_batch_concurrency_and_resume(Path(tmp))
+    test_normalize_code()
+    test_data_cache_single_flight()
+    print("✅ 批量分析测试通过")
@@ -0,0 +1,115 @@
+"""
+检查点与恢复运行测试
+
+用假Agent构建带本地SQLite检查点的生产工作流，验证:
+1. 某个并行分析节点失败后恢复，只重新执行该节点 (已完成的分析不重复调用)
+2. 总结节点报错结束的运行恢复时只重新执行总结
+3. 紧凑序列化 (zlib) 可正确往返，且异步路径 (ainvoke) 同样写入检查点
+"""
+import asyncio
+import os
+import sys
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import graph.workflow as workflow
+from graph.checkpoint import CompactSerializer, resume_point, run_config
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from tests.fake_graph import build_graph, fake_planner, fake_summarizer, sqlite_checkpointer
+
+calls = []       # 各节点的执行记录
+failures = set()  # 下一次执行时失败的节点
+finished = []     # 已返回结果的分析节点 (失败节点等其余分析完成后再抛出异常)
+siblings_done = threading.Event()
+
+
+def _fail_once(node: str, state: dict):
+    """failures 中的节点失败一次 (分析节点抛出异常，总结返回错误)"""
+    if node in failures:
+        failures.discard(node)
+        if node == 'summarizer':
+            return {'final_report': '报告生成失败: rate limited', 'error': 'rate limited'}
+        siblings_done.wait(timeout=5)
+        raise RuntimeError(f"{node} 数据源超时")
+    if node != 'summarizer':
+        finished.append(node)
+        if len(finished) == len(workflow.ANALYSIS_NODES) - 1:
+            siblings_done.set()
+    return None
+
+
+def _build_graph(db_path):
+    return build_graph(planner=fake_planner(calls=calls), summarizer=fake_summarizer(calls, hook=_fail_once),
+                       calls=calls, hook=_fail_once, checkpointer=sqlite_checkpointer(db_path))
+
+
+def test_resume_reruns_only_failed_node(tmp_path):
+    """并行分析中一个节点失败，恢复时其余三个分析不再执行"""
+    graph = _build_graph(tmp_path / "checkpoints.sqlite")
+    calls.clear(), finished.clear(), siblings_done.clear()
+    failures.add('news')
+    try:
+        graph.invoke({'user_query': "分析贵州茅台", 'messages': []}, config=run_config("run-1"))
+        raised = False
+    except RuntimeError:
+        raised = True
+    assert raised
+
+    # 失败节点等其余分析返回后才抛出异常；其结果写入检查点前的极短窗口内仍可能被中断，
+    # 因此只要求失败节点待恢复，且已写入检查点的分析不再执行
+    graph_config, nodes = resume_point(graph, "run-1")
+    assert 'news' in nodes and set(nodes) <= set(workflow.ANALYSIS_NODES)
+
+    calls.clear()
+    result = graph.invoke(None, config=graph_config)
+    print(f"\n恢复后执行的节点: {calls}")
+    assert sorted(calls[:-1]) == sorted(nodes) and calls[-1] == 'summarizer'
+    assert result['final_report'].count('of sh.600519') == 4
+    assert resume_point(graph, "run-1") == (None, [])
+
+
+def test_resume_reruns_failed_summarizer(tmp_path):
+    """总结失败 (节点内捕获异常) 的运行恢复时只重新生成报告"""
+    graph = _build_graph(tmp_path / "checkpoints.sqlite")
+    failures.add('summarizer')
+    result = graph.invoke({'user_query': "分析贵州茅台", 'messages': []}, config=run_config("run-2"))
+    assert result['error']
+
+    graph_config, nodes = resume_point(graph, "run-2")
+    assert nodes == ['summarizer']
+
+    calls.clear()
+    result = graph.invoke(None, config=graph_config)
+    assert calls == ['summarizer']
+    assert not result.get('error')
+    assert result['final_report'].count('of sh.600519') == 4
+    assert resume_point(graph, "missing-run") is None
+
+
+def test_compact_serializer_and_async_path(tmp_path):
+    """压缩编码可往返且更小；异步执行同样写入检查点"""
+    serde = CompactSerializer()
+    state = {'final_report': "## 贵州茅台投资分析报告\n" + "营收稳定增长，毛利率保持高位。" * 200}
+    type_, data = serde.dumps_typed(state)
+    plain_size = len(JsonPlusSerializer().dumps_typed(state)[1])
+    print(f"\n检查点编码: msgpack {plain_size} 字节 -> {type_} {len(data)} 字节")
+    assert type_.endswith('+zlib') and len(data) < plain_size / 4
+    assert serde.loads_typed((type_, data)) == state
+
+    graph = _build_graph(tmp_path / "checkpoints.sqlite")
+    result = asyncio.run(graph.ainvoke({'user_query': "分析贵州茅台", 'messages': []},
+                                       config=run_config("run-3")))
+    assert result['final_report'].count('of sh.600519') == 4
+    assert resume_point(graph, "run-3") == (None, [])
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_resume_reruns_only_failed_node(Path(tmp))
+        test_resume_reruns_failed_summarizer(Path(tmp))
+        test_compact_serializer_and_async_path(Path(tmp))
+    print("✅ 检查点测试通过")
@@ -0,0 +1,130 @@
+"""
+图级请求合并测试
+
+用固定耗时的假Agent构建生产工作流，验证:
+1. 多个线程 (各自的事件循环，模拟Streamlit会话) 和批量任务同时分析同一股票时只运行一次，
+   follower 收到完整的事件流和同一份结果
+2. leader 中途放弃时 follower 重新发起运行
+3. 合并键的本地解析
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import graph.workflow as workflow
+from graph.coalesce import RunCoalescer, run_key
+from tests.fake_graph import build_graph, fake_planner, fake_summarizer
+
+LATENCY = 0.3  # 每个分析节点的模拟耗时 (秒)
+calls = []     # 执行的节点
+
+
+def _report(node, state):
+    return {'final_report': f"report of {state['stock_code']}"}
+
+
+def _build_graph():
+    return build_graph(planner=fake_planner(calls=calls), summarizer=fake_summarizer(calls, hook=_report),
+                       calls=calls, latency=LATENCY)
+
+
+async def _stream(coalescer, graph, query, stop_after=None):
+    """像 app.py 一样从事件流收集最终状态"""
+    state = {'user_query': query, 'messages': []}
+    final_state, ended = {}, []
+    async for event in coalescer.astream_events(graph, state, {}, run_key(state), version="v1"):
+        if event['event'] == 'on_chain_end' and isinstance(event['data'].get('output'), dict):
+            final_state.update(event['data']['output'])
+            ended.append(event['name'])
+        if stop_after and stop_after in ended:
+            break
+    return final_state, ended
+
+
+def test_concurrent_identical_runs_share_one_run():
+    graph = _build_graph()
+    coalescer = RunCoalescer()
+    calls.clear()
+    results = {}
+
+    def session(name, query):
+        results[name] = asyncio.run(_stream(coalescer, graph, query))
+
+    async def batch_item():
+        await asyncio.sleep(0.05)
+        state = {'user_query': "贵州茅台投资价值", 'messages': []}
+        return await coalescer.ainvoke(graph, state, {}, run_key(state))
+
+    threads = [threading.Thread(target=session, args=(f"user{i}", query)) for i, query in
+               enumerate(["分析贵州茅台", "分析一下茅台", "600519 值得投资吗"])]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    batch_result = asyncio.run(batch_item())
+    for thread in threads:
+        thread.join()
+    print(f"\n4个相同请求合并后节点调用 {len(calls)} 次")
+
+    # 只运行一次工作流
+    assert sorted(calls) == sorted(['planner', 'summarizer'] + workflow.ANALYSIS_NODES)
+    for final_state, ended in results.values():
+        assert final_state['final_report'] == "report of sh.600519"
+        assert set(workflow.ANALYSIS_NODES) <= set(ended)   # follower 也收到各节点的事件
+    assert batch_result['final_report'] == "report of sh.600519"
+
+    # 运行结束后不再合并
+    calls.clear()
+    asyncio.run(_stream(coalescer, graph, "分析贵州茅台"))
+    assert 'planner' in calls
+
+
+def test_follower_restarts_when_leader_abandons():
+    graph = _build_graph()
+    coalescer = RunCoalescer()
+    calls.clear()
+    results = {}
+
+    def leader():
+        results['leader'] = asyncio.run(_stream(coalescer, graph, "分析贵州茅台", stop_after='planner'))
+
+    def follower():
+        time.sleep(0.05)
+        results['follower'] = asyncio.run(_stream(coalescer, graph, "分析贵州茅台"))
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=follower)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'final_report' not in results['leader'][0]
+    assert results['follower'][0]['final_report'] == "report of sh.600519"
+    assert calls.count('planner') == 2
+
+
+def test_run_key():
+    base = run_key({'user_query': "分析贵州茅台"})
+    assert base[:3] == ('stock', 'sh.600519', ())
+    assert run_key({'user_query': "600519投资分析"}) == base
+    assert run_key({'user_query': "分析贵州茅台"}, {'deadline': 90}) != base
+    assert run_key({'user_query': "茅台最近K线怎么样"})[2] == ('technical',)
+    # 单一维度的简短回答针对问题本身: 问题不同不合并，仅标点/空白不同时合并
+    assert run_key({'user_query': "茅台的K线支撑位在哪"}) != run_key({'user_query': "茅台最近K线怎么样"})
+    assert run_key({'user_query': "茅台最近K线怎么样？"}) == run_key({'user_query': "茅台最近 k线怎么样"})
+    assert run_key({'user_query': "比较茅台和五粮液"}) is None
+    assert run_key({'user_query': "什么是市盈率"}) is None
+    # 追问同一股票会复用会话中的结果，不与其他会话合并
+    context = {'stock_code': 'sh.600519', 'company_name': '贵州茅台', 'analyses': {}}
+    assert run_key({'user_query': "分析贵州茅台", 'session_context': context}) is None
+    assert run_key({'user_query': "分析五粮液", 'session_context': context}) is not None
+
+
+if __name__ == "__main__":
+    test_concurrent_identical_runs_share_one_run()
+    test_follower_restarts_when_leader_abandons()
+    test_run_key()
+    print("✅ 请求合并测试通过")
@@ -0,0 +1,166 @@
+"""
+多股票对比测试
+
+用固定耗时的假Agent构建生产工作流 (规划的股票列表用真实解析逻辑，对比节点用真实Agent + 假LLM)，验证:
+1. 每只股票一个分析子图，各股票的分析并发执行 (同时执行的节点数超过单只股票的节点数)
+2. 各股票结果按代码合并，对比报告包含本地计算的并排指标表
+3. 行情/财务指标的本地计算
+"""
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pandas as pd
+from langchain_core.messages import AIMessage
+import agents.comparison_agent as comparison_agent
+import graph.workflow as workflow
+from agents.comparison_agent import ComparisonAgent
+from agents.planner_agent import PlannerAgent
+from tests.fake_graph import FakeLLM, InFlight, build_graph, fake_planner, fake_summarizer
+from tools.comparison import format_comparison_table, price_metrics, profit_metrics
+
+LATENCY = 0.3  # 每个分析节点的模拟耗时 (秒)
+calls = []     # (节点, 股票代码)
+
+
+def _plan(state):
+    stocks = PlannerAgent._plan_stocks(None, state['user_query'])
+    first = stocks[0] if stocks else {'company_name': '贵州茅台', 'stock_code': 'sh.600519', 'market': 'A股-上海'}
+    return {'intent': 'stock', **first, 'stocks': stocks,
+            'dimensions': PlannerAgent._plan_dimensions(None, state['user_query'])}
+
+
+def FakeComparison():
+    agent = ComparisonAgent.__new__(ComparisonAgent)
+    agent.llm = FakeLLM('comparison')
+    return agent
+
+
+def fake_metrics(code):
+    return {'close': float(code[-3:]), 'roe': 30.0 if code == 'sh.600519' else 20.0, 'report_period': '2025-06-30'}
+
+
+def _single_report(node, state):
+    return {'final_report': f"single {state['stock_code']}"}
+
+
+def _build_graph(in_flight=None):
+    return build_graph(planner=fake_planner(_plan), summarizer=fake_summarizer(hook=_single_report), calls=calls,
+                       latency=LATENCY, with_code=True, in_flight=in_flight, ComparisonAgent=FakeComparison)
+
+
+def _with_fake_metrics(func):
+    original = comparison_agent.fetch_stock_metrics
+    comparison_agent.fetch_stock_metrics = fake_metrics
+    try:
+        return func()
+    finally:
+        comparison_agent.fetch_stock_metrics = original
+
+
+def _check(result, in_flight):
+    codes = ['sh.600519', 'sz.000858', 'sh.600036']
+    assert [s['stock_code'] for s in result['stocks']] == codes
+    assert sorted(r['stock_code'] for r in result['stock_results']) == sorted(codes)
+    assert sorted(calls) == sorted((node, code) for node in workflow.ANALYSIS_NODES for code in codes)
+    report = result['final_report']
+    assert report.startswith("# 贵州茅台 vs 五粮液 vs 招商银行 对比分析报告")
+    assert "| ROE | 30.00% | 20.00% | 20.00% |" in report
+    assert "news of sz.000858" in report
+    # 三只股票的分析并发执行: 同时执行的节点多于一只股票的节点数
+    assert in_flight.peak > len(workflow.ANALYSIS_NODES)
+
+
+def test_comparison_sync():
+    in_flight = InFlight()
+    graph = _build_graph(in_flight)
+
+    def run():
+        calls.clear()
+        return graph.invoke({'user_query': "比较茅台、五粮液和招商银行", 'messages': []})
+
+    result = _with_fake_metrics(run)
+    print(f"\n同步对比3只股票: 最大同时执行节点数 {in_flight.peak}")
+    _check(result, in_flight)
+
+
+def test_comparison_async_with_dimensions():
+    """异步路径；只问估值时每只股票只运行估值节点"""
+    in_flight = InFlight()
+    graph = _build_graph(in_flight)
+
+    async def run(query):
+        calls.clear()
+        return await graph.ainvoke({'user_query': query, 'messages': []})
+
+    result = _with_fake_metrics(lambda: asyncio.run(run("比较茅台、五粮液和招商银行")))
+    print(f"\n异步对比3只股票: 最大同时执行节点数 {in_flight.peak}")
+    _check(result, in_flight)
+
+    result = _with_fake_metrics(lambda: asyncio.run(run("茅台和五粮液的市盈率哪个低")))
+    assert sorted(calls) == [('valuation', 'sh.600519'), ('valuation', 'sz.000858')]
+    assert 'fundamental_analysis' not in result['stock_results'][0]
+
+    # 单只股票仍走原流程
+    result = _with_fake_metrics(lambda: asyncio.run(run("分析贵州茅台")))
+    assert result['final_report'] == "single sh.600519" and not result['stocks']
+
+
+def test_local_metrics():
+    k_data = pd.DataFrame({
+        'date': ['2025-01-02', '2025-01-03', '2025-01-06', '2025-01-07'],
+        'close': ['100', '120', '90', '110'],
+        'pctChg': ['0', '20', '-25', '22.2222'],
+        'peTTM': ['25.1', '25.3', '', '24.8'],
+        'pbMRQ': ['8.0', '8.1', '7.9', '8.2'],
+    })
+    metrics = price_metrics(k_data)
+    assert metrics['close'] == 110.0
+    assert round(metrics['return_1y'], 2) == 10.0
+    assert round(metrics['max_drawdown'], 2) == -25.0
+    assert metrics['pe_ttm'] == 24.8 and metrics['pb_mrq'] == 8.2
+    assert metrics['volatility'] > 0
+
+    profit = pd.DataFrame({'statDate': ['2025-06-30'], 'roeAvg': ['0.165'], 'npMargin': ['0.52'], 'gpMargin': ['']})
+    metrics.update(profit_metrics(profit))
+    assert round(metrics['roe'], 1) == 16.5 and metrics['gp_margin'] is None
+
+    table = format_comparison_table([{'company_name': '贵州茅台', 'stock_code': 'sh.600519'}], [metrics])
+    assert "| 毛利率 | - |" in table and "| 财报期 | 2025-06-30 |" in table
+    assert price_metrics(pd.DataFrame())['close'] is None
+
+
+def test_plan_stocks():
+    assert PlannerAgent._plan_stocks(None, "分析贵州茅台") == []
+    stocks = PlannerAgent._plan_stocks(None, "比较茅台和五粮液")
+    assert [s['stock_code'] for s in stocks] == ['sh.600519', 'sz.000858']
+    llm_stocks = [{'company_name': '宁德时代', 'stock_code': 'SZ.300750'},
+                  {'company_name': '比亚迪', 'stock_code': 'sz.002594', 'market': 'A股-深圳'}]
+    stocks = PlannerAgent._plan_stocks(llm_stocks, "宁德时代和比亚迪谁更强")
+    assert stocks[0] == {'company_name': '宁德时代', 'stock_code': 'sz.300750', 'market': 'A股-深圳'}
+
+
+def test_parse_plan_replies():
+    planner = PlannerAgent.__new__(PlannerAgent)   # 只测试解析，不需要LLM
+    # 无JSON的文字回复: 降级为通用问答，而不是抛出异常
+    plan = planner._parse_plan('stock', {'messages': [AIMessage(content="无法识别，请确认公司名称")]}, '分析一下')
+    assert plan['intent'] == 'general' and plan['stocks'] == []
+    # 没有代码块的裸JSON，stocks 为嵌套对象列表
+    reply = ('对比结果如下 {"company_name": "宁德时代", "stock_code": "", "market": "", '
+             '"stocks": [{"company_name": "宁德时代", "stock_code": "sz.300750"}, '
+             '{"company_name": "比亚迪", "stock_code": "sz.002594"}]} 请确认')
+    plan = planner._parse_plan('stock', {'messages': [AIMessage(content=reply)]}, '宁德时代和比亚迪谁更强')
+    assert plan['stock_code'] == 'sz.300750'
+    assert [s['stock_code'] for s in plan['stocks']] == ['sz.300750', 'sz.002594']
+
+
+if __name__ == "__main__":
+    test_comparison_sync()
+    test_comparison_async_with_dimensions()
+    test_local_metrics()
+    test_plan_stocks()
+    test_parse_plan_replies()
+    print("✅ 多股票对比测试通过")
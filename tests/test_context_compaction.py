@@ -0,0 +1,90 @@
+"""
+ReAct上下文压缩测试
+复现 test_api_speed.py 中的实际场景 (24个工具返回)，验证每轮发送的prompt大小保持平稳
+"""
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from agents.context_compactor import ContextCompactor, CompactionStats, digest_tool_output, message_tokens
+
+
+TOOL_RESULT = """### sh.600519 2024Q3 盈利能力数据
+
+| code | pubDate | statDate | roeAvg | npMargin | gpMargin | netProfit | epsTTM |
+|:--|:--|:--|:--|:--|:--|:--|:--|
+| sh.600519 | 2024-10-31 | 2024-09-30 | 8.2345 | 52.1234 | 91.2345 | 50912345678 | 40.12 |
+""" + "\n".join(
+    f"| sh.600519 | 2024-{m:02d}-01 | 2024-{m:02d}-30 | 8.{m} | 52.{m} | 91.{m} | 5091234{m:04d} | 40.{m} |"
+    for m in range(1, 13)
+) + "\n\n说明：ROE较高，盈利能力优秀。"
+
+
+def _build_history(tool_calls: int) -> list:
+    """构造包含N次工具调用的ReAct消息历史"""
+    messages = [
+        SystemMessage(content="你是一个股票分析师。"),
+        HumanMessage(content="分析贵州茅台的基本面，请调用所有财务工具"),
+    ]
+    for i in range(tool_calls):
+        messages.append(AIMessage(content="", tool_calls=[{"id": f"call_{i}", "name": f"tool_{i}", "args": {}}]))
+        messages.append(ToolMessage(content=TOOL_RESULT, tool_call_id=f"call_{i}", id=f"tool_msg_{i}"))
+    return messages
+
+
+def test_digest_keeps_title_and_header():
+    """摘要保留标题、表头，并省略中间数据行"""
+    digest = digest_tool_output(TOOL_RESULT, max_chars=600, max_rows=4)
+    assert "### sh.600519 2024Q3 盈利能力数据" in digest
+    assert "| code | pubDate" in digest
+    assert "省略" in digest
+    assert len(digest) < len(TOOL_RESULT)
+
+
+def test_unseen_tool_result_is_kept():
+    """最近一轮工具结果尚未被LLM看过，必须保留原文"""
+    compactor = ContextCompactor(token_budget=100000)
+    compacted = compactor.compact(_build_history(3))
+    assert compacted[-1].content == TOOL_RESULT
+    assert compacted[3].content != TOOL_RESULT
+
+
+def test_tool_calls_stay_paired():
+    """按预算丢弃时整轮移除，tool_call 与 ToolMessage 保持成对"""
+    compactor = ContextCompactor(token_budget=800)
+    compacted = compactor.compact(_build_history(24))
+    call_ids = {tc["id"] for m in compacted if isinstance(m, AIMessage) for tc in m.tool_calls}
+    tool_ids = {m.tool_call_id for m in compacted if isinstance(m, ToolMessage)}
+    assert call_ids == tool_ids
+    assert isinstance(compacted[0], SystemMessage)
+    assert isinstance(compacted[1], HumanMessage)
+
+
+def test_prompt_size_stays_flat():
+    """随着工具调用次数增加，每轮发送的token数不再线性增长"""
+    compactor = ContextCompactor(token_budget=3000)
+    stats = CompactionStats()
+    for n in range(1, 25):
+        compactor.compact(_build_history(n), stats)
+
+    full_tokens = sum(message_tokens(m) for m in _build_history(24))
+    sent = stats.prompt_tokens_per_call
+    print(f"\n不压缩: {full_tokens} tokens, 压缩后最后一轮: {sent[-1]} tokens")
+    print(f"统计: {stats.summary()}")
+
+    assert max(sent) <= 3000
+    assert sent[-1] < full_tokens / 2
+    # 后半程每轮发送量基本持平
+    assert max(sent[12:]) - min(sent[12:]) < 0.25 * max(sent[12:])
+    assert stats.saved_tokens > 0
+
+
+if __name__ == "__main__":
+    test_digest_keeps_title_and_header()
+    test_unseen_tool_result_is_kept()
+    test_tool_calls_stay_paired()
+    test_prompt_size_stays_flat()
+    print("✅ 上下文压缩测试通过")
@@ -0,0 +1,124 @@
+"""
+运行时限 (--deadline) 测试
+
+用假Agent构建生产工作流，其中新闻分析远慢于时限，验证:
+1. 同步/异步路径下不等待慢节点完成即生成报告，慢节点被放弃并记入 timed_out_nodes
+2. 总结Prompt和报告头标注缺失的分析
+3. 截止时间临近时 pre_model_hook 追加收尾指令；时长字符串解析
+"""
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import HumanMessage
+import graph.workflow as workflow
+from agents.context_compactor import ContextCompactor, WRAP_UP_PROMPT
+from agents.summarizer_agent import SummarizerAgent, MISSING_SECTION
+from config import config
+from graph.deadline import parse_duration
+from llm.gateway import run_deadline
+from tests.fake_graph import build_graph
+
+DEADLINE = 1.5     # 运行时限 (秒)
+SLOW_LATENCY = 3   # 慢节点耗时 (秒)
+finished = []      # 已完成的分析节点
+
+
+class FakeSummarizer:
+    """用真实总结Agent的Prompt构建逻辑，不调用LLM"""
+
+    def run(self, state):
+        agent = SummarizerAgent.__new__(SummarizerAgent)
+        prompt = agent._build_messages(state, "")[0].content
+        return {'final_report': prompt}
+
+    async def arun(self, state):
+        return self.run(state)
+
+
+def _build_graph():
+    latency = {node: 0.1 for node in workflow.ANALYSIS_NODES}
+    return build_graph(summarizer=FakeSummarizer, latency={**latency, 'news': SLOW_LATENCY},
+                       hook=lambda node, state: finished.append(node))
+
+
+def _check(result: dict, done: list):
+    # 报告生成时慢节点尚未完成 (没有等待它)
+    assert sorted(done) == sorted(set(workflow.ANALYSIS_NODES) - {'news'})
+    assert result['timed_out_nodes'] == ['news']
+    assert result['final_report'].count('of sh.600519') == 3
+    assert MISSING_SECTION in result['final_report']
+
+
+def _with_small_reserve(func):
+    original = config.DEADLINE_SUMMARY_RESERVE
+    config.DEADLINE_SUMMARY_RESERVE = 0.3
+    try:
+        return func()
+    finally:
+        config.DEADLINE_SUMMARY_RESERVE = original
+
+
+def test_deadline_sync():
+    """同步路径: 慢节点超过预算后不再等待"""
+    graph = _build_graph()
+
+    def run():
+        finished.clear()
+        with run_deadline(DEADLINE):
+            result = graph.invoke({'user_query': "分析贵州茅台", 'messages': []})
+        return result, list(finished)
+
+    _check(*_with_small_reserve(run))
+
+
+def test_deadline_async():
+    """异步路径: 慢节点超过预算后被取消"""
+    graph = _build_graph()
+
+    async def run():
+        finished.clear()
+        with run_deadline(DEADLINE):
+            result = await graph.ainvoke({'user_query': "分析贵州茅台", 'messages': []})
+        return result, list(finished)
+
+    _check(*_with_small_reserve(lambda: asyncio.run(run())))
+
+
+def test_no_deadline_unchanged():
+    """未设置时限时所有节点照常完成 (等待慢节点)"""
+    graph = _build_graph()
+    result = graph.invoke({'user_query': "分析贵州茅台", 'messages': []})
+    assert not result.get('timed_out_nodes')
+    assert result['final_report'].count('of sh.600519') == 4
+    assert SummarizerAgent._missing_sections(result) == []
+
+
+def test_wrap_up_and_duration_parsing():
+    """截止时间临近时追加收尾指令；时长字符串解析"""
+    hook = ContextCompactor().as_pre_model_hook(wrap_up_seconds=10)
+    messages = [HumanMessage(content="分析贵州茅台基本面")]
+    assert hook({'messages': messages}, {})['llm_input_messages'][-1].content != WRAP_UP_PROMPT
+    with run_deadline(5):
+        assert hook({'messages': messages}, {})['llm_input_messages'][-1].content == WRAP_UP_PROMPT
+
+    assert parse_duration("90s") == 90
+    assert parse_duration("2m") == 120
+    assert parse_duration("1m30s") == 90
+    assert parse_duration("45") == 45
+    try:
+        parse_duration("90x")
+        assert False, "应拒绝无法识别的时长"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_deadline_sync()
+    test_deadline_async()
+    test_no_deadline_unchanged()
+    test_wrap_up_and_duration_parsing()
+    print("✅ 运行时限测试通过")
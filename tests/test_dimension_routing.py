@@ -0,0 +1,82 @@
+"""
+分析维度路由测试
+
+用假Agent构建生产工作流 (规划维度用真实的解析逻辑，总结用真实Agent + 假LLM)，验证:
+1. 窄问题只扇出到对应的分析节点，单一维度由轻量总结路径 (快速模型) 直接回答
+2. 多个维度只运行对应节点，总结Prompt中未请求的章节以占位说明代替
+3. 完整分析仍运行全部节点；LLM给出的具体维度优先于关键词
+"""
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import graph.workflow as workflow
+from agents.dimensions import match_dimensions
+from agents.planner_agent import PlannerAgent
+from agents.summarizer_agent import SummarizerAgent, NOT_REQUESTED_SECTION
+from tests.fake_graph import build_graph, fake_planner, llm_summarizer
+
+calls = []  # 执行的分析节点和总结使用的模型
+
+
+def _plan(state):
+    return {'intent': 'stock', 'company_name': '贵州茅台', 'stock_code': 'sh.600519', 'market': 'A股-上海',
+            'dimensions': PlannerAgent._plan_dimensions(None, state['user_query'])}
+
+
+def _build_graph():
+    return build_graph(planner=fake_planner(_plan), summarizer=llm_summarizer(calls), calls=calls)
+
+
+def _run(graph, query):
+    calls.clear()
+    return graph.invoke({'user_query': query, 'messages': []})
+
+
+def test_single_dimension_uses_brief_path():
+    """窄问题只运行一个分析节点，总结走快速模型的简短回答"""
+    graph = _build_graph()
+    result = _run(graph, "茅台最近K线怎么样")
+    assert calls == ['technical', 'brief_summary']
+    assert result['dimensions'] == ['technical']
+    assert "技术分析" in result['final_report'].splitlines()[0]
+    assert "technical of sh.600519" in result['final_report']
+    assert "茅台最近K线怎么样" in result['final_report']
+
+    result = _run(graph, "五粮液的市盈率")
+    assert calls == ['valuation', 'brief_summary']
+
+
+def test_multiple_dimensions_and_full_report():
+    """多个维度只运行对应节点；完整分析运行全部节点"""
+    graph = _build_graph()
+    result = _run(graph, "茅台的估值和最近的新闻")
+    assert sorted(calls[:-1]) == ['news', 'valuation'] and calls[-1] == 'summary'
+    report = result['final_report']
+    assert report.count(NOT_REQUESTED_SECTION) == 2
+    assert "valuation of sh.600519" in report and "news of sh.600519" in report
+    assert SummarizerAgent._missing_sections(result) == []
+
+    result = _run(graph, "分析贵州茅台的投资价值")
+    assert sorted(calls[:-1]) == sorted(workflow.ANALYSIS_NODES) and calls[-1] == 'summary'
+    assert NOT_REQUESTED_SECTION not in result['final_report']
+    print(f"\n窄问题: 2 次Agent调用; 完整分析: {len(calls)} 次Agent调用")
+
+
+def test_plan_dimensions():
+    """LLM给出的具体维度优先；full/无效值回退到关键词"""
+    assert PlannerAgent._plan_dimensions(['technical'], "分析贵州茅台") == ['technical']
+    assert PlannerAgent._plan_dimensions(['news', 'Fundamental'], "") == ['fundamental', 'news']
+    assert PlannerAgent._plan_dimensions(['full'], "茅台最近K线怎么样") == ['technical']
+    assert PlannerAgent._plan_dimensions(['bogus'], "分析贵州茅台") == []
+    assert match_dimensions("宁德时代的ROE和毛利率") == ['fundamental']
+    assert match_dimensions("茅台的K线和市盈率，值得买吗") == []
+
+
+if __name__ == "__main__":
+    test_single_dimension_uses_brief_path()
+    test_multiple_dimensions_and_full_report()
+    test_plan_dimensions()
+    print("✅ 分析维度路由测试通过")
@@ -0,0 +1,108 @@
+"""
+词典实体抽取测试
+
+用固定的股票列表构建名称索引 (不访问数据源)，验证:
+1. Aho-Corasick 自动机的重叠匹配和最左最长匹配
+2. 查询中的名称/简称/曾用名/代码一次扫描抽取，一词多股时标记歧义
+3. 规划Agent在常见情况下不调用LLM，有歧义时回退到LLM规划
+"""
+import json
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage
+import tools.stock_index as stock_index
+from agents.planner_agent import PlannerAgent
+from config import config
+from tools.aho_corasick import AhoCorasick
+from tools.stock_index import StockIndex
+from tools.stock_search import extract_stocks, match_stocks_in_query
+
+STOCKS = [
+    {'code': 'sh.600519', 'name': '贵州茅台', 'aliases': ['茅台']},
+    {'code': 'sz.000858', 'name': '五粮液'},
+    {'code': 'sz.300750', 'name': '宁德时代'},
+    {'code': 'sz.002594', 'name': '比亚迪'},
+    {'code': 'sh.601318', 'name': '中国平安'},
+    {'code': 'sz.000001', 'name': '平安银行'},
+    {'code': 'sz.000002', 'name': '万科A'},
+    {'code': 'sh.600001', 'name': '华夏科技', 'former_names': ['东方电子']},
+    {'code': 'sz.000682', 'name': '东方电子'},
+    {'code': 'sh.600002', 'name': '长城科技', 'former_names': ['长城']},
+    {'code': 'sz.000003', 'name': '长城股份', 'former_names': ['长城']},
+]
+
+
+def _with_index(func):
+    original = stock_index._index
+    stock_index._index = StockIndex(STOCKS)
+    try:
+        return func()
+    finally:
+        stock_index._index = original
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick([('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+    assert sorted(automaton.iter("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+    assert automaton.longest_matches("ushers") == [(1, 4, 2)]
+    automaton = AhoCorasick([('平安', 'a'), ('中国平安', 'b'), ('平安银行', 'c')])
+    assert [m[2] for m in automaton.longest_matches("中国平安和平安银行")] == ['b', 'c']
+
+
+def test_extract_stocks():
+    def run():
+        stocks, ambiguous = extract_stocks("比较茅台、宁德时代和sz.002594")
+        assert [s['code'] for s in stocks] == ['sh.600519', 'sz.300750', 'sz.002594'] and not ambiguous
+        assert stocks[0]['name'] == '贵州茅台' and stocks[0]['text'] == '茅台'
+        assert match_stocks_in_query("中国平安和平安银行哪个好") == [('sh.601318', '中国平安'), ('sz.000001', '平安银行')]
+        assert match_stocks_in_query("万科的估值") == [('sz.000002', '万科A')]   # 去掉A的简称
+        # 曾用名与其他股票的当前名称相同时取当前名称
+        assert match_stocks_in_query("东方电子最近怎么样") == [('sz.000682', '东方电子')]
+        # 曾用名对应多只股票: 有歧义
+        assert extract_stocks("长城最近怎么样") == ([], True)
+        assert extract_stocks("今天大盘怎么样") == ([], False)
+
+    _with_index(run)
+
+
+def test_planner_skips_llm():
+    llm_calls = []
+    planner = PlannerAgent.__new__(PlannerAgent)
+
+    def invoke(inputs):
+        llm_calls.append(inputs)
+        plan = {'company_name': '长城科技', 'stock_code': 'sh.600002', 'market': 'A股-上海'}
+        return {'messages': [AIMessage(content=json.dumps(plan, ensure_ascii=False))]}
+
+    planner.invoke = invoke
+
+    def run():
+        original = config.PREFETCH_ENABLED
+        config.PREFETCH_ENABLED = False
+        try:
+            plan = planner.run({'user_query': "宁德时代的K线"})
+            assert not llm_calls
+            assert plan == {'intent': 'stock', 'company_name': '宁德时代', 'stock_code': 'sz.300750',
+                            'market': 'A股-深圳', 'dimensions': ['technical'], 'stocks': []}
+
+            plan = planner.run({'user_query': "比较茅台和五粮液"})
+            assert [s['stock_code'] for s in plan['stocks']] == ['sh.600519', 'sz.000858'] and not llm_calls
+
+            # 有歧义时交给LLM规划
+            plan = planner.run({'user_query': "分析长城"})
+            assert len(llm_calls) == 1 and plan['stock_code'] == 'sh.600002'
+        finally:
+            config.PREFETCH_ENABLED = original
+
+    _with_index(run)
+
+
+if __name__ == "__main__":
+    test_aho_corasick()
+    test_extract_stocks()
+    test_planner_skips_llm()
+    print("✅ 实体抽取测试通过")
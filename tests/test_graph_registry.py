@@ -0,0 +1,65 @@
+"""
+进程级图/Agent注册表测试
+验证图和Agent每个进程只构建一次 (含并发首次访问)，构建耗时计入当前运行的setup时间
+"""
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from graph import registry as graph_registry
+from monitoring.metrics import registry, new_run_id, run_scope
+
+
+class SlowAgent:
+    """构建耗时较长的假Agent (模拟LLM客户端/向量库初始化)"""
+    constructed = 0
+
+    def __init__(self):
+        time.sleep(0.2)
+        SlowAgent.constructed += 1
+
+
+def test_agent_built_once_under_concurrency():
+    """多个线程同时首次获取Agent时只构建一次"""
+    SlowAgent.constructed = 0
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(graph_registry.get_agent(SlowAgent)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SlowAgent.constructed == 1
+    assert all(agent is results[0] for agent in results)
+
+
+def test_setup_time_recorded_per_run():
+    """首次请求记录构建耗时，后续请求的setup时间为0"""
+    graph_registry.reset()
+
+    first_run = new_run_id()
+    with run_scope(first_run):
+        graph = graph_registry.get_graph()
+        graph_registry.get_agent(SlowAgent)
+
+    second_run = new_run_id()
+    with run_scope(second_run):
+        assert graph_registry.get_graph() is graph
+        graph_registry.get_agent(SlowAgent)
+
+    first = registry.run_summary(first_run)['totals']
+    second = registry.run_summary(second_run)['totals']
+    print(f"\n首次请求setup: {first['setup_time']:.3f}s ({first['setup_calls']} 项), "
+          f"后续请求setup: {second['setup_time']:.3f}s")
+    assert first['setup_calls'] == 2 and first['setup_time'] >= 0.2
+    assert second['setup_calls'] == 0
+
+
+if __name__ == "__main__":
+    test_agent_built_once_under_concurrency()
+    test_setup_time_recorded_per_run()
+    print("✅ 注册表测试通过")
@@ -0,0 +1,144 @@
+"""
+共享HTTP层测试
+
+用本地HTTP服务器 (HTTP/1.1) 验证:
+1. 同步会话和 akshare_transport() 范围内的 requests.get 复用同一条长连接，范围外的 requests.get 不受影响
+2. 配置了有效期的接口命中磁盘缓存 (进程重启后仍有效)，过期后重新请求；未配置的接口不缓存
+3. 异步客户端共享同一份缓存；命中率和节省的字节数可统计
+4. 打开缓存和定期写入时清理过期条目，超过大小上限时淘汰最早过期的条目
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import requests
+import tools.http_client as http_client
+from tools.http_client import (
+    ResponseCache, akshare_transport, create_async_client, get_session, uninstall_requests_transport,
+)
+
+BODY = "茅台 提价".encode('utf-8') * 100
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests_seen = []
+    connections = set()
+
+    def do_GET(self):
+        Handler.requests_seen.append(self.path)
+        Handler.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _with_server(tmp_path, func):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Handler.requests_seen, Handler.connections = [], set()
+    originals = http_client.CACHE_RULES, http_client._cache
+    http_client.CACHE_RULES = [('search', r'^127\.0\.0\.1:\d+/search\?', 0.5)]
+    http_client._cache = ResponseCache(tmp_path / "http_cache.sqlite")
+    try:
+        return func(f"http://127.0.0.1:{server.server_address[1]}")
+    finally:
+        http_client._cache.close()
+        http_client.CACHE_RULES, http_client._cache = originals
+        server.shutdown()
+        server.server_close()
+
+
+def test_keep_alive_and_disk_cache(tmp_path):
+    def run(base):
+        session = get_session()
+        for _ in range(3):
+            assert session.get(f"{base}/search?q=茅台").text == BODY.decode('utf-8')
+        for _ in range(3):
+            session.get(f"{base}/quote?code=600519")   # 未配置的接口每次都请求
+        assert Handler.requests_seen.count('/search?q=%E8%8C%85%E5%8F%B0') == 1
+        assert len(Handler.requests_seen) == 4
+        assert len(Handler.connections) == 1   # 同一条长连接
+
+        # AKShare 范围内的 requests.get 走共享会话；范围外仍按默认行为请求 (不经过缓存)
+        try:
+            with akshare_transport():
+                assert requests.get(f"{base}/search", params={'q': '茅台'}).content == BODY
+            assert len(Handler.requests_seen) == 4 and len(Handler.connections) == 1
+            requests.get(f"{base}/search", params={'q': '茅台'})
+            assert len(Handler.requests_seen) == 5 and len(Handler.connections) == 2
+        finally:
+            uninstall_requests_transport()
+
+        stats = http_client._cache.stats()
+        assert stats['hits'] == 3 and stats['misses'] == 1 and stats['bytes_saved'] == 3 * len(BODY)
+        print(f"\nHTTP缓存命中率 {stats['hit_rate']:.0%}，节省 {stats['bytes_saved']} 字节")
+
+        # 重新打开缓存文件 (模拟进程重启) 仍能命中；过期后重新请求
+        http_client._cache.close()
+        http_client._cache = ResponseCache(tmp_path / "http_cache.sqlite")
+        session.get(f"{base}/search?q=茅台")
+        assert len(Handler.requests_seen) == 5
+        time.sleep(0.6)
+        session.get(f"{base}/search?q=茅台")
+        assert len(Handler.requests_seen) == 6
+        assert http_client._cache.purge_expired() == 0
+
+    _with_server(tmp_path, run)
+
+
+def test_async_client_shares_cache(tmp_path):
+    def run(base):
+        get_session().get(f"{base}/search?q=五粮液")
+
+        async def fetch():
+            async with create_async_client() as client:
+                cached = await client.get(f"{base}/search?q=五粮液")
+                fresh = [await client.get(f"{base}/search?q=宁德时代") for _ in range(2)]
+            return cached, fresh
+
+        cached, fresh = asyncio.run(fetch())
+        assert cached.content == BODY and all(r.text == BODY.decode('utf-8') for r in fresh)
+        assert len(Handler.requests_seen) == 2
+        assert http_client._cache.stats()['endpoints']['search']['hits'] == 2
+
+    _with_server(tmp_path, run)
+
+
+def test_prune_and_size_cap(tmp_path):
+    cache = ResponseCache(tmp_path / "http_cache.sqlite", max_bytes=2500)
+    cache.PRUNE_EVERY = 4
+    cache.put('search', 'expired', 'u0', 200, [], b'x' * 100, ttl=-1)
+    for i in range(3):
+        cache.put('search', f"k{i}", f"u{i}", 200, [], b'x' * 1000, ttl=60 + i)
+    # 第4次写入触发清理: 删除过期条目，超过2500字节时淘汰最早过期的 k0
+    assert cache.get('search', 'expired') is None and cache.get('search', 'k0') is None
+    assert cache.get('search', 'k1') and cache.get('search', 'k2')
+    cache.put('search', 'expired', 'u0', 200, [], b'x', ttl=-1)
+    cache.close()
+
+    # 重新打开时清理过期条目
+    cache = ResponseCache(tmp_path / "http_cache.sqlite")
+    assert cache.purge_expired() == 0
+    cache.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_keep_alive_and_disk_cache(Path(tmp) / "a")
+        test_async_client_shares_cache(Path(tmp) / "b")
+        test_prune_and_size_cap(Path(tmp) / "c")
+    print("✅ 共享HTTP层测试通过")
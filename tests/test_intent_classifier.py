@@ -0,0 +1,95 @@
+"""
+本地意图分类器测试
+
+用字符哈希向量代替 Embedding 模型，验证:
+1. 关键词自动机一次扫描，股票关键词优先
+2. 最近质心分类及置信度阈值；模型不可用时只尝试一次并回退
+3. 规划Agent在本地分类确定时不调用LLM
+"""
+import os
+import sys
+import zlib
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import agents.intent_classifier as intent_classifier
+from agents.intent_classifier import IntentClassifier
+from agents.planner_agent import PlannerAgent
+
+EXAMPLES = {
+    'stock': ["宁德时代值得长期拿着吗", "比亚迪最近的走势如何", "白酒板块现在能上车吗"],
+    'company': ["年假可以分几次休", "加班餐补怎么申请", "出差住宿标准是多少"],
+    'general': ["今天天气怎么样", "红烧肉怎么做", "地球到月球有多远"],
+}
+
+
+def hash_embed(texts):
+    """字符哈希词袋向量"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 64
+        for char in text:
+            vector[zlib.crc32(char.encode()) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+def test_keyword_automaton():
+    classifier = IntentClassifier(embed=hash_embed, examples=EXAMPLES)
+    assert classifier.match_keywords("公司的报销流程") == ('company', '报销')
+    assert classifier.match_keywords("员工持有的股票怎么估值") == ('stock', '持有')   # 股票关键词优先
+    assert classifier.match_keywords("看看pe") == ('stock', 'pe')
+    assert classifier.match_keywords("今天天气怎么样") is None
+
+
+def test_nearest_centroid_with_threshold():
+    embed_calls = []
+
+    def counting_embed(texts):
+        embed_calls.append(len(texts))
+        return hash_embed(texts)
+
+    classifier = IntentClassifier(embed=counting_embed, examples=EXAMPLES, threshold=0.5)
+    assert classifier.classify("年假怎么申请") == 'company'
+    assert classifier.classify("明天天气怎么样") == 'general'
+    assert classifier.classify("宁德时代最近走势") == 'stock'
+    assert len(embed_calls) == 3 + 3   # 样例只向量化一次
+
+    scores = classifier.scores("你好")
+    assert abs(sum(scores.values()) - 1) < 1e-9
+    strict = IntentClassifier(embed=hash_embed, examples=EXAMPLES, threshold=0.99)
+    assert strict.classify("你好") is None
+
+    def broken_embed(texts):
+        embed_calls.append('broken')
+        raise OSError("模型不存在")
+
+    embed_calls.clear()
+    broken = IntentClassifier(embed=broken_embed, examples=EXAMPLES)
+    assert broken.classify("年假怎么申请") is None and broken.classify("红烧肉怎么做") is None
+    assert embed_calls == ['broken']
+
+
+def test_planner_uses_local_classifier():
+    llm_queries = []
+    planner = PlannerAgent.__new__(PlannerAgent)
+    planner._classify_intent_with_llm = lambda query: llm_queries.append(query) or 'general'
+
+    original = intent_classifier._classifier
+    intent_classifier._classifier = IntentClassifier(embed=hash_embed, examples=EXAMPLES, threshold=0.5)
+    try:
+        assert planner._classify_intent("年假怎么申请") == 'company'
+        assert planner._classify_intent("分析宁德时代") == 'stock'
+        assert not llm_queries
+        intent_classifier._classifier.threshold = 1.01
+        assert planner._classify_intent("你好") == 'general' and llm_queries == ["你好"]
+    finally:
+        intent_classifier._classifier = original
+
+
+if __name__ == "__main__":
+    test_keyword_automaton()
+    test_nearest_centroid_with_threshold()
+    test_planner_uses_local_classifier()
+    print("✅ 意图分类测试通过")
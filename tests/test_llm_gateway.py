@@ -0,0 +1,142 @@
+"""
+LLM网关测试 (AIMD自适应并发 / Retry-After / 截止时间 / 优先级)
+
+使用带容量限制的本地桩服务模拟供应商限流: 同时处理的请求超过容量时返回429和 Retry-After，
+对比直接使用 ChatOpenAI (客户端默认重试) 与经网关调度时的429数量和成功率
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from config import config
+from llm.gateway import (
+    AdaptiveLimiter, GatedChatOpenAI, LLMDeadlineExceeded, get_gateway, run_deadline,
+)
+from tests.stub_llm_server import StubLLMServer
+
+CAPACITY = 4       # 桩服务同时处理的请求上限
+REQUESTS = 40      # 并发请求数
+LATENCY = 0.1      # 单次请求耗时 (秒)
+
+
+class RateLimitedStub(StubLLMServer):
+    """超过容量时返回429的桩服务"""
+
+    def __init__(self, capacity: int, retry_after: float = 0.2, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.rejected = 0
+
+    def admit(self, body: dict):
+        with self._lock:
+            if self.in_flight > self.capacity:
+                self.rejected += 1
+                return 429, {'error': {'message': 'rate limited', 'type': 'rate_limit_error'}}, \
+                    {'Retry-After': str(self.retry_after)}
+        return None
+
+
+async def _run_concurrent(llm, n: int) -> tuple:
+    """并发发起 n 个请求，返回 (成功数, 失败数, 耗时)"""
+    async def one():
+        try:
+            await llm.ainvoke([HumanMessage(content="hi")])
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one() for _ in range(n)])
+    return sum(results), n - sum(results), time.perf_counter() - start
+
+
+def test_gateway_adapts_to_provider_capacity():
+    """经网关时全部成功、429显著减少，并发上限收敛到服务容量附近"""
+    server = RateLimitedStub(capacity=CAPACITY, latency=LATENCY).start()
+    original = (config.LLM_INITIAL_CONCURRENCY, config.LLM_MAX_RETRIES, config.LLM_RETRY_BASE_DELAY)
+    # 初始并发上限高于服务容量，验证网关能自行收敛
+    config.LLM_INITIAL_CONCURRENCY, config.LLM_MAX_RETRIES, config.LLM_RETRY_BASE_DELAY = 8, 20, 0.05
+    try:
+        common = dict(api_key="stub-key", base_url=server.base_url, model="stub", temperature=0)
+
+        async def compare():
+            direct = ChatOpenAI(**common)  # 客户端默认重试2次
+            direct_result = await _run_concurrent(direct, REQUESTS)
+            direct_rejected = server.rejected
+            server.rejected = 0
+            gated = GatedChatOpenAI(**common, max_retries=0)
+            gated_result = await _run_concurrent(gated, REQUESTS)
+            return direct_result, direct_rejected, gated_result, server.rejected
+
+        (direct_ok, direct_failed, direct_time), direct_rejected, \
+            (gated_ok, gated_failed, gated_time), gated_rejected = asyncio.run(compare())
+        gateway = get_gateway(server.base_url)  # 每个桩服务地址对应独立网关
+    finally:
+        config.LLM_INITIAL_CONCURRENCY, config.LLM_MAX_RETRIES, config.LLM_RETRY_BASE_DELAY = original
+        server.stop()
+
+    print(f"\n直接调用: 成功 {direct_ok}, 失败 {direct_failed}, 429 {direct_rejected} 次, {direct_time:.2f}s")
+    print(f"经网关:   成功 {gated_ok}, 失败 {gated_failed}, 429 {gated_rejected} 次, {gated_time:.2f}s, "
+          f"并发上限 {gateway.limiter.limit:.1f}")
+    assert gated_ok == REQUESTS
+    assert gated_rejected < direct_rejected / 2
+    assert gateway.limiter.limit <= CAPACITY * 2
+    assert gateway.limiter.in_flight == 0
+
+
+def test_priority_queue_order():
+    """并发已满时优先放行高优先级 (数值小) 的请求"""
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    limiter.acquire()
+    order = []
+
+    def worker(priority, label):
+        limiter.acquire(priority)
+        order.append(label)
+        limiter.release(None)
+
+    threads = [threading.Thread(target=worker, args=(10, 'batch'))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=worker, args=(0, 'interactive')))
+    threads[1].start()
+    time.sleep(0.05)
+
+    limiter.release(None)
+    for thread in threads:
+        thread.join(timeout=2)
+    assert order == ['interactive', 'batch']
+
+
+def test_run_deadline_bounds_llm_call():
+    """运行截止时间约束单次请求超时，超时后不再重试"""
+    server = StubLLMServer(latency=2.0).start()
+    try:
+        llm = GatedChatOpenAI(api_key="stub-key", base_url=server.base_url, model="stub", max_retries=0)
+        try:
+            with run_deadline(0.5):
+                llm.invoke([HumanMessage(content="hi")])
+            raised = False
+        except LLMDeadlineExceeded:
+            raised = True
+        # 客户端在服务端响应之前放弃 (请求仍在处理中)，且只发出一次请求
+        abandoned, requests = server.in_flight, server.requests
+    finally:
+        server.stop()
+    assert raised
+    assert abandoned == 1 and requests == 1
+
+
+if __name__ == "__main__":
+    test_gateway_adapts_to_provider_capacity()
+    test_priority_queue_order()
+    test_run_deadline_bounds_llm_call()
+    print("✅ LLM网关测试通过")
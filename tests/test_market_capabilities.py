@@ -0,0 +1,105 @@
+"""
+市场能力矩阵测试
+
+不访问数据源，验证:
+1. 数据源/工具/分析维度按市场声明能力；Baostock 对港股/美股立即拒绝 (不登录)
+2. 港股K线路由到 AKShare，A股仍走 Baostock
+3. 工作流只运行股票所属市场支持的分析节点，请求的维度都不支持时不调用LLM
+"""
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pandas as pd
+import tools.baostock_utils as baostock_utils
+import tools.data_source as data_source
+from agents.summarizer_agent import UNSUPPORTED_SECTION
+from tools.capabilities import UnsupportedMarketError, check_tool, route_sources, split_dimensions
+from tests.fake_graph import build_graph, fake_planner, llm_summarizer
+from tools.financial_reports import get_profit_data
+from tools.stock_market import get_historical_k_data, get_stock_basic_info
+
+calls = []  # 执行的分析节点和总结使用的模型
+
+
+def test_capability_matrix():
+    assert split_dimensions('hk.00700', ['fundamental', 'technical', 'valuation', 'news']) == (
+        ['technical', 'news'], ['fundamental', 'valuation'])
+    assert split_dimensions('us.AAPL', ['technical', 'news']) == (['news'], ['technical'])
+    assert split_dimensions('sh.600519', ['fundamental', 'valuation']) == (['fundamental', 'valuation'], [])
+    assert split_dimensions('600519', ['valuation']) == (['valuation'], [])   # 无法识别市场时不拦截
+    assert route_sources('k_data', 'hk.00700', ['baostock', 'akshare']) == ['akshare']
+    assert route_sources('profit', 'sz.000858', ['baostock', 'akshare']) == ['baostock', 'akshare']
+    assert check_tool('get_profit_data', 'sh.600519') is None
+    assert '港股' in check_tool('get_dividend_data', 'hk.00700')
+
+
+def test_unsupported_calls_fail_fast():
+    def no_login():
+        raise AssertionError("不支持的市场不应登录 Baostock")
+
+    original = baostock_utils.baostock_login_context
+    baostock_utils.baostock_login_context = no_login
+    try:
+        for func, args in [
+            (baostock_utils.fetch_generic_data, ('stock_basic',)),
+            (baostock_utils.fetch_financial_data, ('hk.00700', 2024, 4, 'profit')),
+            (data_source.fetch_financial_data_dual, ('hk.00700', 2024, 4, 'profit')),
+        ]:
+            kwargs = {'code': 'hk.00700'} if func is baostock_utils.fetch_generic_data else {}
+            try:
+                func(*args, **kwargs)
+                raise AssertionError("应抛出 UnsupportedMarketError")
+            except UnsupportedMarketError:
+                pass
+        assert '不支持' in get_stock_basic_info.invoke({'code': 'hk.00700'})
+        assert '不支持' in get_profit_data.invoke({'code': 'hk.00700', 'year': 2024, 'quarter': 4})
+    finally:
+        baostock_utils.baostock_login_context = original
+
+
+def test_k_data_routing():
+    routed = []
+    originals = data_source.fetch_hk_k_data, data_source.fetch_generic_data
+    data_source.fetch_hk_k_data = lambda code, *args: routed.append(('akshare', code)) or pd.DataFrame({'close': [1.0]})
+    data_source.fetch_generic_data = lambda **kwargs: routed.append(('baostock', kwargs['code'])) or pd.DataFrame()
+    try:
+        args = {'start_date': '2024-01-01', 'end_date': '2024-03-01'}
+        assert 'close' in get_historical_k_data.invoke({'code': 'hk.00700', **args})
+        get_historical_k_data.invoke({'code': 'sh.600519', **args})
+        assert '不支持' in get_historical_k_data.invoke({'code': 'us.AAPL', **args})
+        assert routed == [('akshare', 'hk.00700'), ('baostock', 'sh.600519')]
+    finally:
+        data_source.fetch_hk_k_data, data_source.fetch_generic_data = originals
+
+
+def _plan(state):
+    dimensions = ['valuation'] if '估值' in state['user_query'] else []
+    return {'intent': 'stock', 'company_name': '腾讯', 'stock_code': 'hk.00700', 'market': '港股',
+            'dimensions': dimensions}
+
+
+def test_workflow_skips_unsupported_dimensions():
+    graph = build_graph(planner=fake_planner(_plan), summarizer=llm_summarizer(calls, brief='summary'), calls=calls)
+
+    calls.clear()
+    result = graph.invoke({'user_query': "分析腾讯", 'messages': []})
+    assert sorted(calls[:-1]) == ['news', 'technical'] and calls[-1] == 'summary'
+    report = result['final_report']
+    assert report.count(UNSUPPORTED_SECTION) == 2 and "不支持的分析**: 基本面分析、估值分析" in report
+
+    # 只问了不支持的维度: 不运行分析节点，也不调用LLM
+    calls.clear()
+    result = graph.invoke({'user_query': "腾讯的估值", 'messages': []})
+    assert calls == []
+    assert "不支持港股的估值分析" in result['final_report']
+
+
+if __name__ == "__main__":
+    test_capability_matrix()
+    test_unsupported_calls_fail_fast()
+    test_k_data_routing()
+    test_workflow_skips_unsupported_dimensions()
+    print("✅ 市场能力矩阵测试通过")
@@ -0,0 +1,63 @@
+"""
+调用指标收集测试
+使用本地假模型驱动 LLMProgressCallback，验证注册表记录、JSON导出和Prometheus格式
+"""
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from agents.base_agent import LLMProgressCallback
+from monitoring.metrics import MetricsRegistry, registry, new_run_id, run_scope
+
+
+@tool
+def echo_tool(text: str) -> str:
+    """回显输入"""
+    return text
+
+
+def test_callback_records_llm_and_tool_calls():
+    """LLM和工具调用都被记录到当前运行"""
+    callback = LLMProgressCallback(agent_name="测试Agent", verbose=False)
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="你好，世界")]))
+    run_id = new_run_id()
+
+    with run_scope(run_id):
+        # stream 触发 on_llm_new_token，用于统计首token时间
+        list(model.stream([HumanMessage(content="hi")], config={"callbacks": [callback]}))
+        echo_tool.invoke({"text": "abc"}, config={"callbacks": [callback]})
+
+    calls = registry.run_calls(run_id)
+    kinds = sorted(call['kind'] for call in calls)
+    assert kinds == ['llm', 'tool']
+    llm_call = next(call for call in calls if call['kind'] == 'llm')
+    assert llm_call['agent'] == "测试Agent"
+    assert llm_call['ttft'] is not None and llm_call['ttft'] <= llm_call['wall_time']
+
+    summary = registry.run_summary(run_id)
+    assert summary['totals']['llm_calls'] == 1
+    assert summary['totals']['tool_calls'] == 1
+
+
+def test_prometheus_export_format():
+    """Prometheus文本格式包含直方图分桶和计数器"""
+    local = MetricsRegistry()
+    local.record_call({'kind': 'llm', 'run_id': 'r1', 'agent': 'a', 'node': 'fundamental', 'name': 'gpt',
+                       'start': 0.0, 'end': 1.2, 'wall_time': 1.2, 'ttft': 0.3,
+                       'prompt_tokens': 1200, 'completion_tokens': 300})
+    text = local.to_prometheus()
+    assert '# TYPE stock_agent_llm_latency_seconds histogram' in text
+    assert 'stock_agent_llm_latency_seconds_bucket{agent="a",model="gpt",node="fundamental",le="2.5"} 1' in text
+    assert 'stock_agent_llm_tokens_total{agent="a",model="gpt",node="fundamental",type="prompt"} 1200' in text
+    assert local.run_summary('r1')['by_node']['fundamental']['completion_tokens'] == 300
+
+
+if __name__ == "__main__":
+    test_callback_records_llm_and_tool_calls()
+    test_prometheus_export_format()
+    print("✅ 指标收集测试通过")
@@ -0,0 +1,149 @@
+"""
+按调用点模型分档测试
+1. 路由解析: 默认档位、MODEL_ROUTES 覆盖、快速模型回退
+2. 延迟/成本对比: 在本地桩服务上运行分类/提取类调用点，
+   对比"全部使用主模型"与"按调用点分档"的耗时和估算成本
+
+LLM 使用本地桩服务 (tests/stub_llm_server.py)，主模型和快速模型配置不同的响应延迟
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.runnables import RunnableLambda
+from config import config
+from llm.factory import resolve_model
+from monitoring.metrics import registry, new_run_id, run_scope
+from tests.stub_llm_server import StubLLMServer
+
+MAIN_MODEL = "gpt-4o"
+FAST_MODEL = "gpt-4o-mini"
+LATENCY = {MAIN_MODEL: 0.4, FAST_MODEL: 0.05}
+ROUNDS = 2
+
+# 模拟一段分析文本 (行业提取的输入)
+SAMPLE_REPORT = "贵州茅台是中国白酒行业龙头企业，主营茅台酒及系列酒的生产与销售。" * 20
+SAMPLE_NEWS = [{'title': f"贵州茅台发布公告{i}", 'content': "公司经营稳健，渠道改革持续推进。" * 5, 'source': '新浪财经'}
+               for i in range(5)]
+
+
+class _ConfigOverride:
+    """临时覆盖配置项"""
+
+    def __init__(self, **values):
+        self.values = values
+        self.original = {}
+
+    def __enter__(self):
+        for key, value in self.values.items():
+            self.original[key] = getattr(config, key)
+            setattr(config, key, value)
+
+    def __exit__(self, *exc):
+        for key, value in self.original.items():
+            setattr(config, key, value)
+
+
+def test_resolve_model_routes():
+    """默认档位、覆盖规则和快速模型回退"""
+    with _ConfigOverride(OPENAI_MODEL=MAIN_MODEL, OPENAI_FAST_MODEL=FAST_MODEL, MODEL_ROUTES=""):
+        assert resolve_model("intent") == ('fast', FAST_MODEL)
+        assert resolve_model("summarizer") == ('main', MAIN_MODEL)
+        assert resolve_model("unknown_site") == ('main', MAIN_MODEL)
+    with _ConfigOverride(OPENAI_MODEL=MAIN_MODEL, OPENAI_FAST_MODEL=FAST_MODEL,
+                         MODEL_ROUTES="intent=main, summarizer=gpt-4.1"):
+        assert resolve_model("intent") == ('main', MAIN_MODEL)
+        assert resolve_model("summarizer") == ('custom', "gpt-4.1")
+    with _ConfigOverride(OPENAI_MODEL=MAIN_MODEL, OPENAI_FAST_MODEL="", MODEL_ROUTES=""):
+        # 未配置快速模型时回退到主模型
+        assert resolve_model("intent") == ('fast', MAIN_MODEL)
+
+
+def _run_helper_sites(planner, summarizer, callback) -> None:
+    """依次调用分类/提取类调用点 (与图中调用方式相同)"""
+    from tools.stock_search import _extract_company_name_with_llm
+    from tools.news_crawler import _analyze_news_sentiment_risk
+
+    planner._classify_intent_with_llm("分析一下贵州茅台的投资价值")
+    summarizer._extract_industry_from_text(SAMPLE_REPORT)
+    # 工具内部的LLM调用通过外层运行配置继承回调 (与ReAct工具调用时一致)
+    helpers = RunnableLambda(lambda _: (
+        _extract_company_name_with_llm("分析一下贵州茅台的投资价值"),
+        _analyze_news_sentiment_risk(SAMPLE_NEWS, "贵州茅台"),
+    ))
+    helpers.invoke(None, config={'callbacks': [callback]})
+
+
+def run_benchmark(rounds: int = ROUNDS) -> dict:
+    """运行"全部主模型"与"按调用点分档"两种路由，返回耗时/成本/路由统计"""
+    from agents.planner_agent import PlannerAgent
+    from agents.summarizer_agent import SummarizerAgent
+
+    server = StubLLMServer(latency=LATENCY, answer="白酒").start()
+    results = {}
+    try:
+        modes = {
+            'all_main': "intent=main,industry_extraction=main,company_extraction=main,news_sentiment=main",
+            'tiered': "",
+        }
+        for mode, routes in modes.items():
+            with _ConfigOverride(OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="stub-key",
+                                 OPENAI_MODEL=MAIN_MODEL, OPENAI_FAST_MODEL=FAST_MODEL, MODEL_ROUTES=routes,
+                                 NEWS_SENTIMENT_MODE='llm'):
+                planner, summarizer = PlannerAgent(), SummarizerAgent()
+                for agent in (planner, summarizer):
+                    agent.progress_callback.verbose = False
+
+                run_id = new_run_id()
+                start = time.perf_counter()
+                with run_scope(run_id):
+                    for _ in range(rounds):
+                        _run_helper_sites(planner, summarizer, planner.progress_callback)
+                elapsed = time.perf_counter() - start
+
+                summary = registry.run_summary(run_id)
+                results[mode] = {
+                    'time': elapsed,
+                    'llm_calls': summary['totals']['llm_calls'],
+                    'cost_usd': summary['totals']['cost_usd'],
+                    'routes': sorted({(c['call_site'], c['name']) for c in summary['calls'] if c['kind'] == 'llm'}),
+                }
+    finally:
+        server.stop()
+    return results
+
+
+def test_tiered_routing_is_faster_and_cheaper():
+    """分类/提取调用点切到快速模型后，耗时和成本都明显下降"""
+    results = run_benchmark()
+    main, tiered = results['all_main'], results['tiered']
+    print(f"\n全部主模型: {main['time']:.2f}s ${main['cost_usd']:.6f} | "
+          f"分档: {tiered['time']:.2f}s ${tiered['cost_usd']:.6f}")
+
+    assert main['llm_calls'] == tiered['llm_calls'] == 4 * ROUNDS
+    assert {model for _, model in main['routes']} == {MAIN_MODEL}
+    assert {model for _, model in tiered['routes']} == {FAST_MODEL}
+    assert {site for site, _ in tiered['routes']} == {
+        'intent', 'industry_extraction', 'company_extraction', 'news_sentiment'}
+    assert tiered['time'] < main['time'] / 2
+    assert tiered['cost_usd'] < main['cost_usd'] / 5
+
+    # 路由计数器按调用点/档位记录
+    prometheus = registry.to_prometheus()
+    assert f'stock_agent_model_route_total{{call_site="intent",model="{FAST_MODEL}",tier="fast"}}' in prometheus
+
+
+if __name__ == "__main__":
+    test_resolve_model_routes()
+    results = run_benchmark()
+    print("=" * 60)
+    print("模型分档延迟/成本对比 (分类与提取调用点)")
+    print("=" * 60)
+    for mode, result in results.items():
+        print(f"{mode}: 耗时 {result['time']:.2f}s, LLM调用 {result['llm_calls']} 次, "
+              f"估算成本 ${result['cost_usd']:.6f}")
+        for site, model in result['routes']:
+            print(f"    {site} -> {model}")
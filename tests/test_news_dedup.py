@@ -0,0 +1,132 @@
+"""
+新闻转载聚类测试
+
+不访问网络和LLM，验证:
+1. 同一事件的转载 (标题改写、加"转载"字样、摘要截断) 合并为一个事件，保留排名最靠前的一条并记录转载数
+2. 不同事件不会被合并
+3. 数百条新闻 (包括大量转载集中在同一分桶时) 的聚类工作量随数量线性增长
+4. 情感分析的提示词覆盖不同的事件，并注明转载数
+"""
+import os
+import random
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage
+from config import config
+import tools.news_crawler as news_crawler
+import tools.news_dedup as news_dedup
+from tools.news_crawler import crawl_news
+from tools.news_dedup import cluster_news
+
+NEWS = [
+    {'title': '贵州茅台宣布上调飞天茅台出厂价约20%', 'content': '贵州茅台公告称自11月1日起上调53度飞天茅台出厂价，平均上调幅度约20%', 'source': '新浪财经'},
+    {'title': '茅台三季度净利润同比增长15.8%', 'content': '前三季度实现营业总收入1053亿元，归母净利润528亿元', 'source': '新浪财经'},
+    {'title': '【转载】贵州茅台宣布上调飞天茅台出厂价约20%!', 'content': '贵州茅台公告称自11月1日起上调53度飞天茅台出厂价，平均上调幅度约20%', 'source': '证券时报'},
+    {'title': '重磅：茅台上调飞天出厂价，平均幅度约20%', 'content': '贵州茅台公告称，自11月1日起上调53度飞天茅台出厂价，平均上调幅度约20%…', 'source': '百度'},
+    {'title': '白酒板块午后走弱 五粮液跌超3%', 'content': '白酒板块午后持续走低，五粮液、泸州老窖跌幅居前', 'source': '证券时报'},
+    {'title': '茅台前三季度净利润同比增长15.8%', 'content': '前三季度实现营业总收入1053亿元，归母净利润528亿元', 'source': '百度'},
+]
+
+
+def test_reposts_merged_into_events():
+    events = cluster_news(NEWS)
+    assert [e['title'] for e in events] == [NEWS[0]['title'], NEWS[1]['title'], NEWS[4]['title']]
+    assert [e['reposts'] for e in events] == [2, 1, 0]
+    assert events[0]['sources'] == ['新浪财经', '证券时报', '百度']
+    assert events[0]['content'] == NEWS[0]['content']
+    # 阈值为1时只合并去掉转载标记和标点后完全相同的文本
+    assert [e['reposts'] for e in cluster_news(NEWS, similarity=1.0)] == [1, 0, 0, 0, 0]
+    assert cluster_news([]) == []
+
+
+def _random_news(rng: random.Random, n: int):
+    chars = '股份公司发布公告业绩增长下降收购重组分红减持增持董事会监管处罚订单产能价格市场销售利润亏损'
+    news = []
+    for i in range(n):
+        if news and rng.random() < 0.3:
+            base = rng.choice(news)
+            news.append({**base, 'title': '转载：' + base['title'][:-2]})
+        else:
+            title = ''.join(rng.choice(chars) for _ in range(20))
+            news.append({'title': title, 'content': ''.join(rng.choice(chars) for _ in range(60)), 'source': str(i)})
+    return news
+
+
+def _repost_heavy(rng: random.Random, n: int):
+    """少数事件的大量转载 (多数新闻落入相同的分桶)"""
+    bases = _random_news(rng, 5)
+    return [{**base, 'title': rng.choice(['', '转载：', '重磅：']) + base['title'][:rng.randint(17, 20)]}
+            for base in (rng.choice(bases) for _ in range(n))]
+
+
+def test_linear_time():
+    rng = random.Random(7)
+    comparisons, finds = {}, {}
+    jaccard, find = news_dedup._jaccard, news_dedup._DisjointSet.find
+
+    def counting_jaccard(a, b):
+        comparisons[key] += 1
+        return jaccard(a, b)
+
+    def counting_find(self, i):
+        finds[key] += 1
+        return find(self, i)
+
+    news_dedup._jaccard, news_dedup._DisjointSet.find = counting_jaccard, counting_find
+    try:
+        for n in (200, 800):
+            key = ('random', n)
+            comparisons[key] = finds[key] = 0
+            events = cluster_news(_random_news(rng, n))
+            assert 0.6 * n < len(events) < 0.8 * n
+            assert sum(e['reposts'] for e in events) + len(events) == n
+
+            key = ('reposts', n)
+            comparisons[key] = finds[key] = 0
+            events = cluster_news(_repost_heavy(rng, n))
+            assert len(events) <= 5 and sum(e['reposts'] for e in events) + len(events) == n
+    finally:
+        news_dedup._jaccard, news_dedup._DisjointSet.find = jaccard, find
+    print(f"\n比较次数 {comparisons}\n并查集查找次数 {finds}")
+    for key in comparisons:
+        n = key[1]
+        # 每条新闻每个分桶至多比较一次 (远少于两两比较的 n^2/2 次)，转载集中时也是如此
+        assert comparisons[key] < n * 2
+        assert finds[key] <= n * (2 * news_dedup.LSH_BANDS + 4)   # 各分桶2次 + 合并2次 + 汇总1次
+    assert finds[('reposts', 800)] < 4.5 * finds[('reposts', 200)]
+
+
+class FakeLLM:
+    prompts = []
+
+    def invoke(self, prompt):
+        FakeLLM.prompts.append(prompt)
+        return AIMessage(content="情感评分: 4\n风险评分: 2\n情感分析: 提价利好")
+
+
+def test_sentiment_prompt_covers_distinct_events():
+    originals = (news_crawler._search_news, news_crawler.get_chat_model, config.NEWS_SENTIMENT_MODE,
+                 config.NEWS_STORE_ENABLED)
+    news_crawler._search_news = lambda query, num_results: NEWS
+    news_crawler.get_chat_model = lambda task: FakeLLM()
+    config.NEWS_SENTIMENT_MODE = 'llm'   # 由LLM评分
+    config.NEWS_STORE_ENABLED = False    # 不经过新闻库 (见 test_news_store)
+    try:
+        report = crawl_news.invoke({'query': '贵州茅台'})
+    finally:
+        (news_crawler._search_news, news_crawler.get_chat_model, config.NEWS_SENTIMENT_MODE,
+         config.NEWS_STORE_ENABLED) = originals
+    prompt = FakeLLM.prompts[-1]
+    assert prompt.count('标题:') == 3 and '(另有2篇转载)' in prompt
+    assert '五粮液' in prompt
+    assert '情感评分 | 4/5' in report and report.count('**') == 6
+
+
+if __name__ == "__main__":
+    test_reposts_merged_into_events()
+    test_linear_time()
+    test_sentiment_prompt_covers_distinct_events()
+    print("✅ 新闻转载聚类测试通过")
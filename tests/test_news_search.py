@@ -0,0 +1,111 @@
+"""
+多源新闻并发搜索测试
+
+用 httpx.MockTransport 模拟新闻源 (不访问网络)，验证:
+1. 各新闻源并发搜索 (各源的请求同时进行)
+2. 超过截止时间的数据源请求被取消，其他数据源的结果照常返回
+3. 结果规范化后按URL去重 (忽略协议、跟踪参数、结尾斜杠)，各源轮流排序；缓存命中时返回副本
+"""
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+import tools.news_crawler as news_crawler
+from config import config
+from tools.data_cache import data_cache
+from tools.news_crawler import fetch_news_list, merge_news
+
+LATENCY = 0.3
+
+SINA_PAGE = """<div class="box-result"><h2><a href="https://finance.sina.com.cn/a/1.html?utm_source=search">茅台 提价</a></h2>
+<div class="content">  茅台宣布  提价 </div></div>
+<div class="box-result"><h2><a href="https://finance.sina.com.cn/a/2.html">茅台 三季报</a></h2></div>"""
+
+BAIDU_PAGE = """<div class="result"><h3><a href="http://finance.sina.com.cn/a/1.html/">茅台提价 (转载)</a></h3></div>
+<div class="result"><h3><a href="https://news.example.com/b/1">茅台 渠道调研</a></h3>
+<span class="c-author">证券时报</span></div>"""
+
+
+def _with_transport(delays, func):
+    """
+    用模拟传输层替换共享客户端，delays 为各主机的响应延迟 (秒)
+
+    func 接收请求统计: peak (同时进行的最大请求数)、cancelled (超时被取消请求的主机)
+    """
+    stats = {'in_flight': 0, 'peak': 0, 'cancelled': []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        stats['in_flight'] += 1
+        stats['peak'] = max(stats['peak'], stats['in_flight'])
+        try:
+            await asyncio.sleep(delays.get(host, 0))
+        except asyncio.CancelledError:
+            stats['cancelled'].append(host)
+            raise
+        finally:
+            stats['in_flight'] -= 1
+        page = SINA_PAGE if 'sina' in host else BAIDU_PAGE if 'baidu' in host else ''
+        return httpx.Response(200, content=page.encode('utf-8'))
+
+    original = news_crawler._client
+    news_crawler._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    data_cache.clear()
+    try:
+        return func(stats)
+    finally:
+        news_crawler._client = original
+        data_cache.clear()
+
+
+def test_sources_run_concurrently():
+    def run(stats):
+        news = fetch_news_list("茅台", 10)
+        print(f"\n两个新闻源各 {LATENCY}s: 同时进行的请求数 {stats['peak']}")
+        assert stats['peak'] == 2
+        # 新浪和百度轮流排序，百度的第一条与新浪重复 (只保留先出现的一条)
+        assert [n['title'] for n in news] == ["茅台 提价", "茅台 三季报", "茅台 渠道调研"]
+        assert news[0]['content'] == "茅台宣布 提价" and news[0]['source'] == '新浪财经'
+        assert news[2]['source'] == '证券时报'
+
+        # 缓存命中时返回副本: 调用方修改结果不影响其他调用方
+        news[0]['cluster'] = 'x'
+        assert 'cluster' not in fetch_news_list("茅台", 10)[0]
+
+    _with_transport({'search.sina.com.cn': LATENCY, 'www.baidu.com': LATENCY}, run)
+
+
+def test_slow_source_hits_deadline():
+    def run(stats):
+        original = config.NEWS_SOURCE_TIMEOUT
+        config.NEWS_SOURCE_TIMEOUT = 0.2
+        try:
+            news = fetch_news_list("茅台", 10)
+        finally:
+            config.NEWS_SOURCE_TIMEOUT = original
+        # 慢数据源的请求在截止时间被取消，而不是等到响应
+        assert stats['cancelled'] == ['search.sina.com.cn']
+        assert [n['title'] for n in news] == ["茅台提价 (转载)", "茅台 渠道调研"]
+
+    _with_transport({'search.sina.com.cn': 5, 'www.baidu.com': 0.05}, run)
+
+
+def test_merge_news():
+    merged = merge_news([
+        ('a', [{'title': 'x', 'url': 'https://Example.com/p?id=1&utm_medium=x'}, {'title': '', 'url': ''}]),
+        ('b', [{'title': 'x2', 'url': 'http://example.com/p/?id=1'}, {'title': 'y', 'url': ''},
+               {'title': 'y', 'url': ''}]),
+    ], 10)
+    assert [(n['title'], n['source']) for n in merged] == [('x', 'a'), ('y', 'b')]
+    assert len(merge_news([('a', [{'title': str(i), 'url': f'u{i}'} for i in range(5)])], 3)) == 3
+
+
+if __name__ == "__main__":
+    test_sources_run_concurrently()
+    test_slow_source_hits_deadline()
+    test_merge_news()
+    print("✅ 新闻并发搜索测试通过")
@@ -0,0 +1,136 @@
+"""
+新闻情感/风险本地评分测试
+
+用字符哈希向量代替 Embedding 模型 (不访问网络和LLM)，验证:
+1. 词典评分: 利好/利空/风险词、否定词反转、长词优先 ("不及预期" 中的 "不" 不是否定)
+2. 全部新闻一次批量向量化；模型不可用时只尝试一次并退回词典评分
+3. 汇总按转载数加权，单条重大风险不被稀释
+4. hybrid 模式下LLM只撰写分析 (不再评分)，fast 模式下新闻节点完全不调用LLM
+"""
+import os
+import sys
+import zlib
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage
+import tools.news_crawler as news_crawler
+import tools.news_sentiment as news_sentiment
+from agents.news_agent import NewsAgent
+from config import config
+from tools.news_crawler import crawl_news
+from tools.news_sentiment import NewsSentimentScorer, aggregate_scores
+
+NEWS = [
+    {'title': '贵州茅台三季度净利润大增，业绩超预期', 'content': '', 'source': '新浪财经', 'url': '', 'reposts': 2},
+    {'title': '茅台召开年度股东大会', 'content': '', 'source': '百度', 'url': ''},
+    {'title': '某白酒企业收到证监会立案告知书', 'content': '', 'source': '证券时报', 'url': ''},
+]
+
+
+def hash_embed(texts):
+    """字符哈希词袋向量"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 64
+        for char in text:
+            vector[zlib.crc32(char.encode()) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+def test_lexicon_scores():
+    scorer = NewsSentimentScorer(embed=hash_embed)
+    sentiment, risk, keywords = scorer.lexicon_scores("茅台三季度净利润大增，业绩超预期")
+    assert sentiment > 4.5 and risk is None and keywords == ['大增', '超预期']
+    sentiment, risk, keywords = scorer.lexicon_scores("公司收到证监会立案告知书")
+    assert sentiment < 2 and risk > 4 and keywords == ['立案']   # 同时是利空词和风险词
+    sentiment, risk, keywords = scorer.lexicon_scores("公司否认财务造假传闻")
+    assert sentiment > 3 and risk is None                          # 否定: 反转情感、忽略风险
+    assert scorer.lexicon_scores("业绩不及预期，股价下跌")[0] < 1.5  # "不及预期" 不触发否定
+    assert scorer.lexicon_scores("公司未来将继续增长")[0] > 3.5     # "未来" 不是否定
+    assert scorer.lexicon_scores("公司召开股东大会") == (None, None, [])
+
+
+def test_batch_embedding_and_fallback():
+    calls = []
+
+    def counting_embed(texts):
+        calls.append(len(texts))
+        return hash_embed(texts)
+
+    scorer = NewsSentimentScorer(embed=counting_embed)
+    scores = scorer.score_articles(NEWS)
+    assert calls == [40, 3]   # 样例一次 + 全部新闻一次
+    assert all(s['method'] == 'lexicon+embedding' and 1 <= s['sentiment'] <= 5 and 1 <= s['risk'] <= 5
+               for s in scores)
+    scorer.score_articles(NEWS)
+    assert calls == [40, 3, 3]
+
+    failures = []
+
+    def broken_embed(texts):
+        failures.append(texts)
+        raise RuntimeError("模型不可用")
+
+    scorer = NewsSentimentScorer(embed=broken_embed)
+    for _ in range(2):
+        scores = scorer.score_articles(NEWS)
+    assert len(failures) == 1
+    assert [s['method'] for s in scores] == ['lexicon'] * 3
+    assert scores[1]['sentiment'] == 3.0 and scores[1]['risk'] == 2.0
+
+
+def test_aggregate_scores():
+    scores = [{'sentiment': 4.6, 'risk': 2.0}, {'sentiment': 3.0, 'risk': 2.0}, {'sentiment': 1.5, 'risk': 4.8}]
+    # 情感 (4.6*3 + 3.0 + 1.5) / 5 = 3.66；风险加权平均 2.56，但不低于 4.8-1
+    assert aggregate_scores(NEWS, scores) == (4, 4)
+    assert aggregate_scores([], []) == (3, 3)
+
+
+class FakeLLM:
+    prompts = []
+
+    def invoke(self, prompt):
+        FakeLLM.prompts.append(prompt)
+        return AIMessage(content="情感分析: 业绩超预期\n风险分析: 关注监管\n新闻要点: 三季报")
+
+
+def _run_crawl(mode):
+    originals = (news_crawler._search_news, news_crawler.get_chat_model, news_sentiment._scorer,
+                 config.NEWS_SENTIMENT_MODE, config.NEWS_STORE_ENABLED)
+    news_crawler._search_news = lambda query, num_results: [dict(n) for n in NEWS]
+    news_crawler.get_chat_model = lambda task: FakeLLM()
+    news_sentiment._scorer = NewsSentimentScorer(embed=hash_embed)
+    config.NEWS_SENTIMENT_MODE = mode
+    config.NEWS_STORE_ENABLED = False   # 不经过新闻库 (见 test_news_store)
+    FakeLLM.prompts.clear()
+    try:
+        if mode == 'fast':
+            agent = NewsAgent.__new__(NewsAgent)   # 快速模式不需要LLM
+            return agent.run({'company_name': '贵州茅台', 'stock_code': 'sh.600519'})['news_analysis']
+        return crawl_news.invoke({'query': '贵州茅台'})
+    finally:
+        (news_crawler._search_news, news_crawler.get_chat_model, news_sentiment._scorer,
+         config.NEWS_SENTIMENT_MODE, config.NEWS_STORE_ENABLED) = originals
+
+
+def test_hybrid_and_fast_modes():
+    report = _run_crawl('hybrid')
+    assert len(FakeLLM.prompts) == 1
+    prompt = FakeLLM.prompts[0]
+    assert '无需重新评分' in prompt and '情感评分:' not in prompt and '[本地评分: 情感' in prompt
+    assert '业绩超预期' in report and '本地评分: 情感' in report
+
+    report = _run_crawl('fast')
+    assert FakeLLM.prompts == []
+    assert '本地评分 (未调用LLM)' in report and '风险信号: 立案' in report
+
+
+if __name__ == "__main__":
+    test_lexicon_scores()
+    test_batch_embedding_and_fallback()
+    test_aggregate_scores()
+    test_hybrid_and_fast_modes()
+    print("✅ 新闻本地评分测试通过")
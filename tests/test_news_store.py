@@ -0,0 +1,173 @@
+"""
+新闻增量存储测试
+
+用临时新闻库、模拟的搜索结果和字符哈希向量 (不访问网络和LLM)，验证:
+1. 发布时间解析: 绝对日期、未写年份的日期、"N小时前"、"昨天"
+2. 增量同步: 第二次同步只为新增文章抓取正文和评分，旧事件的新转载计入已有事件
+3. 同步间隔内不再搜索，事件集合未变化时复用上次的分析 (不再调用LLM)
+4. 分析汇总时间窗口内保存的评分，同步时删除窗口之外的数据；所有数据源不可用时使用已保存的新闻
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage
+import tools.news_crawler as news_crawler
+import tools.news_sentiment as news_sentiment
+import tools.news_store as news_store
+from config import config
+from tests.test_news_sentiment import hash_embed
+from tools.news_crawler import crawl_news
+from tools.news_sentiment import NewsSentimentScorer, aggregate_scores
+from tools.news_store import NewsStore, parse_published
+
+PRICE = {'title': '贵州茅台宣布上调飞天茅台出厂价约20%', 'url': 'https://finance.sina.com.cn/a/1.html',
+         'content': '贵州茅台公告称自11月1日起上调53度飞天茅台出厂价，平均上调幅度约20%', 'source': '新浪财经'}
+EARNINGS = {'title': '茅台三季度净利润大增，业绩超预期', 'url': 'https://finance.sina.com.cn/a/2.html',
+            'content': '前三季度实现营业总收入1053亿元，归母净利润528亿元', 'source': '新浪财经'}
+PRICE_REPOST = {**PRICE, 'title': '【转载】贵州茅台宣布上调飞天茅台出厂价约20%!',
+                'url': 'https://www.stcn.com/article/1.html', 'source': '证券时报'}
+PRICE_REPOST_2 = {**PRICE, 'title': '重磅：茅台上调飞天出厂价，平均幅度约20%',
+                  'url': 'https://news.baidu.com/article/1', 'source': '百度'}
+PROBE = {'title': '某白酒企业收到证监会立案告知书', 'url': 'https://www.cs.com.cn/a/3.html',
+         'content': '公司公告称收到中国证监会立案告知书', 'source': '中证网'}
+
+
+class FakeLLM:
+    prompts = []
+
+    def invoke(self, prompt):
+        FakeLLM.prompts.append(prompt)
+        return AIMessage(content="情感分析: 业绩超预期\n风险分析: 关注监管\n新闻要点: 提价")
+
+
+class _Harness:
+    """临时新闻库 + 模拟搜索/正文抓取/评分，记录各环节的调用"""
+
+    def __init__(self, tmp_path):
+        self.results = []
+        self.searches = 0
+        self.fetched = []
+        self.scored = []
+        self.store = NewsStore(tmp_path / "news_store.sqlite")
+        scorer = NewsSentimentScorer(embed=hash_embed)
+        score_articles = scorer.score_articles
+        scorer.score_articles = lambda articles: (self.scored.extend(a['title'] for a in articles),
+                                                  score_articles(articles))[1]
+        self.patches = {
+            (news_crawler, 'fetch_news_list'): self._search,
+            (news_crawler, 'attach_article_bodies'): self._attach,
+            (news_crawler, 'get_chat_model'): lambda task: FakeLLM(),
+            (news_sentiment, '_scorer'): scorer,
+            (news_store, '_store'): self.store,
+            (config, 'NEWS_STORE_ENABLED'): True,
+            (config, 'NEWS_SENTIMENT_MODE'): 'hybrid',
+            (config, 'NEWS_SYNC_INTERVAL'): 0,
+        }
+
+    def _search(self, query, num_results=10):
+        self.searches += 1
+        if isinstance(self.results, Exception):
+            raise self.results
+        return [news_crawler._normalize_news(n, '') for n in self.results]
+
+    def _attach(self, events):
+        self.fetched.extend(e['title'] for e in events)
+        for event in events:
+            event['body'] = event['content'] + '。正文'
+        return len(events)
+
+    def __enter__(self):
+        self.originals = {key: getattr(*key) for key in self.patches}
+        for (owner, name), value in self.patches.items():
+            setattr(owner, name, value)
+        FakeLLM.prompts.clear()
+        return self
+
+    def __exit__(self, *exc):
+        for (owner, name), value in self.originals.items():
+            setattr(owner, name, value)
+        self.store.close()
+
+    def crawl(self, results):
+        self.results = results
+        self.fetched.clear(), self.scored.clear(), FakeLLM.prompts.clear()
+        return crawl_news.invoke({'query': '贵州茅台'})
+
+
+def test_parse_published():
+    now = datetime(2024, 10, 18, 15, 0).timestamp()
+    assert parse_published("证券时报 2024-10-18 10:32:05", now) == datetime(2024, 10, 18, 10, 32, 5).timestamp()
+    assert parse_published("2024年10月17日", now) == datetime(2024, 10, 17).timestamp()
+    assert parse_published("中证网 12月30日 09:15", now) == datetime(2023, 12, 30, 9, 15).timestamp()
+    assert parse_published("新浪财经 3小时前", now) == now - 3 * 3600
+    assert parse_published("昨天 20:10", now) == datetime(2024, 10, 17, 20, 10).timestamp()
+    assert parse_published("新浪财经", now) is None
+
+
+def test_incremental_sync(tmp_path):
+    with _Harness(tmp_path) as h:
+        report = h.crawl([PRICE, EARNINGS, PRICE_REPOST])
+        assert h.fetched == [PRICE['title'], EARNINGS['title']]
+        assert h.scored == [PRICE['title'], EARNINGS['title']]
+        assert len(FakeLLM.prompts) == 1 and '(另有1篇转载)' in report
+
+        # 再次搜索: 只有立案新闻和提价的第二篇转载是新文章
+        report = h.crawl([PRICE, PROBE, EARNINGS, PRICE_REPOST_2])
+        assert h.fetched == [PROBE['title']] and h.scored == [PROBE['title']]
+        assert '(另有2篇转载)' in report and '立案' in report
+        assert h.store.stats()['new_articles'] == 5 and h.store.stats()['seen_articles'] == 2
+
+        # 窗口内的事件: 最近同步的在前，评分来自新闻库
+        events = h.store.window_events('贵州茅台', 0)
+        assert [e['title'] for e in events] == [PROBE['title'], PRICE['title'], EARNINGS['title']]
+        assert events[1]['sources'] == ['新浪财经', '证券时报', '百度'] and events[1]['body'].endswith('正文')
+        scores = [e['score'] for e in events]
+        sentiment, risk = aggregate_scores(events, scores)
+        assert f"情感评分 | {sentiment}/5" in report and f"风险评分 | {risk}/5" in report
+
+        # 同步间隔内: 不搜索、不评分，事件未变化时复用分析
+        config.NEWS_SYNC_INTERVAL = 600
+        searches = h.searches
+        assert h.crawl([PRICE]) == report
+        assert h.searches == searches and h.scored == [] and FakeLLM.prompts == []
+        assert h.store.stats()['skipped_syncs'] == 1 and h.store.stats()['analyses_reused'] == 1
+
+
+def test_window_and_fallback(tmp_path):
+    with _Harness(tmp_path) as h:
+        old = {**PROBE, 'source': '中证网 ' + time.strftime('%Y-%m-%d', time.localtime(time.time() - 30 * 86400))}
+        h.crawl([old, EARNINGS])
+        assert h.fetched == [EARNINGS['title']]   # 超出时间窗口的文章不保存
+        last_sync = h.store.last_sync('贵州茅台')
+
+        # 已保存的事件随时间移出窗口
+        assert [e['title'] for e in h.store.window_events('贵州茅台', time.time() + 1)] == []
+
+        # 所有数据源不可用: 使用已保存的新闻，不记录为已同步
+        report = h.crawl(RuntimeError("所有数据源均不可用"))
+        assert EARNINGS['title'] in report and h.fetched == [] and h.scored == []
+        assert h.store.last_sync('贵州茅台') == last_sync
+
+        # 同步时删除窗口之外的文章，以及长期未同步公司的同步记录和分析结果
+        h.store.mark_synced('五粮液', time.time() - 30 * 86400, 0)
+        h.store.save_analysis('五粮液', 'digest', {'sentiment_score': 3})
+        now = time.time()
+        assert h.store.mark_synced('贵州茅台', now, now + 1) == 1
+        assert h.store.window_events('贵州茅台', 0) == [] and h.store.last_sync('贵州茅台') == now
+        assert h.store.last_sync('五粮液') is None and h.store.cached_analysis('五粮液', 'digest') is None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_parse_published()
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "a").mkdir(), (Path(tmp) / "b").mkdir()
+        test_incremental_sync(Path(tmp) / "a")
+        test_window_and_fallback(Path(tmp) / "b")
+    print("✅ 新闻增量存储测试通过")
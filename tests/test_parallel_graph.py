@@ -0,0 +1,64 @@
+"""
+生产工作流 (create_multi_branch_graph) 并行扇出测试
+
+用固定耗时的假Agent替换真实Agent，验证:
+1. 四个分析节点并发执行 (记录到多个节点同时执行，不依赖耗时)
+2. 节点只返回状态更新，reducer 正确合并到最终状态
+3. 同步 (invoke) 和异步 (ainvoke) 两条路径行为一致
+"""
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import graph.workflow as workflow
+from tests.fake_graph import InFlight, build_graph
+
+AGENT_LATENCY = 0.3  # 每个分析节点的模拟耗时 (秒)
+
+
+def _build_graph(in_flight):
+    return build_graph(latency=AGENT_LATENCY, in_flight=in_flight)
+
+
+def _check_result(result: dict):
+    assert result['final_report'].count('of sh.600519') == 4
+    assert set(result['completed_nodes']) == {'planner', *workflow.ANALYSIS_NODES, 'summarizer'}
+    assert result['user_query'] == "分析贵州茅台"
+
+
+def test_analyses_run_in_parallel_sync():
+    """同步路径: 四个分析节点在线程中并发执行"""
+    in_flight = InFlight()
+    result = _build_graph(in_flight).invoke({'user_query': "分析贵州茅台", 'messages': []})
+    _check_result(result)
+    print(f"\n同步路径最大同时执行节点数: {in_flight.peak}")
+    assert in_flight.peak >= 2
+
+
+def test_analyses_run_in_parallel_async():
+    """异步路径: 四个分析节点在同一事件循环中并发执行"""
+    in_flight = InFlight()
+    result = asyncio.run(_build_graph(in_flight).ainvoke({'user_query': "分析贵州茅台", 'messages': []}))
+    _check_result(result)
+    print(f"\n异步路径最大同时执行节点数: {in_flight.peak}")
+    assert in_flight.peak >= 2
+
+
+def test_reducers_merge_concurrent_writes():
+    """同一步中多个节点写入同一字段时按reducer合并"""
+    from graph.state import keep_latest, merge_errors, merge_unique
+    assert keep_latest("a", None) == "a"
+    assert keep_latest("a", "b") == "b"
+    assert merge_errors("新闻分析失败", "估值分析失败") == "新闻分析失败; 估值分析失败"
+    assert merge_errors("新闻分析失败", "新闻分析失败") == "新闻分析失败"
+    assert merge_unique(['planner'], ['news', 'planner']) == ['planner', 'news']
+
+
+if __name__ == "__main__":
+    test_analyses_run_in_parallel_sync()
+    test_analyses_run_in_parallel_async()
+    test_reducers_merge_concurrent_writes()
+    print("✅ 并行工作流测试通过")
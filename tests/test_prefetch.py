@@ -0,0 +1,133 @@
+"""
+规划阶段数据预取测试
+
+用带延迟的假数据源替换预取使用的数据接口，验证:
+1. 查询中的股票代码/公司简称的高置信度匹配 (多只股票时不预取)
+2. 规划结果一致时，分析节点的同参数请求直接命中预取写入的缓存
+3. 规划结果不一致时，尚未开始的预取被取消
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import tools.prefetch as prefetch
+from tools.data_cache import cached_data, data_cache
+from tools.stock_search import match_stock_in_query
+
+LATENCY = 0.3   # 每次数据请求的模拟耗时 (秒)
+fetches = []    # (数据源, 股票代码或关键词)
+
+
+@cached_data(namespace='test_prefetch_generic')
+def fake_generic_data(**kwargs):
+    fetches.append((kwargs['query_type'], kwargs['code']))
+    time.sleep(LATENCY)
+    return kwargs['query_type']
+
+
+@cached_data(namespace='test_prefetch_financial')
+def fake_financial_data(code, year, quarter, data_type):
+    fetches.append((data_type, code))
+    time.sleep(LATENCY)
+    return data_type
+
+
+@cached_data(namespace='test_prefetch_news')
+def fake_news_list(query, num_results=10):
+    fetches.append(('news', query))
+    time.sleep(LATENCY)
+    return [{'title': query}]
+
+
+def _with_fakes(func, executor=None):
+    fakes = {
+        'fetch_generic_data': fake_generic_data,
+        'fetch_financial_data_dual': fake_financial_data,
+        'fetch_news_list': fake_news_list,
+    }
+    if executor is not None:
+        fakes['DATA_EXECUTOR'] = executor
+    originals = {name: getattr(prefetch, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(prefetch, name, fake)
+    fetches.clear()
+    data_cache.clear()
+    try:
+        return func()
+    finally:
+        for name, original in originals.items():
+            setattr(prefetch, name, original)
+
+
+def test_match_stock_in_query():
+    assert match_stock_in_query("分析贵州茅台的投资价值") == ('sh.600519', '贵州茅台')
+    assert match_stock_in_query("看看600519最近走势") == ('sh.600519', '贵州茅台')
+    assert match_stock_in_query("看看000001最近走势") == ('sz.000001', '')
+    assert match_stock_in_query("茅台(SH600519)值得买吗") == ('sh.600519', '贵州茅台')
+    assert match_stock_in_query("对比茅台和五粮液") is None
+    assert match_stock_in_query("分析一下这家公司") is None
+    assert match_stock_in_query("2024年报") is None
+
+
+def test_prefetch_hits_cache_when_plan_matches():
+    """规划期间预取完成，分析节点的同参数请求不再访问数据源"""
+    def run():
+        with prefetch.start_prefetch("分析贵州茅台的投资价值") as pending:
+            time.sleep(LATENCY * 1.5)  # 模拟规划Agent的LLM耗时
+            assert pending.settle('sh.600519')
+        pending.wait(timeout=5)
+        prefetched = len(fetches)
+
+        # 分析节点以相同参数读取: 全部命中缓存，不再访问数据源
+        fake_generic_data(query_type='stock_basic', code='sh.600519')
+        jobs = prefetch._prefetch_jobs('sh.600519', '贵州茅台')
+        for job in jobs.values():
+            job()
+        print(f"\n预取 {prefetched} 项，分析节点读取后数据源调用 {len(fetches)} 次")
+        assert prefetched == 4 and len(fetches) == 4
+
+    _with_fakes(run)
+
+
+def test_prefetch_cancelled_when_plan_differs():
+    """规划结果为其他股票时，尚未开始的预取被取消"""
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def run():
+        with prefetch.start_prefetch("分析贵州茅台的投资价值") as pending:
+            assert not pending.settle('sz.000858')
+        pending.wait(timeout=5)
+        assert len(fetches) <= 1
+        assert sum(future.cancelled() for future in pending.futures.values()) >= 3
+
+    try:
+        _with_fakes(run, executor)
+    finally:
+        executor.shutdown()
+
+
+def test_no_prefetch_without_confident_match():
+    """无法确定唯一股票或规划中途异常时不留下预取"""
+    def run():
+        assert not prefetch.start_prefetch("对比茅台和五粮液").futures
+        assert not prefetch.start_prefetch("分析腾讯").futures   # 港股不预取
+        try:
+            with prefetch.start_prefetch("分析五粮液") as pending:
+                raise RuntimeError("规划失败")
+        except RuntimeError:
+            pass
+        assert pending._cancelled.is_set()
+
+    _with_fakes(run)
+
+
+if __name__ == "__main__":
+    test_match_stock_in_query()
+    test_prefetch_hits_cache_when_plan_matches()
+    test_prefetch_cancelled_when_plan_differs()
+    test_no_prefetch_without_confident_match()
+    print("✅ 数据预取测试通过")
@@ -0,0 +1,132 @@
+"""
+会话追问测试
+
+用真实规划Agent (LLM替换为返回固定JSON的假模型) 和真实总结Agent (假LLM) 构建生产工作流，验证:
+1. 第一轮完整分析后，指代上一轮公司的追问不调用规划LLM，也不重新运行已有结果的分析节点
+2. 追问单一维度时直接走轻量总结路径
+3. 换股票时重新规划，上下文随之切换；reset 后不再复用
+4. 各维度的分析结果按各自的分析时间过期
+"""
+import json
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.messages import AIMessage
+import graph.workflow as workflow
+from agents.planner_agent import PlannerAgent
+from config import config
+from graph.session import AnalysisSession
+from tests.fake_graph import build_graph, llm_summarizer
+
+LATENCY = 0.2  # 每个分析节点的模拟耗时 (秒)
+calls = []     # 规划LLM、分析节点和总结模型的调用记录
+
+PLANS = {
+    '茅台': {'company_name': '贵州茅台', 'stock_code': 'sh.600519', 'market': 'A股-上海'},
+    '五粮液': {'company_name': '五粮液', 'stock_code': 'sz.000858', 'market': 'A股-深圳'},
+}
+
+
+def FakePlanner():
+    """真实规划逻辑，ReAct调用替换为按查询返回固定JSON"""
+    agent = PlannerAgent.__new__(PlannerAgent)
+
+    def invoke(inputs):
+        calls.append('planner')
+        query = inputs['messages'][-1].content.split("用户查询:")[-1]
+        # 查询中最先提到的公司 (附带的上一轮公司在查询之后)
+        mentioned = sorted((query.find(key), key) for key in PLANS if key in query)
+        plan = PLANS[mentioned[0][1]] if mentioned else {'company_name': '', 'stock_code': '', 'market': ''}
+        return {'messages': [AIMessage(content=json.dumps({**plan, 'dimensions': ['full']}, ensure_ascii=False))]}
+
+    agent.invoke = invoke
+    return agent
+
+
+def _build_graph():
+    return build_graph(planner=FakePlanner, summarizer=llm_summarizer(calls), calls=calls, latency=LATENCY)
+
+
+def _turn(graph, session, query):
+    calls.clear()
+    result = graph.invoke(session.build_input(query))
+    session.update(result)
+    return result
+
+
+def test_followup_reuses_session_state():
+    original_prefetch = config.PREFETCH_ENABLED
+    config.PREFETCH_ENABLED = False
+    try:
+        graph = _build_graph()
+        session = AnalysisSession()
+
+        # 查询中的股票由词典抽取，不调用规划LLM
+        result = _turn(graph, session, "分析贵州茅台")
+        assert calls[-1] == 'summary'
+        assert sorted(calls[:-1]) == sorted(workflow.ANALYSIS_NODES)
+        assert set(session.context['analyses']) == set(workflow.ANALYSIS_NODES)
+
+        # 追问: 不调用规划LLM，不重新运行分析节点，单一维度走轻量总结
+        result = _turn(graph, session, "那它的估值呢")
+        assert calls == ['brief_summary']
+        assert result['stock_code'] == 'sh.600519' and result['dimensions'] == ['valuation']
+        assert "valuation of sh.600519" in result['final_report']
+
+        result = _turn(graph, session, "它的K线和新闻呢")
+        assert calls == ['summary']
+
+        # 没有指代词的追问交给LLM规划 (Prompt附带上一轮的公司)，规划结果为同一股票时同样复用
+        result = _turn(graph, session, "估值呢")
+        assert calls == ['planner', 'brief_summary']
+
+        # 换股票: 重新规划，只复用同一股票的结果
+        result = _turn(graph, session, "那五粮液呢")
+        assert 'planner' not in calls and len(calls) == len(workflow.ANALYSIS_NODES) + 1
+        assert session.context['stock_code'] == 'sz.000858'
+
+        session.reset()
+        assert session.build_input("那它的估值呢")['session_context'] is None
+        assert PlannerAgent._resolve_followup(FakePlanner(), "那它的估值呢", None) is None
+    finally:
+        config.PREFETCH_ENABLED = original_prefetch
+
+
+def test_session_update_rules():
+    session = AnalysisSession(ttl=60)
+    base = {'intent': 'stock', 'company_name': '贵州茅台', 'stock_code': 'sh.600519', 'market': 'A股-上海'}
+    session.update({**base, 'technical_analysis': 'ok', 'news_analysis': '新闻分析失败: timeout',
+                    'valuation_analysis': 'partial', 'timed_out_nodes': ['valuation']})
+    assert session.context['analyses'] == {'technical': 'ok'}
+
+    session.update({**base, 'news_analysis': 'news'})
+    assert session.context['analyses'] == {'technical': 'ok', 'news': 'news'}
+
+    # 公司知识问答和多股票对比不改变上下文
+    session.update({'intent': 'company', 'final_report': '...'})
+    session.update({**base, 'stocks': [{'stock_code': 'sh.600519'}, {'stock_code': 'sz.000858'}]})
+    assert session.context['stock_code'] == 'sh.600519'
+
+    # 各维度按自己的分析时间过期: 追问只复用未过期的分析，复用不延长有效期
+    session._analyzed_at['technical'] -= 61
+    assert session.active_context()['analyses'] == {'news': 'news'}
+    session.update({**base, 'news_analysis': 'news', 'valuation_analysis': 'valuation'})
+    assert session.active_context()['analyses'] == {'news': 'news', 'valuation': 'valuation'}
+    session._analyzed_at['news'] -= 61
+    session.update({**base, 'valuation_analysis': 'valuation'})
+    assert session.active_context()['analyses'] == {'valuation': 'valuation'}
+
+    session.ttl = 0
+    time.sleep(0.01)
+    assert session.active_context() is None
+    assert session.build_input("那它呢")['session_context'] is None
+
+
+if __name__ == "__main__":
+    test_followup_reuses_session_state()
+    test_session_update_rules()
+    print("✅ 会话追问测试通过")
@@ -0,0 +1,94 @@
+"""
+股票名称索引测试
+
+用固定的股票列表构建索引 (不访问数据源)，验证:
+1. 名称、简称、拼音首字母/全拼、曾用名、常用简称的精确匹配，前缀补全和错别字容错
+2. 刷新时名称变化的股票保留曾用名；索引文件的保存/加载
+3. 查询耗时为微秒级，_search_stock_by_name 不再下载股票列表
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import tools.stock_index as stock_index
+import tools.stock_search as stock_search
+from tools.stock_index import StockIndex, build_index
+
+LISTING = [
+    ('sh.600519', '贵州茅台'), ('sz.000858', '五 粮 液'), ('sh.600036', '招商银行'),
+    ('sh.601318', '中国平安'), ('sz.000001', '平安银行'), ('sh.600123', '*ST兰花'),
+    ('sh.600887', '伊利股份'), ('sz.300750', '宁德时代'), ('sh.601398', '工商银行'),
+]
+
+
+def _build(listing=LISTING, previous=None):
+    original = stock_index._fetch_listing
+    stock_index._fetch_listing = lambda: (listing, 'test')
+    try:
+        return build_index(previous)
+    finally:
+        stock_index._fetch_listing = original
+
+
+def test_lookup():
+    index = _build()
+    assert index.lookup('贵州茅台')['code'] == 'sh.600519'
+    assert index.lookup('茅台')['code'] == 'sh.600519'          # 常用简称
+    assert index.lookup('兰花')['code'] == 'sh.600123'          # 去掉 *ST
+    assert index.lookup('伊利')['code'] == 'sh.600887'          # 去掉 股份
+    assert index.lookup('GZMT')['code'] == 'sh.600519'          # 拼音首字母
+    assert index.lookup('ningdeshidai')['code'] == 'sz.300750'  # 全拼
+    assert index.lookup('贵洲茅台')['code'] == 'sh.600519'      # 错别字
+    assert index.lookup('宁德')['code'] == 'sz.300750'          # 唯一前缀
+    assert index.lookup('五粮液')['name'] == '五粮液'           # 名称中的空格已去除
+    assert index.lookup('国平')['code'] == 'sh.601318'          # 包含查询词的名称
+    assert index.lookup('腾讯')['code'] == 'hk.00700'           # 映射表中的港股
+    assert index.lookup('特斯拉') is None
+    assert [s['code'] for s in index.prefix('gs')] == ['sh.601398']
+    assert [s['code'] for s in index.prefix('平安')] == ['sz.000001']
+
+
+def test_refresh_keeps_former_names_and_persists():
+    old = _build()
+    renamed = [(code, '贵州酒业' if code == 'sh.600519' else name) for code, name in LISTING]
+    index = _build(renamed, previous=old)
+    assert index.get('sh.600519')['former_names'] == ['贵州茅台']
+    assert index.lookup('贵州茅台')['name'] == '贵州酒业'
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'stock_index.json'
+        index.save(path)
+        loaded = StockIndex.load(path)
+    assert len(loaded) == len(index) and loaded.built_at == index.built_at
+    assert loaded.lookup('gzjy')['code'] == 'sh.600519'
+
+
+def test_lookup_speed_and_search_uses_index():
+    index = _build()
+    queries = ['贵州茅台', 'gzmt', '宁德', '贵洲茅台', '特斯拉'] * 2000
+    start = time.perf_counter()
+    for query in queries:
+        index.lookup(query)
+    per_lookup = (time.perf_counter() - start) / len(queries)
+    print(f"\n每次查询 {per_lookup * 1e6:.1f}µs")
+    assert per_lookup < 200e-6
+
+    original = stock_search.get_stock_index
+    stock_search.get_stock_index = lambda: index
+    try:
+        assert stock_search._search_stock_by_name('招行银行') == {
+            'code': 'sh.600036', 'name': '招商银行', 'market': 'A股-上海'}
+    finally:
+        stock_search.get_stock_index = original
+
+
+if __name__ == "__main__":
+    test_lookup()
+    test_refresh_keeps_former_names_and_persists()
+    test_lookup_speed_and_search_uses_index()
+    print("✅ 股票索引测试通过")
@@ -0,0 +1,92 @@
+"""
+Aho-Corasick 多模式匹配
+一次扫描文本找出所有出现的关键词 (耗时与文本长度成正比，与关键词数量无关)，
+用于从查询中抽取股票名称等实体
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机
+
+    关键词和文本统一转为小写后匹配
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        """
+        Args:
+            patterns: [(关键词, 关联值)]，空关键词被忽略
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        for pattern, value in patterns:
+            if pattern:
+                self._add(pattern.lower(), value)
+        self._build()
+
+    def _add(self, pattern: str, value: Any) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), value))
+
+    def _build(self) -> None:
+        """按广度优先计算失败指针，并合并后缀状态的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        扫描文本
+
+        Args:
+            text: 待匹配文本
+
+        Yields:
+            (起始位置, 结束位置, 关联值)，按结束位置顺序，包含重叠的匹配
+        """
+        state = 0
+        for end, char in enumerate(text.lower(), 1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                yield end - length, end, value
+
+    def longest_matches(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        不重叠的最左最长匹配
+
+        Returns:
+            [(起始位置, 结束位置, 关联值)]，按起始位置排序
+        """
+        matches = sorted(self.iter(text), key=lambda m: (m[0], m[0] - m[1]))
+        result: List[Tuple[int, int, Any]] = []
+        covered = 0
+        for start, end, value in matches:
+            if start >= covered:
+                result.append((start, end, value))
+                covered = end
+        return result
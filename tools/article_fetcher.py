@@ -0,0 +1,226 @@
+"""
+新闻正文抓取
+
+搜索结果只有一两句摘要，情感/风险分析需要正文。正文抓取在新闻后台事件循环中并发进行:
+
+- 并发上限: 全局最多 ARTICLE_FETCH_CONCURRENCY 个请求；同一主机最多 ARTICLE_HOST_CONCURRENCY 个，
+  且相邻请求间隔不少于 ARTICLE_HOST_INTERVAL 秒 (礼貌抓取，避免被站点限流)
+- 正文提取: lxml 解析，优先常见正文容器 (新浪 #artibody 等)，否则取段落文本最多的节点
+- 内容缓存: 提取后的正文按URL存入共享磁盘缓存 (http_client.ResponseCache)，有效期 ARTICLE_CACHE_TTL
+- 总截止时间: 不超过 ARTICLE_FETCH_DEADLINE，且设置了运行截止时间时为LLM收尾留出 DEADLINE_WRAP_UP_SECONDS；
+  截止时仍未完成的请求被取消，调用方退回使用摘要
+"""
+import asyncio
+import re
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+import httpx
+import lxml.html
+from lxml import etree
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from llm.gateway import remaining_time
+from monitoring.metrics import registry
+from .http_client import cache_key, get_response_cache
+
+# 常见财经站点的正文容器，按顺序尝试
+MAIN_SELECTORS = [
+    '#artibody', '#article_content', '#ContentBody', '.article-content', '.article_content',
+    '.post_body', '#content', 'article', '.article',
+]
+
+_NOISE_TAGS = ['script', 'style', 'noscript', 'iframe', 'form', 'nav', 'header', 'footer', 'aside']
+_BLOCK_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'li', 'div', 'section', 'br'}
+# 正文过短时视为提取失败 (多为列表页、登录页)
+_MIN_TEXT_LENGTH = 50
+
+_CACHE_ENDPOINT = 'article_body'
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def _selector_xpath(selector: str) -> str:
+    """把简单的CSS选择器 (#id / .class / 标签) 转换为XPath"""
+    if selector.startswith('#'):
+        return f'//*[@id="{selector[1:]}"]'
+    if selector.startswith('.'):
+        return f'//*[contains(concat(" ", normalize-space(@class), " "), " {selector[1:]} ")]'
+    return f'//{selector}'
+
+
+_MAIN_XPATHS = [_selector_xpath(selector) for selector in MAIN_SELECTORS]
+
+
+def _block_text(element) -> str:
+    """按块级元素换行拼接文本"""
+    parts = []
+    for node in element.iter():
+        if not isinstance(node.tag, str):
+            continue
+        if node.tag in _BLOCK_TAGS:
+            parts.append('\n')
+        if node.text:
+            parts.append(node.text)
+        if node.tail and node is not element:
+            parts.append(node.tail)
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def decode_html(html: bytes, encoding: Optional[str] = None) -> str:
+    """
+    解码网页: 依次使用 <meta charset>、响应头声明的编码、UTF-8，都失败时按 GB18030 解码
+
+    Args:
+        html: 网页原始内容
+        encoding: 响应头声明的编码
+    """
+    match = _META_CHARSET.search(html[:4096])
+    declared = match.group(1).decode('ascii') if match else encoding
+    candidates = [declared] if declared else []
+    for name in candidates + ['utf-8']:
+        # GBK/GB2312 页面常含超出字符集的字符，统一按超集 GB18030 解码
+        name = 'gb18030' if name.lower().replace('-', '') in ('gbk', 'gb2312') else name
+        try:
+            return html.decode(name)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return html.decode('gb18030', errors='replace')
+
+
+def extract_main_text(html: bytes, max_chars: Optional[int] = None, encoding: Optional[str] = None) -> str:
+    """
+    提取网页正文
+
+    Args:
+        html: 网页原始内容
+        max_chars: 最长字符数，默认为配置 ARTICLE_MAX_CHARS
+        encoding: 响应头声明的编码 (见 decode_html)
+
+    Returns:
+        正文文本 (段落间换行)，无法识别正文时返回空字符串
+    """
+    max_chars = config.ARTICLE_MAX_CHARS if max_chars is None else max_chars
+    try:
+        root = lxml.html.fromstring(_XML_DECLARATION.sub('', decode_html(html, encoding)))
+    except (etree.ParserError, ValueError):
+        return ''
+    for element in root.xpath('//' + ' | //'.join(_NOISE_TAGS)):
+        element.drop_tree()
+
+    text = ''
+    for xpath in _MAIN_XPATHS:
+        found = root.xpath(xpath)
+        if found:
+            text = _block_text(found[0])
+            if len(text) >= _MIN_TEXT_LENGTH:
+                break
+    else:
+        # 没有已知容器: 取直接包含段落文本最多的节点
+        scores: Dict = {}
+        for p in root.iter('p'):
+            parent = p.getparent()
+            if parent is not None:
+                scores[parent] = scores.get(parent, 0) + len(p.text_content().strip())
+        text = _block_text(max(scores, key=scores.get)) if scores else ''
+    return text[:max_chars] if len(text) >= _MIN_TEXT_LENGTH else ''
+
+
+class _PoliteLimiter:
+    """全局及按主机的并发上限 (asyncio 原语绑定事件循环，每个循环一份)"""
+
+    def __init__(self):
+        self.global_slots = asyncio.Semaphore(config.ARTICLE_FETCH_CONCURRENCY)
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.host_next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """占用一个请求名额，并保证与该主机上一次请求的间隔"""
+        host_slot = self.host_slots.setdefault(host, asyncio.Semaphore(config.ARTICLE_HOST_CONCURRENCY))
+        async with self.global_slots, host_slot:
+            now = time.monotonic()
+            start = max(now, self.host_next_start.get(host, 0.0))
+            self.host_next_start[host] = start + config.ARTICLE_HOST_INTERVAL
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _PoliteLimiter]" = weakref.WeakKeyDictionary()
+
+
+def _limiter() -> _PoliteLimiter:
+    loop = asyncio.get_running_loop()
+    if loop not in _limiters:
+        _limiters[loop] = _PoliteLimiter()
+    return _limiters[loop]
+
+
+async def _fetch_one(client: httpx.AsyncClient, url: str) -> str:
+    """抓取并提取单篇正文 (先查缓存；正文提取和缓存读写在线程中进行，不阻塞共享事件循环上的其他请求)"""
+    cache = get_response_cache()
+    key = cache_key('GET', url)
+    cached = await asyncio.to_thread(cache.get, _CACHE_ENDPOINT, key)
+    if cached is not None:
+        registry.inc('stock_agent_article_fetch_total', {'result': 'cached'}, help_text='新闻正文抓取次数')
+        return cached[2].decode('utf-8')
+
+    async with _limiter().slot(urlsplit(url).netloc.lower()):
+        response = await client.get(url, follow_redirects=True)
+        response.raise_for_status()
+    text = await asyncio.to_thread(extract_main_text, response.content, encoding=response.charset_encoding)
+    registry.inc('stock_agent_article_fetch_total', {'result': 'ok' if text else 'empty'},
+                 help_text='新闻正文抓取次数')
+    if text:
+        await asyncio.to_thread(cache.put, _CACHE_ENDPOINT, key, url, 200, [], text.encode('utf-8'),
+                                config.ARTICLE_CACHE_TTL)
+    return text
+
+
+def fetch_budget() -> float:
+    """本次正文抓取可用的秒数 (<=0 表示没有时间抓取)"""
+    budget = config.ARTICLE_FETCH_DEADLINE
+    remaining = remaining_time()
+    if remaining is not None:
+        budget = min(budget, remaining - config.DEADLINE_WRAP_UP_SECONDS)
+    return budget
+
+
+async def afetch_articles(client: httpx.AsyncClient, urls: Iterable[str],
+                          budget: Optional[float] = None) -> Dict[str, str]:
+    """
+    并发抓取多篇新闻正文
+
+    Args:
+        client: 异步HTTP客户端
+        urls: 新闻URL (重复和空URL被忽略)
+        budget: 总截止时间 (秒)，默认由 fetch_budget() 计算
+
+    Returns:
+        URL -> 正文，抓取失败、超时或无法提取正文的URL不在结果中
+    """
+    budget = fetch_budget() if budget is None else budget
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls or budget <= 0:
+        return {}
+    tasks = {asyncio.ensure_future(_fetch_one(client, url)): url for url in urls}
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()
+    if pending:
+        registry.inc('stock_agent_article_fetch_total', {'result': 'timeout'}, len(pending),
+                     help_text='新闻正文抓取次数')
+
+    bodies = {}
+    for task in done:
+        if task.exception() is not None:
+            registry.inc('stock_agent_article_fetch_total', {'result': 'error'}, help_text='新闻正文抓取次数')
+        elif task.result():
+            bodies[tasks[task]] = task.result()
+    return bodies
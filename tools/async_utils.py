@@ -0,0 +1,122 @@
+"""
+异步工具辅助模块
+为阻塞的数据接口 (Baostock/AKShare/requests) 提供线程池卸载，使其可在事件循环中调用；
+同步代码需要并发发起网络请求时，提交协程到常驻的后台事件循环
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+from langchain_core.tools import BaseTool, StructuredTool
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+
+T = TypeVar('T')
+
+# 阻塞数据调用专用线程池 (与事件循环默认线程池隔离，便于控制并发上限)
+DATA_EXECUTOR = ThreadPoolExecutor(
+    max_workers=config.DATA_THREAD_POOL_SIZE,
+    thread_name_prefix='data-fetch'
+)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在数据线程池中执行阻塞函数，并保留当前上下文变量 (如运行ID)
+
+    Args:
+        func: 阻塞函数
+        *args, **kwargs: 函数参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(DATA_EXECUTOR, call)
+
+
+def asyncify_tool(tool: BaseTool) -> BaseTool:
+    """
+    为同步工具补充异步实现 (线程池卸载)
+
+    同步调用 (invoke) 行为不变；异步调用 (ainvoke) 时不再占用事件循环，
+    而是在 DATA_EXECUTOR 中执行原函数。
+
+    Args:
+        tool: @tool 装饰生成的工具
+
+    Returns:
+        同时支持同步和异步调用的工具
+    """
+    func = getattr(tool, 'func', None)
+    if func is None or getattr(tool, 'coroutine', None) is not None:
+        # 已有原生异步实现或不是函数工具，保持原样
+        return tool
+
+    async def _acall(**kwargs: Any) -> Any:
+        return await run_blocking(func, **kwargs)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=func,
+        coroutine=_acall,
+        return_direct=tool.return_direct,
+    )
+
+
+def asyncify_tools(tools: List[BaseTool]) -> List[BaseTool]:
+    """批量为工具补充异步实现"""
+    return [asyncify_tool(tool) for tool in tools]
+
+
+class BackgroundLoop:
+    """
+    常驻后台线程的事件循环
+
+    异步HTTP客户端的连接绑定在事件循环上。同步调用方 (数据线程池中的工具、预取) 每次 asyncio.run
+    都会新建循环，无法复用连接；把协程提交到同一个后台循环，客户端和连接池即可在进程内共享。
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: 线程名称
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环 (首次使用时启动线程)"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        阻塞等待协程在后台循环中执行完成 (不能在后台循环自身的线程中调用)
+
+        Args:
+            coro: 协程
+            timeout: 最长等待时间 (秒)
+
+        Returns:
+            协程返回值
+        """
+        return self.submit(coro).result(timeout)
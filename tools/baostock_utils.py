@@ -8,6 +8,8 @@ from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 import threading
 import atexit
+from .capabilities import require_source
+from .data_cache import cached_data
 
 
 class BaostockConnectionManager:
@@ -75,6 +77,7 @@ def ensure_baostock_connection():
     _connection_manager.ensure_connection()
 
 
+@cached_data()
 def fetch_financial_data(
     code: str,
     year: int,
@@ -92,7 +95,11 @@ def fetch_financial_data(
     
     Returns:
         DataFrame: 财务数据
+    
+    Raises:
+        UnsupportedMarketError: Baostock 不支持该股票所属市场 (不登录，立即失败)
     """
+    require_source('baostock', data_type, code)
     with baostock_login_context():
         # 整个查询操作都在锁内执行，避免死锁
         with QUERY_LOCK:
@@ -131,6 +138,7 @@ def fetch_financial_data(
             return pd.DataFrame(data_list, columns=rs.fields)
 
 
+@cached_data()
 def fetch_index_constituent_data(
     index_type: str,
     date: Optional[str] = None
@@ -181,6 +189,7 @@ def fetch_index_constituent_data(
         return pd.DataFrame(data_list, columns=rs.fields)
 
 
+@cached_data()
 def fetch_macro_data(
     data_type: str,
     start_date: Optional[str] = None,
@@ -231,6 +240,7 @@ def fetch_macro_data(
         return pd.DataFrame(data_list, columns=rs.fields)
 
 
+@cached_data()
 def fetch_generic_data(
     query_type: str,
     **kwargs
@@ -244,7 +254,11 @@ def fetch_generic_data(
     
     Returns:
         DataFrame: 查询结果
+    
+    Raises:
+        UnsupportedMarketError: Baostock 不支持该股票所属市场 (不登录，立即失败)
     """
+    require_source('baostock', query_type, kwargs.get('code'))
     with baostock_login_context():
         # 整个查询操作都在锁内执行，避免死锁
         with QUERY_LOCK:
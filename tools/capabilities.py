@@ -0,0 +1,176 @@
+"""
+市场能力矩阵
+
+各数据源按查询类型声明支持的市场，工具和分析维度由所用的查询类型推出支持的市场。
+调用前先查矩阵:
+
+- 有支持该市场的数据源时路由过去 (如港股K线走 AKShare)
+- 没有时立即拒绝 (不登录数据源、不发请求)，规划后的路由也跳过无法支持的分析维度
+
+映射表中的港股 (hk.*) 以前会被发给只支持A股的 Baostock，每次工具调用都白白消耗一次请求和一轮LLM。
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# 市场 (股票代码前缀)
+MARKET_NAMES = {
+    'sh': 'A股-上海',
+    'sz': 'A股-深圳',
+    'bj': 'A股-北京',
+    'hk': '港股',
+    'us': '美股',
+}
+
+A_SHARE: FrozenSet[str] = frozenset({'sh', 'sz'})
+ALL_MARKETS: FrozenSet[str] = frozenset(MARKET_NAMES)
+
+# 财务报表查询类型 (见 tools/data_source.py)
+FINANCIAL_QUERIES = ('profit', 'operation', 'growth', 'balance', 'cash_flow', 'dupont')
+
+# 各数据源按查询类型支持的市场 (数据源按顺序优先)
+SOURCE_CAPABILITIES: Dict[str, Dict[str, FrozenSet[str]]] = {
+    'baostock': {
+        **{query: A_SHARE for query in FINANCIAL_QUERIES},
+        **{query: A_SHARE for query in (
+            'k_data', 'stock_basic', 'dividend', 'adjust_factor', 'stock_industry',
+            'performance_express', 'forecast',
+        )},
+    },
+    'akshare': {
+        **{query: A_SHARE for query in FINANCIAL_QUERIES},
+        'k_data': frozenset({'hk'}),
+    },
+    # 新闻按公司名称搜索，与市场无关
+    'news': {'news': ALL_MARKETS},
+}
+
+# 各工具使用的查询类型
+TOOL_QUERIES = {
+    'get_historical_k_data': 'k_data',
+    'get_stock_basic_info': 'stock_basic',
+    'get_dividend_data': 'dividend',
+    'get_adjust_factor_data': 'adjust_factor',
+    'get_stock_industry': 'stock_industry',
+    'get_performance_express_report': 'performance_express',
+    'get_forecast_report': 'forecast',
+    'get_profit_data': 'profit',
+    'get_operation_data': 'operation',
+    'get_growth_data': 'growth',
+    'get_balance_data': 'balance',
+    'get_cash_flow_data': 'cash_flow',
+    'get_dupont_data': 'dupont',
+    'crawl_news': 'news',
+}
+
+# 各分析维度必需的查询类型 (全部可用时才执行该维度)
+DIMENSION_QUERIES = {
+    'fundamental': ('profit',),
+    'technical': ('k_data',),
+    'valuation': ('stock_basic', 'profit'),
+    'news': ('news',),
+}
+
+
+class UnsupportedMarketError(Exception):
+    """没有数据源支持该市场的查询"""
+    pass
+
+
+def market_of(code: str) -> str:
+    """
+    股票代码所属市场
+
+    Args:
+        code: 股票代码，如 sh.600519 / hk.00700
+
+    Returns:
+        市场前缀 (见 MARKET_NAMES)，无法识别时返回空字符串
+    """
+    prefix = str(code or '').split('.', 1)[0].lower()
+    return prefix if prefix in MARKET_NAMES else ''
+
+
+def _serves(markets: FrozenSet[str], code: str) -> bool:
+    """市场集合是否覆盖该股票 (无法识别市场的代码不拦截，保持原有行为)"""
+    market = market_of(code)
+    return not market or market in markets
+
+
+def query_markets(query_type: str) -> FrozenSet[str]:
+    """支持某查询类型的市场 (所有数据源的并集)"""
+    markets = frozenset()
+    for capabilities in SOURCE_CAPABILITIES.values():
+        markets |= capabilities.get(query_type, frozenset())
+    return markets
+
+
+def route_sources(query_type: str, code: str, sources: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    支持该股票所属市场的数据源
+
+    Args:
+        query_type: 查询类型
+        code: 股票代码
+        sources: 候选数据源 (按优先顺序)，默认为全部数据源
+
+    Returns:
+        按优先顺序排列的可用数据源，没有时为空列表
+    """
+    return [
+        source for source in (sources or SOURCE_CAPABILITIES)
+        if _serves(SOURCE_CAPABILITIES.get(source, {}).get(query_type, frozenset()), code)
+    ]
+
+
+def _describe(code: str) -> str:
+    return MARKET_NAMES.get(market_of(code), '未知市场')
+
+
+def require_source(source: str, query_type: str, code: str) -> None:
+    """
+    数据源调用前的市场检查
+
+    Raises:
+        UnsupportedMarketError: 该数据源不支持此股票所属市场的查询
+    """
+    if code and not route_sources(query_type, code, [source]):
+        raise UnsupportedMarketError(f"{source} 不支持{_describe(code)}的 {query_type} 查询 ({code})")
+
+
+def check_tool(tool_name: str, code: str) -> Optional[str]:
+    """
+    工具调用前的市场检查
+
+    Args:
+        tool_name: 工具名称
+        code: 股票代码
+
+    Returns:
+        不支持时的拒绝说明，支持 (或工具未声明) 时返回None
+    """
+    query_type = TOOL_QUERIES.get(tool_name)
+    if not query_type or not code or _serves(query_markets(query_type), code):
+        return None
+    return f"{tool_name} 不支持{_describe(code)}股票 ({code})，请不要再次调用，直接基于其他可用数据分析"
+
+
+def dimension_supported(dimension: str, code: str) -> bool:
+    """分析维度对该股票是否可执行"""
+    return all(_serves(query_markets(query), code) for query in DIMENSION_QUERIES.get(dimension, ()))
+
+
+def split_dimensions(code: str, dimensions: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    按市场能力划分分析维度
+
+    Returns:
+        (可执行的维度, 不支持的维度)
+    """
+    supported, unsupported = [], []
+    for dimension in dimensions:
+        (supported if dimension_supported(dimension, code) else unsupported).append(dimension)
+    return supported, unsupported
+
+
+def unavailable_tools(tool_names: Iterable[str], code: str) -> List[str]:
+    """工具列表中不支持该股票所属市场的工具"""
+    return [name for name in tool_names if check_tool(name, code)]
@@ -0,0 +1,157 @@
+"""
+多股票对比指标模块
+从行情和财务数据本地计算对比指标 (不经过LLM)，生成并排的Markdown表格
+
+- 行情指标: 最新收盘价、近1年涨跌幅、年化波动率、最大回撤、市盈率TTM、市净率MRQ
+- 财务指标: 最近一期已披露的 ROE、净利率、毛利率
+- 数据经由带缓存的数据接口获取，与各分析Agent共享缓存
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from .baostock_utils import fetch_financial_data
+from .data_source import fetch_k_data
+from .date_utils import get_recent_quarters
+
+# 对比所用的K线字段 (前复权，含估值字段)
+COMPARISON_K_FIELDS = "date,close,pctChg,peTTM,pbMRQ"
+
+# (指标键, 表头, 小数位数, 是否为百分比)
+METRICS: List[Tuple[str, str, int, bool]] = [
+    ('close', '最新收盘价 (元)', 2, False),
+    ('return_1y', '近1年涨跌幅', 2, True),
+    ('volatility', '年化波动率', 2, True),
+    ('max_drawdown', '近1年最大回撤', 2, True),
+    ('pe_ttm', '市盈率 (TTM)', 2, False),
+    ('pb_mrq', '市净率 (MRQ)', 2, False),
+    ('roe', 'ROE', 2, True),
+    ('np_margin', '净利率', 2, True),
+    ('gp_margin', '毛利率', 2, True),
+    ('report_period', '财报期', 0, False),
+]
+
+
+def _last_number(series: pd.Series) -> Optional[float]:
+    """序列中最后一个有效数值"""
+    values = pd.to_numeric(series, errors='coerce').dropna()
+    return float(values.iloc[-1]) if not values.empty else None
+
+
+def price_metrics(k_data: pd.DataFrame) -> Dict[str, Optional[float]]:
+    """
+    由日K线计算行情指标
+
+    Args:
+        k_data: 包含 close、pctChg、peTTM、pbMRQ 列的日K线 (前复权，按日期升序)
+
+    Returns:
+        {'close', 'return_1y', 'volatility', 'max_drawdown', 'pe_ttm', 'pb_mrq'}，无数据的指标为None
+    """
+    metrics: Dict[str, Optional[float]] = {key: None for key in
+                                           ('close', 'return_1y', 'volatility', 'max_drawdown', 'pe_ttm', 'pb_mrq')}
+    if k_data is None or k_data.empty:
+        return metrics
+    close = pd.to_numeric(k_data['close'], errors='coerce').dropna()
+    if not close.empty:
+        metrics['close'] = float(close.iloc[-1])
+        metrics['return_1y'] = (float(close.iloc[-1]) / float(close.iloc[0]) - 1) * 100
+        drawdown = close / close.cummax() - 1
+        metrics['max_drawdown'] = float(drawdown.min()) * 100
+    changes = pd.to_numeric(k_data.get('pctChg', pd.Series(dtype=float)), errors='coerce').dropna()
+    if len(changes) > 1:
+        metrics['volatility'] = float(changes.std()) * math.sqrt(252)
+    if 'peTTM' in k_data:
+        metrics['pe_ttm'] = _last_number(k_data['peTTM'])
+    if 'pbMRQ' in k_data:
+        metrics['pb_mrq'] = _last_number(k_data['pbMRQ'])
+    return metrics
+
+
+def profit_metrics(profit: pd.DataFrame) -> Dict[str, Any]:
+    """
+    由Baostock盈利能力数据提取财务指标
+
+    Args:
+        profit: 包含 roeAvg、npMargin、gpMargin、statDate 列的盈利能力数据 (比率为小数)
+
+    Returns:
+        {'roe', 'np_margin', 'gp_margin', 'report_period'}，无数据的指标为None
+    """
+    metrics: Dict[str, Any] = {'roe': None, 'np_margin': None, 'gp_margin': None, 'report_period': None}
+    if profit is None or profit.empty:
+        return metrics
+    for key, column in (('roe', 'roeAvg'), ('np_margin', 'npMargin'), ('gp_margin', 'gpMargin')):
+        if column in profit:
+            value = _last_number(profit[column])
+            metrics[key] = value * 100 if value is not None else None
+    if 'statDate' in profit:
+        metrics['report_period'] = str(profit['statDate'].iloc[-1])
+    return metrics
+
+
+def fetch_stock_metrics(code: str) -> Dict[str, Any]:
+    """
+    获取单只股票的对比指标 (各项数据独立获取，单项失败不影响其他指标)
+
+    Args:
+        code: 股票代码 (如 sh.600519)
+
+    Returns:
+        指标字典 (键见 METRICS)，获取失败的指标为None
+    """
+    end = datetime.now()
+    metrics: Dict[str, Any] = {}
+    try:
+        k_data = fetch_k_data(
+            code=code,
+            start_date=(end - timedelta(days=365)).strftime('%Y-%m-%d'), end_date=end.strftime('%Y-%m-%d'),
+            frequency='d', adjustflag='2', fields=COMPARISON_K_FIELDS,
+        )
+    except Exception as e:
+        print(f"    [Comparison] {code} 行情数据获取失败: {e}")
+        k_data = None
+    metrics.update(price_metrics(k_data))
+
+    profit = None
+    # 最近一期可能尚未披露，依次回退
+    for year, quarter in get_recent_quarters(4):
+        try:
+            profit = fetch_financial_data(code, year, quarter, 'profit')
+        except Exception as e:
+            print(f"    [Comparison] {code} {year}Q{quarter} 财务数据获取失败: {e}")
+            continue
+        if not profit.empty:
+            break
+    metrics.update(profit_metrics(profit))
+    return metrics
+
+
+def _format_value(value: Any, digits: int, percent: bool) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return '-'
+    if isinstance(value, str):
+        return value
+    return f"{value:.{digits}f}%" if percent else f"{value:.{digits}f}"
+
+
+def format_comparison_table(stocks: List[Dict[str, str]], metrics: List[Dict[str, Any]]) -> str:
+    """
+    生成并排的指标对比表
+
+    Args:
+        stocks: [{'company_name', 'stock_code'}]
+        metrics: 与 stocks 一一对应的指标字典
+
+    Returns:
+        Markdown表格 (行为指标，列为股票)
+    """
+    headers = [f"{s.get('company_name') or s['stock_code']} ({s['stock_code']})" for s in stocks]
+    lines = [
+        "| 指标 | " + " | ".join(headers) + " |",
+        "|------|" + "|".join("------" for _ in headers) + "|",
+    ]
+    for key, label, digits, percent in METRICS:
+        cells = [_format_value(m.get(key), digits, percent) for m in metrics]
+        lines.append(f"| {label} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
@@ -0,0 +1,143 @@
+"""
+数据源结果缓存模块
+进程内TTL缓存，批量分析时多个运行共享同一份行情/财务/宏观数据
+
+- 同一参数的并发请求只访问一次数据源 (其余请求等待第一次的结果)
+- 只缓存成功结果，异常不缓存
+- DataFrame 结果返回副本，调用方修改不影响缓存
+- DATA_CACHE_TTL=0 时关闭缓存
+"""
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+import pandas as pd
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+
+T = TypeVar('T')
+
+
+class DataCache:
+    """线程安全的TTL缓存 (带并发请求合并)"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        # key -> (过期时间, 值)
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        # key -> 正在获取该key的事件 (并发请求合并)
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], T], ttl: float) -> Tuple[T, bool]:
+        """
+        读取缓存，未命中时调用 loader 获取并写入
+
+        Args:
+            key: 缓存键
+            loader: 数据获取函数
+            ttl: 有效期 (秒)
+
+        Returns:
+            (值, 是否命中缓存)
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self.hits += 1
+                    return entry[1], True
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # 相同请求正在获取，等待其完成后重新读取 (失败时由当前线程重试)
+            waiter.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._evict()
+                self._entries[key] = (time.monotonic() + ttl, value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _evict(self) -> None:
+        """清理过期条目，仍超出上限时丢弃最早写入的一半"""
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            for key in list(self._entries)[:len(self._entries) // 2]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+# 全局数据缓存
+data_cache = DataCache()
+
+
+def _private_copy(value: Any) -> Any:
+    """缓存值的副本: 调用方会原地修改结果 (如给新闻条目加字段)，不能共享缓存中的对象"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def cached_data(namespace: Optional[str] = None, ttl: Optional[float] = None):
+    """
+    数据获取函数的缓存装饰器
+
+    Args:
+        namespace: 缓存命名空间 (默认使用函数名)
+        ttl: 有效期 (秒)，默认使用 DATA_CACHE_TTL
+
+    Returns:
+        装饰器
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        name = namespace or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            expires = config.DATA_CACHE_TTL if ttl is None else ttl
+            if expires <= 0:
+                return func(*args, **kwargs)
+            key = (name, args, tuple(sorted(kwargs.items())))
+            value, hit = data_cache.get_or_load(key, lambda: func(*args, **kwargs), expires)
+            registry.inc('stock_agent_data_cache_total', {'source': name, 'result': 'hit' if hit else 'miss'},
+                         help_text='数据源缓存访问次数')
+            return _private_copy(value)
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
@@ -1,11 +1,16 @@
 """
 双数据源工具模块
 优先使用 AKShare，失败时回退到 Baostock
+只调用支持该股票所属市场的数据源 (见 tools/capabilities.py)，港股K线走 AKShare
 """
 import pandas as pd
 from typing import Optional, Tuple
 import time
 import threading
+from .baostock_utils import fetch_generic_data
+from .capabilities import UnsupportedMarketError, route_sources
+from .data_cache import cached_data
+from .http_client import import_akshare
 
 # 全局数据获取锁，防止多线程并发导致的 Baostock 崩溃或 Akshare 输出混乱
 DATA_FETCH_LOCK = threading.Lock()
@@ -59,7 +64,7 @@ def _fetch_from_akshare(
         (成功标志, 数据DataFrame, 错误信息)
     """
     try:
-        import akshare as ak
+        ak = import_akshare()
         
         ak_code = _convert_stock_code(code, "akshare")
         
@@ -161,6 +166,7 @@ def _fetch_from_baostock(
         return False, pd.DataFrame(), f"Baostock 错误: {error_msg}"
 
 
+@cached_data()
 def fetch_financial_data_dual(
     code: str,
     year: int,
@@ -201,6 +207,12 @@ def fetch_financial_data_dual(
             ("Baostock", _fetch_from_baostock),
         ]
     
+    # 只保留支持该市场的数据源 (都不支持时不发请求，立即失败)
+    available = route_sources(data_type, code, [name.lower() for name, _ in sources])
+    sources = [(name, func) for name, func in sources if name.lower() in available]
+    if not sources:
+        raise UnsupportedMarketError(f"没有数据源支持 {code} 的 {data_type} 数据")
+    
     # 依次尝试各数据源
     with DATA_FETCH_LOCK:
         for source_name, fetch_func in sources:
@@ -222,6 +234,85 @@ def fetch_financial_data_dual(
     )
 
 
+# AKShare 港股K线列名 -> Baostock 字段名
+_HK_K_COLUMNS = {
+    '日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+    '成交量': 'volume', '成交额': 'amount', '换手率': 'turn', '涨跌幅': 'pctChg',
+}
+_AKSHARE_PERIODS = {'d': 'daily', 'w': 'weekly', 'm': 'monthly'}
+_AKSHARE_ADJUST = {'1': 'hfq', '2': 'qfq', '3': ''}
+
+
+@cached_data()
+def fetch_hk_k_data(
+    code: str,
+    start_date: str,
+    end_date: str,
+    frequency: str = "d",
+    adjustflag: str = "3",
+    fields: str = "date,open,high,low,close,volume"
+) -> pd.DataFrame:
+    """
+    从 AKShare 获取港股K线 (参数和返回字段与 Baostock K线一致)
+    
+    Args:
+        code: 股票代码，如 hk.00700
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        frequency: K线频率，d/w/m
+        adjustflag: 复权类型，1=后复权, 2=前复权, 3=不复权
+        fields: 返回字段
+    
+    Returns:
+        DataFrame: K线数据 (AKShare 不提供的字段被忽略)
+    """
+    ak = import_akshare()
+    
+    if frequency not in _AKSHARE_PERIODS:
+        raise DataSourceError(f"AKShare 港股K线不支持频率: {frequency}")
+    df = ak.stock_hk_hist(
+        symbol=_convert_stock_code(code, "akshare"),
+        period=_AKSHARE_PERIODS[frequency],
+        start_date=start_date.replace("-", ""),
+        end_date=end_date.replace("-", ""),
+        adjust=_AKSHARE_ADJUST.get(adjustflag, ""),
+    )
+    df = df.rename(columns=_HK_K_COLUMNS)
+    df['date'] = df['date'].astype(str)
+    return df[[field for field in fields.split(",") if field in df.columns]]
+
+
+def fetch_k_data(
+    code: str,
+    start_date: str,
+    end_date: str,
+    frequency: str = "d",
+    adjustflag: str = "3",
+    fields: str = "date,open,high,low,close,volume"
+) -> pd.DataFrame:
+    """
+    按市场路由的K线查询: A股走 Baostock，港股走 AKShare
+    
+    Raises:
+        UnsupportedMarketError: 没有数据源支持该市场 (如美股)
+    """
+    sources = route_sources('k_data', code, ['baostock', 'akshare'])
+    if not sources:
+        raise UnsupportedMarketError(f"没有数据源支持 {code} 的K线数据")
+    if sources[0] == 'akshare':
+        return fetch_hk_k_data(code, start_date, end_date, frequency, adjustflag, fields)
+    # 参数写法与规划阶段预取一致，才能命中数据缓存
+    return fetch_generic_data(
+        query_type='k_data',
+        code=code,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        adjustflag=adjustflag,
+        fields=fields
+    )
+
+
 def format_to_markdown(df: pd.DataFrame, title: str = "") -> str:
     """
     将DataFrame格式化为Markdown表格
@@ -6,6 +6,7 @@ from typing import Optional
 from langchain_core.tools import tool
 from .data_source import fetch_financial_data_dual, format_to_markdown, RateLimitError
 from .baostock_utils import fetch_generic_data
+from .capabilities import check_tool
 
 
 @tool
@@ -23,6 +24,10 @@ def get_profit_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的盈利能力数据
     """
+    rejected = check_tool('get_profit_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'profit')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 盈利能力数据")
@@ -45,6 +50,10 @@ def get_operation_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的营运能力数据
     """
+    rejected = check_tool('get_operation_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'operation')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 营运能力数据")
@@ -67,6 +76,10 @@ def get_growth_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的成长能力数据
     """
+    rejected = check_tool('get_growth_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'growth')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 成长能力数据")
@@ -89,6 +102,10 @@ def get_balance_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的偿债能力数据
     """
+    rejected = check_tool('get_balance_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'balance')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 偿债能力数据")
@@ -111,6 +128,10 @@ def get_cash_flow_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的现金流量数据
     """
+    rejected = check_tool('get_cash_flow_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'cash_flow')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 现金流量数据")
@@ -134,6 +155,10 @@ def get_dupont_data(code: str, year: int, quarter: int) -> str:
     Returns:
         str: Markdown格式的杜邦分析数据
     """
+    rejected = check_tool('get_dupont_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_financial_data_dual(code, year, quarter, 'dupont')
         return format_to_markdown(df, f"{code} {year}Q{quarter} 杜邦分析数据")
@@ -160,6 +185,10 @@ def get_performance_express_report(
     Returns:
         str: Markdown格式的业绩快报数据
     """
+    rejected = check_tool('get_performance_express_report', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(
             query_type='performance_express',
@@ -191,6 +220,10 @@ def get_forecast_report(
     Returns:
         str: Markdown格式的业绩预告数据
     """
+    rejected = check_tool('get_forecast_report', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(
             query_type='forecast',
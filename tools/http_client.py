@@ -0,0 +1,385 @@
+"""
+共享HTTP层
+
+新闻搜索和 AKShare 的HTTP请求统一经过这里:
+
+- 连接池: 按主机分池并保持长连接 (keep-alive)，不再每次请求都重新建立 TCP/TLS 连接
+- 磁盘响应缓存: 按接口配置有效期 (CACHE_RULES，如新闻搜索10分钟、股票列表1天)，未配置的接口不缓存；
+  缓存在进程重启和批量分析的多个进程之间共享。打开时和每写入 PRUNE_EVERY 条时清理过期条目，
+  总大小超过 HTTP_CACHE_MAX_MB 时先淘汰最早过期的条目
+- 统计: 按接口记录命中率和节省的下载字节数 (response_cache.stats() 及 Prometheus 指标)
+
+同步请求使用共享的 requests 会话 (不保存Cookie)。AKShare 内部使用 requests.get 等模块级调用，
+import_akshare 返回的模块代理在 akshare_transport() 范围内调用各接口，只有这些调用改走共享会话，
+其他库的 requests 调用不受影响；异步请求 (新闻并发搜索) 使用 create_async_client 创建的 httpx 客户端。
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import httpx
+import requests
+import requests.api
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+
+# 可缓存的接口: (名称, 匹配 "主机/路径?查询" 的正则, 有效期秒)，按顺序匹配第一条
+CACHE_RULES: List[Tuple[str, str, float]] = [
+    ('news_search', r'^(search\.sina\.com\.cn/news|www\.baidu\.com/s)\?', 600),
+    # AKShare stock_info_a_code_name: 沪深北交易所的证券列表
+    ('stock_listing', r'^(query\.sse\.com\.cn/sseQuery/commonQuery\.do|www\.szse\.cn/api/report/ShowReport'
+                      r'|www\.bse\.cn/nqxxController/nqxxCnzq\.do)', 86400),
+    # AKShare 财务报表 (东方财富数据中心 / 新浪财务指标)，季度更新
+    ('financial_reports', r'^(datacenter-web\.eastmoney\.com/api/data/v1/get\?.*reportName=RPT_DMSK_FN_'
+                          r'|money\.finance\.sina\.com\.cn/corp/go\.php/vFD_FinancialGuideLine)', 86400),
+    # AKShare 港股K线 (盘中最后一根K线会变化)
+    ('hk_kline', r'^\d*\.?push2his\.eastmoney\.com/api/qt/stock/kline/get\?', 600),
+]
+
+# 不随缓存保存的响应头 (缓存的是解压后的正文)
+_HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+CachedResponse = Tuple[int, List[Tuple[str, str]], bytes]
+
+
+def match_rule(method: str, url: str) -> Optional[Tuple[str, float]]:
+    """
+    查找请求对应的缓存规则
+
+    Args:
+        method: 请求方法 (只缓存 GET/POST)
+        url: 完整URL
+
+    Returns:
+        (接口名称, 有效期)，不缓存时返回None
+    """
+    if not config.HTTP_CACHE_ENABLED or method.upper() not in ('GET', 'POST'):
+        return None
+    target = re.sub(r'^https?://', '', url, flags=re.IGNORECASE)
+    for name, pattern, ttl in CACHE_RULES:
+        if re.search(pattern, target):
+            return name, ttl
+    return None
+
+
+def cache_key(method: str, url: str, body: Any = None) -> str:
+    """请求的缓存键 (方法 + URL + 请求体)"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hashlib.sha256(f"{method.upper()} {url}\n".encode('utf-8'))
+    digest.update(body or b'')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite 磁盘响应缓存 (线程安全)
+
+    Attributes:
+        path: 缓存文件路径
+        max_bytes: 缓存正文的总大小上限 (字节)，None 表示不限制
+    """
+
+    # 每写入多少条清理一次过期条目并检查大小上限
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, url TEXT, status INTEGER, headers TEXT, "
+            "body BLOB, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # 接口 -> {hits, misses, bytes_saved}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes = 0
+        self.prune()
+
+    def _count(self, endpoint: str, result: str, size: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'hits': 0, 'misses': 0, 'bytes_saved': 0})
+            stats['hits' if result == 'hit' else 'misses'] += 1
+            stats['bytes_saved'] += size
+        registry.inc('stock_agent_http_cache_total', {'endpoint': endpoint, 'result': result},
+                     help_text='HTTP响应缓存访问次数')
+        if size:
+            registry.inc('stock_agent_http_cache_bytes_saved_total', {'endpoint': endpoint}, size,
+                         help_text='HTTP响应缓存节省的下载字节数')
+
+    def get(self, endpoint: str, key: str) -> Optional[CachedResponse]:
+        """
+        读取未过期的缓存响应 (同时记录命中统计)
+
+        Returns:
+            (状态码, 响应头, 正文)，未命中时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            self._count(endpoint, 'miss')
+            return None
+        status, headers, body = row
+        self._count(endpoint, 'hit', len(body))
+        return status, [tuple(item) for item in json.loads(headers)], bytes(body)
+
+    def put(self, endpoint: str, key: str, url: str, status: int,
+            headers: List[Tuple[str, str]], body: bytes, ttl: float) -> None:
+        """写入响应 (只应写入成功的响应)"""
+        headers = [(k, v) for k, v in headers if k.lower() not in _HOP_HEADERS]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, url, status, json.dumps(headers), sqlite3.Binary(body), time.time() + ttl),
+            )
+            self._conn.commit()
+            self._writes += 1
+            due = self._writes % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def purge_expired(self) -> int:
+        """删除过期条目，返回删除数量"""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def prune(self) -> int:
+        """
+        删除过期条目，总大小超过 max_bytes 时再淘汰最早过期的条目 (释放的页由后续写入复用)
+
+        Returns:
+            删除的条目数
+        """
+        deleted = self.purge_expired()
+        if self.max_bytes is None:
+            return deleted
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(body) FROM responses ORDER BY expires_at DESC").fetchall()
+            kept, evicted = 0, []
+            for key, size in rows:
+                kept += size or 0
+                if kept > self.max_bytes:
+                    evicted.append((key,))
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self._conn.commit()
+        if evicted:
+            registry.inc('stock_agent_http_cache_evictions_total', value=len(evicted),
+                         help_text='HTTP响应缓存超过大小上限淘汰的条目数')
+        return deleted + len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计 (总计及按接口)"""
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._stats.items()}
+        hits = sum(s['hits'] for s in endpoints.values())
+        misses = sum(s['misses'] for s in endpoints.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'bytes_saved': sum(s['bytes_saved'] for s in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """进程内共享的磁盘响应缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(config.HTTP_CACHE_PATH, int(config.HTTP_CACHE_MAX_MB * 1024 * 1024))
+    return _cache
+
+
+class CachingAdapter(HTTPAdapter):
+    """带磁盘响应缓存的 requests 传输适配器 (连接池按主机划分，默认保持长连接)"""
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        rule = match_rule(request.method, request.url)
+        if rule is None or kwargs.get('stream'):
+            return super().send(request, **kwargs)
+        endpoint, ttl = rule
+        key = cache_key(request.method, request.url, request.body)
+        cache = get_response_cache()
+        cached = cache.get(endpoint, key)
+        if cached is not None:
+            return self._cached_response(request, cached)
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            cache.put(endpoint, key, request.url, response.status_code,
+                      list(response.headers.items()), response.content, ttl)
+        return response
+
+    def _cached_response(self, request: requests.PreparedRequest, cached: CachedResponse) -> requests.Response:
+        status, headers, body = cached
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """共享的 requests 会话 (每个主机最多保持 HTTP_POOL_SIZE 个长连接；不保存Cookie，各调用之间互不影响)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = CachingAdapter(pool_connections=config.HTTP_POOL_HOSTS, pool_maxsize=config.HTTP_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+_original_request = requests.api.request
+# 当前调用是否在 akshare_transport() 范围内
+_shared_scope: contextvars.ContextVar[bool] = contextvars.ContextVar('shared_requests_scope', default=False)
+
+
+def _shared_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """requests.request 的替代实现: akshare_transport() 范围内使用共享会话，其余调用保持原行为"""
+    if _shared_scope.get():
+        return get_session().request(method=method, url=url, **kwargs)
+    return _original_request(method, url, **kwargs)
+
+
+def install_requests_transport() -> None:
+    """
+    替换 requests.api.request (幂等)
+
+    替换是进程级的，但只有 akshare_transport() 范围内的 requests.get/post 等模块级调用改走共享会话，
+    范围外 (其他库、其他线程) 仍按 requests 默认行为每次新建会话。
+    """
+    requests.api.request = _shared_request
+
+
+def uninstall_requests_transport() -> None:
+    """恢复 requests 的默认行为"""
+    requests.api.request = _original_request
+
+
+@contextmanager
+def akshare_transport() -> Iterator[None]:
+    """范围内 (当前线程/协程) 的 requests 模块级调用走共享传输层 (连接复用 + 响应缓存)"""
+    install_requests_transport()
+    token = _shared_scope.set(True)
+    try:
+        yield
+    finally:
+        _shared_scope.reset(token)
+
+
+class _AkshareModule:
+    """AKShare 模块代理: 各接口在 akshare_transport() 范围内调用"""
+
+    def __init__(self, module: Any):
+        self._module = module
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with akshare_transport():
+                return attr(*args, **kwargs)
+
+        return call
+
+
+def import_akshare() -> Any:
+    """导入 AKShare，返回的模块代理使其HTTP请求走共享传输层 (只影响 AKShare 接口调用)"""
+    import akshare
+    return _AkshareModule(akshare)
+
+
+class CachingAsyncTransport(httpx.AsyncBaseTransport):
+    """带磁盘响应缓存的 httpx 异步传输层 (连接池按主机划分，保持长连接)"""
+
+    def __init__(self, **kwargs: Any):
+        """
+        Args:
+            **kwargs: 传给 httpx.AsyncHTTPTransport 的参数 (默认按 HTTP_POOL_SIZE 限制长连接数)
+        """
+        kwargs.setdefault('limits', httpx.Limits(max_keepalive_connections=config.HTTP_POOL_SIZE * config.HTTP_POOL_HOSTS))
+        self._transport = httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        rule = match_rule(request.method, url)
+        if rule is None:
+            return await self._transport.handle_async_request(request)
+        endpoint, ttl = rule
+        body = await request.aread()
+        key = cache_key(request.method, url, body)
+        cache = get_response_cache()
+        cached = cache.get(endpoint, key)
+        if cached is not None:
+            status, headers, content = cached
+            return httpx.Response(status, headers=headers, content=content, request=request)
+        response = await self._transport.handle_async_request(request)
+        content = await response.aread()
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS]
+        if response.status_code == 200:
+            cache.put(endpoint, key, url, response.status_code, headers, content, ttl)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_async_client(**kwargs: Any) -> httpx.AsyncClient:
+    """
+    创建使用共享缓存的异步HTTP客户端 (连接绑定在使用它的事件循环上，应在同一循环中复用)
+
+    Args:
+        **kwargs: 传给 httpx.AsyncClient 的参数
+    """
+    return httpx.AsyncClient(transport=CachingAsyncTransport(), **kwargs)
@@ -5,6 +5,7 @@
 from typing import Optional
 from langchain_core.tools import tool
 from .baostock_utils import fetch_index_constituent_data, fetch_generic_data, format_to_markdown
+from .capabilities import check_tool
 
 
 @tool
@@ -19,6 +20,10 @@ def get_stock_industry(code: Optional[str] = None, date: Optional[str] = None) -
     Returns:
         str: Markdown格式的行业分类数据
     """
+    rejected = check_tool('get_stock_industry', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(
             query_type='stock_industry',
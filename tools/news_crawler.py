@@ -1,69 +1,210 @@
 """
 新闻爬取工具模块
 提供新闻爬取和情感/风险分析功能
+各新闻源通过共享的异步HTTP客户端并发搜索 (各自有截止时间)，结果规范化后按URL去重合并；
+情感分析前再把近似重复的转载聚类为事件，LLM 看到的是不同的事件而不是同一条新闻的多个版本；
+排名靠前的事件在截止时间内并发抓取正文 (见 article_fetcher)，抓取不到的退回使用摘要；
+情感/风险评分默认在本地批量计算 (见 news_sentiment)，LLM 只撰写分析文字；
+启用新闻库时按公司增量同步 (见 news_store)：只处理未见过的文章，分析汇总时间窗口内已保存的评分
 """
-import requests
+import asyncio
+import re
+import time
+import httpx
 from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
-from urllib.parse import quote
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import sys
 sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
 from config import config
+from llm.factory import get_chat_model
+from monitoring.metrics import registry
+from .article_fetcher import afetch_articles, fetch_budget
+from .async_utils import BackgroundLoop
+from .data_cache import cached_data
+from .http_client import create_async_client
+from .news_dedup import cluster_news, find_clusters
+from .news_sentiment import RISK_LEXICON, aggregate_scores, get_sentiment_scorer
+from .news_store import article_id, get_news_store, parse_published
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9',
+}
 
-def _search_sina_news(query: str, num_results: int = 10) -> List[Dict]:
+# 交给LLM分析的事件数，及每个事件放入提示词的正文长度
+_ANALYZED_EVENTS = 5
+_PROMPT_BODY_CHARS = 600
+
+# URL中不影响内容的跟踪参数 (去重时忽略)
+_TRACKING_PARAMS = re.compile(r'^(utm_\w+|spm|from|source|ref|share_token|wfr)$', re.IGNORECASE)
+
+
+def _parse_sina(html: str, num_results: int) -> List[Dict]:
+    """解析新浪财经搜索结果页"""
+    soup = BeautifulSoup(html, 'lxml')
+    news_list = []
+    for item in soup.select('.box-result')[:num_results]:
+        title_elem = item.select_one('h2 a')
+        content_elem = item.select_one('.content')
+        source_elem = item.select_one('.fgray_time')
+        if title_elem:
+            news_list.append({
+                'title': title_elem.get_text(strip=True),
+                'url': title_elem.get('href', ''),
+                'content': content_elem.get_text(strip=True) if content_elem else '',
+                'source': source_elem.get_text(strip=True) if source_elem else '新浪财经'
+            })
+    return news_list
+
+
+def _parse_baidu(html: str, num_results: int) -> List[Dict]:
+    """解析百度新闻搜索结果页"""
+    soup = BeautifulSoup(html, 'lxml')
+    news_list = []
+    for item in soup.select('.result-op, .result')[:num_results]:
+        title_elem = item.select_one('h3 a, .news-title a')
+        content_elem = item.select_one('.c-abstract, .news-content')
+        source_elem = item.select_one('.c-author, .news-source')
+        if title_elem:
+            news_list.append({
+                'title': title_elem.get_text(strip=True),
+                'url': title_elem.get('href', ''),
+                'content': content_elem.get_text(strip=True) if content_elem else '',
+                'source': source_elem.get_text(strip=True) if source_elem else ''
+            })
+    return news_list
+
+
+# 新闻搜索源: 名称 -> (搜索URL, 结果页解析函数)，按顺序排列合并结果；新增数据源在此注册
+NEWS_SOURCES: Dict[str, Tuple[Callable[[str], str], Callable[[str, int], List[Dict]]]] = {
+    'sina': (lambda query: f"https://search.sina.com.cn/news?q={quote(query)}", _parse_sina),
+    'baidu': (lambda query: f"https://www.baidu.com/s?wd={quote(query + ' 新闻')}&tn=news", _parse_baidu),
+}
+
+# 新闻搜索的后台事件循环和共享的异步HTTP客户端 (连接池在各次搜索间复用，结果页经磁盘缓存，见 tools/http_client.py)
+_news_loop = BackgroundLoop('news-search')
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """共享的异步HTTP客户端 (只在后台循环中使用)"""
+    global _client
+    if _client is None:
+        _client = create_async_client(headers=HEADERS, follow_redirects=True,
+                                      timeout=config.NEWS_SOURCE_TIMEOUT)
+    return _client
+
+
+async def _search_source(name: str, query: str, num_results: int) -> List[Dict]:
     """
-    使用新浪财经搜索爬取新闻（主要数据源）
-    
+    搜索单个新闻源 (超过 NEWS_SOURCE_TIMEOUT 或出错时返回空列表，不影响其他数据源)
+
     Args:
+        name: 数据源名称 (见 NEWS_SOURCES)
         query: 搜索关键词
         num_results: 返回结果数量
-    
+
     Returns:
         新闻列表
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9',
-    }
-    
-    # 新浪财经搜索URL
-    url = f"https://search.sina.com.cn/news?q={quote(query)}"
-    
+    build_url, parse = NEWS_SOURCES[name]
+    start = time.perf_counter()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = await asyncio.wait_for(_get_client().get(build_url(query)), config.NEWS_SOURCE_TIMEOUT)
         response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        news_list = []
-        # 解析新浪搜索结果
-        results = soup.select('.box-result')[:num_results]
-        
-        for item in results:
-            title_elem = item.select_one('h2 a')
-            content_elem = item.select_one('.content')
-            source_elem = item.select_one('.fgray_time')
-            
-            if title_elem:
-                news = {
-                    'title': title_elem.get_text(strip=True),
-                    'url': title_elem.get('href', ''),
-                    'content': content_elem.get_text(strip=True) if content_elem else '',
-                    'source': source_elem.get_text(strip=True) if source_elem else '新浪财经'
-                }
-                news_list.append(news)
-        
-        return news_list
+        news_list = parse(response.text, num_results)
+        result = 'ok' if news_list else 'empty'
+    except asyncio.TimeoutError:
+        print(f"    [News] {name} 超过 {config.NEWS_SOURCE_TIMEOUT:.0f}s 未返回，跳过")
+        news_list, result = [], 'timeout'
     except Exception as e:
-        return []
+        print(f"    [News] {name} 搜索失败: {e}")
+        news_list, result = [], 'error'
+    registry.inc('stock_agent_news_source_total', {'source': name, 'result': result},
+                 help_text='新闻源搜索次数')
+    registry.observe('stock_agent_news_source_seconds', time.perf_counter() - start, {'source': name},
+                     help_text='新闻源搜索耗时 (秒)')
+    return news_list
 
 
-def _search_baidu_news(query: str, num_results: int = 10) -> List[Dict]:
+def _url_key(url: str) -> str:
+    """去重用的规范化URL: 忽略协议、大小写主机名、片段、跟踪参数和结尾的斜杠"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k)))
+    return urlunsplit(('', parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+
+
+def _news_key(news: Dict) -> str:
+    """新闻的去重键: 规范化URL，没有URL时为标题"""
+    return _url_key(news['url']) if news.get('url') else news['title']
+
+
+def _normalize_news(item: Dict, source_name: str) -> Dict:
+    """统一新闻条目字段 (去除多余空白，补全来源，从来源/时间文本中解析发布时间)"""
+    clean = lambda text: re.sub(r'\s+', ' ', str(text or '')).strip()
+    source = clean(item.get('source'))
+    return {
+        'title': clean(item.get('title')),
+        'url': str(item.get('url') or '').strip(),
+        'content': clean(item.get('content')),
+        'source': source or source_name,
+        'published': parse_published(source),
+    }
+
+
+def merge_news(results: Iterable[Tuple[str, List[Dict]]], num_results: int) -> List[Dict]:
     """
-    使用百度搜索爬取新闻（备用数据源）
+    合并多个新闻源的结果
+
+    各源轮流取一条 (每个源排在前面的结果优先)，按规范化URL去重 (没有URL时按标题)。
+
+    Args:
+        results: [(数据源名称, 新闻列表)]
+        num_results: 返回结果数量
+
+    Returns:
+        合并后的新闻列表
+    """
+    queues = [[_normalize_news(item, name) for item in news_list] for name, news_list in results]
+    merged, seen = [], set()
+    for rank in range(max((len(queue) for queue in queues), default=0)):
+        for queue in queues:
+            if rank >= len(queue) or not queue[rank]['title']:
+                continue
+            news = queue[rank]
+            key = _news_key(news)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(news)
+            if len(merged) >= num_results:
+                return merged
+    return merged
+
+
+async def asearch_news(query: str, num_results: int = 10, sources: Optional[List[str]] = None) -> List[Dict]:
+    """
+    并发搜索所有新闻源并合并 (耗时取决于最慢的数据源，而不是各源之和)
+
+    Args:
+        query: 搜索关键词
+        num_results: 返回结果数量
+        sources: 数据源名称，默认为 NEWS_SOURCES 中的全部
+
+    Returns:
+        合并去重后的新闻列表
+    """
+    names = list(sources or NEWS_SOURCES)
+    results = await asyncio.gather(*(_search_source(name, query, num_results) for name in names))
+    return merge_news(zip(names, results), num_results)
+
+
+def _search_sina_news(query: str, num_results: int = 10) -> List[Dict]:
+    """
+    使用新浪财经搜索爬取新闻
     
     Args:
         query: 搜索关键词
@@ -72,46 +213,27 @@ def _search_baidu_news(query: str, num_results: int = 10) -> List[Dict]:
     Returns:
         新闻列表
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9',
-    }
+    return _news_loop.run(_search_source('sina', query, num_results))
+
+
+def _search_baidu_news(query: str, num_results: int = 10) -> List[Dict]:
+    """
+    使用百度搜索爬取新闻
     
-    # 百度新闻搜索URL
-    url = f"https://www.baidu.com/s?wd={quote(query + ' 新闻')}&tn=news"
+    Args:
+        query: 搜索关键词
+        num_results: 返回结果数量
     
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        news_list = []
-        # 解析搜索结果
-        results = soup.select('.result-op, .result')[:num_results]
-        
-        for item in results:
-            title_elem = item.select_one('h3 a, .news-title a')
-            content_elem = item.select_one('.c-abstract, .news-content')
-            source_elem = item.select_one('.c-author, .news-source')
-            
-            if title_elem:
-                news = {
-                    'title': title_elem.get_text(strip=True),
-                    'url': title_elem.get('href', ''),
-                    'content': content_elem.get_text(strip=True) if content_elem else '',
-                    'source': source_elem.get_text(strip=True) if source_elem else ''
-                }
-                news_list.append(news)
-        
-        return news_list
-    except Exception as e:
-        return []
+    Returns:
+        新闻列表
+    """
+    return _news_loop.run(_search_source('baidu', query, num_results))
 
 
-def _search_news(query: str, num_results: int = 10) -> List[Dict]:
+@cached_data(namespace='news_search', ttl=config.NEWS_CACHE_TTL)
+def fetch_news_list(query: str, num_results: int = 10) -> List[Dict]:
     """
-    多源新闻搜索：优先使用新浪财经，失败时回退到百度
+    多源新闻搜索：新浪财经、百度等数据源并发搜索，结果合并去重 (结果缓存 NEWS_CACHE_TTL 秒)
     
     Args:
         query: 搜索关键词
@@ -119,33 +241,209 @@ def _search_news(query: str, num_results: int = 10) -> List[Dict]:
     
     Returns:
         新闻列表
+    
+    Raises:
+        RuntimeError: 所有数据源均不可用 (不缓存)
     """
-    # 优先使用新浪财经
-    news_list = _search_sina_news(query, num_results)
+    news_list = _news_loop.run(asearch_news(query, num_results))
     
     if news_list:
         return news_list
     
-    # 回退到百度新闻
-    news_list = _search_baidu_news(query, num_results)
+    raise RuntimeError("所有数据源均不可用")
+
+
+def _search_news(query: str, num_results: int = 10) -> List[Dict]:
+    """
+    多源新闻搜索，所有数据源均失败时返回错误信息条目
     
-    if news_list:
-        return news_list
+    Args:
+        query: 搜索关键词
+        num_results: 返回结果数量
     
-    # 都失败时返回错误信息
-    return [{'title': f'新闻获取失败: 所有数据源均不可用', 'content': '', 'url': '', 'source': ''}]
+    Returns:
+        新闻列表
+    """
+    try:
+        return fetch_news_list(query, num_results)
+    except RuntimeError:
+        return [{'title': f'新闻获取失败: 所有数据源均不可用', 'content': '', 'url': '', 'source': ''}]
 
 
-def _analyze_news_sentiment_risk(news_list: List[Dict], company_name: str) -> Dict:
+def attach_article_bodies(events: List[Dict]) -> int:
     """
-    使用LLM分析新闻的情感和风险
+    并发抓取前 ARTICLE_FETCH_TOP_N 个事件的正文，写入各事件的 body 字段
+
+    Args:
+        events: 新闻事件列表 (原地修改)
+
+    Returns:
+        成功获取正文的事件数
+    """
+    targets = [e for e in events[:config.ARTICLE_FETCH_TOP_N] if e.get('url')]
+    # 截止时间在调用方线程计算 (运行截止时间保存在上下文变量中，后台循环看不到)
+    budget = fetch_budget()
+    if not targets or budget <= 0:
+        return 0
+
+    async def fetch() -> Dict[str, str]:
+        return await afetch_articles(_get_client(), [e['url'] for e in targets], budget)
+
+    start = time.perf_counter()
+    bodies = _news_loop.run(fetch())
+    for event in targets:
+        if event['url'] in bodies:
+            event['body'] = bodies[event['url']]
+    print(f"    [News] 正文抓取 {len(bodies)}/{len(targets)} 篇 ({time.perf_counter() - start:.1f}s)")
+    return len(bodies)
+
+
+def sync_company_news(company: str, num_results: int = 10) -> List[Dict]:
+    """
+    增量同步公司新闻到新闻库，返回时间窗口内的事件
+
+    距上次同步不足 NEWS_SYNC_INTERVAL 时不再搜索；否则只处理未保存过的文章 (按规范化URL)：
+    先与窗口内已保存的事件聚类 (转载计入已有事件)，再只为新事件抓取正文。
+    所有数据源均不可用时使用新闻库中已有的事件，且不记录为已同步。
+
+    Args:
+        company: 公司名称 (搜索关键词)
+        num_results: 每次搜索的新闻数量
+
+    Returns:
+        时间窗口内的新闻事件 (见 NewsStore.window_events)
+    """
+    store = get_news_store()
+    now = time.time()
+    since = now - config.NEWS_WINDOW_DAYS * 86400
+    last_sync = store.last_sync(company)
+    if last_sync is not None and now - last_sync < config.NEWS_SYNC_INTERVAL:
+        print(f"    [News] {company} {now - last_sync:.0f}s 前已同步，使用新闻库")
+        store.count('skipped_syncs')
+        return store.window_events(company, since)
+    
+    try:
+        news_list = fetch_news_list(company, num_results)
+    except RuntimeError:
+        print("    [News] 所有数据源均不可用，使用新闻库中已保存的新闻")
+        return store.window_events(company, since)
     
+    for news in news_list:
+        news['id'] = article_id(_news_key(news))
+    # 重新搜索到的旧文章直接跳过；超出时间窗口的新文章不再保存
+    fresh = [n for n in store.unseen(company, news_list) if (n.get('published') or now) >= since]
+    events = store.window_events(company, since)
+    new_events = []
+    if fresh:
+        # 已保存的事件排在前面，聚类的代表 (下标最小者) 优先是已有事件
+        for members in find_clusters(events + fresh):
+            if members[0] < len(events):
+                cluster = events[members[0]]['id']
+            else:
+                new_events.append(fresh[members[0] - len(events)])
+                cluster = new_events[-1]['id']
+            for i in members:
+                if i >= len(events):
+                    fresh[i - len(events)]['cluster'] = cluster
+        attach_article_bodies(new_events)
+        store.add_articles(company, fresh, now)
+        events = store.window_events(company, since)
+    store.mark_synced(company, now, since)
+    store.count('syncs')
+    print(f"    [News] {company} 增量同步: 搜索到 {len(news_list)} 条，新增 {len(fresh)} 条 "
+          f"(新事件 {len(new_events)} 个)，窗口内共 {len(events)} 个事件")
+    return events
+
+
+def _events_digest(events: List[Dict], mode: str) -> str:
+    """事件集合的摘要 (事件及转载数不变时分析结果可以复用)"""
+    parts = [mode] + [f"{e['id']}:{e['reposts']}" for e in events]
+    return article_id('|'.join(parts))
+
+
+def _analyze_stored_events(events: List[Dict], company_name: str) -> Dict:
+    """
+    分析新闻库中的事件: 只为尚未评分的事件评分并保存，事件集合未变化时复用上次的分析
+
     Args:
-        news_list: 新闻列表
+        events: sync_company_news 返回的事件
         company_name: 公司名称
+
+    Returns:
+        与 _analyze_news_sentiment_risk 相同的分析结果
+    """
+    store = get_news_store()
+    mode = config.NEWS_SENTIMENT_MODE
+    scores = None
+    if mode != 'llm':
+        unscored = [e for e in events if e['score'] is None]
+        if unscored:
+            new_scores = get_sentiment_scorer().score_articles(unscored)
+            store.save_scores(company_name, [e['id'] for e in unscored], new_scores)
+            for event, score in zip(unscored, new_scores):
+                event['score'] = score
+        scores = [e['score'] for e in events]
+    
+    digest = _events_digest(events, mode)
+    cached = store.cached_analysis(company_name, digest)
+    if cached is not None:
+        print(f"    [News] {company_name} 新闻事件无变化，复用上次分析")
+        return cached
+    analysis = _analyze_news_sentiment_risk(events, company_name, mode, scores)
+    if not analysis.get('failed'):
+        store.save_analysis(company_name, digest, analysis)
+    return analysis
+
+
+def _repost_note(event: Dict) -> str:
+    """事件的转载说明 (无转载时为空)"""
+    return f" (另有{event['reposts']}篇转载)" if event.get('reposts') else ''
+
+
+def _event_summary(event: Dict) -> Dict:
+    return {'title': event['title'], 'source': event['source'], 'reposts': event.get('reposts', 0)}
+
+
+def _news_text(events: List[Dict], scores: Optional[List[Dict]] = None) -> str:
+    """提示词中的新闻内容 (可附本地评分)"""
+    lines = []
+    for i, n in enumerate(events):
+        score_note = f" [本地评分: 情感{scores[i]['sentiment']:.1f} 风险{scores[i]['risk']:.1f}]" if scores else ''
+        lines.append(f"标题: {n['title']}{_repost_note(n)}{score_note}\n"
+                     f"内容: {(n.get('body') or n['content'])[:_PROMPT_BODY_CHARS]}")
+    return "\n".join(lines)
+
+
+def _local_analysis(events: List[Dict], scores: List[Dict], sentiment: int, risk: int) -> str:
+    """不调用LLM时由本地评分生成的分析文字"""
+    keywords = [k for s in scores for k in s['keywords']]
+    risk_words = [k for k in dict.fromkeys(keywords) if k.lower() in RISK_LEXICON]
+    lines = [
+        f"情感评分: {sentiment}",
+        f"风险评分: {risk}",
+        f"情感分析: 本地评分 (未调用LLM)，关键词: {'、'.join(dict.fromkeys(keywords)) or '无明显情感信号'}",
+        f"风险分析: {'风险信号: ' + '、'.join(risk_words) if risk_words else '未发现明显风险信号'}",
+        "新闻要点:",
+    ]
+    ranked = sorted(zip(events, scores), key=lambda item: abs(item[1]['sentiment'] - 3) + item[1]['risk'], reverse=True)
+    for event, score in ranked[:_ANALYZED_EVENTS]:
+        lines.append(f"- {event['title']}{_repost_note(event)} (情感{score['sentiment']:.1f} 风险{score['risk']:.1f})")
+    return "\n".join(lines)
+
+
+def _analyze_news_sentiment_risk(news_list: List[Dict], company_name: str, mode: Optional[str] = None,
+                                 scores: Optional[List[Dict]] = None) -> Dict:
+    """
+    分析新闻的情感和风险
+    
+    Args:
+        news_list: 聚类后的新闻事件列表 (cluster_news 的结果，reposts 为转载数)
+        company_name: 公司名称
+        mode: 评分方式 llm/hybrid/fast，默认为配置 NEWS_SENTIMENT_MODE
+        scores: 已保存的各事件本地评分 (新闻库)，为None时重新评分
     
     Returns:
-        包含情感和风险分析的字典
+        包含情感和风险分析的字典 (本地评分时含各事件的 article_scores；LLM调用失败时 failed 为True)
     """
     if not news_list:
         return {
@@ -154,14 +452,54 @@ def _analyze_news_sentiment_risk(news_list: List[Dict], company_name: str) -> Di
             'analysis': '未获取到相关新闻',
             'news_summary': []
         }
+    mode = mode or config.NEWS_SENTIMENT_MODE
+    if mode == 'llm':
+        return _llm_sentiment_risk(news_list[:_ANALYZED_EVENTS], company_name)
     
-    # 构建新闻摘要
-    news_text = "\n".join([
-        f"标题: {n['title']}\n内容: {n['content'][:200]}"
-        for n in news_list[:5]  # 只分析前5条
-    ])
+    # 全部事件一次批量评分，LLM只看排名靠前的事件
+    if scores is None:
+        scores = get_sentiment_scorer().score_articles(news_list)
+    sentiment, risk = aggregate_scores(news_list, scores)
+    events = news_list[:_ANALYZED_EVENTS]
+    result = {
+        'sentiment_score': sentiment,
+        'risk_score': risk,
+        'article_scores': scores,
+        'news_summary': [_event_summary(n) for n in events],
+    }
+    if mode == 'fast':
+        result['analysis'] = _local_analysis(news_list, scores, sentiment, risk)
+        return result
+    
+    prompt = f"""请分析以下关于"{company_name}"的新闻。情感评分和风险评分已由本地模型给出，无需重新评分。
+每条新闻是一个独立事件 (已合并转载)，转载数越多说明市场关注度越高。
+
+整体评分: 情感 {sentiment}/5，风险 {risk}/5
+
+新闻内容:
+{_news_text(events, scores[:len(events)])}
+
+请按以下格式回复:
+情感分析: [结合整体评分简要分析市场情绪]
+风险分析: [简要分析潜在风险]
+新闻要点: [列出3-5个关键信息点]
+"""
+    try:
+        response = get_chat_model("news_sentiment").invoke(prompt)
+        result['analysis'] = response.content
+    except Exception as e:
+        print(f"    [News] LLM分析失败，使用本地分析: {e}")
+        result['analysis'] = _local_analysis(news_list, scores, sentiment, risk)
+        result['failed'] = True
+    return result
+
+
+def _llm_sentiment_risk(events: List[Dict], company_name: str) -> Dict:
+    """由LLM评分并撰写分析 (NEWS_SENTIMENT_MODE=llm)"""
+    news_text = _news_text(events)
     
     prompt = f"""请分析以下关于"{company_name}"的新闻，并给出情感评分和风险评分。
+每条新闻是一个独立事件 (已合并转载)，转载数越多说明市场关注度越高。
 
 新闻内容:
 {news_text}
@@ -175,12 +513,7 @@ def _analyze_news_sentiment_risk(news_list: List[Dict], company_name: str) -> Di
 """
     
     try:
-        llm = ChatOpenAI(
-            api_key=config.OPENAI_API_KEY,
-            base_url=config.OPENAI_BASE_URL,
-            model=config.OPENAI_MODEL,
-            temperature=0
-        )
+        llm = get_chat_model("news_sentiment")
         response = llm.invoke(prompt)
         analysis_text = response.content
         
@@ -204,14 +537,15 @@ def _analyze_news_sentiment_risk(news_list: List[Dict], company_name: str) -> Di
             'sentiment_score': max(1, min(5, sentiment_score)),
             'risk_score': max(1, min(5, risk_score)),
             'analysis': analysis_text,
-            'news_summary': [{'title': n['title'], 'source': n['source']} for n in news_list[:5]]
+            'news_summary': [_event_summary(n) for n in events]
         }
     except Exception as e:
         return {
             'sentiment_score': 3,
             'risk_score': 3,
             'analysis': f'分析失败: {str(e)}',
-            'news_summary': [{'title': n['title'], 'source': n['source']} for n in news_list[:5]]
+            'news_summary': [_event_summary(n) for n in events],
+            'failed': True
         }
 
 
@@ -241,11 +575,22 @@ def crawl_news(query: str, num_results: int = 10) -> str:
     Returns:
         str: 包含新闻列表和分析结果的Markdown格式文本
     """
-    # 爬取新闻（优先新浪财经，备用百度）
-    news_list = _search_news(query, num_results)
-    
-    # 分析情感和风险
-    analysis = _analyze_news_sentiment_risk(news_list, query)
+    if config.NEWS_STORE_ENABLED:
+        # 增量同步新闻库，汇总时间窗口内已保存的评分
+        events = sync_company_news(query, num_results)
+        analysis = _analyze_stored_events(events, query)
+    else:
+        # 爬取新闻（新浪财经、百度并发搜索）
+        news_list = _search_news(query, num_results)
+        
+        # 合并同一事件的转载
+        events = cluster_news(news_list)
+        if len(events) < len(news_list):
+            print(f"    [News] {len(news_list)} 条新闻合并为 {len(events)} 个事件")
+        attach_article_bodies(events[:_ANALYZED_EVENTS])
+        
+        # 分析情感和风险
+        analysis = _analyze_news_sentiment_risk(events, query)
     
     # 格式化输出
     result = f"""### {query} 相关新闻分析
@@ -262,7 +607,10 @@ def crawl_news(query: str, num_results: int = 10) -> str:
 #### 新闻列表
 """
     
-    for i, news in enumerate(news_list[:5], 1):
-        result += f"\n{i}. **{news['title']}**\n   - 来源: {news['source']}\n   - 摘要: {news['content'][:100]}...\n"
+    scores = analysis.get('article_scores')
+    for i, news in enumerate(events[:_ANALYZED_EVENTS], 1):
+        result += f"\n{i}. **{news['title']}**{_repost_note(news)}\n   - 来源: {news['source']}\n   - 摘要: {news['content'][:100]}...\n"
+        if scores:
+            result += f"   - 本地评分: 情感 {scores[i - 1]['sentiment']:.1f} / 风险 {scores[i - 1]['risk']:.1f}\n"
     
     return result
@@ -0,0 +1,133 @@
+"""
+新闻近似重复聚类
+
+财经新闻搜索结果中大量是同一事件的转载 (标题略有改动、加上"转载"/"重磅"等字样)。
+按 标题 + 摘要 的字符二元组集合计算 MinHash 签名，用 LSH 分桶找出候选对，再按实际 Jaccard 相似度确认，
+每个聚类保留排名最靠前的一条作为代表，并记录转载数。
+
+- 每条新闻只与所在分桶的第一个成员比较，耗时随新闻数量线性增长 (数百条新闻为毫秒级)
+- 分桶参数 (LSH_BANDS x LSH_ROWS) 使相似度约 0.37 以上的新闻对大概率成为候选
+"""
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+import numpy as np
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+
+LSH_BANDS = 20
+LSH_ROWS = 3
+NUM_PERM = LSH_BANDS * LSH_ROWS
+
+# 各"排列"为 64 位乘加哈希 (a 为奇数，按 2^64 取模溢出)，a、b 随机但固定，保证签名可跨进程比较
+_rng = np.random.default_rng(20240501)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+# 转载标记等不影响内容的字样
+_NOISE = re.compile(r'[(（【\[]?(转载|转发|原标题|重磅|快讯|独家)[)）】\]]?[:：!！]?')
+
+
+def shingles(text: str) -> Set[str]:
+    """文本的字符二元组集合 (去除标点、空白和转载标记，英文转小写)"""
+    text = re.sub(r'[\W_]+', '', _NOISE.sub('', text).lower())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def minhash(features: Set[str]) -> np.ndarray:
+    """
+    MinHash 签名
+
+    Args:
+        features: 特征集合 (非空)
+
+    Returns:
+        长度为 NUM_PERM 的签名
+    """
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode('utf-8'), digest_size=8).digest(), 'big') for f in features],
+        dtype=np.uint64,
+    )
+    with np.errstate(over='ignore'):
+        return (np.outer(_A, hashes) + _B[:, None]).min(axis=1)
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class _DisjointSet:
+    """并查集 (路径压缩)，合并时排名靠前 (下标较小) 的新闻作为根"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        root_i, root_j = self.find(i), self.find(j)
+        self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def find_clusters(news_list: List[Dict], similarity: Optional[float] = None) -> List[List[int]]:
+    """
+    找出近似重复的新闻聚类
+
+    Args:
+        news_list: 新闻列表 (按重要性排序，含 title/content)
+        similarity: 判定为同一事件的最低 Jaccard 相似度，默认为配置 NEWS_DEDUP_SIMILARITY
+
+    Returns:
+        各聚类的成员下标 (升序，第一个为代表)，按代表的下标排序
+    """
+    threshold = config.NEWS_DEDUP_SIMILARITY if similarity is None else similarity
+    features = [shingles(f"{n.get('title', '')} {n.get('content', '')}") for n in news_list]
+    clusters = _DisjointSet(len(news_list))
+
+    # 每个分桶只保留第一个成员，新闻只与其比较: 转载集中落入同一分桶时比较次数也不会随桶大小增长
+    buckets: Dict[tuple, int] = {}
+    for i, feature in enumerate(features):
+        if not feature:
+            continue
+        signature = minhash(feature)
+        for band in range(LSH_BANDS):
+            rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+            j = buckets.setdefault((band, rows.tobytes()), i)
+            if j != i and clusters.find(i) != clusters.find(j) and _jaccard(features[i], features[j]) >= threshold:
+                clusters.union(i, j)
+
+    members: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(news_list)):
+        members[clusters.find(i)].append(i)
+    return [members[root] for root in sorted(members)]
+
+
+def cluster_news(news_list: List[Dict], similarity: Optional[float] = None) -> List[Dict]:
+    """
+    聚类近似重复的新闻
+
+    Args:
+        news_list: 新闻列表 (按重要性排序，含 title/content/source)
+        similarity: 判定为同一事件的最低 Jaccard 相似度，默认为配置 NEWS_DEDUP_SIMILARITY
+
+    Returns:
+        每个聚类的代表新闻 (保持原顺序)，附加 reposts (转载数) 和 sources (各转载来源)
+    """
+    events = []
+    for members in find_clusters(news_list, similarity):
+        sources = [news_list[i].get('source', '') for i in members]
+        events.append({
+            **news_list[members[0]],
+            'reposts': len(members) - 1,
+            'sources': list(dict.fromkeys(s for s in sources if s)),
+        })
+    return events
@@ -0,0 +1,304 @@
+"""
+新闻情感/风险本地评分
+
+情感/风险评分不再逐次调用LLM，先在本地给每条新闻打分:
+1. 词典: Aho-Corasick 一次扫描匹配利好/利空/风险词 (带权重)，前面紧邻否定词 ("否认"、"未") 时反转
+2. 最近质心: 新闻向量与各类标注样例的质心做余弦相似度，softmax 概率加权各类的锚定分数
+   (所有新闻一次批量向量化，复用RAG的共享 Embedding 模型；模型不可用时只用词典)
+
+两者都有结果时取平均，汇总时按转载数加权 (转载越多关注度越高)。
+LLM 只负责撰写分析文字 (NEWS_SENTIMENT_MODE=hybrid)，快速模式 (fast) 下完全不调用LLM。
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from .aho_corasick import AhoCorasick
+
+# 情感词: 正数为利好，负数为利空 (绝对值2为强信号)
+SENTIMENT_LEXICON: Dict[str, float] = {
+    # 利好
+    "增长": 1, "大增": 2, "预增": 2, "超预期": 2, "创新高": 2, "新高": 1, "扭亏": 2, "盈利": 1,
+    "上调": 1, "提价": 1, "涨价": 1, "回购": 1.5, "增持": 1.5, "分红": 1, "派息": 1, "红利": 1, "中标": 1.5,
+    "签约": 1, "订单": 1, "获批": 1.5, "突破": 1, "上涨": 1, "大涨": 2, "涨停": 2, "利好": 1.5,
+    "买入评级": 1.5, "增持评级": 1, "看好": 1, "复苏": 1, "回暖": 1, "放量": 0.5, "龙头": 0.5,
+    # 利空
+    "下滑": -1, "下降": -1, "大降": -2, "预减": -2, "预亏": -2, "亏损": -1.5, "首亏": -2, "不及预期": -2,
+    "下调": -1, "降价": -1, "减持": -1.5, "清仓": -1.5, "处罚": -2, "罚款": -1.5, "立案": -2, "调查": -1.5,
+    "违规": -2, "诉讼": -1.5, "下跌": -1, "大跌": -2, "暴跌": -2, "跌停": -2, "利空": -1.5, "爆雷": -2,
+    "退市": -2, "造假": -2, "违约": -2, "冻结": -1.5, "问询": -1, "警示": -1, "召回": -1.5, "裁员": -1,
+    "停产": -1.5, "减值": -1.5, "承压": -1, "低迷": -1, "流出": -0.5, "平仓": -1.5, "实体清单": -2, "制裁": -2,
+}
+
+# 风险词 (权重越大风险越高)
+RISK_LEXICON: Dict[str, float] = {
+    "立案": 2, "调查": 1.5, "处罚": 2, "罚款": 1.5, "违规": 2, "造假": 2, "诉讼": 1.5, "仲裁": 1,
+    "退市": 2, "*st": 2, "爆雷": 2, "违约": 2, "债务": 1, "逾期": 1.5, "质押": 1, "冻结": 1.5,
+    "问询": 1, "警示": 1, "减持": 1, "清仓": 1, "亏损": 1, "首亏": 1.5, "预亏": 1.5, "减值": 1, "商誉": 0.5,
+    "停产": 1.5, "召回": 1, "制裁": 1.5, "实体清单": 2, "平仓": 2, "集采": 1, "反垄断": 1.5, "裁员": 0.5, "不确定": 0.5,
+}
+
+# 否定词: 出现在关键词之前 NEGATION_WINDOW 个字符内时反转情感、忽略风险
+NEGATIONS = ("否认", "澄清", "不存在", "未", "不", "没有", "无", "并非")
+NEGATION_WINDOW = 3
+# 含否定字但不表示否定的常用词
+NOT_NEGATIONS = ("未来", "不断", "不仅", "不少", "不同", "无论", "并不意外")
+
+# 各类的锚定分数 (1-5) 及标注样例 (财经新闻标题)
+SENTIMENT_CLASSES: Dict[str, float] = {'positive': 4.5, 'neutral': 3.0, 'negative': 1.5}
+RISK_CLASSES: Dict[str, float] = {'high': 4.5, 'low': 2.0}
+
+SENTIMENT_EXAMPLES: Dict[str, List[str]] = {
+    'positive': [
+        "公司前三季度净利润同比大幅增长，业绩超出市场预期",
+        "公司拟斥资十亿元回购股份，彰显发展信心",
+        "新产品获批上市，有望打开第二增长曲线",
+        "公司中标重大项目，在手订单创历史新高",
+        "多家机构上调目标价，维持买入评级",
+        "行业需求回暖，公司产品量价齐升",
+        "控股股东增持公司股份，看好长期发展",
+        "公司宣布高比例分红，股息率领先同行",
+    ],
+    'neutral': [
+        "公司召开年度股东大会，审议通过多项议案",
+        "公司发布关于董事会换届选举的公告",
+        "公司将于下周举行业绩说明会",
+        "公司股票交易正常，近期经营情况未发生重大变化",
+        "公司参加行业展会，展示主要产品",
+        "公司调整组织架构，设立区域事业部",
+        "公司完成工商变更登记手续",
+        "公司回复投资者关于产能规划的提问",
+    ],
+    'negative': [
+        "公司上半年净利润同比下滑，业绩不及预期",
+        "公司收到证监会立案告知书，涉嫌信息披露违规",
+        "大股东拟减持不超过百分之三的股份",
+        "公司股价连续跌停，市值大幅缩水",
+        "产品被曝质量问题，公司宣布召回",
+        "行业竞争加剧，公司毛利率持续承压",
+        "公司计提大额商誉减值，全年预计亏损",
+        "主要客户订单取消，公司下调全年业绩指引",
+    ],
+}
+
+RISK_EXAMPLES: Dict[str, List[str]] = {
+    'high': [
+        "公司涉嫌财务造假被立案调查",
+        "公司债券违约，多个银行账户被冻结",
+        "公司股票被实施退市风险警示",
+        "控股股东股权质押比例过高面临平仓风险",
+        "公司收到交易所问询函，要求说明资金去向",
+        "公司卷入重大诉讼，涉案金额超过净资产",
+        "产品遭遇海外制裁，出口业务面临停滞",
+        "公司预计连续两年亏损，持续经营能力存疑",
+    ],
+    'low': [
+        "公司经营稳健，现金流充裕，资产负债率处于行业低位",
+        "公司召开年度股东大会，审议通过多项议案",
+        "公司新产品发布会顺利举行",
+        "公司获评年度优秀上市公司",
+        "公司与地方政府签署战略合作协议",
+        "公司完成年度分红派息",
+        "公司业绩保持平稳增长",
+        "公司参加投资者交流活动，介绍经营情况",
+    ],
+}
+
+Embed = Callable[[List[str]], List[List[float]]]
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _default_embed(texts: List[str]) -> List[List[float]]:
+    from rag.embedding.qwen_embedding import get_shared_embedding
+    return get_shared_embedding().embed_documents(texts)
+
+
+def article_text(article: Dict, max_chars: int = 200) -> str:
+    """评分使用的文本: 标题 + 正文 (或摘要) 开头"""
+    body = article.get('body') or article.get('content') or ''
+    return f"{article.get('title', '')} {body[:max_chars]}".strip()
+
+
+class NewsSentimentScorer:
+    """
+    词典 + 最近质心的新闻情感/风险评分器
+
+    Attributes:
+        temperature: 相似度 softmax 的温度
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Embed] = None,
+        sentiment_examples: Optional[Dict[str, List[str]]] = None,
+        risk_examples: Optional[Dict[str, List[str]]] = None,
+        temperature: float = 0.05,
+    ):
+        """
+        Args:
+            embed: 批量向量化函数，默认使用共享的 Qwen Embedding 模型
+            sentiment_examples: 各情感类别的标注样例，默认为 SENTIMENT_EXAMPLES
+            risk_examples: 各风险类别的标注样例，默认为 RISK_EXAMPLES
+            temperature: softmax 温度
+        """
+        self._embed = embed or _default_embed
+        self.sentiment_examples = sentiment_examples or SENTIMENT_EXAMPLES
+        self.risk_examples = risk_examples or RISK_EXAMPLES
+        self.temperature = temperature
+        self.automaton = AhoCorasick(
+            [(word, ('sentiment', weight)) for word, weight in SENTIMENT_LEXICON.items()]
+            + [(word, ('risk', weight)) for word, weight in RISK_LEXICON.items()]
+            + [(word, ('negation', 0)) for word in NEGATIONS]
+            + [(word, ('plain', 0)) for word in NOT_NEGATIONS]
+        )
+        self._centroids: Optional[Dict[str, Dict[str, List[float]]]] = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def lexicon_scores(self, text: str) -> Tuple[Optional[float], Optional[float], List[str]]:
+        """
+        词典评分
+
+        Returns:
+            (情感分, 风险分, 命中的关键词)；未命中情感词/风险词时对应分数为None
+        """
+        hits = sorted(self.automaton.iter(text), key=lambda hit: (hit[0], hit[0] - hit[1]))
+        sentiment = risk = 0.0
+        sentiment_hit = risk_hit = False
+        keywords = []
+        negated_until = covered_until = -1
+        span = None
+        for start, end, (kind, weight) in hits:
+            if start < covered_until and (start, end) != span:
+                # 包含在更长的词中 (如 "不及预期" 中的 "不"、"未来" 中的 "未")；同一个词可同时是情感词和风险词
+                continue
+            covered_until, span = end, (start, end)
+            if kind == 'negation':
+                negated_until = end + NEGATION_WINDOW
+                continue
+            if kind == 'plain':
+                continue
+            negated = start < negated_until
+            word = text[start:end]
+            if kind == 'sentiment':
+                sentiment += -0.5 * weight if negated else weight
+                sentiment_hit = True
+                keywords.append(f"未{word}" if negated else word)
+            elif not negated:
+                risk += weight
+                risk_hit = True
+                if word not in keywords:
+                    keywords.append(word)
+        return (
+            3 + 2 * math.tanh(sentiment / 2) if sentiment_hit else None,
+            2 + 3 * math.tanh(risk / 2) if risk_hit else None,
+            keywords,
+        )
+
+    def _load_centroids(self) -> Optional[Dict[str, Dict[str, List[float]]]]:
+        """首次使用时批量向量化标注样例并计算质心 (模型不可用时只尝试一次)"""
+        if self._centroids is None and not self._unavailable:
+            with self._lock:
+                if self._centroids is None and not self._unavailable:
+                    try:
+                        groups = {'sentiment': self.sentiment_examples, 'risk': self.risk_examples}
+                        texts = [text for examples in groups.values() for texts in examples.values() for text in texts]
+                        vectors = iter(self._embed(texts))
+                        centroids: Dict[str, Dict[str, List[float]]] = {}
+                        for group, examples in groups.items():
+                            centroids[group] = {}
+                            for label, label_texts in examples.items():
+                                rows = [next(vectors) for _ in label_texts]
+                                centroids[group][label] = _normalize([sum(column) / len(rows) for column in zip(*rows)])
+                        self._centroids = centroids
+                    except Exception as e:
+                        self._unavailable = True
+                        print(f"    [Sentiment] Embedding 模型不可用，只使用词典评分: {e}")
+        return self._centroids
+
+    def _expected_score(self, vector: List[float], centroids: Dict[str, List[float]],
+                        anchors: Dict[str, float]) -> float:
+        """各类别 softmax 概率加权的锚定分数"""
+        similarities = {label: sum(a * b for a, b in zip(vector, centroid)) for label, centroid in centroids.items()}
+        top = max(similarities.values())
+        weights = {label: math.exp((s - top) / self.temperature) for label, s in similarities.items()}
+        total = sum(weights.values())
+        return sum(anchors[label] * weight / total for label, weight in weights.items())
+
+    def score_articles(self, articles: List[Dict]) -> List[Dict]:
+        """
+        批量评分 (一次向量化全部新闻)
+
+        Args:
+            articles: 新闻列表 (title/content，可含 body)
+
+        Returns:
+            每条新闻的 {'sentiment', 'risk', 'keywords', 'method'}，分数为1-5的浮点数
+        """
+        texts = [article_text(article) for article in articles]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        centroids = self._load_centroids() if texts else None
+        if centroids:
+            try:
+                vectors = [_normalize(vector) for vector in self._embed(texts)]
+            except Exception as e:
+                print(f"    [Sentiment] 向量化失败，只使用词典评分: {e}")
+
+        results = []
+        for text, vector in zip(texts, vectors):
+            lex_sentiment, lex_risk, keywords = self.lexicon_scores(text)
+            if vector is None:
+                sentiment = 3.0 if lex_sentiment is None else lex_sentiment
+                risk = 2.0 if lex_risk is None else lex_risk
+                method = 'lexicon'
+            else:
+                emb_sentiment = self._expected_score(vector, centroids['sentiment'], SENTIMENT_CLASSES)
+                emb_risk = self._expected_score(vector, centroids['risk'], RISK_CLASSES)
+                sentiment = emb_sentiment if lex_sentiment is None else (emb_sentiment + lex_sentiment) / 2
+                risk = emb_risk if lex_risk is None else (emb_risk + lex_risk) / 2
+                method = 'lexicon+embedding'
+            results.append({'sentiment': sentiment, 'risk': risk, 'keywords': keywords, 'method': method})
+        return results
+
+
+def aggregate_scores(articles: List[Dict], scores: List[Dict]) -> Tuple[int, int]:
+    """
+    汇总为整体评分
+
+    情感按转载数加权平均 (转载越多关注度越高)；风险同样加权平均，但不低于最高单条风险减1，
+    避免一条重大风险被多条普通新闻稀释。
+
+    Args:
+        articles: 新闻事件列表 (可含 reposts)
+        scores: score_articles 的结果
+
+    Returns:
+        (情感评分, 风险评分)，均为1-5的整数；没有新闻时为 (3, 3)
+    """
+    if not scores:
+        return 3, 3
+    weights = [1 + article.get('reposts', 0) for article in articles]
+    total = sum(weights)
+    sentiment = sum(w * s['sentiment'] for w, s in zip(weights, scores)) / total
+    risk = sum(w * s['risk'] for w, s in zip(weights, scores)) / total
+    risk = max(risk, max(s['risk'] for s in scores) - 1)
+    return max(1, min(5, int(sentiment + 0.5))), max(1, min(5, int(risk + 0.5)))
+
+
+_scorer: Optional[NewsSentimentScorer] = None
+_scorer_lock = threading.Lock()
+
+
+def get_sentiment_scorer() -> NewsSentimentScorer:
+    """获取进程内共享的新闻评分器"""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                _scorer = NewsSentimentScorer()
+    return _scorer
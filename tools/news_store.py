@@ -0,0 +1,279 @@
+"""
+新闻增量存储
+
+按公司保存已抓取的新闻 (SQLite，见 config.NEWS_STORE_PATH)，新闻搜索改为增量同步:
+
+- 文章按规范化URL的哈希去重 (公司 + URL哈希为主键)，再次搜索到的旧文章直接跳过，不再抓取正文、不再评分
+- 每篇事件代表文章的情感/风险评分只计算一次并保存，新闻分析汇总时间窗口 (NEWS_WINDOW_DAYS) 内已保存的评分
+- 转载文章保存为所属事件 (cluster，即代表文章的URL哈希) 的成员，用于统计转载数和来源
+- 事件集合未变化时复用上次的分析结果，批量分析自选股时只做新增部分的工作
+
+同步调度 (搜索、聚类、抓取正文) 在 news_crawler.sync_company_news 中进行，本模块只负责存取。
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+
+# 相对发布时间的单位 (秒)
+_RELATIVE_UNITS = {'秒': 1, '分钟': 60, '小时': 3600, '天': 86400}
+
+
+def article_id(key: str) -> str:
+    """文章ID: 规范化URL (没有URL时为标题) 的哈希"""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_published(text: str, now: Optional[float] = None) -> Optional[float]:
+    """
+    从搜索结果的来源/时间文本中解析发布时间
+
+    支持 "2024-10-18 10:32"、"2024年10月18日"、"10月18日 10:32" (当年)、"昨天 10:32"、"3小时前"、"刚刚"
+
+    Args:
+        text: 来源/时间文本 (如新浪的 "证券时报 2024-10-18 10:32:05")
+        now: 当前时间戳，默认为 time.time()
+
+    Returns:
+        发布时间戳，无法解析时返回None
+    """
+    now = time.time() if now is None else now
+    text = text or ''
+    if '刚刚' in text:
+        return now
+    match = re.search(r'(\d+)\s*(秒|分钟|小时|天)前', text)
+    if match:
+        return now - int(match.group(1)) * _RELATIVE_UNITS[match.group(2)]
+
+    current = datetime.fromtimestamp(now)
+    clock = r'(?:\s*(\d{1,2}):(\d{2})(?::(\d{2}))?)?'
+    match = re.search(r'(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})日?' + clock, text)
+    if match:
+        year, month, day = (int(g) for g in match.groups()[:3])
+        time_parts = match.groups()[3:]
+    else:
+        match = re.search(r'(\d{1,2})月(\d{1,2})日' + clock, text)
+        if match:
+            year, (month, day) = current.year, (int(g) for g in match.groups()[:2])
+            time_parts = match.groups()[2:]
+        else:
+            match = re.search(r'(今天|昨天|前天)' + clock, text)
+            if not match:
+                return None
+            date = current - timedelta(days=('今天', '昨天', '前天').index(match.group(1)))
+            year, month, day = date.year, date.month, date.day
+            time_parts = match.groups()[1:]
+    hour, minute, second = (int(g or 0) for g in time_parts)
+    try:
+        published = datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return None
+    if published > current and not re.search(r'\d{4}', text):
+        published = published.replace(year=year - 1)   # 未写年份的 "12月31日" 在1月份指去年
+    return published.timestamp()
+
+
+class NewsStore:
+    """
+    按公司保存新闻文章、评分和分析结果 (线程安全)
+
+    Attributes:
+        path: 数据库文件路径
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "company TEXT, id TEXT, url TEXT, title TEXT, content TEXT, body TEXT, source TEXT, "
+            "published_at REAL, seen_at REAL, event_time REAL, rank INTEGER, cluster TEXT, "
+            "sentiment REAL, risk REAL, keywords TEXT, score_method TEXT, PRIMARY KEY (company, id));"
+            "CREATE INDEX IF NOT EXISTS idx_articles_time ON articles (company, event_time);"
+            "CREATE INDEX IF NOT EXISTS idx_articles_cluster ON articles (company, cluster);"
+            "CREATE TABLE IF NOT EXISTS syncs (company TEXT PRIMARY KEY, last_sync REAL);"
+            "CREATE TABLE IF NOT EXISTS analyses (company TEXT PRIMARY KEY, digest TEXT, result TEXT, "
+            "created_at REAL);"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._stats = {'syncs': 0, 'skipped_syncs': 0, 'new_articles': 0, 'seen_articles': 0,
+                       'scored': 0, 'analyses_reused': 0}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """记录同步统计 (见 stats)"""
+        with self._lock:
+            self._stats[name] += amount
+        if name in ('new_articles', 'seen_articles') and amount:
+            registry.inc('stock_agent_news_store_articles_total', {'result': name.split('_')[0]}, amount,
+                         help_text='新闻同步时新增/已存在的文章数')
+
+    def last_sync(self, company: str) -> Optional[float]:
+        """上次同步时间，从未同步时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT last_sync FROM syncs WHERE company = ?", (company,)).fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, company: str, when: float, since: float) -> int:
+        """
+        记录同步时间，并清理时间窗口之外的数据
+
+        删除该公司 event_time 早于窗口起点的文章，以及早于窗口起点的其他公司同步记录和分析结果
+        (长期未分析的公司不再占用空间)。
+
+        Args:
+            company: 公司名称
+            when: 同步时间
+            since: 时间窗口起点
+
+        Returns:
+            删除的文章数
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO syncs VALUES (?, ?)", (company, when))
+            deleted = self._conn.execute("DELETE FROM articles WHERE company = ? AND event_time < ?",
+                                         (company, since)).rowcount
+            self._conn.execute("DELETE FROM syncs WHERE last_sync < ? AND company != ?", (since, company))
+            self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (since,))
+            self._conn.commit()
+        return deleted
+
+    def unseen(self, company: str, articles: List[Dict]) -> List[Dict]:
+        """
+        筛选未保存过的文章 (按 id)
+
+        Args:
+            company: 公司名称
+            articles: 含 id 的文章列表
+
+        Returns:
+            未保存过的文章 (保持原顺序)
+        """
+        ids = [a['id'] for a in articles]
+        with self._lock:
+            seen = {row[0] for row in self._conn.execute(
+                f"SELECT id FROM articles WHERE company = ? AND id IN ({','.join('?' * len(ids))})",
+                [company, *ids],
+            )}
+        fresh = [a for a in articles if a['id'] not in seen]
+        self.count('new_articles', len(fresh))
+        self.count('seen_articles', len(articles) - len(fresh))
+        return fresh
+
+    def add_articles(self, company: str, articles: List[Dict], seen_at: float) -> None:
+        """
+        保存新文章
+
+        Args:
+            company: 公司名称
+            articles: 含 id/cluster 的文章列表 (按搜索排名排序，可含 published/body)
+            seen_at: 同步时间
+        """
+        rows = [
+            (company, a['id'], a.get('url', ''), a['title'], a.get('content', ''), a.get('body'),
+             a.get('source', ''), a.get('published'), seen_at, a.get('published') or seen_at, rank,
+             a['cluster'], None, None, None, None)
+            for rank, a in enumerate(articles)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO articles VALUES ({', '.join('?' * 16)})", rows)
+            self._conn.commit()
+
+    def save_scores(self, company: str, ids: List[str], scores: List[Dict]) -> None:
+        """保存事件代表文章的评分 (news_sentiment.score_articles 的结果)"""
+        rows = [(s['sentiment'], s['risk'], json.dumps(s['keywords'], ensure_ascii=False), s['method'], company, i)
+                for i, s in zip(ids, scores)]
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE articles SET sentiment = ?, risk = ?, keywords = ?, score_method = ? "
+                "WHERE company = ? AND id = ?", rows)
+            self._conn.commit()
+        self.count('scored', len(rows))
+
+    def window_events(self, company: str, since: float) -> List[Dict]:
+        """
+        时间窗口内的新闻事件
+
+        Args:
+            company: 公司名称
+            since: 窗口起点 (按发布时间，无发布时间时按首次发现时间)
+
+        Returns:
+            事件代表文章列表 (最近同步的在前，同次同步按搜索排名)，附加 reposts (转载数)、
+            sources (各转载来源) 和 score (未评分时为None)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, url, title, content, body, source, published_at, sentiment, risk, keywords, "
+                "score_method FROM articles WHERE company = ? AND cluster = id AND event_time >= ? "
+                "ORDER BY seen_at DESC, rank", (company, since),
+            ).fetchall()
+            members: Dict[str, List[str]] = {}
+            for cluster, source in self._conn.execute(
+                    "SELECT cluster, source FROM articles WHERE company = ? AND event_time >= ? "
+                    "ORDER BY seen_at, rank", (company, since)):
+                members.setdefault(cluster, []).append(source)
+        events = []
+        for (id_, url, title, content, body, source, published, sentiment, risk, keywords, method) in rows:
+            sources = members.get(id_, [source])
+            score = None
+            if sentiment is not None:
+                score = {'sentiment': sentiment, 'risk': risk, 'keywords': json.loads(keywords), 'method': method}
+            events.append({
+                'id': id_, 'url': url, 'title': title, 'content': content, 'source': source,
+                'published': published, 'reposts': len(sources) - 1,
+                'sources': list(dict.fromkeys(s for s in sources if s)), 'score': score,
+                **({'body': body} if body else {}),
+            })
+        return events
+
+    def cached_analysis(self, company: str, digest: str) -> Optional[Dict]:
+        """事件集合未变化 (digest 相同) 时返回上次的分析结果"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM analyses WHERE company = ? AND digest = ?",
+                                     (company, digest)).fetchone()
+        if row is None:
+            return None
+        self.count('analyses_reused')
+        return json.loads(row[0])
+
+    def save_analysis(self, company: str, digest: str, result: Dict) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)",
+                               (company, digest, json.dumps(result, ensure_ascii=False), time.time()))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """同步统计 (本进程)"""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[NewsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_news_store() -> NewsStore:
+    """进程内共享的新闻库"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = NewsStore(config.NEWS_STORE_PATH)
+    return _store
@@ -0,0 +1,156 @@
+"""
+规划阶段的数据预取模块
+
+规划Agent的ReAct循环需要数秒 (意图识别 + 工具调用 + LLM输出)。查询中能直接确定唯一股票时
+(如包含A股代码或映射表中的公司简称)，在规划的同时于数据线程池中预取分析节点随后要用的数据:
+基本信息、近3年日K线、最新一季财务数据、相关新闻。
+
+- 预取结果写入进程内数据缓存 (tools/data_cache.py)，分析节点的工具调用参数相同时直接命中；
+  请求仍在进行时，相同请求会等待并复用这次结果
+- 规划结果与预取的股票不一致 (或不是股票分析) 时取消尚未开始的预取
+- 预取失败不影响分析 (异常不缓存，工具调用时重新获取)
+"""
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from monitoring.metrics import registry
+from .async_utils import DATA_EXECUTOR
+from .baostock_utils import fetch_generic_data
+from .capabilities import SOURCE_CAPABILITIES, market_of
+from .data_source import fetch_financial_data_dual
+from .date_utils import get_current_year_quarter, get_market_analysis_timeframe
+from .news_crawler import fetch_news_list
+from .stock_market import DEFAULT_K_FIELDS
+from .stock_search import match_stock_in_query
+
+# 预取任务走 Baostock，只预取其支持的市场 (见 tools/capabilities.py)
+_PREFETCH_MARKETS = SOURCE_CAPABILITIES['baostock']['k_data']
+
+
+def _prefetch_jobs(code: str, name: str) -> Dict[str, Callable[[], object]]:
+    """
+    预取任务 (参数与各分析Agent工具的调用方式一致，才能命中缓存)
+
+    Args:
+        code: 股票代码
+        name: 公司名称 (为空时不预取新闻)
+
+    Returns:
+        {任务名: 无参函数}
+    """
+    # 技术分析Agent按Prompt获取近3年日K线
+    timeframe = get_market_analysis_timeframe('three_years')
+    year, quarter = get_current_year_quarter()
+    jobs = {
+        'basic_info': lambda: fetch_generic_data(query_type='stock_basic', code=code),
+        'k_data': lambda: fetch_generic_data(
+            query_type='k_data', code=code,
+            start_date=timeframe['start_date'], end_date=timeframe['end_date'],
+            frequency='d', adjustflag='3', fields=DEFAULT_K_FIELDS,
+        ),
+        'financials': lambda: fetch_financial_data_dual(code, year, quarter, 'profit'),
+    }
+    if name:
+        jobs['news'] = lambda: fetch_news_list(name, config.NEWS_COUNT)
+    return jobs
+
+
+class Prefetch:
+    """
+    一次规划对应的预取 (上下文管理器，退出时未确认的预取自动取消)
+
+    Attributes:
+        code: 预取的股票代码，未启动预取时为空字符串
+        name: 公司名称
+    """
+
+    def __init__(self, code: str = '', name: str = ''):
+        self.code = code
+        self.name = name
+        self.futures: Dict[str, Future] = {}
+        self._cancelled = threading.Event()
+        self._settled = False
+
+    def start(self) -> 'Prefetch':
+        """提交预取任务到数据线程池 (保留运行ID等上下文变量)"""
+        print(f"    [Prefetch] 预取 {self.name or self.code} ({self.code}) 的数据: 基本信息/K线/财务/新闻")
+        for kind, job in _prefetch_jobs(self.code, self.name).items():
+            context = contextvars.copy_context()
+            self.futures[kind] = DATA_EXECUTOR.submit(context.run, self._run, kind, job)
+        return self
+
+    def _run(self, kind: str, job: Callable[[], object]) -> None:
+        if self._cancelled.is_set():
+            return
+        try:
+            job()
+            result = 'done'
+        except Exception as e:
+            print(f"    [Prefetch] {kind} 预取失败: {e}")
+            result = 'failed'
+        registry.inc('stock_agent_prefetch_total', {'kind': kind, 'result': result},
+                     help_text='规划阶段数据预取次数')
+
+    def settle(self, stock_code: str) -> bool:
+        """
+        用规划结果确认预取
+
+        Args:
+            stock_code: 规划Agent最终确定的股票代码
+
+        Returns:
+            预取是否有效 (股票一致)；不一致时取消尚未开始的预取
+        """
+        self._settled = True
+        if not self.futures:
+            return False
+        if stock_code == self.code:
+            return True
+        self.cancel()
+        return False
+
+    def cancel(self) -> None:
+        """取消尚未开始的预取 (正在执行的请求无法中断，其结果仍写入缓存)"""
+        if not self.futures or self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        cancelled = [kind for kind, future in self.futures.items() if future.cancel()]
+        for kind in cancelled:
+            registry.inc('stock_agent_prefetch_total', {'kind': kind, 'result': 'cancelled'},
+                         help_text='规划阶段数据预取次数')
+        print(f"    [Prefetch] 规划结果不是 {self.code}，已取消 {len(cancelled)} 项未开始的预取")
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的预取结束 (测试用)"""
+        for future in self.futures.values():
+            if not future.cancelled():
+                future.result(timeout=timeout)
+
+    def __enter__(self) -> 'Prefetch':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self._settled:
+            self.cancel()
+
+
+def start_prefetch(query: str) -> Prefetch:
+    """
+    查询中能直接确定唯一股票时启动预取
+
+    Args:
+        query: 用户查询
+
+    Returns:
+        预取对象 (未启动时为空预取，settle/cancel 均无操作)
+    """
+    if not config.PREFETCH_ENABLED or config.DATA_CACHE_TTL <= 0:
+        return Prefetch()
+    match = match_stock_in_query(query)
+    if match is None or market_of(match[0]) not in _PREFETCH_MARKETS:
+        return Prefetch()
+    return Prefetch(*match).start()
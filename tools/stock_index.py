@@ -0,0 +1,409 @@
+"""
+股票名称索引模块
+全部A股的名称索引，每个进程只加载一次，按天刷新并持久化到本地文件
+
+- 精确/前缀匹配: 公司名称、简称 (去掉 *ST/股份/集团 等)、拼音首字母 (gzmt)、全拼 (guizhoumaotai)、
+  曾用名 (刷新时名称变化的股票保留旧名称)、STOCK_MAPPING 中的常用简称，统一建在一棵字典树上
+- 模糊匹配: 字符 1-gram/2-gram 倒排索引，按 Dice 系数容忍错别字 (如 "贵洲茅台")
+- 刷新: 索引文件超过 STOCK_INDEX_TTL 后在后台线程重建 (Akshare，失败时回退 Baostock)，重建期间继续使用旧索引；
+  没有索引文件且数据源不可用时只包含 STOCK_MAPPING
+"""
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import sys
+sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
+from config import config
+from .aho_corasick import AhoCorasick
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 未安装时不建立拼音键
+    lazy_pinyin = None
+
+# 生成简称时去掉的前缀/后缀
+_NAME_PREFIXES = ('*ST', 'S*ST', 'SST', 'ST', 'S')
+_NAME_SUFFIXES = ('股份', '集团', '控股', 'Ａ', 'Ｂ', 'A', 'B')
+# 索引刷新失败后的重试间隔 (秒)
+REFRESH_RETRY_INTERVAL = 600
+# 模糊匹配的最低相似度，以及计算相似度的候选数上限
+FUZZY_THRESHOLD = 0.5
+FUZZY_CANDIDATES = 50
+
+
+def _abbreviations(name: str) -> List[str]:
+    """由证券简称生成去掉ST标记和常见后缀的简称"""
+    results = []
+    base = name
+    for prefix in _NAME_PREFIXES:
+        if base.startswith(prefix) and len(base) > len(prefix) + 1:
+            base = base[len(prefix):]
+            results.append(base)
+            break
+    for suffix in _NAME_SUFFIXES:
+        if base.endswith(suffix) and len(base) > len(suffix) + 1:
+            results.append(base[:-len(suffix)])
+            break
+    return results
+
+
+def _pinyin_keys(name: str) -> Tuple[str, str]:
+    """(拼音首字母, 全拼)，未安装 pypinyin 时为空字符串"""
+    if lazy_pinyin is None:
+        return '', ''
+    initials = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER, errors='ignore')).lower()
+    full = ''.join(lazy_pinyin(name, errors='ignore')).lower()
+    return initials, full
+
+
+def _ngrams(text: str) -> Counter:
+    """字符 1-gram 和 2-gram"""
+    grams = Counter(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _has_cjk(text: str) -> bool:
+    return any('\u4e00' <= char <= '\u9fff' for char in text)
+
+
+def _dice(left: Counter, right: Counter) -> float:
+    total = sum(left.values()) + sum(right.values())
+    return 2 * sum((left & right).values()) / total if total else 0.0
+
+
+class StockIndex:
+    """
+    股票名称索引
+
+    Attributes:
+        stocks: [{'code', 'name', 'former_names', 'aliases', 'initials', 'pinyin'}]
+        built_at: 构建时间 (ISO格式)
+        source: 数据来源 (akshare/baostock/mapping)
+    """
+
+    def __init__(self, stocks: Iterable[Dict[str, Any]], built_at: str = '', source: str = ''):
+        self.stocks: List[Dict[str, Any]] = []
+        self.built_at = built_at or datetime.now().isoformat(timespec='seconds')
+        self.source = source
+        self._by_code: Dict[str, int] = {}
+        self._exact: Dict[str, List[int]] = {}
+        self._trie: Dict[str, Any] = {}
+        self._grams: Dict[str, List[int]] = {}
+        self._name_grams: List[Counter] = []
+        self._automaton: Optional[AhoCorasick] = None
+        for stock in stocks:
+            self._add(stock)
+
+    def _add(self, stock: Dict[str, Any]) -> None:
+        if stock['code'] in self._by_code:
+            return
+        entry = {
+            'code': stock['code'],
+            'name': ''.join(stock['name'].split()),  # Akshare 的三字名称带空格，如 "五 粮 液"
+            'former_names': list(stock.get('former_names') or []),
+            'aliases': list(stock.get('aliases') or []),
+        }
+        if 'initials' in stock and 'pinyin' in stock:
+            entry['initials'], entry['pinyin'] = stock['initials'], stock['pinyin']
+        else:
+            entry['initials'], entry['pinyin'] = _pinyin_keys(entry['name'])
+        position = len(self.stocks)
+        self.stocks.append(entry)
+        self._by_code[entry['code']] = position
+
+        names = [entry['name'], *entry['former_names'], *entry['aliases']]
+        keys = set(names)
+        for name in names:
+            keys.update(_abbreviations(name))
+        keys.update(key for key in (entry['initials'], entry['pinyin']) if key)
+        for key in keys:
+            self._insert(key.lower(), position)
+
+        grams = _ngrams(entry['name'])
+        self._name_grams.append(grams)
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(position)
+
+    def _insert(self, key: str, position: int) -> None:
+        """
+        写入精确匹配表和字典树 (节点的 '$' 记录经过该节点的股票)
+
+        同一股票的键连续写入，只需与列表末尾比较即可去重
+        """
+        postings = self._exact.setdefault(key, [])
+        if not postings or postings[-1] != position:
+            postings.append(position)
+        node = self._trie
+        for char in key:
+            node = node.setdefault(char, {})
+            below = node.setdefault('$', [])
+            if not below or below[-1] != position:
+                below.append(position)
+
+    def _prefix_positions(self, text: str) -> List[int]:
+        node = self._trie
+        for char in text.strip().lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get('$', [])
+
+    def _best(self, positions: Iterable[int], key: str = '') -> Dict[str, Any]:
+        """多个候选时优先名称与查询相同的，其次名称最短的"""
+        return min((self.stocks[p] for p in positions),
+                   key=lambda s: (s['name'].lower() != key, len(s['name']), s['code']))
+
+    def __len__(self) -> int:
+        return len(self.stocks)
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """按代码获取条目"""
+        position = self._by_code.get(code)
+        return self.stocks[position] if position is not None else None
+
+    def exact(self, name: str) -> Optional[Dict[str, Any]]:
+        """名称/简称/拼音/曾用名的精确匹配"""
+        key = name.strip().lower()
+        positions = self._exact.get(key)
+        return self._best(positions, key) if positions else None
+
+    def prefix(self, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        前缀匹配 (用于补全)
+
+        Args:
+            text: 名称或拼音的前缀
+            limit: 最多返回的条数
+
+        Returns:
+            按名称长度排序的条目
+        """
+        positions = self._prefix_positions(text)
+        return sorted((self.stocks[p] for p in positions), key=lambda s: (len(s['name']), s['code']))[:limit]
+
+    def fuzzy(self, text: str, threshold: float = FUZZY_THRESHOLD) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        容错匹配: 查询包含于名称中时取最短的名称，否则按 n-gram 相似度取最高者
+
+        候选由 2-gram 倒排索引产生 (查询过短或没有共同 2-gram 时用 1-gram)，只对共享 n-gram 最多的候选计算相似度
+
+        Returns:
+            (条目, 相似度)，没有达到阈值的候选时返回None
+        """
+        text = text.strip()
+        grams = _ngrams(text)
+        bigrams = [gram for gram in grams if len(gram) == 2]
+        candidates = Counter()
+        for gram in bigrams:
+            candidates.update(self._grams.get(gram, ()))
+        if not candidates:
+            for gram in text:
+                candidates.update(self._grams.get(gram, ()))
+        if not candidates:
+            return None
+        # 名称包含查询时必然包含查询的全部 n-gram
+        needed = len(bigrams) or 1
+        containing = [p for p, count in candidates.items()
+                      if count >= needed and text in self.stocks[p]['name']]
+        if containing:
+            best = self._best(containing)
+            return best, len(text) / len(best['name'])
+        position, score = max(
+            ((p, _dice(grams, self._name_grams[p])) for p, _ in candidates.most_common(FUZZY_CANDIDATES)),
+            key=lambda item: (item[1], -len(self.stocks[item[0]]['name'])),
+        )
+        return (self.stocks[position], score) if score >= threshold else None
+
+    def automaton(self) -> AhoCorasick:
+        """
+        名称类键 (含中文的名称、简称、曾用名、常用简称) 的 Aho-Corasick 自动机，首次调用时构建
+
+        关联值为该键对应的条目列表 (多于一个时有歧义)
+        """
+        if self._automaton is None:
+            self._automaton = AhoCorasick(
+                (key, [self.stocks[p] for p in positions])
+                for key, positions in self._exact.items() if len(key) >= 2 and _has_cjk(key)
+            )
+        return self._automaton
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        按名称查找股票: 精确匹配 -> 唯一前缀 -> 模糊匹配
+
+        Args:
+            name: 公司名称、简称、拼音首字母或曾用名
+
+        Returns:
+            索引条目，未找到时返回None
+        """
+        if not name or not name.strip():
+            return None
+        found = self.exact(name)
+        if found:
+            return found
+        positions = self._prefix_positions(name)
+        if len(positions) == 1:
+            return self.stocks[positions[0]]
+        matched = self.fuzzy(name)
+        return matched[0] if matched else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'built_at': self.built_at, 'source': self.source, 'stocks': self.stocks}
+
+    def save(self, path: Path) -> None:
+        """写入索引文件 (先写临时文件再替换，避免读到半个文件)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(path.suffix + '.tmp')
+        temp.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding='utf-8')
+        temp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'StockIndex':
+        data = json.loads(path.read_text(encoding='utf-8'))
+        return cls(data['stocks'], built_at=data.get('built_at', ''), source=data.get('source', ''))
+
+
+def _mapping_entries() -> List[Dict[str, Any]]:
+    """STOCK_MAPPING 中的常用简称 (作为别名并入索引；不在A股列表中的港股等单独成条)"""
+    from .stock_search import STOCK_MAPPING
+    entries: Dict[str, Dict[str, Any]] = {}
+    for name, code in STOCK_MAPPING.items():
+        if not code:
+            continue
+        entry = entries.setdefault(code, {'code': code, 'name': name, 'aliases': []})
+        if len(name) > len(entry['name']):
+            entry['aliases'].append(entry['name'])
+            entry['name'] = name
+        else:
+            entry['aliases'].append(name)
+    return list(entries.values())
+
+
+def _fetch_listing() -> Tuple[List[Tuple[str, str]], str]:
+    """下载全部A股 [(代码, 名称)]，Akshare 失败时回退 Baostock"""
+    try:
+        from .http_client import import_akshare
+        ak = import_akshare()
+        df = ak.stock_info_a_code_name()
+        listing = []
+        for code, name in zip(df['code'], df['name']):
+            code = str(code).zfill(6)
+            market = 'sh' if code[0] in '69' else 'bj' if code[0] in '48' else 'sz'
+            listing.append((f"{market}.{code}", str(name)))
+        if listing:
+            return listing, 'akshare'
+    except Exception as e:
+        print(f"    [StockIndex] Akshare 获取股票列表失败: {e}")
+
+    from .baostock_utils import fetch_generic_data
+    from .date_utils import get_latest_trading_date
+    df = fetch_generic_data(query_type='all_stock', date=get_latest_trading_date())
+    listing = [(code, name) for code, name in zip(df['code'], df['code_name'])
+               if code.startswith(('sh.6', 'sz.0', 'sz.3', 'bj.'))]  # 排除指数
+    if not listing:
+        raise RuntimeError("Baostock 未返回股票列表")
+    return listing, 'baostock'
+
+
+def build_index(previous: Optional[StockIndex] = None) -> StockIndex:
+    """
+    从数据源重建索引
+
+    Args:
+        previous: 上一版索引 (名称变化的股票把旧名称记为曾用名，并保留其已有曾用名)
+
+    Returns:
+        新索引
+    """
+    listing, source = _fetch_listing()
+    mapping = {entry['code']: entry for entry in _mapping_entries()}
+    stocks = []
+    for code, name in listing:
+        name = ''.join(name.split())
+        former = []
+        old = previous.get(code) if previous else None
+        if old:
+            former = [n for n in old['former_names'] + [old['name']] if n != name]
+        aliases = [n for n in [mapping.get(code, {}).get('name'), *mapping.get(code, {}).get('aliases', [])]
+                   if n and n != name]
+        stocks.append({'code': code, 'name': name, 'former_names': list(dict.fromkeys(former)),
+                       'aliases': aliases})
+    listed = {code for code, _ in listing}
+    stocks.extend(entry for code, entry in mapping.items() if code not in listed)
+    return StockIndex(stocks, source=source)
+
+
+_index: Optional[StockIndex] = None
+_lock = threading.Lock()
+_refreshing = threading.Event()
+_next_refresh = 0.0  # 刷新失败后，在此时间之前不再重试
+
+
+def _is_stale(index: StockIndex) -> bool:
+    try:
+        built = datetime.fromisoformat(index.built_at).timestamp()
+    except ValueError:
+        return True
+    return time.time() - built > config.STOCK_INDEX_TTL
+
+
+def _refresh(path: Path) -> None:
+    """后台重建索引并替换进程内的索引"""
+    global _index, _next_refresh
+    try:
+        start = time.perf_counter()
+        index = build_index(_index)
+        index.save(path)
+        _index = index
+        print(f"    [StockIndex] 索引已刷新: {len(index)} 只股票 ({index.source}, {time.perf_counter() - start:.1f}s)")
+    except Exception as e:
+        _next_refresh = time.time() + REFRESH_RETRY_INTERVAL
+        print(f"    [StockIndex] 索引刷新失败，继续使用现有索引: {e}")
+    finally:
+        _refreshing.clear()
+
+
+def _schedule_refresh(path: Path) -> None:
+    if _refreshing.is_set() or time.time() < _next_refresh:
+        return
+    _refreshing.set()
+    threading.Thread(target=_refresh, args=(path,), name='stock-index-refresh', daemon=True).start()
+
+
+def get_stock_index() -> StockIndex:
+    """
+    获取进程内共享的股票索引
+
+    首次调用时加载索引文件 (没有文件时同步构建一次)；索引过期时在后台刷新，本次仍返回现有索引。
+
+    Returns:
+        股票索引
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                path = config.STOCK_INDEX_PATH
+                try:
+                    _index = StockIndex.load(path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"    [StockIndex] 索引文件读取失败，重新构建: {e}")
+                if _index is None:
+                    try:
+                        _index = build_index()
+                        _index.save(path)
+                    except Exception as e:
+                        print(f"    [StockIndex] 股票列表获取失败，仅使用常用股票映射: {e}")
+                        # 标记为过期，下次访问时后台重试
+                        _index = StockIndex(_mapping_entries(), built_at='1970-01-01T00:00:00', source='mapping')
+    if _is_stale(_index):
+        _schedule_refresh(config.STOCK_INDEX_PATH)
+    return _index
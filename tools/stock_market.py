@@ -5,6 +5,11 @@
 from typing import Optional, List
 from langchain_core.tools import tool
 from .baostock_utils import fetch_generic_data, format_to_markdown
+from .data_source import fetch_k_data
+from .capabilities import check_tool
+
+# K线默认返回字段 (规划阶段预取使用相同参数，见 tools/prefetch.py)
+DEFAULT_K_FIELDS = "date,open,high,low,close,volume,amount,turn,pctChg"
 
 
 @tool
@@ -14,7 +19,7 @@ def get_historical_k_data(
     end_date: str,
     frequency: str = "d",
     adjustflag: str = "3",
-    fields: str = "date,open,high,low,close,volume,amount,turn,pctChg"
+    fields: str = DEFAULT_K_FIELDS
 ) -> str:
     """
     获取股票历史K线数据
@@ -30,9 +35,13 @@ def get_historical_k_data(
     Returns:
         str: Markdown格式的K线数据表格
     """
+    rejected = check_tool('get_historical_k_data', code)
+    if rejected:
+        return rejected
+    
     try:
-        df = fetch_generic_data(
-            query_type='k_data',
+        # A股走 Baostock，港股走 AKShare
+        df = fetch_k_data(
             code=code,
             start_date=start_date,
             end_date=end_date,
@@ -56,6 +65,10 @@ def get_stock_basic_info(code: str) -> str:
     Returns:
         str: Markdown格式的股票基本信息
     """
+    rejected = check_tool('get_stock_basic_info', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(query_type='stock_basic', code=code)
         return format_to_markdown(df, f"{code} 基本信息")
@@ -80,6 +93,10 @@ def get_dividend_data(
     Returns:
         str: Markdown格式的分红数据
     """
+    rejected = check_tool('get_dividend_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(
             query_type='dividend',
@@ -109,6 +126,10 @@ def get_adjust_factor_data(
     Returns:
         str: Markdown格式的复权因子数据
     """
+    rejected = check_tool('get_adjust_factor_data', code)
+    if rejected:
+        return rejected
+    
     try:
         df = fetch_generic_data(
             query_type='adjust_factor',
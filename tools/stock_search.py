@@ -2,15 +2,16 @@
 股票搜索工具模块
 提供公司名称到股票代码的查询功能
 """
+import re
 import baostock as bs
-import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from .baostock_utils import baostock_login_context
+from .stock_index import get_stock_index
 import sys
 sys.path.insert(0, str(__file__).rsplit('\\', 2)[0])
 from config import config
+from llm.factory import get_chat_model
 
 
 # 常用股票映射表 (公司简称 -> 股票代码)
@@ -76,6 +77,94 @@ STOCK_MAPPING = {
 }
 
 
+_CODE_PATTERN = re.compile(r'^(?:(sh|sz|bj)\.?)?(\d{6})$', re.IGNORECASE)
+# 查询文本中的A股代码 (前后不能紧邻数字或字母)
+_CODE_IN_TEXT = re.compile(r'(?<![0-9A-Za-z.])((?:sh|sz|bj)\.?)?(\d{6})(?![0-9])', re.IGNORECASE)
+
+
+def normalize_code(text: str) -> Optional[str]:
+    """
+    规范化股票代码
+    
+    Args:
+        text: 如 sh.600519、SH600519、600519
+    
+    Returns:
+        Baostock格式代码 (sh.600519)，不是股票代码时返回None
+    """
+    match = _CODE_PATTERN.match(text.strip())
+    if not match:
+        return None
+    market, digits = match.group(1), match.group(2)
+    if not market:
+        market = 'sh' if digits[0] in '69' else 'bj' if digits[0] in '48' else 'sz'
+    return f"{market.lower()}.{digits}"
+
+
+def extract_stocks(query: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    词典抽取查询中提到的股票 (不调用LLM和数据源)
+    
+    一次扫描: 股票名称索引上的 Aho-Corasick 自动机匹配名称/简称/曾用名 (不重叠的最左最长匹配)，
+    正则匹配A股代码。
+    
+    Args:
+        query: 用户查询
+    
+    Returns:
+        ([{'code', 'name', 'text', 'start'}], 是否有歧义)，股票按在查询中出现的顺序去重；
+        名称为索引中的当前名称 (如 "茅台" -> "贵州茅台")，未知代码为空字符串；
+        某个词对应多只股票时不计入结果并标记为有歧义
+    """
+    index = get_stock_index()
+    found = []
+    for match in _CODE_IN_TEXT.finditer(query):
+        code = normalize_code(''.join(match.groups('')))
+        entry = index.get(code)
+        found.append((match.start(), code, entry['name'] if entry else '', match.group()))
+    ambiguous = False
+    for start, end, entries in index.automaton().longest_matches(query):
+        text = query[start:end]
+        if len(entries) > 1:
+            # 当前名称与该词相同的条目优先 (其他条目只是曾用名/简称相同)
+            entries = [e for e in entries if e['name'].lower() == text.lower()]
+            if len(entries) != 1:
+                ambiguous = True
+                continue
+        found.append((start, entries[0]['code'], entries[0]['name'], text))
+    stocks: Dict[str, Dict[str, Any]] = {}
+    for start, code, name, text in sorted(found):
+        stocks.setdefault(code, {'code': code, 'name': name, 'text': text, 'start': start})
+    return list(stocks.values()), ambiguous
+
+
+def match_stocks_in_query(query: str) -> List[Tuple[str, str]]:
+    """
+    不调用LLM和数据源，找出查询中明确提到的所有股票 (A股代码或股票名称索引中的名称/简称)
+    
+    Args:
+        query: 用户查询
+    
+    Returns:
+        [(股票代码, 公司名称)]，按在查询中出现的顺序去重 (见 extract_stocks)
+    """
+    return [(stock['code'], stock['name']) for stock in extract_stocks(query)[0]]
+
+
+def match_stock_in_query(query: str) -> Optional[Tuple[str, str]]:
+    """
+    不调用LLM和数据源，从查询中直接确定唯一的股票 (高置信度匹配)
+    
+    Args:
+        query: 用户查询
+    
+    Returns:
+        (股票代码, 公司名称)，查询涉及多只股票或无法确定时返回None
+    """
+    stocks = match_stocks_in_query(query)
+    return stocks[0] if len(stocks) == 1 else None
+
+
 def _search_stock_by_name(company_name: str) -> Optional[Dict[str, str]]:
     """
     通过公司名称搜索股票代码
@@ -90,57 +179,17 @@ def _search_stock_by_name(company_name: str) -> Optional[Dict[str, str]]:
     if company_name in STOCK_MAPPING:
         code = STOCK_MAPPING[company_name]
         if code:
-            return {'code': code, 'name': company_name, 'market': _get_market(code)}
+            return {'code': code, 'name': company_name, 'market': get_market(code)}
         return None
     
-    # 方法1: 使用 Akshare 搜索 A 股
-    try:
-        import akshare as ak
-        df = ak.stock_info_a_code_name()
-        # 模糊匹配: 公司名称包含查询词，或查询词包含公司名称
-        matches = df[df['name'].str.contains(company_name, na=False)]
-        if not matches.empty:
-            row = matches.iloc[0]
-            code = row['code']
-            name = row['name']
-            # 转换为 baostock 格式 (sh./sz.)
-            if code.startswith('6'):
-                bs_code = f"sh.{code}"
-            else:
-                bs_code = f"sz.{code}"
-            return {
-                'code': bs_code,
-                'name': name,
-                'market': _get_market(bs_code)
-            }
-    except Exception as e:
-        print(f"    [DEBUG] Akshare搜索失败: {e}")
-    
-    # 方法2: 使用 Baostock 搜索 (备选)
-    try:
-        with baostock_login_context():
-            rs = bs.query_all_stock()
-            if rs.error_code != '0':
-                return None
-            
-            while rs.next():
-                row = rs.get_row_data()
-                stock_code = row[0]
-                stock_name = row[1] if len(row) > 1 else ''
-                
-                if company_name in stock_name or stock_name in company_name:
-                    return {
-                        'code': stock_code,
-                        'name': stock_name,
-                        'market': _get_market(stock_code)
-                    }
-    except Exception as e:
-        print(f"    [DEBUG] Baostock搜索失败: {e}")
-    
+    # 进程内的股票名称索引 (名称/简称/拼音/曾用名/容错匹配，不再每次下载全部股票列表)
+    entry = get_stock_index().lookup(company_name)
+    if entry:
+        return {'code': entry['code'], 'name': entry['name'], 'market': get_market(entry['code'])}
     return None
 
 
-def _get_market(code: str) -> str:
+def get_market(code: str) -> str:
     """
     根据股票代码判断市场
     """
@@ -174,12 +223,7 @@ def _extract_company_name_with_llm(query: str) -> str:
 公司名称:"""
     
     try:
-        llm = ChatOpenAI(
-            api_key=config.OPENAI_API_KEY,
-            base_url=config.OPENAI_BASE_URL,
-            model=config.OPENAI_MODEL,
-            temperature=0
-        )
+        llm = get_chat_model("company_extraction")
         response = llm.invoke(prompt)
         return response.content.strip()
     except:
@@ -216,7 +260,7 @@ def query_stock_info(query: str) -> str:
 |------|------|
 | 股票代码 | {query} |
 | 股票名称 | {row[1] if len(row) > 1 else '未知'} |
-| 市场 | {_get_market(query)} |
+| 市场 | {get_market(query)} |
 | 状态 | 正常 |
 """
         except: